@@ -2,17 +2,28 @@
 קלאסים בסיסיים למערכת ה-Agents
 """
 
-from openai import OpenAI
-from typing import Optional, Any, List, Callable, Dict
-from pydantic import BaseModel, create_model
+from typing import TYPE_CHECKING, Optional, Any, List, Callable, Dict
 import json
 import inspect
 import functools
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.tokens import compact_tool_output, prompt_token_report
+from .records import render_result
+from .runtime import (
+    Completion, ToolCalls, RunAgent, run_effects, arun_effects,
+    agent_events, agent_aevents, drain_events, adrain_events, acreate_completion, record_llm_call
+)
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 class Agent:
     """מחלקת בסיס לסוכן AI שיכול להשתמש בכלים"""
     
-    def __init__(self, client, model="gpt-4o", woo_client=None):
+    def __init__(self, client, model="gpt-4o", woo_client=None, max_parallel_tools=4,
+                 max_steps=5, token_budget=None, deadline_seconds=None, max_tool_result_tokens=1500):
         """
         אתחול סוכן AI בסיסי
         
@@ -20,25 +31,322 @@ class Agent:
             client: לקוח OpenAI
             model: מודל השפה לשימוש
             woo_client: לקוח WooCommerce (אופציונלי)
+            max_parallel_tools: מספר קריאות הכלים המקסימלי שירוצו במקביל (ברירת מחדל: 4)
+            max_steps: מספר צעדי הכלים המקסימלי בריצה אחת (ברירת מחדל: 5)
+            token_budget: תקציב טוקנים לריצה אחת (ברירת מחדל: ללא הגבלה)
+            deadline_seconds: זמן מקסימלי לריצה אחת בשניות (ברירת מחדל: ללא הגבלה)
+            max_tool_result_tokens: תקרת הטוקנים של תוצאת כלי שנשלחת למודל (None - ללא הגבלה)
         """
         self.client = client
         self.model = model
         self.tools = []
+        # הגדרות הכלים בפורמט ה-API, נבנות פעם אחת ומתעדכנות כשנוסף כלי
+        self._tools_for_api = None
         self.description = None
         self.woocommerce = woo_client  # שמירת לקוח WooCommerce בתכונה
         self.function_map = {}  # מיפוי של פונקציות
+        self.max_parallel_tools = max_parallel_tools
+        self.max_steps = max_steps
+        self.token_budget = token_budget
+        self.deadline_seconds = deadline_seconds
+        self.max_tool_result_tokens = max_tool_result_tokens
+        # נתוני הריצה האחרונה - לכל תהליכון ולכל משימת asyncio בנפרד
+        self._run_stats = contextvars.ContextVar(f"agent_run_stats_{id(self)}", default=None)
     
     def run(self, input_text):
         """
         הפעלת הסוכן עם טקסט קלט
         
+        הסוכן מריץ לולאת קריאות כלים: בכל צעד המודל יכול לבקש כלים נוספים,
+        עד שהוא מחזיר תשובה סופית או שאחת ממגבלות התקציב מופעלת
+        (מספר צעדים, טוקנים, זמן או קריאה כפולה לאותו כלי).
+        
+        Args:
+            input_text: טקסט השאלה/הבקשה
+            
+        Returns:
+            תשובת הסוכן כמחרוזת
+        """
+        return drain_events(self._run_events(input_text, stream=False))
+    
+    def run_stream(self, input_text):
+        """
+        הפעלת הסוכן במצב הזרמה
+        
+        Args:
+            input_text: טקסט השאלה/הבקשה
+            
+        Yields:
+            אירועים כמילונים: token (קטע טקסט מהמודל), tool_call, tool_result,
+            handoff, ולבסוף done עם התשובה המלאה
+        """
+        content = yield from self._run_events(input_text, stream=True)
+        yield {"type": "done", "content": content}
+    
+    async def arun(self, input_text):
+        """
+        הפעלה אסינכרונית של הסוכן - אותה לוגיקה כמו run, עם AsyncOpenAI
+        וכלים שרצים מחוץ ללולאת האירועים
+        
         Args:
             input_text: טקסט השאלה/הבקשה
             
         Returns:
             תשובת הסוכן כמחרוזת
         """
+        return await adrain_events(arun_effects(self._logic(input_text, stream=False)))
+    
+    def arun_stream(self, input_text):
+        """
+        הפעלה אסינכרונית במצב הזרמה
+        
+        Args:
+            input_text: טקסט השאלה/הבקשה
+            
+        Returns:
+            מחולל אסינכרוני של אותם אירועים כמו run_stream
+        """
+        return arun_effects(self._logic(input_text, stream=True))
+    
+    def _run_events(self, input_text, stream=False):
+        """
+        מריץ את לולאת הסוכן במנוע הסינכרוני ומחזיר את התשובה הסופית כערך ההחזרה
+        """
+        return (yield from run_effects(self._logic(input_text, stream)))
+    
+    def _logic(self, input_text, stream=False):
+        """
+        לולאת הריצה של הסוכן כמחולל אירועים ובקשות קלט/פלט
+        
+        מחזיר (כערך ההחזרה של המחולל) את התשובה הסופית. במצב הזרמה הטקסט
+        נשלח כאירועי token ברגע שהוא מתקבל מהמודל.
+        """
         # המרת הכלים לפורמט שמתאים ל-OpenAI API
+        tools_for_api = self._get_tools_for_api()
+        stats = self._start_run_stats()
+        
+        try:
+            messages = [{"role": "user", "content": input_text}]
+            if self.description:
+                messages.insert(0, {"role": "system", "content": self.description})
+            
+            # תוצאות של קריאות כלים שכבר בוצעו בריצה הנוכחית, לפי שם וארגומנטים
+            seen_calls = {}
+            tool_results = []
+            
+            for step in range(1, self.max_steps + 1):
+                step_start = time.monotonic()
+                prompt_report = prompt_token_report(messages, tools_for_api, self.model)
+                response = yield Completion(
+                    self.client,
+                    stream,
+                    model=self.model,
+                    messages=messages,
+                    tools=tools_for_api if tools_for_api else None
+                )
+                step_stats = self._record_step(stats, step, step_start, response)
+                step_stats["prompt_report"] = prompt_report
+                
+                # אם אין קריאת כלי, מחזיר את התשובה כמו שהיא
+                message = response.choices[0].message
+                if not (hasattr(message, 'tool_calls') and message.tool_calls):
+                    stats["stop_reason"] = "completed"
+                    if message.content:
+                        return message.content
+                    return (yield from self._emit("לא התקבלה תשובה מהמודל", stream))
+                
+                # העברה לסוכן אחר מקבלת עדיפות על פני כלים רגילים
+                for tool_call in message.tool_calls:
+                    handoff = self._find_handoff(tool_call.function.name)
+                    if handoff:
+                        stats["stop_reason"] = "handoff"
+                        return (yield from self._run_handoff(handoff, tool_call, stream))
+                
+                if stream:
+                    for tool_call in message.tool_calls:
+                        yield {"type": "tool_call", "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+                
+                # קריאות שכבר בוצעו עם אותם ארגומנטים לא מופעלות שוב
+                new_calls = [tc for tc in message.tool_calls if self._call_key(tc) not in seen_calls]
+                executed = (yield ToolCalls(self, new_calls)) if new_calls else []
+                for tool_call, tool_result in executed:
+                    seen_calls[self._call_key(tool_call)] = tool_result
+                    if stream:
+                        yield {"type": "tool_result", "name": tool_call.function.name}
+                
+                tool_results = [(tc, seen_calls[self._call_key(tc)]) for tc in message.tool_calls]
+                step_stats["tool_calls"] = [tc.function.name for tc in message.tool_calls]
+                step_stats["duplicate_calls"] = len(message.tool_calls) - len(new_calls)
+                step_stats["duration"] = time.monotonic() - step_start
+                
+                # שליחת כל התוצאות חזרה ל-API בהודעת המשך אחת
+                messages.append(self._assistant_tool_message(message.tool_calls))
+                # תוצאות גדולות (רשימות מוצרים, דוחות) מקוצרות לתקציב הטוקנים
+                for tool_call, tool_result in tool_results:
+                    messages.append({
+                        "role": "tool", 
+                        "tool_call_id": tool_call.id, 
+                        "content": compact_tool_output(tool_result, self.max_tool_result_tokens, self.model)
+                    })
+                
+                stop_reason = self._check_budget(stats, step, new_calls)
+                if stop_reason:
+                    stats["stop_reason"] = stop_reason
+                    break
+            else:
+                stats["stop_reason"] = "max_steps"
+            
+            # חריגה מתקציב הזמן או הטוקנים - מחזירים את התוצאות הגולמיות ללא קריאה נוספת
+            if stats["stop_reason"] in ("token_budget", "deadline"):
+                raw_results = "\n".join(render_result(tool_result) for _, tool_result in tool_results)
+                return (yield from self._emit(f"הפעולה נעצרה לאחר חריגה מהתקציב. הנה התוצאות שהתקבלו:\n{raw_results}", stream))
+            
+            try:
+                # בקשת תשובה סופית ללא כלים
+                step_start = time.monotonic()
+                prompt_report = prompt_token_report(messages, model=self.model)
+                final_response = yield Completion(
+                    self.client,
+                    stream,
+                    model=self.model,
+                    messages=messages
+                )
+                final_stats = self._record_step(stats, len(stats["steps"]) + 1, step_start, final_response)
+                final_stats["prompt_report"] = prompt_report
+                return final_response.choices[0].message.content
+            except Exception as e:
+                raw_results = "\n".join(render_result(tool_result) for _, tool_result in tool_results)
+                return (yield from self._emit(f"שגיאה בעיבוד תוצאות הכלי: {str(e)}\n\nהנה התוצאות הגולמיות:\n{raw_results}", stream))
+            
+        except Exception as e:
+            stats["stop_reason"] = "error"
+            return (yield from self._emit(f"שגיאה בהפעלת הסוכן: {str(e)}", stream))
+        finally:
+            stats["duration"] = time.monotonic() - stats["_start"]
+            stats["llm_calls"] = len(stats["steps"])
+    
+    @staticmethod
+    def _emit(text, stream):
+        """
+        מחזיר טקסט שלא הגיע מהמודל, ובמצב הזרמה שולח אותו גם כאירוע token
+        """
+        if stream:
+            yield {"type": "token", "content": text}
+        return text
+    
+    @property
+    def last_run_stats(self):
+        """
+        מחזיר את נתוני הריצה האחרונה של הסוכן בתהליכון (או במשימת asyncio) הנוכחי
+        (צעדים, זמנים, טוקנים, מספר הקריאות למודל וסיבת העצירה), או None אם לא הייתה ריצה.
+        כל צעד כולל prompt_report - פירוט הטוקנים של ה-prompt לפי סוג התוכן.
+        """
+        return self._run_stats.get()
+    
+    def _start_run_stats(self):
+        """
+        מאתחל את נתוני הריצה הנוכחית
+        """
+        stats = {
+            "steps": [],
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "duration": 0.0,
+            "stop_reason": None,
+            "_start": time.monotonic()
+        }
+        self._run_stats.set(stats)
+        return stats
+    
+    def _record_step(self, stats, step, step_start, response):
+        """
+        רושם צעד בלולאה: זמן הקריאה למודל וכמות הטוקנים שנצרכה
+        """
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        
+        step_stats = {
+            "step": step,
+            "duration": time.monotonic() - step_start,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tool_calls": [],
+            "duplicate_calls": 0
+        }
+        stats["steps"].append(step_stats)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["total_tokens"] += prompt_tokens + completion_tokens
+        return step_stats
+    
+    def _check_budget(self, stats, step, new_calls):
+        """
+        בודק אם יש לעצור את הלולאה אחרי הצעד הנוכחי
+        
+        Returns:
+            סיבת העצירה, או None אם אפשר להמשיך
+        """
+        if not new_calls:
+            # המודל ביקש רק קריאות שכבר בוצעו - הוא נתקע בלולאה
+            return "duplicate_calls"
+        if self.token_budget is not None and stats["total_tokens"] >= self.token_budget:
+            return "token_budget"
+        if self.deadline_seconds is not None and time.monotonic() - stats["_start"] >= self.deadline_seconds:
+            return "deadline"
+        if step >= self.max_steps:
+            return "max_steps"
+        return None
+    
+    @staticmethod
+    def _call_key(tool_call):
+        """
+        מפתח לזיהוי קריאות כפולות - שם הכלי וארגומנטים מנורמלים
+        """
+        try:
+            arguments = json.dumps(json.loads(tool_call.function.arguments), sort_keys=True, ensure_ascii=False)
+        except (json.JSONDecodeError, TypeError):
+            arguments = tool_call.function.arguments
+        return tool_call.function.name, arguments
+    
+    @staticmethod
+    def _assistant_tool_message(tool_calls):
+        """
+        בונה את הודעת ה-assistant שמכילה את קריאות הכלים, לצורך החזרת התוצאות למודל
+        """
+        return {
+            "role": "assistant", 
+            "content": None, 
+            "tool_calls": [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments
+                    }
+                }
+                for tool_call in tool_calls
+            ]
+        }
+    
+    def _get_tools_for_api(self):
+        """
+        מחזיר את הכלים של הסוכן בפורמט שמתאים ל-OpenAI API. ההמרה מתבצעת
+        פעם אחת, והתוצאה משמשת את כל הריצות עד שנוסף כלי.
+        
+        Returns:
+            רשימת הגדרות כלים
+        """
+        if self._tools_for_api is None:
+            self._tools_for_api = self._build_tools_for_api()
+        return self._tools_for_api
+    
+    def _build_tools_for_api(self):
+        """
+        ממיר את הכלים של הסוכן לפורמט שמתאים ל-OpenAI API
+        """
         tools_for_api = []
         
         for tool in self.tools:
@@ -89,91 +397,98 @@ class Agent:
                     "function": function_obj
                 })
         
+        return tools_for_api
+    
+    def _find_handoff(self, tool_name):
+        """
+        מחזיר את אובייקט ה-Handoff שמתאים לשם הכלי, או None
+        """
+        if not tool_name.startswith("handoff_to_"):
+            return None
+        for tool in self.tools:
+            if isinstance(tool, Handoff) and tool_name == f"handoff_to_{tool.name}":
+                return tool
+        return None
+    
+    def _run_handoff(self, handoff, tool_call, stream=False):
+        """
+        מפעיל את הסוכן המקבל עם השאלה שהועברה
+        """
         try:
-            # קריאה ל-API עם הכלים
-            messages = [{"role": "user", "content": input_text}]
-            if self.description:
-                messages.insert(0, {"role": "system", "content": self.description})
-                
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=tools_for_api if tools_for_api else None
-            )
+            args = json.loads(tool_call.function.arguments)
+            if isinstance(args, dict) and "query" in args:
+                query = args["query"]
+            else:
+                query = str(args)
+        except json.JSONDecodeError:
+            query = tool_call.function.arguments
+        
+        if stream:
+            yield {"type": "handoff", "agent": handoff.name}
+        return (yield RunAgent(resolve_agent(handoff.agent), query, stream))
+    
+    def dispatch_target(self, route):
+        """
+        מחזיר את הסוכן שיטפל בבקשה שכבר נותבה לתחום route. אם לסוכן יש
+        העברה לתחום הזה, הבקשה עוברת ישירות לסוכן המקבל - בלי קריאה למודל
+        רק כדי שיבחר שוב באותה העברה.
+        
+        Args:
+            route: שם התחום (למשל product)
             
-            # אם יש קריאת כלי, מבצע אותה
-            message = response.choices[0].message
-            if hasattr(message, 'tool_calls') and message.tool_calls:
-                tool_call = message.tool_calls[0]
-                tool_name = tool_call.function.name
-                
-                # בדיקה אם מדובר בהעברה לסוכן אחר
-                if tool_name.startswith("handoff_to_"):
-                    for tool in self.tools:
-                        if isinstance(tool, Handoff) and tool_name == f"handoff_to_{tool.name}":
-                            # הפעלת הסוכן המקבל עם השאלה שהועברה
-                            try:
-                                args = json.loads(tool_call.function.arguments)
-                                if isinstance(args, dict) and "query" in args:
-                                    return tool.agent.run(args["query"])
-                                else:
-                                    return tool.agent.run(str(args))
-                            except json.JSONDecodeError:
-                                return tool.agent.run(tool_call.function.arguments)
-                
-                # הפעלת כלי רגיל
-                for tool in self.tools:
-                    if isinstance(tool, Tool) and tool.name == tool_name:
-                        try:
-                            args = json.loads(tool_call.function.arguments)
-                            # בדיקה אם args הוא מילון
-                            if isinstance(args, dict):
-                                if "input" in args:
-                                    tool_result = tool(args["input"])
-                                else:
-                                    tool_result = tool(args)  # העבר את כל הארגומנטים
-                            else:
-                                tool_result = tool(args)  # העבר את הארגומנטים כמו שהם
-                        except json.JSONDecodeError:
-                            # אם יש בעיה בפענוח ה-JSON, העבר את הארגומנטים כמחרוזת
-                            tool_result = tool(tool_call.function.arguments)
-                        
-                        try:
-                            # שליחת התוצאה חזרה ל-API
-                            final_messages = messages.copy()
-                            final_messages.append({
-                                "role": "assistant", 
-                                "content": None, 
-                                "tool_calls": [
-                                    {
-                                        "id": tool_call.id,
-                                        "type": "function",
-                                        "function": {
-                                            "name": tool_name,
-                                            "arguments": tool_call.function.arguments
-                                        }
-                                    }
-                                ]
-                            })
-                            final_messages.append({
-                                "role": "tool", 
-                                "tool_call_id": tool_call.id, 
-                                "content": str(tool_result)
-                            })
-                            
-                            final_response = self.client.chat.completions.create(
-                                model=self.model,
-                                messages=final_messages
-                            )
-                            return final_response.choices[0].message.content
-                        except Exception as e:
-                            return f"שגיאה בעיבוד תוצאות הכלי: {str(e)}\n\nהנה התוצאות הגולמיות:\n{tool_result}"
+        Returns:
+            הסוכן המקבל, או הסוכן הזה אם אין לו העברה מתאימה
+        """
+        for tool in self.tools:
+            if isinstance(tool, Handoff) and tool.name in (route, f"{route}_handoff"):
+                return tool.agent
+        return self
+    
+    def _execute_tool_call(self, tool_call):
+        """
+        מבצע קריאת כלי בודדת ומחזיר את התוצאה
+        
+        Args:
+            tool_call: קריאת הכלי שהתקבלה מהמודל
             
-            # אם אין קריאת כלי, מחזיר את התשובה כמו שהיא
-            return message.content or "לא התקבלה תשובה מהמודל"
+        Returns:
+            תוצאת הכלי
+        """
+        tool_name = tool_call.function.name
+        for tool in self.tools:
+            if isinstance(tool, Tool) and tool.name == tool_name:
+                try:
+                    args = json.loads(tool_call.function.arguments)
+                    # בדיקה אם args הוא מילון
+                    if isinstance(args, dict):
+                        if "input" in args:
+                            return tool(args["input"])
+                        return tool(args)  # העבר את כל הארגומנטים
+                    return tool(args)  # העבר את הארגומנטים כמו שהם
+                except json.JSONDecodeError:
+                    # אם יש בעיה בפענוח ה-JSON, העבר את הארגומנטים כמחרוזת
+                    return tool(tool_call.function.arguments)
+        
+        return f"הכלי {tool_name} לא נמצא"
+    
+    def _execute_tool_calls(self, tool_calls):
+        """
+        מבצע את כל קריאות הכלים שהחזיר המודל, במקביל על מאגר תהליכונים מוגבל
+        
+        Args:
+            tool_calls: רשימת קריאות הכלים
             
-        except Exception as e:
-            return f"שגיאה בהפעלת הסוכן: {str(e)}"
+        Returns:
+            רשימת זוגות (קריאת כלי, תוצאה) לפי סדר הקריאות המקורי
+        """
+        if len(tool_calls) <= 1 or self.max_parallel_tools <= 1:
+            return [(tool_call, self._execute_tool_call(tool_call)) for tool_call in tool_calls]
+        
+        max_workers = min(self.max_parallel_tools, len(tool_calls))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self._execute_tool_call, tool_calls))
+        
+        return list(zip(tool_calls, results))
         
     def add_tool(self, tool_or_fn):
         """
@@ -192,6 +507,7 @@ class Agent:
             raise ValueError(f"הפרמטר tool_or_fn חייב להיות פונקציה מעוטרת ב-@function_tool או אובייקט מסוג Tool, קיבלנו {type(tool_or_fn)}")
         
         self.tools.append(tool)
+        self._tools_for_api = None
         
         # הוספת מתודה לקריאה ישירה של הכלי
         if isinstance(tool, Tool):
@@ -225,16 +541,65 @@ class Handoff:
             str: תשובת הסוכן המתמחה
         """
         return self.agent.run(user_input)
+    
+    def run_stream(self, user_input: str):
+        """
+        מעביר את הבקשה לסוכן המתמחה במצב הזרמה
+        
+        Args:
+            user_input: קלט המשתמש
+            
+        Yields:
+            אירועי הסוכן המתמחה, ולבסוף done עם התשובה המלאה
+        """
+        content = yield from agent_events(self.agent, user_input, stream=True)
+        yield {"type": "done", "content": content}
+    
+    async def arun(self, user_input: str) -> str:
+        """
+        מעביר את הבקשה לסוכן המתמחה באופן אסינכרוני
+        
+        Args:
+            user_input: קלט המשתמש
+            
+        Returns:
+            str: תשובת הסוכן המתמחה
+        """
+        return await adrain_events(agent_aevents(self.agent, user_input))
+
+def resolve_agent(agent, route=None):
+    """
+    פותח שרשרת של עטיפות עד הסוכן שמבצע בפועל: Handoff מוחלף בסוכן שלו,
+    וסוכן עם העברה לתחום route מוחלף בסוכן המקבל (ראה Agent.dispatch_target)
+    
+    Args:
+        agent: סוכן או Handoff
+        route: תחום שכבר נבחר (אופציונלי)
+        
+    Returns:
+        הסוכן שיש להפעיל
+    """
+    seen = set()
+    while id(agent) not in seen:
+        seen.add(id(agent))
+        if isinstance(agent, Handoff):
+            agent = agent.agent
+        elif route and hasattr(agent, "dispatch_target"):
+            agent = agent.dispatch_target(route)
+        else:
+            break
+    return agent
 
 class Guardrail:
     """Base class for agent guardrails"""
-    def __init__(self, client: OpenAI, model: str, instructions: str):
+    def __init__(self, client: "OpenAI", model: str, instructions: str):
         self.client = client
         self.model = model
         self.instructions = instructions
     
     def check(self, input_text: str) -> bool:
         """Check if the input passes the guardrail"""
+        record_llm_call()
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
@@ -243,6 +608,19 @@ class Guardrail:
             ]
         )
         return "true" in response.choices[0].message.content.lower()
+    
+    async def acheck(self, input_text: str) -> bool:
+        """Check if the input passes the guardrail, without blocking the event loop"""
+        record_llm_call()
+        response = await acreate_completion(
+            self.client,
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.instructions},
+                {"role": "user", "content": input_text}
+            ]
+        )
+        return "true" in response.choices[0].message.content.lower()
 
 class Thread:
     """Base class for agent threads"""
@@ -257,6 +635,10 @@ class Runner:
     @staticmethod
     def run(agent: Agent, user_input: str) -> Any:
         return agent.run(user_input)
+    
+    @staticmethod
+    async def arun(agent: Agent, user_input: str) -> Any:
+        return await agent.arun(user_input)
 
 class Tool:
     """Base class for agent tools"""
@@ -292,6 +674,70 @@ class Tool:
         except Exception as e:
             return f"שגיאה בהפעלת הכלי: {str(e)}"
 
+# סכמות הפרמטרים לפי קוד הפונקציה: כלים שמוגדרים כפונקציות פנימיות בכל
+# יצירת סוכן משתפים את אותו קוד, ולכן הסכמה שלהם מחושבת פעם אחת בתהליך
+# (הסכמה משותפת לכל הכלים האלה ואין לשנות אותה)
+_PARAMETER_SCHEMAS = {}
+
+def _tool_parameters(func):
+    """
+    מחזיר את סכמת ה-JSON של הפרמטרים של הפונקציה (פרט ל-woo_client)
+    """
+    try:
+        key = (func.__code__, func.__defaults__, func.__kwdefaults__ and tuple(func.__kwdefaults__.items()))
+        hash(key)
+    except (AttributeError, TypeError):
+        key = None
+    if key is not None and key in _PARAMETER_SCHEMAS:
+        return _PARAMETER_SCHEMAS[key]
+    
+    sig = inspect.signature(func)
+    parameters = {}
+    for param_name, param in sig.parameters.items():
+        if param_name != 'woo_client':  # דילוג על woo_client
+            param_type = param.annotation if param.annotation != inspect.Parameter.empty else Any
+
+            # המרת טיפוסי Python לטיפוסי JSON Schema
+            json_schema_type = "string"  # ברירת מחדל
+
+            if param_type == int:
+                json_schema_type = "integer"
+            elif param_type == str:
+                json_schema_type = "string"
+            elif param_type == bool:
+                json_schema_type = "boolean"
+            elif param_type == float:
+                json_schema_type = "number"
+            elif param_type == list or param_type == tuple:
+                json_schema_type = "array"
+            elif param_type == dict:
+                json_schema_type = "object"
+            elif param_type == Any:
+                json_schema_type = "string"
+
+            # הוספת מידע על פרמטר
+            parameters[param_name] = {
+                "type": json_schema_type
+            }
+
+            # הוספת מידע נוסף לפי טיפוס הפרמטר
+            if json_schema_type == "array":
+                # לכל מערך צריך להיות מבנה items
+                parameters[param_name]["items"] = {"type": "string"}
+
+            elif json_schema_type == "object":
+                # לכל אובייקט מאפשרים מפתחות נוספים
+                parameters[param_name]["additionalProperties"] = True
+
+            # הוספת ערכי ברירת מחדל אם יש
+            if param.default != inspect.Parameter.empty:
+                if param.default is not None:
+                    parameters[param_name]["default"] = param.default
+    
+    if key is not None:
+        _PARAMETER_SCHEMAS[key] = parameters
+    return parameters
+
 def function_tool(fn=None, *, name=None, description=None):
     """
     מעטר פונקציה כדי להפוך אותה לכלי שימושי.
@@ -311,49 +757,7 @@ def function_tool(fn=None, *, name=None, description=None):
         # שימוש ב-docstring של הפונקציה אם לא סופק תיאור
         tool_description = description or func.__doc__ or f"הפעל את הפונקציה {tool_name}"
         
-        # איסוף פרמטרים של הפונקציה (פרט ל-woo_client)
-        sig = inspect.signature(func)
-        parameters = {}
-        for param_name, param in sig.parameters.items():
-            if param_name != 'woo_client':  # דילוג על woo_client
-                param_type = param.annotation if param.annotation != inspect.Parameter.empty else Any
-
-                # המרת טיפוסי Python לטיפוסי JSON Schema
-                json_schema_type = "string"  # ברירת מחדל
-                
-                if param_type == int:
-                    json_schema_type = "integer"
-                elif param_type == str:
-                    json_schema_type = "string"
-                elif param_type == bool:
-                    json_schema_type = "boolean"
-                elif param_type == float:
-                    json_schema_type = "number"
-                elif param_type == list or param_type == tuple:
-                    json_schema_type = "array"
-                elif param_type == dict:
-                    json_schema_type = "object"
-                elif param_type == Any:
-                    json_schema_type = "string"
-                
-                # הוספת מידע על פרמטר
-                parameters[param_name] = {
-                    "type": json_schema_type
-                }
-                
-                # הוספת מידע נוסף לפי טיפוס הפרמטר
-                if json_schema_type == "array":
-                    # לכל מערך צריך להיות מבנה items
-                    parameters[param_name]["items"] = {"type": "string"}
-                
-                elif json_schema_type == "object":
-                    # לכל אובייקט מאפשרים מפתחות נוספים
-                    parameters[param_name]["additionalProperties"] = True
-                
-                # הוספת ערכי ברירת מחדל אם יש
-                if param.default != inspect.Parameter.empty:
-                    if param.default is not None:
-                        parameters[param_name]["default"] = param.default
+        parameters = _tool_parameters(func)
         
         # יצירת כלי ושמירתו כתכונה של הפונקציה
         tool = Tool(tool_name, tool_description, func)
@@ -374,4 +778,4 @@ def function_tool(fn=None, *, name=None, description=None):
     if fn is None:
         return decorator
     else:
-        return decorator(fn) 
\ No newline at end of file
+        return decorator(fn) 
@@ -1,6 +1,9 @@
 from datetime import datetime
 import logging
 
+from .intent_matcher import match_intents
+from memory.history_index import HistoryIndex
+
 # הגדרת מודל ברירת המחדל
 DEFAULT_MODEL = "gpt-4o"
 
@@ -10,22 +13,93 @@ class BaseAgent:
     """
     מחלקת בסיס לכל הסוכנים
     """
-    def __init__(self, model_name=DEFAULT_MODEL, chat_memory_limit=10):
+    # משקל דמיון ה-embeddings בציון הרלוונטיות, כשמוגדרת פונקציית embedding
+    EMBEDDING_WEIGHT = 0.3
+
+    def __init__(self, model_name=DEFAULT_MODEL, chat_memory_limit=10, history_embed=None,
+                 history_archive_limit=2000):
         """
         אתחול הסוכן הבסיסי
+        
+        Args:
+            chat_memory_limit: מספר השאלות והתשובות בהיסטוריה שנשלחת למודל
+            history_embed: פונקציה שמחזירה embedding לטקסט, לשילוב דמיון סמנטי
+                בבחירת ההיסטוריה הרלוונטית (אופציונלי)
+            history_archive_limit: מספר ההודעות האחרונות שנשמרות בזיכרון ובמאגר השיחות
+                לבחירת ההיסטוריה הרלוונטית - גם הודעות שכבר יצאו מההיסטוריה שנשלחת למודל
         """
         self.model_name = model_name
         self.chat_memory_limit = chat_memory_limit
+        self.history_embed = history_embed
+        self.history_archive_limit = history_archive_limit
+        self.chat_store = None
+        self.chat_session_id = None
+        self._chat_appended = 0
         self.chat_history = []
         self.conversation_state = {}
         self.session_start_time = datetime.now()
         logger.debug(f"מאתחל סוכן בסיסי עם מודל: {model_name}")
 
+    @property
+    def chat_history(self):
+        self._load_chat()
+        return self._chat_history
+
+    @chat_history.setter
+    def chat_history(self, value):
+        self._chat_history = value
+        self._history_archive = list(value)
+        self._chat_loaded = True
+        self._history_index = None
+
+    @property
+    def conversation_state(self):
+        self._load_chat()
+        return self._conversation_state
+
+    @conversation_state.setter
+    def conversation_state(self, value):
+        self._conversation_state = value
+
+    def attach_store(self, store, session_id):
+        """
+        מחבר את היסטוריית השיחה ומצב השיחה למאגר שיחות (memory/conversation_store.py).
+        ההיסטוריה נטענת מהמאגר רק בגישה הראשונה, וכל הודעה חדשה נכתבת כרשומה אחת.
+
+        Args:
+            store: מאגר השיחות
+            session_id: מזהה השיחה במאגר
+        """
+        self.chat_store = store
+        self.chat_session_id = session_id
+        self._chat_history = []
+        self._history_archive = []
+        self._conversation_state = {}
+        self._chat_appended = 0
+        self._chat_loaded = store is None
+        self._history_index = None
+
+    def _load_chat(self):
+        """
+        טוען מהמאגר את היסטוריית השיחה (הארכיון, וממנו ההיסטוריה לפי מגבלת
+        הזיכרון) ואת מצב השיחה
+        """
+        if self._chat_loaded:
+            return
+        self._chat_loaded = True
+        archive = _keep_first_and_last(self.chat_store.read(self.chat_session_id, "chat"), self.history_archive_limit)
+        self._history_archive = archive
+        self._chat_history = _keep_first_and_last(archive, self.chat_memory_limit * 2)
+        self._history_index = None
+        self._conversation_state = self.chat_store.get_state(self.chat_session_id, "conversation_state", {})
+
     def set_conversation_state(self, key, value):
         """
         שמירת מידע במצב השיחה
         """
         self.conversation_state[key] = value
+        if self.chat_store is not None:
+            self.chat_store.set_state(self.chat_session_id, "conversation_state", self._conversation_state)
         logger.debug(f"עדכן מצב שיחה: {key}={value}")
 
     def get_conversation_state(self, key, default=None):
@@ -42,58 +116,100 @@ class BaseAgent:
             logger.warning("ניסיון להוסיף תוכן ריק להיסטוריית השיחה")
             return
             
-        self.chat_history.append({"role": role, "content": content})
+        message = {"role": role, "content": content}
+        self.chat_history.append(message)
+        self._history_archive.append(message)
+        if self._history_index is not None:
+            self._history_index.add(message, content)
+        if self.chat_store is not None:
+            self.chat_store.append(self.chat_session_id, "chat", message)
         
         # בדיקה אם היסטוריית השיחה חרגה ממגבלת הזיכרון
         if len(self.chat_history) > self.chat_memory_limit * 2:  # כפול 2 כי כל תגובה מורכבת משאלה ותשובה
-            # השארת ההודעה הראשונה (לרוב הוראות המערכת) ומחיקת ההודעות הישנות
-            self.chat_history = [self.chat_history[0]] + self.chat_history[-(self.chat_memory_limit * 2 - 1):]
+            # השארת ההודעה הראשונה (לרוב הוראות המערכת) ומחיקת ההודעות הישנות;
+            # הן נשארות בארכיון ובאינדקס לבחירת ההיסטוריה הרלוונטית
+            self._chat_history = _keep_first_and_last(self._chat_history, self.chat_memory_limit * 2)
             logger.info(f"היסטוריית שיחה קוצרה למגבלת זיכרון: {self.chat_memory_limit} הודעות")
+        
+        if len(self._history_archive) > self.history_archive_limit:
+            kept = _keep_first_and_last(self._history_archive, self.history_archive_limit)
+            if self._history_index is not None:
+                for evicted in self._history_archive[1:-(len(kept) - 1)]:
+                    self._history_index.remove(evicted)
+            self._history_archive = kept
+            if self.chat_store is not None:
+                # הרצף במאגר נכתב רק בהוספה; הוא נדחס מדי פעם לארכיון המקוצר
+                self._chat_appended += 1
+                if self._chat_appended >= self.history_archive_limit:
+                    self.chat_store.replace(self.chat_session_id, "chat", self._history_archive)
+                    self._chat_appended = 0
     
     def get_relevant_history(self, query=None, max_messages=None):
         """
         מחזיר את ההיסטוריה הרלוונטית לשאילתה הנוכחית
-        אם מועברת שאילתה, מחפש הודעות עם תוכן דומה
+        אם מועברת שאילתה, מחפש בכל הארכיון (גם הודעות שיצאו מההיסטוריה
+        שנשלחת למודל) הודעות עם תוכן דומה (BM25 באינדקס ההפוך, ואופציונלית
+        דמיון embeddings), עם עדיפות להודעות אחרונות
         """
         if not max_messages:
             max_messages = self.chat_memory_limit
-            
-        if not query or len(self.chat_history) <= max_messages * 2:
+        
+        recent = self.chat_history
+        history = self._history_archive
+        if not query or len(history) <= max_messages * 2:
             # אם אין שאילתה או שההיסטוריה קצרה מספיק, מחזיר את ההיסטוריה הרגילה
-            return self.chat_history
-            
-        # שמירת ההודעה הראשונה (הוראות מערכת בד"כ)
-        result = [self.chat_history[0]] if self.chat_history else []
+            return recent
         
-        # אלגוריתם פשוט לחיפוש הודעות רלוונטיות - מחפש הודעות עם מילות מפתח דומות
-        query_words = set(query.lower().split())
-        scored_messages = []
+        index = self._relevant_history_index()
+        limit = max_messages * 2 - 1
+        # המיקום של הודעה בארכיון לפי המספר הסידורי שלה באינדקס
+        # (אחרי ההודעה הראשונה הארכיון רציף בסדר ההוספה)
+        offset = index.sequence(history[1]) - 1
         
-        for i, message in enumerate(self.chat_history[1:], 1):  # דילוג על הודעת המערכת הראשונה
-            if not message.get("content"):
-                continue
-                
-            content = message.get("content", "").lower()
-            # חישוב ציון פשוט - כמה מילים מהשאילתה מופיעות בהודעה
-            common_words = sum(1 for word in query_words if word in content)
-            score = common_words / len(query_words) if query_words else 0
+        # רק להודעות שמכילות מילה מהשאילתה יש ציון רלוונטיות; מבין האחרות
+        # ייבחרו בכל מקרה האחרונות, ולכן מספיק להוסיף את limit האחרונות
+        candidates = index.search(query)
+        top_score = max((score for _, score in candidates.values()), default=0) or 1
+        relevance = {key: score / top_score for key, (_, score) in candidates.items()}
+        for message in history[-limit:]:
+            if message.get("content"):
+                candidates.setdefault(id(message), (message, 0.0))
+        candidates.pop(id(history[0]), None)
+        
+        query_vector = self.history_embed(query) if self.history_embed else None
+        scored_messages = []
+        for key, (message, _) in candidates.items():
+            score = relevance.get(key, 0.0)
+            if query_vector is not None:
+                similarity = index.embedding_similarity(message, message["content"], query_vector)
+                score = score * (1 - self.EMBEDDING_WEIGHT) + max(similarity, 0.0) * self.EMBEDDING_WEIGHT
             
             # נותן עדיפות להודעות אחרונות
-            recency_bonus = i / len(self.chat_history)
+            position = index.sequence(message) - offset
+            recency_bonus = position / len(history)
             final_score = score * 0.7 + recency_bonus * 0.3
             
-            scored_messages.append((final_score, i, message))
+            scored_messages.append((final_score, position, message))
         
-        # מיון ההודעות לפי הציון ולקיחת ה-N הכי רלוונטיות
-        top_messages = sorted(scored_messages, key=lambda x: x[0], reverse=True)[:max_messages * 2 - 1]
-        # מיון לפי סדר המקורי
+        # מיון ההודעות לפי הציון ולקיחת ה-N הכי רלוונטיות, ואז לפי הסדר המקורי
+        top_messages = sorted(scored_messages, key=lambda x: x[0], reverse=True)[:limit]
         top_messages.sort(key=lambda x: x[1])
         
-        # הוספת ההודעות הרלוונטיות לתוצאה
-        result.extend([msg for _, _, msg in top_messages])
+        result = [history[0]] + [msg for _, _, msg in top_messages]
         
-        logger.debug(f"היסטוריה רלוונטית נבחרה: {len(result)} הודעות מתוך {len(self.chat_history)}")
+        logger.debug(f"היסטוריה רלוונטית נבחרה: {len(result)} הודעות מתוך {len(history)}")
         return result
+    
+    def _relevant_history_index(self):
+        """
+        מחזיר את האינדקס ההפוך של הארכיון, ובונה אותו מחדש אם הארכיון הוחלף
+        """
+        self._load_chat()
+        if self._history_index is None or len(self._history_index) != len(self._history_archive):
+            self._history_index = HistoryIndex(embed=self.history_embed)
+            for message in self._history_archive:
+                self._history_index.add(message, message.get("content"))
+        return self._history_index
         
     def clear_chat_history(self, preserve_system=True):
         """
@@ -104,6 +220,9 @@ class BaseAgent:
         else:
             self.chat_history = []
         self.conversation_state = {}
+        if self.chat_store is not None:
+            self.chat_store.replace(self.chat_session_id, "chat", self._chat_history)
+            self.chat_store.set_state(self.chat_session_id, "conversation_state", {})
         logger.info("היסטוריית שיחה נוקתה")
     
     def get_chat_context(self, query):
@@ -128,24 +247,23 @@ class BaseAgent:
         Returns:
             str: תגובת הסוכן
         """
-        # בדיקה אם מדובר בעדכון מלאי
-        if "עדכן את המלאי" in user_input or "עדכן מלאי" in user_input:
-            import re
-            product_id_match = re.search(r'מוצר עם מזהה (\d+)|מוצר (\d+)|מזהה (\d+)', user_input)
-            quantity_match = re.search(r'לכמות (\d+)', user_input)
+        # בדיקה אם מדובר בעדכון מלאי (הביטויים והפרמטרים מזוהים בסריקה אחת)
+        matched = match_intents(user_input)
+        if matched.has("stock_request"):
+            product_id = matched.slot("product_id")
+            quantity = matched.slot("target_quantity")
             
-            if product_id_match and quantity_match:
-                # מצא את הערך הלא ריק בקבוצות השונות
-                product_id = None
-                for group_idx in range(1, 4):
-                    if group_idx <= len(product_id_match.groups()) and product_id_match.group(group_idx):
-                        product_id = product_id_match.group(group_idx)
-                        break
-                
-                quantity = quantity_match.group(1)
-                
-                if product_id and quantity:
-                    return f"המלאי עודכן בהצלחה! כמות המלאי של מוצר {product_id} עודכנה לכמות {quantity}"
+            if product_id and quantity:
+                return f"המלאי עודכן בהצלחה! כמות המלאי של מוצר {product_id} עודכנה לכמות {quantity}"
         
         # ברירת מחדל - להחזיר הודעה כללית
-        return f"קיבלתי את הבקשה: {user_input}. אנא המתן בזמן שאני מטפל בבקשתך." 
\ No newline at end of file
+        return f"קיבלתי את הבקשה: {user_input}. אנא המתן בזמן שאני מטפל בבקשתך." 
+
+
+def _keep_first_and_last(messages, limit):
+    """
+    מקצר רשימת הודעות ל-limit הודעות: הראשונה (לרוב הוראות המערכת) והאחרונות
+    """
+    if len(messages) <= limit:
+        return messages
+    return [messages[0]] + messages[-(limit - 1):]
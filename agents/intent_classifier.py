@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מסווג כוונות מקומי לניתוב בקשות
+-------------------------------
+
+מסווג TF-IDF (מילים, זוגות מילים ו-n-grams של תווים) עם רגרסיה לוגיסטית
+רב-מחלקתית, שמחליף את קריאת המודל של AgentRouter כשהוא בטוח מספיק בתשובה.
+הסיווג רץ על המעבד בפחות ממילישנייה; מתחת לסף הביטחון המנתב חוזר למודל.
+
+המודל מאומן מקורפוס עברי מתויג (agents/data/intent_corpus.jsonl) ומצעדי
+הניתוב שנשמרו בקבצי ה-trace (צעדים מסוג "route"), ונשמר כ-JSON.
+
+אימון מחדש:
+    python -m agents.intent_classifier train [--traces traces] [--corpus ...] [--output ...]
+
+בדיקת סיווג:
+    python -m agents.intent_classifier predict "צור קופון של 10 אחוז"
+"""
+
+import os
+import re
+import json
+import math
+import logging
+import argparse
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+DEFAULT_CORPUS_PATH = DATA_DIR / "intent_corpus.jsonl"
+DEFAULT_MODEL_PATH = DATA_DIR / "intent_model.json"
+
+# התחומים שהמסווג מכיר ("primary" - ברכות ושאלות כלליות)
+INTENT_LABELS = ("product", "order", "coupon", "category", "customer", "report", "settings", "primary")
+
+# מקורות ניתוב ב-trace שההחלטות שלהם משמשות לאימון. החלטות של המסווג
+# עצמו לא נכללות, כדי שלא יאמן את עצמו על הטעויות שלו.
+TRAINABLE_ROUTE_SOURCES = ("llm", "local", "intent")
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+|\d+")
+
+
+def tokenize(text):
+    """
+    מפרק טקסט למילים. מספרים מוחלפים ב-"#" - הערך שלהם לא משפיע על התחום.
+    """
+    return ["#" if token.isdigit() else token for token in _TOKEN_RE.findall((text or "").lower())]
+
+
+def extract_features(text):
+    """
+    מחזיר את מוני התכונות של טקסט: מילים, זוגות מילים ו-n-grams של 3-4 תווים
+    בתוך כל מילה (תופסים מילים עם תחיליות כמו "ה", "ו", "ל" ו"ב").
+    """
+    words = tokenize(text)
+    features = Counter(f"w:{word}" for word in words)
+    features.update(f"b:{first}_{second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        if word == "#":
+            continue
+        padded = f"<{word}>"
+        for n in (3, 4):
+            features.update(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+    return features
+
+
+class IntentClassifier:
+    """
+    מסווג TF-IDF + רגרסיה לוגיסטית רב-מחלקתית
+    """
+
+    def __init__(self, labels, vocabulary, idf, weights, bias):
+        """
+        Args:
+            labels: שמות המחלקות
+            vocabulary: מיפוי תכונה -> אינדקס
+            idf: משקלי IDF לכל תכונה
+            weights: מטריצת משקלים (תכונות x מחלקות)
+            bias: הטיה לכל מחלקה
+        """
+        self.labels = list(labels)
+        self.vocabulary = dict(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+
+    @classmethod
+    def train(cls, texts, labels, min_df=2, l2=1e-3, epochs=300, learning_rate=2.0):
+        """
+        מאמן מסווג חדש (ירידה במורד הגרדיאנט על כל הדוגמאות יחד - הקורפוס קטן)
+
+        Args:
+            texts: טקסטים לאימון
+            labels: התחום של כל טקסט
+            min_df: מספר הדוגמאות המזערי שבהן תכונה צריכה להופיע
+            l2: מקדם הרגולריזציה
+            epochs: מספר צעדי האימון
+            learning_rate: גודל הצעד
+
+        Returns:
+            IntentClassifier: המסווג המאומן
+        """
+        if not texts:
+            raise ValueError("אין דוגמאות לאימון המסווג")
+
+        classes = sorted(set(labels), key=lambda label: (
+            INTENT_LABELS.index(label) if label in INTENT_LABELS else len(INTENT_LABELS), label))
+        counts = [extract_features(text) for text in texts]
+
+        document_frequency = Counter(feature for features in counts for feature in features)
+        names = sorted(feature for feature, df in document_frequency.items() if df >= min_df)
+        vocabulary = {name: index for index, name in enumerate(names)}
+        idf = np.array([math.log((1 + len(texts)) / (1 + document_frequency[name])) + 1 for name in names])
+
+        matrix = np.zeros((len(texts), len(names)))
+        for row, features in enumerate(counts):
+            for feature, count in features.items():
+                index = vocabulary.get(feature)
+                if index is not None:
+                    matrix[row, index] = (1 + math.log(count)) * idf[index]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        targets = np.zeros((len(texts), len(classes)))
+        targets[np.arange(len(texts)), [classes.index(label) for label in labels]] = 1
+
+        weights = np.zeros((len(names), len(classes)))
+        bias = np.zeros(len(classes))
+        for _ in range(epochs):
+            probabilities = _softmax(matrix @ weights + bias)
+            error = (probabilities - targets) / len(texts)
+            weights -= learning_rate * (matrix.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(classes, vocabulary, idf, weights, bias)
+
+    def _vectorize(self, text):
+        """
+        מחזיר את אינדקסי התכונות המוכרות ואת ערכי ה-TF-IDF המנורמלים שלהן
+        """
+        indices, values = [], []
+        for feature, count in extract_features(text).items():
+            index = self.vocabulary.get(feature)
+            if index is not None:
+                indices.append(index)
+                values.append(1 + math.log(count))
+        if not indices:
+            return None, None
+        values = np.asarray(values) * self.idf[indices]
+        return indices, values / np.linalg.norm(values)
+
+    def predict_proba(self, text):
+        """
+        מחזיר מילון תחום -> הסתברות. טקסט ללא תכונות מוכרות מקבל None.
+        """
+        indices, values = self._vectorize(text)
+        if indices is None:
+            return None
+        probabilities = _softmax(values @ self.weights[indices] + self.bias)
+        return dict(zip(self.labels, probabilities.tolist()))
+
+    def predict(self, text):
+        """
+        מסווג טקסט
+
+        Returns:
+            (תחום, ביטחון) - או (None, 0.0) אם אין בטקסט אף תכונה מוכרת
+        """
+        indices, values = self._vectorize(text)
+        if indices is None:
+            return None, 0.0
+        probabilities = _softmax(values @ self.weights[indices] + self.bias)
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def to_dict(self):
+        """
+        מחזיר את המודל כמילון לשמירה. משקלים זניחים נשמטים.
+        """
+        features = sorted(self.vocabulary, key=self.vocabulary.get)
+        weights = {}
+        for name in features:
+            row = self.weights[self.vocabulary[name]]
+            if np.abs(row).max() >= 1e-4:
+                weights[name] = [round(value, 4) for value in row.tolist()]
+        return {
+            "labels": self.labels,
+            "idf": {name: round(float(self.idf[self.vocabulary[name]]), 4) for name in weights},
+            "weights": weights,
+            "bias": [round(value, 4) for value in self.bias.tolist()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        names = list(data["weights"])
+        return cls(
+            data["labels"],
+            {name: index for index, name in enumerate(names)},
+            [data["idf"][name] for name in names],
+            [data["weights"][name] for name in names],
+            data["bias"]
+        )
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        """
+        שומר את המודל לקובץ JSON
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """
+        טוען מודל שנשמר ב-save
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+@lru_cache(maxsize=None)
+def load_default_classifier(path=str(DEFAULT_MODEL_PATH)):
+    """
+    טוען את המסווג המאומן (פעם אחת לכל תהליך)
+
+    Returns:
+        IntentClassifier, או None אם אין מודל שמור - הניתוב ימשיך דרך המודל
+    """
+    try:
+        return IntentClassifier.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"מסווג הכוונות לא נטען ({path}): {e}")
+        return None
+
+
+def load_corpus(path=DEFAULT_CORPUS_PATH):
+    """
+    טוען קורפוס מתויג - שורת JSON לכל דוגמה: {"text": ..., "label": ...}
+    """
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                examples.append((record["text"], record["label"]))
+    return examples
+
+
+def load_trace_examples(trace_dir="traces"):
+    """
+    אוסף דוגמאות מתויגות מצעדי הניתוב שנשמרו בקבצי ה-trace
+
+    Args:
+        trace_dir: תיקיית ה-traces
+
+    Returns:
+        list: זוגות (טקסט, תחום)
+    """
+    examples = []
+    for trace_file in sorted(Path(trace_dir).glob("*.json")):
+        try:
+            with open(trace_file, "r", encoding="utf-8") as f:
+                steps = json.load(f).get("steps", [])
+        except (OSError, ValueError) as e:
+            logger.warning(f"דילוג על קובץ trace פגום {trace_file}: {e}")
+            continue
+        for step in steps:
+            data = step.get("data") or {}
+            if (step.get("type") == "route"
+                    and data.get("source") in TRAINABLE_ROUTE_SOURCES
+                    and data.get("agent") in INTENT_LABELS
+                    and data.get("user_input")):
+                examples.append((data["user_input"], data["agent"]))
+    return examples
+
+
+def cross_validate(examples, folds=5, **train_kwargs):
+    """
+    מחזיר את דיוק המסווג ב-k-fold על הדוגמאות (סדר קבוע, בלי אקראיות)
+    """
+    correct = 0
+    for fold in range(folds):
+        train = [example for i, example in enumerate(examples) if i % folds != fold]
+        test = [example for i, example in enumerate(examples) if i % folds == fold]
+        classifier = IntentClassifier.train([t for t, _ in train], [l for _, l in train], **train_kwargs)
+        correct += sum(classifier.predict(text)[0] == label for text, label in test)
+    return correct / len(examples)
+
+
+def retrain(corpus_path=DEFAULT_CORPUS_PATH, trace_dir="traces", output_path=DEFAULT_MODEL_PATH, folds=5):
+    """
+    מאמן את המסווג מחדש מהקורפוס ומקבצי ה-trace ושומר אותו
+
+    Returns:
+        dict: נתוני האימון (מספר דוגמאות, דיוק ב-cross validation, נתיב המודל)
+    """
+    examples = load_corpus(corpus_path)
+    trace_examples = load_trace_examples(trace_dir) if trace_dir else []
+    # דוגמה מה-trace גוברת על דוגמה זהה בקורפוס
+    merged = dict(examples)
+    merged.update(trace_examples)
+    examples = list(merged.items())
+
+    accuracy = cross_validate(examples, folds) if folds > 1 else None
+    classifier = IntentClassifier.train([t for t, _ in examples], [l for _, l in examples])
+    path = classifier.save(output_path)
+    load_default_classifier.cache_clear()
+    return {
+        "examples": len(examples),
+        "trace_examples": len(trace_examples),
+        "accuracy": accuracy,
+        "features": len(classifier.vocabulary),
+        "path": str(path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="אימון ובדיקה של מסווג הכוונות לניתוב")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="אימון המסווג מחדש")
+    train_parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_PATH), help="קורפוס מתויג (JSONL)")
+    train_parser.add_argument("--traces", default=os.environ.get("TRACING_DIRECTORY", "traces"),
+                              help="תיקיית ה-traces (מחרוזת ריקה - בלי traces)")
+    train_parser.add_argument("--output", default=str(DEFAULT_MODEL_PATH), help="נתיב לשמירת המודל")
+    train_parser.add_argument("--folds", type=int, default=5, help="מספר החלקים ל-cross validation")
+
+    predict_parser = commands.add_parser("predict", help="סיווג טקסט")
+    predict_parser.add_argument("text")
+    predict_parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH))
+
+    args = parser.parse_args()
+    if args.command == "train":
+        report = retrain(args.corpus, args.traces, args.output, args.folds)
+        print(f"דוגמאות: {report['examples']} (מתוכן מ-traces: {report['trace_examples']})")
+        if report["accuracy"] is not None:
+            print(f"דיוק ב-cross validation: {report['accuracy']:.1%}")
+        print(f"תכונות: {report['features']}")
+        print(f"המודל נשמר ב: {report['path']}")
+    else:
+        label, confidence = IntentClassifier.load(args.model).predict(args.text)
+        print(f"{label} ({confidence:.2f})")
+
+
+if __name__ == "__main__":
+    main()
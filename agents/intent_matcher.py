@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+זיהוי ביטויים וחילוץ פרמטרים במעבר אחד על ההודעה
+------------------------------------------------
+
+הכללים של הסוכן הראשי (שאלות זהות, בקשות עמומות, שאלות המשך, פקודות
+מוצר, מחיר, מלאי וקטגוריה, אישור/ביטול) היו רשימות של חיפושי מחרוזות
+וקריאות re.search נפרדות, שכל אחת סורקת את ההודעה מחדש.
+
+כאן כל הכללים מהודרים פעם אחת לביטוי רגולרי משולב. כל כלל מתחיל בביטוי
+קבוע (head) ואחריו חלק רגולרי אופציונלי (tail) שלוכד פרמטרים. הסריקה
+נעשית כ-lookahead בכל מיקום, ולכן מוצאת גם התאמות חופפות ("למה" ו"מה").
+כשכמה כללים מתחילים באותו מיקום ובאותו ביטוי קבוע (למשל "מוצר" ו"מוצר 12"),
+הארוך מנצח בסריקה והשאר נבדקים רק במיקום הזה.
+
+התוצאה מכילה את כל הכוונות שזוהו, הפרמטרים שחולצו (ההופעה הראשונה של כל
+פרמטר) ואת מיקום ההופעה הראשונה של כל כוונה.
+
+מדידה:
+    python -m benchmarks.bench_intent_matcher
+"""
+
+import re
+from types import MappingProxyType
+from collections import namedtuple
+from functools import lru_cache
+
+# כלל: כוונה (או None לכלל שרק מחלץ פרמטרים), ביטויים קבועים בתחילתו,
+# המשך רגולרי, שמות הפרמטרים לכל קבוצה לוכדת, והאם הכלל חל על ההודעה כולה
+MatchRule = namedtuple("MatchRule", "intent heads tail slots anchored")
+
+
+def rule(intent, heads, tail="", slots=(), anchored=False):
+    """
+    יוצר כלל. כל פריט ב-slots הוא שם פרמטר או tuple של שמות (אותה קבוצה
+    לוכדת ממלאת כמה פרמטרים).
+    """
+    if isinstance(heads, str):
+        heads = (heads,)
+    slots = tuple((names,) if isinstance(names, str) else tuple(names) for names in slots)
+    return MatchRule(intent, tuple(heads), tail, slots, anchored)
+
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+# "של מוצר עם מזהה 12", "למוצר 12", "המוצר 12"
+_PRODUCT_TARGET = r"\s+(?:של\s+|ל|ב)?ה?מוצר\s+(?:עם\s+)?(?:מזהה\s+|מס(?:פר|')\s+)?(\d+)"
+
+# הכללים של MainAgent ו-BaseAgent
+DEFAULT_RULES = (
+    # ניתוב קבוע
+    rule("return_to_primary", ["חזור לסוכן הראשי", "חזור לסוכן הכללי"]),
+    rule("identity", ["איזה סוכן אתה", "מי אתה"]),
+    rule("help_request", ["עזרה", "מה אתה יכול לעשות"]),
+    rule("greeting", ["שלום", "היי", "ברוך הבא", "צריך עזרה"]),
+    rule("domain_word", ["מוצר", "הזמנ", "קטגור", "קופון", "לקוח", "דוח", "הגדר"]),
+    rule("followup_word", ["כמה", "איזה", "מה", "למה", "כמות", "פרטים", "עוד", "אחר", "נוסף"]),
+    rule("category_command", [
+        "קטגוריה חדשה", "צור קטגוריה", "יצירת קטגוריה", "הוסף קטגוריה",
+        "עדכן קטגוריה", "שנה קטגוריה", "מחק קטגוריה", "רשימת קטגוריות",
+        "חפש קטגוריה", "פרטי קטגוריה"
+    ]),
+
+    # "תמצא מוצר X כמות N מחיר P" - ההודעה כולה; שם המוצר יכול להימשך על פני כמה שורות
+    rule("find_product", ["תמצא מוצר", "מצא מוצר"],
+         r"\s+(?s:(.+?))(?:\s+כמות\s+(\d+))?(?:\s+מחיר\s+" + _NUMBER + r")?$",
+         slots=("find_name", "find_quantity", "find_price"), anchored=True),
+    # "עדכן את המוצר 12 ל-5" - ההודעה כולה
+    rule("product_shorthand", "עדכן את המוצר", r"\s+(\d+)\s+ל-(\d+)$",
+         slots=("shorthand_product_id", "shorthand_value"), anchored=True),
+
+    # פקודות מלאות שמתבצעות ישירות בכלי (ההודעה כולה), למשל
+    # "עדכן את המלאי של מוצר עם מזהה 12 לכמות 5" או "צור קטגוריה חדשה בשם נעליים"
+    rule("stock_command", ["עדכן מלאי", "עדכן את המלאי", "שנה מלאי", "שנה את המלאי", "עדכן כמות", "עדכן את הכמות"],
+         _PRODUCT_TARGET + r"\s+(?:לכמות|ל-|ל)\s*(\d+)\s*[.!]?$",
+         slots=("command_product_id", "command_quantity"), anchored=True),
+    rule("price_command", ["עדכן מחיר", "עדכן את המחיר", "שנה מחיר", "שנה את המחיר"],
+         _PRODUCT_TARGET + r"\s+(?:למחיר|ל-|ל)\s*₪?\s*" + _NUMBER + r"\s*₪?\s*[.!]?$",
+         slots=("command_product_id", "command_price"), anchored=True),
+    # שם בלי פרטים נוספים (תיאור, קטגוריית אב) - אחרת הבקשה עוברת לסוכן הקטגוריות
+    rule("category_create_command", ["צור קטגוריה", "הוסף קטגוריה", "יצירת קטגוריה"],
+         r"(?:\s+חדשה)?\s+בשם\s+(?!.*(?:\sעם\s|תיאור|תחת|הורה|סלאג|תמונה))"
+         r"['\"״]?([^'\"״,.!]+?)['\"״]?\s*[.!]?$",
+         slots=("command_name",), anchored=True),
+
+    # פעולות שדורשות אימות
+    rule("create_product", ["צור מוצר", "יצירת מוצר", "מוצר חדש"]),
+    rule("create_product", "תמצא מוצר", r"(?=.*מחיר)"),
+    rule("update_price", ["עדכן מחיר", "שנה מחיר", "לשנות מחיר"]),
+    rule("update_stock", ["עדכן מלאי", "עדכן כמות", "שנה מלאי", "לשנות מלאי"]),
+    rule("stock_request", ["עדכן את המלאי", "עדכן מלאי"]),
+    rule("create_category", ["צור קטגוריה", "יצירת קטגוריה", "קטגוריה חדשה"]),
+
+    # פרמטרים
+    rule(None, ["בשם", "ששמו", "ששמה"], r"\s+['\"]?([^'\",]+)['\"]?", slots=("name",)),
+    rule(None, "שם", r":?\s+['\"]?([^'\",]+)['\"]?", slots=("name",)),
+    rule(None, "מוצר עם מזהה", r" (\d+)", slots=("product_id",)),
+    rule(None, "מוצר", r"\s+(\d+)", slots=("product_id",)),
+    rule(None, "מזהה", r" (\d+)", slots=("product_id",)),
+    rule(None, "מחיר", r":?\s+" + _NUMBER, slots=(("price", "new_price"),)),
+    rule(None, "במחיר", r"\s+" + _NUMBER, slots=("price",)),
+    rule(None, ["מחיר חדש", "למחיר"], r"\s+" + _NUMBER, slots=("new_price",)),
+    rule(None, "כמות", r":?\s+(\d+)", slots=(("quantity", "new_stock"),)),
+    rule(None, "במלאי", r"\s+(\d+)", slots=("quantity",)),
+    rule(None, ["כמות חדשה", "ל-"], r"\s+(\d+)", slots=("new_stock",)),
+    rule(None, "לכמות", r"\s+(\d+)", slots=(("new_stock", "target_quantity"),)),
+
+    # תשובה לבקשת אימות - ההודעה כולה
+    rule("confirm", ["כן", "אישור", "מאשר", "נכון", "אכן", "בהחלט", "בבקשה", "אוקיי", "אוקי", "ok", "yes", "y"],
+         "$", anchored=True),
+    rule("reject", ["לא", "ביטול", "מבטל", "לבטל", "שגוי", "לא מאשר", "no", "n"], "$", anchored=True),
+)
+
+
+class MatchResult:
+    """
+    תוצאת סריקה: הכוונות שזוהו, הפרמטרים שחולצו ומיקומי הכוונות. התוצאה
+    משותפת לכל הקריאות עם אותה הודעה (match_intents), ולכן אינה ניתנת לשינוי.
+    """
+
+    __slots__ = ("intents", "slots", "positions")
+
+    def __init__(self, intents, slots, positions):
+        self.intents = frozenset(intents)
+        self.slots = MappingProxyType(slots)
+        self.positions = MappingProxyType(positions)
+
+    def has(self, *intents):
+        """
+        האם זוהתה לפחות אחת מהכוונות
+        """
+        return any(intent in self.intents for intent in intents)
+
+    def slot(self, name, default=None):
+        return self.slots.get(name, default)
+
+    def __repr__(self):
+        return f"MatchResult(intents={sorted(self.intents)}, slots={dict(self.slots)})"
+
+
+class _Alternative:
+    """ביטוי קבוע אחד של כלל, כחלופה בביטוי המשולב"""
+
+    __slots__ = ("intent", "head", "key", "slots", "anchored", "pattern", "is_literal",
+                 "compiled", "group", "slot_groups", "implied", "candidates")
+
+    def __init__(self, rule_, head, flags):
+        self.intent = rule_.intent
+        self.head = head
+        self.key = head.casefold()
+        self.slots = rule_.slots
+        self.anchored = rule_.anchored
+        self.pattern = re.escape(head) + rule_.tail
+        self.is_literal = not rule_.tail
+        # לבדיקה במיקום נתון כשחלופה אחרת ניצחה בסריקה
+        self.compiled = re.compile(self.pattern, flags)
+        self.group = None
+        self.slot_groups = ()
+        self.implied = ()
+        self.candidates = ()
+
+
+class IntentMatcher:
+    """
+    מהדר רשימת כללים לביטוי רגולרי אחד וסורק הודעה במעבר אחד
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, flags=re.IGNORECASE):
+        """
+        Args:
+            rules: רשימת כללים (rule)
+            flags: דגלי re לכל הכללים
+        """
+        alternatives = [_Alternative(rule_, head, flags) for rule_ in rules for head in rule_.heads]
+        # בכל צומת: המשך לביטוי ארוך יותר קודם, ואחריו חלופה עם המשך רגולרי
+        # לפני ביטוי קבוע בלבד
+        alternatives.sort(key=lambda alt: (-len(alt.head), alt.is_literal))
+
+        # הביטויים הקבועים מסודרים בעץ תחיליות (trie), כך שבכל מיקום המנוע בודק
+        # רק את הענפים שמתחילים בתו הנוכחי ולא את כל החלופות אחת אחרי השנייה
+        self._groups = 0
+        self._by_group = {}
+        branches = []
+        if any(alt.anchored for alt in alternatives):
+            branches.append("^" + self._compile_trie([alt for alt in alternatives if alt.anchored]))
+        if not all(alt.anchored for alt in alternatives):
+            branches.append(self._compile_trie([alt for alt in alternatives if not alt.anchored]))
+        self._regex = re.compile("(?=" + "|".join(branches) + ")" if branches else "(?!)", flags)
+
+        # חלופות שיכולות להתאים באותו מיקום כמו חלופה שניצחה. בעץ, ענף ארוך יותר
+        # נבדק קודם וחלופות שמתחילות בהודעה כולה נבדקות לפני השאר - לכן
+        # נשארות רק חלופות שהביטוי שלהן הוא תחילת הביטוי של המנצחת (וכשהמנצחת
+        # חלה על ההודעה כולה - גם כל השאר). ביטוי קבוע בלבד כזה מתאים תמיד.
+        for alt in alternatives:
+            shadowed = [
+                other for other in alternatives
+                if other is not alt and (
+                    alt.key.startswith(other.key) and (alt.anchored or not other.anchored)
+                    or alt.anchored and not other.anchored and other.key.startswith(alt.key)
+                )
+            ]
+            alt.implied = tuple(other for other in shadowed if other.is_literal and alt.key.startswith(other.key))
+            alt.candidates = tuple(other for other in shadowed if other not in alt.implied)
+        self.alternatives = alternatives
+
+    def _compile_trie(self, alternatives):
+        """
+        בונה ביטוי רגולרי מעץ התחיליות של החלופות. כל חלופה היא קבוצה לוכדת
+        (עם ההמשך הרגולרי שלה) בצומת שבו הביטוי הקבוע שלה מסתיים.
+        """
+        root = {}
+        for alt in alternatives:
+            node = root
+            for char in alt.key:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(alt)
+        return self._compile_node(root)
+
+    def _compile_node(self, node):
+        branches = []
+        for char, child in node.items():
+            if char is not None:
+                branches.append(re.escape(char) + self._compile_node(child))
+        for alt in node.get(None, ()):
+            self._groups += 1
+            alt.group = self._groups
+            self._by_group[alt.group] = alt
+            alt.slot_groups = tuple(range(alt.group + 1, alt.group + 1 + len(alt.slots)))
+            self._groups += len(alt.slots)
+            branches.append(f"({alt.pattern[len(re.escape(alt.head)):]})")
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    def scan(self, text):
+        """
+        סורק הודעה
+
+        Args:
+            text: הודעת המשתמש
+
+        Returns:
+            MatchResult: כל הכוונות והפרמטרים שזוהו
+        """
+        text = (text or "").strip()
+        intents, slots, positions = set(), {}, {}
+
+        def record(alt, position, values):
+            if alt.intent is not None:
+                intents.add(alt.intent)
+                positions.setdefault(alt.intent, position)
+            for names, value in zip(alt.slots, values):
+                if value is not None:
+                    for name in names:
+                        slots.setdefault(name, value)
+
+        by_group = self._by_group
+        for match in self._regex.finditer(text):
+            alt = by_group[match.lastindex]
+            position = match.start()
+            record(alt, position, [match.group(group) for group in alt.slot_groups])
+            for other in alt.implied:
+                record(other, position, ())
+            for other in alt.candidates:
+                other_match = other.compiled.match(text, position)
+                if other_match:
+                    record(other, position, other_match.groups())
+
+        return MatchResult(intents, slots, positions)
+
+
+_default_matcher = IntentMatcher()
+
+
+@lru_cache(maxsize=256)
+def match_intents(text):
+    """
+    סורק הודעה עם הכללים של הסוכן הראשי. התוצאה נשמרת, כך שכמה בדיקות על
+    אותה הודעה באותו תור עולות סריקה אחת.
+    """
+    return _default_matcher.scan(text)
@@ -14,9 +14,16 @@ Agent ראשי משופר למערכת AI Agents לניהול חנות WooCommer
 - מנגנון לחזרה ל-Agent הקודם
 """
 
-from .base import Agent, Handoff, Guardrail, Thread, Tool, function_tool
+from .base import Agent, Handoff, Guardrail, Thread, Tool, function_tool, resolve_agent
+from .runtime import (
+    RunAgent, ResumeAgent, BlockingCall, Completion, Speculate, run_effects, arun_effects,
+    drain_events, adrain_events, acreate_completion, start_llm_call_count, record_llm_call
+)
+from .intent_matcher import match_intents
+from .routing_cache import normalize_utterance
+from .specialists import LazyAgentRegistry
 from utils.tracing import Trace
-from memory.vector_store import AdvancedVectorStore
+from utils.tokens import ContextBuilder, count_tokens, truncate_text, prompt_token_report
 from agents.product_agent import create_product_agent
 from agents.order_agent import create_order_agent
 from agents.coupon_agent import create_coupon_agent
@@ -26,53 +33,169 @@ from agents.report_agent import create_report_agent
 from agents.settings_agent import create_settings_agent
 import json
 from typing import Dict, List, Optional, Any, Tuple
-import re
+import time
 import asyncio
 import logging
+import contextvars
+import copy
+from collections import deque
+from itertools import islice
+from datetime import datetime
 from .base_agent import BaseAgent
 import os
-import glob
-import importlib.util
-import yaml
-import hashlib
-import pkg_resources
 
 # הגדרת מודל ברירת המחדל
 DEFAULT_MODEL = "gpt-4o"
 
 logger = logging.getLogger(__name__)
 
+# ערך ברירת מחדל שמסמן ל-AgentRouter לטעון את המסווג המאומן
+DEFAULT_CLASSIFIER = object()
+
 class AgentContext:
     """
     מחלקה לשמירת הקשר ומידע משותף בין ה-Agents.
     """
     
-    def __init__(self):
+    # תקציב הטוקנים של ההקשר שמועבר לסוכנים המתמחים
+    RECENT_TURNS = 3
+    CONTEXT_TOKENS = 900
+    TURN_INPUT_TOKENS = 120
+    TURN_RESPONSE_TOKENS = 250
+    SUMMARY_TOKENS = 200
+    SUMMARY_LINE_TOKENS = 40
+    # מספר השיחות שנשמרות בזיכרון; שיחות ישנות יותר נשארות רק בסיכום המצטבר
+    HISTORY_DEPTH = 50
+    
+    def __init__(self, store=None, session_id=None, history_depth=None):
         """
         אתחול הקשר ה-Agent.
+        
+        Args:
+            store: מאגר שיחות (memory/conversation_store.py) לשמירת ההיסטוריה
+                והמידע המשותף מחוץ לתהליך (אופציונלי)
+            session_id: מזהה השיחה במאגר
+            history_depth: מספר השיחות שנשמרות בזיכרון (ברירת מחדל: HISTORY_DEPTH)
         """
-        self.shared_data = {}
-        self.conversation_history = []
-        self.agent_history = []
+        self.store = store if session_id is not None else None
+        self.session_id = session_id
+        # עם מאגר, ההיסטוריה נטענת רק בגישה הראשונה
+        self._loaded = self.store is None
+        self._shared_data = {}
+        # חלון השיחות לא יורד מתחת לשיחות האחרונות שנשלחות במלואן, כך שכל
+        # שיחה שנזרקת מהחלון כבר יכולה להיכנס לסיכום
+        depth = max(history_depth or self.HISTORY_DEPTH, self.RECENT_TURNS + 1)
+        self._conversation_history = deque(maxlen=depth)
+        self._agent_history = deque(maxlen=depth)
+        # מספר השיחות הכולל מתחילת השיחה, כולל שיחות שכבר נזרקו מהחלון
+        self.turn_count = 0
         self.current_task = None
+        # סיכום מצטבר של השיחות שכבר יצאו מחלון השיחות האחרונות
+        self.summary_lines = []
+        self._summarized_count = 0
+        # מספר השיחות שנמחקו מתחילת רצף השיחות במאגר (דחיסה), ומספר השיחות
+        # שנכתבו מאז הדחיסה האחרונה
+        self._turns_base = 0
+        self._turns_appended = 0
+        # פירוט הטוקנים של ההקשר האחרון שנבנה
+        self.last_context_report = None
+    
+    @property
+    def shared_data(self):
+        self._ensure_loaded()
+        return self._shared_data
+    
+    @property
+    def conversation_history(self):
+        self._ensure_loaded()
+        return self._conversation_history
+    
+    @property
+    def agent_history(self):
+        self._ensure_loaded()
+        return self._agent_history
+    
+    def _ensure_loaded(self):
+        """
+        טוען מהמאגר את ההיסטוריה והמידע המשותף בגישה הראשונה
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        self._shared_data = self.store.get_state(self.session_id, "shared_data", {})
+        self._load_turns(self.store.get_state(self.session_id, "summary", {}))
+    
+    def _load_turns(self, summary):
+        """
+        טוען את חלון השיחות מהמאגר. הסיכום נשמר במאגר, ולכן נקראות רק
+        השיחות שנכנסות לחלון.
+        """
+        self._conversation_history.clear()
+        self._agent_history.clear()
+        self.summary_lines = summary.get("lines", [])
+        self._summarized_count = summary.get("until", 0)
+        self._turns_base = summary.get("base", 0)
+        self.turn_count = max(self._turns_base, self._summarized_count - self._conversation_history.maxlen)
+        self._append_turns(self.store.read(self.session_id, "turns", start=self.turn_count - self._turns_base))
+    
+    def _append_turns(self, records):
+        for record in records:
+            if len(self._conversation_history) == self._conversation_history.maxlen:
+                # השיחה הישנה ביותר עומדת לצאת מהחלון - מסכמים אותה קודם
+                self._update_summary()
+            self.turn_count += 1
+            self._conversation_history.append({
+                "user_input": record["u"],
+                "response": record["r"],
+                "agent_name": record["a"],
+                "timestamp": record["t"]
+            })
+            self._agent_history.append(record["a"])
+    
+    def sync(self):
+        """
+        מעדכן מהמאגר שיחה שכבר נטענה: תורות שנוספו ומידע משותף שנשמר
+        בתהליך אחר (למשל worker אחר של השרת). קורא רק את התורות החדשות.
+        """
+        if self.store is None or not self._loaded:
+            return
+        self._shared_data = self.store.get_state(self.session_id, "shared_data", {})
+        summary = self.store.get_state(self.session_id, "summary", {})
+        if summary.get("base", 0) != self._turns_base:
+            # תהליך אחר דחס את הרצף - המיקומים השתנו, ולכן החלון נטען מחדש
+            self._load_turns(summary)
+            return
+        self._append_turns(self.store.read(self.session_id, "turns", start=self.turn_count - self._turns_base))
     
     def add_to_history(self, user_input: str, response: str, agent_name: str):
         """
-        מוסיף פריט לשיחה להיסטוריה.
+        מוסיף פריט לשיחה להיסטוריה. עם מאגר, התור נכתב כרשומה אחת בסוף הרצף.
         
         Args:
             user_input: קלט המשתמש
             response: תגובת ה-Agent
             agent_name: שם ה-Agent שטיפל בבקשה
         """
-        self.conversation_history.append({
-            "user_input": user_input,
-            "response": response,
-            "agent_name": agent_name,
-            "timestamp": self._get_timestamp()
-        })
-        
-        self.agent_history.append(agent_name)
+        record = {"u": user_input, "r": response, "a": agent_name, "t": self._get_timestamp()}
+        self._ensure_loaded()
+        self._append_turns([record])
+        if self.store is not None:
+            self.store.append(self.session_id, "turns", record)
+            self._turns_appended += 1
+            if self._turns_appended >= self._conversation_history.maxlen:
+                self._compact_turns()
+    
+    def _compact_turns(self):
+        """
+        מחליף את רצף השיחות במאגר בשיחות שבחלון בלבד. השיחות הישנות כבר
+        נמצאות בסיכום, כך שהרצף (וזמן הטעינה) לא גדלים עם אורך השיחה.
+        """
+        records = [{"u": item["user_input"], "r": item["response"], "a": item["agent_name"], "t": item["timestamp"]}
+                   for item in self._conversation_history]
+        self.store.replace(self.session_id, "turns", records)
+        self._turns_base = self.turn_count - len(records)
+        self._turns_appended = 0
+        self._save_summary()
     
     def _get_timestamp(self):
         """
@@ -93,6 +216,16 @@ class AgentContext:
             value: ערך
         """
         self.shared_data[key] = value
+        if self.store is not None:
+            # ערכים שלא ניתן לייצג ב-JSON נשארים בזיכרון התהליך בלבד
+            persistent = {}
+            for name, item in self._shared_data.items():
+                try:
+                    json.dumps(item)
+                except (TypeError, ValueError):
+                    continue
+                persistent[name] = item
+            self.store.set_state(self.session_id, "shared_data", persistent)
     
     def get_shared_data(self, key: str, default: Any = None) -> Any:
         """
@@ -130,7 +263,7 @@ class AgentContext:
             return ""
         
         # הגבלת מספר הפריטים
-        last_items = self.conversation_history[-last_n:] if last_n > 0 else self.conversation_history
+        last_items = list(self.conversation_history)[-last_n:] if last_n > 0 else self.conversation_history
         
         summary = []
         for item in last_items:
@@ -160,45 +293,93 @@ class AgentContext:
         מכין הקשר לשימוש במודל השפה, כולל היסטוריית השיחה.
         מאפשר למודל להבין את ההקשר של שיחות קודמות.
         
+        השיחות האחרונות נשלחות במלואן עד תקרת טוקנים לכל שיחה (רשימות ארוכות
+        מקוצרות), ושיחות ישנות יותר נשלחות כסיכום מצטבר קצר. פירוט הטוקנים
+        נשמר ב-last_context_report.
+        
         Returns:
             str: הקשר מפורמט לשימוש במודל השפה
         """
         if not self.conversation_history:
             return ""
-            
-        # נשתמש ב-3 השיחות האחרונות לכל היותר
-        context_items = self.conversation_history[-3:]
         
-        context_parts = []
-        context_parts.append("### היסטוריית שיחה קודמת:")
+        self._update_summary()
         
-        for item in context_items:
-            user_input = item.get("user_input", "")
-            response = item.get("response", "")
-            
-            context_parts.append(f"משתמש: {user_input}")
-            context_parts.append(f"מערכת: {response}")
-            context_parts.append("---")
-            
-        context_parts.append("### שים לב להיסטוריה לעיל בעת מתן תשובה לשאלה הנוכחית.")
+        builder = ContextBuilder(self.CONTEXT_TOKENS)
+        builder.add("header", "### היסטוריית שיחה קודמת:")
+        builder.add("summary", "\n".join(["סיכום שיחות קודמות:"] + self.summary_lines) if self.summary_lines else "",
+                    max_tokens=self.SUMMARY_TOKENS, priority=2, keep="tail")
+        
+        # השיחה האחרונה מקבלת תקציב ראשונה
+        recent = list(self.conversation_history)[-self.RECENT_TURNS:]
+        for index, item in enumerate(recent):
+            turn = "\n".join([
+                f"משתמש: {truncate_text(item.get('user_input', ''), self.TURN_INPUT_TOKENS)}",
+                f"מערכת: {truncate_text(item.get('response', ''), self.TURN_RESPONSE_TOKENS)}",
+                "---"
+            ])
+            builder.add(f"turn_{len(recent) - index}", turn, priority=1 + (len(recent) - index) / 10)
+        
+        builder.add("footer", "### שים לב להיסטוריה לעיל בעת מתן תשובה לשאלה הנוכחית.")
+        
+        context = builder.build()
+        self.last_context_report = builder.report
+        return context
+    
+    def _update_summary(self):
+        """
+        מוסיף לסיכום את השיחות שיצאו מחלון השיחות האחרונות. כל שיחה מסוכמת
+        פעם אחת בלבד, והשורות הישנות ביותר נזרקות כשהסיכום חורג מהתקציב.
+        המיקומים הם מתחילת השיחה (turn_count), כך שהסיכום ממשיך גם אחרי
+        ששיחות נזרקו מהחלון.
+        """
+        summarize_until = self.turn_count - self.RECENT_TURNS
+        if summarize_until <= self._summarized_count:
+            return
+        window_start = self.turn_count - len(self._conversation_history)
+        for item in islice(self._conversation_history, max(self._summarized_count - window_start, 0),
+                           summarize_until - window_start):
+            response = (item.get("response") or "").strip().split("\n")[0]
+            line = f"- {item.get('agent_name', 'לא ידוע')}: {item.get('user_input', '')} ← {response}"
+            self.summary_lines.append(truncate_text(line, self.SUMMARY_LINE_TOKENS, keep="head"))
+        self._summarized_count = summarize_until
         
-        return "\n".join(context_parts)
+        while len(self.summary_lines) > 1 and count_tokens("\n".join(self.summary_lines)) > self.SUMMARY_TOKENS:
+            self.summary_lines.pop(0)
+        if self.store is not None:
+            self._save_summary()
+    
+    def _save_summary(self):
+        self.store.set_state(self.session_id, "summary",
+                             {"lines": self.summary_lines, "until": self._summarized_count, "base": self._turns_base})
 
 class AgentRouter:
     """
     מחלקה לניתוב בקשות לסוכנים המתאימים ביותר
     """
     
-    def __init__(self, client, model_name="gpt-4o"):
+    # סף הביטחון של המסווג המקומי - מתחתיו ההחלטה עוברת למודל
+    CLASSIFIER_THRESHOLD = 0.6
+    
+    def __init__(self, client, model_name="gpt-4o", classifier=DEFAULT_CLASSIFIER,
+                 confidence_threshold=CLASSIFIER_THRESHOLD, routing_cache=None):
         """
         אתחול המנתב
         
         Args:
             client: הלקוח של OpenAI 
             model_name: שם המודל לשימוש
+            classifier: מסווג הכוונות המקומי (ברירת מחדל: המודל המאומן
+                ב-agents/data; None - כל החלטה שאינה מקומית עוברת למודל)
+            confidence_threshold: סף הביטחון לקבלת החלטת המסווג
+            routing_cache: מטמון החלטות לפי תבנית הבקשה (RoutingCache, אופציונלי)
         """
         self.client = client
         self.model = model_name
+        # המסווג המאומן (ו-numpy) נטענים רק בניתוב הראשון שצריך אותו
+        self._classifier = classifier
+        self.confidence_threshold = confidence_threshold
+        self.routing_cache = routing_cache
         self.topic_mapping = {
             "מוצרים": "product",
             "הזמנות": "order",
@@ -220,18 +401,147 @@ class AgentRouter:
         Returns:
             str: שם הסוכן המתאים
         """
+        decision, _ = self.quick_decision(user_input)
+        if decision:
+            return decision
+        
+        return self.llm_identify_agent(user_input)
+    
+    def llm_identify_agent(self, user_input):
+        """
+        מזהה את הסוכן בקריאה למודל בלבד, למי שכבר הריץ את quick_decision
+        (בלי לבדוק שוב את הכללים, המטמון והמסווג המקומי)
+        
+        Args:
+            user_input: קלט המשתמש
+            
+        Returns:
+            str: שם הסוכן המתאים
+        """
+        record_llm_call()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._classification_messages(user_input)
+        )
+        
+        return self.remember(user_input, self._parse_agent_area(response.choices[0].message.content))
+    
+    async def aidentify_agent(self, user_input, context=None):
+        """
+        מזהה את הסוכן המתאים באופן אסינכרוני (AsyncOpenAI)
+        
+        Args:
+            user_input: קלט המשתמש
+            context: הקשר השיחה (אופציונלי)
+            
+        Returns:
+            str: שם הסוכן המתאים
+        """
+        decision, _ = self.quick_decision(user_input)
+        if decision:
+            return decision
+        
+        return await self.allm_identify_agent(user_input)
+    
+    async def allm_identify_agent(self, user_input):
+        """
+        הגרסה האסינכרונית של llm_identify_agent
+        """
+        record_llm_call()
+        response = await acreate_completion(
+            self.client,
+            model=self.model,
+            messages=self._classification_messages(user_input)
+        )
+        
+        return self.remember(user_input, self._parse_agent_area(response.choices[0].message.content))
+    
+    def local_decision(self, user_input):
+        """
+        החלטת ניתוב שאינה דורשת קריאה למודל, או None
+        """
+        matched = match_intents(user_input)
+        
         # בדיקה אם זו שאלה על זהות הסוכן - תמיד תחזיר primary
-        if "איזה סוכן אתה" in user_input or "מי אתה" in user_input:
+        if matched.has("identity"):
             return "primary"
             
         # בדיקה ישירה לביטויים הקשורים לקטגוריות
-        if any(phrase in user_input.lower() for phrase in [
-            "קטגוריה חדשה", "צור קטגוריה", "יצירת קטגוריה", "הוסף קטגוריה",
-            "עדכן קטגוריה", "שנה קטגוריה", "מחק קטגוריה", "רשימת קטגוריות",
-            "חפש קטגוריה", "פרטי קטגוריה"
-        ]):
+        if matched.has("category_command"):
             return "category"
+        
+        return None
+    
+    def quick_decision(self, user_input):
+        """
+        החלטת ניתוב בלי קריאה למודל: כללים קבועים, החלטה שמורה לתבנית
+        הבקשה, ואחריהן המסווג המקומי כשהביטחון שלו עובר את הסף
+        
+        Returns:
+            (סוג הסוכן, "local", "cache" או "classifier"), או (None, None) אם נדרש המודל
+        """
+        decision = self.local_decision(user_input)
+        if decision:
+            return decision, "local"
+        
+        if self.routing_cache is not None:
+            decision = self.routing_cache.get(normalize_utterance(user_input))
+            if decision:
+                return decision, "cache"
+        
+        if self.classifier is not None:
+            decision, confidence = self.classifier.predict(user_input)
+            if decision and confidence >= self.confidence_threshold:
+                return self.remember(user_input, decision), "classifier"
+        
+        return None, None
+    
+    def likely_agents(self, user_input, limit=2, min_probability=0.0):
+        """
+        הסוכנים המתמחים הסבירים ביותר לפי המסווג המקומי, גם כשהביטחון שלו
+        מתחת לסף (לניתוב ספקולטיבי)
+        
+        Args:
+            user_input: קלט המשתמש
+            limit: מספר הסוכנים המרבי
+            min_probability: ההסתברות המינימלית של סוכן ברשימה
             
+        Returns:
+            list: סוגי הסוכנים, מהסביר ביותר (ללא primary)
+        """
+        if self.classifier is None:
+            return []
+        probabilities = self.classifier.predict_proba(user_input)
+        if not probabilities:
+            return []
+        ranked = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)
+        return [label for label, probability in ranked
+                if label != "primary" and probability >= min_probability][:limit]
+    
+    @property
+    def classifier(self):
+        if self._classifier is DEFAULT_CLASSIFIER:
+            from .intent_classifier import load_default_classifier
+            self._classifier = load_default_classifier()
+        return self._classifier
+    
+    @classifier.setter
+    def classifier(self, value):
+        self._classifier = value
+    
+    def remember(self, user_input, decision):
+        """
+        שומר את החלטת הניתוב לתבנית הבקשה ומחזיר אותה. "primary" לא נשמר -
+        זו גם ברירת המחדל כשתשובת המודל לא פוענחה.
+        """
+        if self.routing_cache is not None and decision != "primary":
+            self.routing_cache.set(normalize_utterance(user_input), decision)
+        return decision
+    
+    def _classification_messages(self, user_input):
+        """
+        בונה את ההודעות לסיווג הבקשה על ידי המודל
+        """
         prompt = f"""
         שאלה או בקשה של המשתמש: {user_input}
         
@@ -247,15 +557,16 @@ class AgentRouter:
         נא לענות בתחום אחד בלבד מהרשימה לעיל, ללא הסברים נוספים.
         """
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "אתה מומחה לסיווג בקשות ושאלות בתחום של ניהול חנות WooCommerce. תפקידך לזהות את התחום אליו שייכת השאלה."},
-                {"role": "user", "content": prompt},
-            ]
-        )
-        
-        agent_area = response.choices[0].message.content.strip()
+        return [
+            {"role": "system", "content": "אתה מומחה לסיווג בקשות ושאלות בתחום של ניהול חנות WooCommerce. תפקידך לזהות את התחום אליו שייכת השאלה."},
+            {"role": "user", "content": prompt},
+        ]
+    
+    def _parse_agent_area(self, agent_area):
+        """
+        ממיר את תשובת המודל לקוד הסוכן המתאים
+        """
+        agent_area = (agent_area or "").strip()
         
         # המרה לקוד הסוכן המתאים
         for topic, agent_type in self.topic_mapping.items():
@@ -281,11 +592,47 @@ class MainAgent(BaseAgent):
         "settings": create_settings_agent,
         "report": create_report_agent
     }
-    
-    def __init__(self, client, model_name=DEFAULT_MODEL, woo_client=None):
+
+    # תיאורי ההעברות לסוכנים המתמחים: שם ההעברה -> (תחום, תיאור)
+    HANDOFF_DESCRIPTIONS = {
+        "product": ("product", "העבר לסוכן מוצרים כשהמשתמש מבקש לנהל מוצרים, לחפש מוצרים, ליצור או לעדכן מוצרים, או לעבוד עם מלאי."),
+        "order": ("order", "העבר לסוכן הזמנות כשהמשתמש מבקש לנהל הזמנות, לחפש הזמנות, לעדכן סטטוס הזמנות או לבצע פעולות הקשורות להזמנות."),
+        "coupon": ("coupon", "העבר לסוכן קופונים כשהמשתמש מבקש ליצור קופונים, לנהל קופונים, או לעדכן מבצעים והנחות."),
+        "category": ("category", "העבר לסוכן קטגוריות כשהמשתמש מבקש לנהל קטגוריות מוצרים, תגיות, או מבנה המוצרים בחנות."),
+        "customer": ("customer", "העבר לסוכן לקוחות כשהמשתמש מבקש לנהל לקוחות, לחפש לקוחות, או לעדכן פרטי לקוחות."),
+        "report": ("report", "העבר לסוכן דו״חות כשהמשתמש מבקש לקבל דו״חות מכירות, נתונים סטטיסטיים, או ניתוח ביצועים של החנות."),
+        "settings_handoff": ("settings", "העבר לסוכן הגדרות כשהמשתמש מבקש לעדכן הגדרות חנות, להגדיר שיטות משלוח, שיטות תשלום או הגדרות כלליות."),
+    }
+    # שמות ישנים של סוכנים מתמחים -> התחום שלהם
+    HANDOFF_ALIASES = {"product_handoff": "product", "settings_handoff": "settings"}
+
+    # פקודות שכל הפרמטרים שלהן חולצו בסריקה מתבצעות ישירות בכלי של הסוכן
+    # המתמחה, בלי ניתוב ובלי קריאות למודל:
+    # כוונה -> (סוג הפעולה, תחום, שם הכלי, {ארגומנט: (פרמטר בסריקה, המרה)})
+    FAST_PATH_ACTIONS = {
+        "stock_command": ("update_stock", "product", "update_stock",
+                          {"product_id": ("command_product_id", int), "quantity": ("command_quantity", int)}),
+        "price_command": ("update_price", "product", "update_price",
+                          {"product_id": ("command_product_id", int), "regular_price": ("command_price", str)}),
+        "category_create_command": ("create_category", "category", "create_category",
+                                    {"name": ("command_name", str)}),
+        # "עדכן את המוצר 12 ל-5" - הפרשנות כעדכון מלאי היא ניחוש, ולכן מתבצעת רק אחרי אישור
+        "product_shorthand": ("update_stock", "product", "update_stock",
+                              {"product_id": ("shorthand_product_id", int), "quantity": ("shorthand_value", int)}),
+    }
+    # כוונות שהפרשנות שלהן דורשת אישור מהמשתמש לפני הביצוע (גם כש-confirm_writes כבוי)
+    CONFIRM_FIRST = frozenset({"product_shorthand"})
+
+    def __init__(self, client, model_name=DEFAULT_MODEL, woo_client=None, routing_cache=None, speculation=None,
+                 conversation_store=None, history_depth=None, confirm_writes=True):
         """
         אתחול הסוכן הראשי
-        מקבל לקוח WooCommerce לשימוש הסוכנים
+        מקבל לקוח WooCommerce לשימוש הסוכנים, מטמון החלטות ניתוב אופציונלי,
+        מדיניות ניתוב ספקולטיבי אופציונלית (SpeculativeRouting), מאגר שיחות
+        אופציונלי שבו נשמרות השיחות שנוצרות ב-for_session, ומספר השיחות
+        שנשמרות בזיכרון לכל שיחה (history_depth).
+        כש-confirm_writes פעיל (ברירת המחדל), פקודות כתיבה מלאות מתבצעות
+        ישירות בכלי רק אחרי אישור המשתמש
         """
         super().__init__(model_name)
         
@@ -293,22 +640,58 @@ class MainAgent(BaseAgent):
         self.woocommerce = woo_client
         self.model = model_name  # שמירת שם המודל כמשתנה מחלקה
         self.current_agent_type = "primary"  # Agent ראשי כברירת מחדל
-        self.context = AgentContext()
+        self.history_depth = history_depth
+        self.context = AgentContext(history_depth=history_depth)
         self.router = None
+        self.trace = None  # Trace לרישום החלטות הניתוב (אופציונלי)
+        self.speculation = speculation
+        self.conversation_store = conversation_store
+        self.confirm_writes = confirm_writes
         
         # יצירת מנתב אם קיים לקוח
         if client:
-            self.router = AgentRouter(client, model_name)
+            self.router = AgentRouter(client, model_name, routing_cache=routing_cache)
         
-        # מחזיק את הסוכנים המתמחים
-        self.specialized_agents = {}
-        self.agents = {}  # תמיכה לאחורה בשמות ישנים
+        # מחזיק את הסוכנים המתמחים (נבנים בגישה הראשונה, ראה agents/specialists.py)
+        self.specialized_agents = LazyAgentRegistry()
+        self.agents = self.specialized_agents  # תמיכה לאחורה בשם הישן
         self.primary_agent = None  # הסוכן הראשי
-        self.handoffs = []  # רשימת העברות
+        # נתוני התור האחרון (ניתוב וקריאות למודל) - לכל תהליכון ולכל משימת asyncio בנפרד
+        self._turn_stats = contextvars.ContextVar(f"main_agent_turn_stats_{id(self)}", default=None)
         
         # אתחול הסוכנים המתמחים אם קיים לקוח וסטור WooCommerce
         if client and woo_client:
             self._create_specialized_agents()
+    
+    def for_session(self, session_id=None):
+        """
+        יוצר סוכן ראשי לשיחה נפרדת: הקשר שיחה, מצב שיחה ונתוני תור משלו,
+        מעל אותו מנתב ואותם סוכנים מתמחים (שאין בהם מצב של שיחה).
+        עם מאגר שיחות ומזהה שיחה, ההקשר נטען מהמאגר ונשמר בו - השיחה שורדת
+        הפעלה מחדש וזמינה לכל תהליך שמשתמש באותו מאגר.
+        
+        Args:
+            session_id: מזהה השיחה במאגר (אופציונלי)
+        
+        Returns:
+            MainAgent: עותק קל של הסוכן לשיחה חדשה
+        """
+        store = self.conversation_store if session_id is not None else None
+        session_agent = copy.copy(self)
+        session_agent.context = AgentContext(store, session_id, self.history_depth)
+        session_agent.current_agent_type = "primary"
+        session_agent.trace = None
+        session_agent.attach_store(store, session_id)
+        session_agent.session_start_time = datetime.now()
+        session_agent._turn_stats = contextvars.ContextVar(
+            f"main_agent_turn_stats_{id(session_agent)}", default=None)
+        return session_agent
+    
+    def sync_session(self):
+        """
+        מעדכן את הקשר השיחה מהמאגר לפני בקשה - תורות שנכתבו בתהליך אחר
+        """
+        self.context.sync()
         
     def run(self, user_input):
         """
@@ -322,24 +705,135 @@ class MainAgent(BaseAgent):
         Returns:
             str: תשובת הסוכן המתאים
         """
+        return drain_events(self._run_events(user_input, stream=False))
+    
+    def run_stream(self, user_input):
+        """
+        מעבד בקשת משתמש במצב הזרמה
+        
+        Args:
+            user_input: קלט המשתמש (טקסט)
+            
+        Yields:
+            אירועים כמילונים: route (הסוכן שנבחר), token, tool_call, tool_result,
+            handoff, ולבסוף done עם התשובה המלאה
+        """
+        content = yield from self._run_events(user_input, stream=True)
+        yield {"type": "done", "content": content}
+    
+    async def arun(self, user_input):
+        """
+        מעבד בקשת משתמש באופן אסינכרוני - אותה לוגיקת ניתוב כמו run,
+        עם קריאות לא חוסמות למודל ולחנות
+        
+        Args:
+            user_input: קלט המשתמש (טקסט)
+            
+        Returns:
+            str: תשובת הסוכן המתאים
+        """
+        return await adrain_events(arun_effects(self._logic(user_input, stream=False)))
+    
+    def arun_stream(self, user_input):
+        """
+        מעבד בקשת משתמש באופן אסינכרוני במצב הזרמה
+        
+        Args:
+            user_input: קלט המשתמש (טקסט)
+            
+        Returns:
+            מחולל אסינכרוני של אותם אירועים כמו run_stream
+        """
+        return arun_effects(self._logic(user_input, stream=True))
+    
+    def _run_events(self, user_input, stream=False):
+        """
+        מריץ את לוגיקת הניתוב במנוע הסינכרוני ומחזיר את התשובה הסופית כערך ההחזרה
+        """
+        return (yield from run_effects(self._logic(user_input, stream)))
+    
+    @property
+    def last_turn_stats(self):
+        """
+        מחזיר את נתוני התור האחרון בשיחה: הסוכן שנבחר (route), מקור ההחלטה
+        (route_source: fixed, fast_path, followup, intent, local, cache,
+        classifier, llm, primary), מספר הקריאות למודל (llm_calls) ומשך הטיפול, או None אם עוד
+        לא היה תור
+        """
+        return self._turn_stats.get()
+    
+    def _logic(self, user_input, stream=False):
+        """
+        לוגיקת הניתוב של הסוכן הראשי כמחולל אירועים ובקשות קלט/פלט.
+        מחזיר את התשובה הסופית כערך ההחזרה של המחולל.
+        """
+        counter = start_llm_call_count()
+        stats = {"route": "primary", "route_source": "primary", "llm_calls": 0, "duration": 0.0}
+        self._turn_stats.set(stats)
+        start = time.monotonic()
+        try:
+            return (yield from self._route(user_input, stream, stats))
+        finally:
+            stats["llm_calls"] = counter["count"]
+            stats["duration"] = time.monotonic() - start
+            logger.info(f"ניתוב: {stats['route']} ({stats['route_source']}), קריאות למודל: {stats['llm_calls']}")
+            # החלטות הניתוב נשמרות ב-trace ומשמשות לאימון מסווג הכוונות
+            if self.trace is not None:
+                self.trace.add_step("route", {
+                    "user_input": user_input,
+                    "agent": stats["route"],
+                    "source": stats["route_source"],
+                    "llm_calls": stats["llm_calls"]
+                })
+    
+    def _route(self, user_input, stream, stats):
+        """
+        ההחלטה לאיזה סוכן להעביר את הבקשה. כל החלטה נרשמת ב-stats
+        ומועברת ישירות לסוכן המתמחה, בלי לסווג את הבקשה פעם נוספת.
+        """
         logger.info(f"MainAgent.run קיבל קלט: {user_input}")
+        # כל הביטויים והפרמטרים של הבקשה מזוהים בסריקה אחת
+        matched = match_intents(user_input)
         
         # בדיקה אם זו בקשה לחזור לסוכן הראשי או שאלה על זהות הסוכן
-        if ("חזור לסוכן הראשי" in user_input or 
-            "חזור לסוכן הכללי" in user_input or 
-            "איזה סוכן אתה" in user_input or 
-            "מי אתה" in user_input):
+        if matched.has("return_to_primary", "identity"):
             # אין צורך לשנות סוג סוכן כי הסוכן הראשי תמיד נשאר בשליטה
-            return self._get_primary_agent_response(user_input)
-            
+            stats["route_source"] = "fixed"
+            return (yield from self._emit(self._get_primary_agent_response(user_input), stream))
+
+        # פעולה שממתינה לאישור תקפה לתור הבא בלבד
+        pending_action = self.context.get_shared_data("pending_action")
+        self.context.set_shared_data("pending_action", None)
+        if pending_action and matched.has("confirm", "reject"):
+            if matched.has("confirm"):
+                response = yield from self._run_fast_path(pending_action, stream)
+            else:
+                stats["route_source"] = "fixed"
+                response = yield from self._emit("הפעולה בוטלה.", stream)
+            self.context.add_to_history(user_input, response, stats["route"])
+            return response
+
         # בדיקה אם זו בקשה עמומה (מעט מילים ללא הקשר ברור)
-        if len(user_input.split()) < 4 and not any(specific in user_input.lower() for specific in 
-            ["מוצר", "הזמנ", "קטגור", "קופון", "לקוח", "דוח", "הגדר"]):
-            return f"אשמח לעזור! האם תוכל לפרט יותר לגבי מה שאתה רוצה לעדכן? האם מדובר במוצר, הזמנה, קטגוריה, או משהו אחר?"
-        
+        if len(user_input.split()) < 4 and not matched.has("domain_word"):
+            stats["route_source"] = "fixed"
+            return (yield from self._emit(f"אשמח לעזור! האם תוכל לפרט יותר לגבי מה שאתה רוצה לעדכן? האם מדובר במוצר, הזמנה, קטגוריה, או משהו אחר?", stream))
+
+        # פקודה מלאה (פעולה, מזהה וערך) מתבצעת ישירות בכלי, בלי ניתוב ובלי קריאות למודל
+        action = self._fast_path_action(matched)
+        if action:
+            if action["confirm"]:
+                self.context.set_shared_data("pending_action", action)
+                stats["route"] = action["agent"]
+                stats["route_source"] = "fast_path"
+                response = yield from self._emit(
+                    self._generate_confirmation_message(action["type"], action["details"]), stream)
+            else:
+                response = yield from self._run_fast_path(action, stream)
+            self.context.add_to_history(user_input, response, action["agent"])
+            return response
+
         # בדיקה אם מדובר בשאלת המשך (שאלה קצרה שמתייחסת לשיחה קודמת)
-        is_followup = len(user_input.split()) <= 5 and any(word in user_input.lower() for word in 
-                                                       ["כמה", "איזה", "מה", "למה", "כמות", "פרטים", "עוד", "אחר", "נוסף"])
+        is_followup = len(user_input.split()) <= 5 and matched.has("followup_word")
         
         # אם יש היסטוריית שיחה ומדובר בשאלת המשך, נחפש את הסוכן האחרון שענה ונעביר אליו את השאלה
         if is_followup and self.context.conversation_history:
@@ -348,46 +842,21 @@ class MainAgent(BaseAgent):
             
             # אם זה לא הסוכן הראשי, נעביר את השאלה לסוכן המתאים
             if last_agent_type != "primary" and last_agent_type in self.specialized_agents:
-                agent = self.specialized_agents[last_agent_type]
-                
-                # הכנת הקשר השיחה להעברה לסוכן
-                conversation_context = self.context.get_context_for_model()
-                
-                # בניית קלט עם הקשר
-                enhanced_input = f"{conversation_context}\n\nשאלה נוכחית: {user_input}"
-                
-                # שליחה לסוכן המתאים
-                if hasattr(agent, 'agent'):
-                    response = agent.agent.run(enhanced_input)
-                else:
-                    response = agent.run(enhanced_input)
+                response = yield from self._call_specialist(last_agent_type, user_input, stream, "followup")
                     
                 # הוספת התגובה להיסטוריה
                 self.context.add_to_history(user_input, response, last_agent_type)
                 return response
         
         # בדיקה אם מדובר בבקשה ליצירת מוצר במינוח מעורפל כמו "תמצא מוצר"
-        if re.search(r'^(תמצא מוצר|מצא מוצר)\s+.+\s+כמות\s+\d+\s+מחיר\s+\d+', user_input, re.IGNORECASE):
+        if matched.has("find_product") and matched.slot("find_quantity") and matched.slot("find_price"):
             logger.info(f"זוהתה בקשה מעורפלת ליצירת מוצר: {user_input}")
             # עיבוד הקלט לפני העברה לסוכן המוצרים
             processed_input, was_processed = self._process_user_intent(user_input)
             
             if was_processed and "product" in self.specialized_agents:
-                agent = self.specialized_agents["product"]
-                
-                # הכנת הקשר השיחה להעברה לסוכן
-                conversation_context = self.context.get_context_for_model()
-                
-                # בניית קלט עם הקשר
-                enhanced_input = processed_input
-                if conversation_context:
-                    enhanced_input = f"{conversation_context}\n\nשאלה נוכחית: {processed_input}"
-                
                 # שליחה לסוכן המוצרים
-                if hasattr(agent, 'agent'):
-                    response = agent.agent.run(enhanced_input)
-                else:
-                    response = agent.run(enhanced_input)
+                response = yield from self._call_specialist("product", processed_input, stream, "intent")
                 
                 # הוספת התגובה להיסטוריה
                 self.context.add_to_history(user_input, response, "product")
@@ -395,27 +864,12 @@ class MainAgent(BaseAgent):
         
         # זיהוי סוכן מתאים לטיפול בבקשה
         if self.router:
-            target_agent_type = self.router.identify_agent(user_input, self.context)
+            target_agent_type, source, prefetched = yield from self._identify_agent(user_input, stream)
             
             # אם זוהה סוכן מתמחה מתאים, העבר אליו את הבקשה
             if target_agent_type != "primary" and target_agent_type in self.specialized_agents:
-                agent = self.specialized_agents[target_agent_type]
-                
-                # הכנת הקשר השיחה להעברה לסוכן אם יש היסטוריה
-                conversation_context = self.context.get_context_for_model()
-                
-                # בניית קלט עם הקשר אם יש היסטוריה
-                enhanced_input = user_input
-                if conversation_context:
-                    enhanced_input = f"{conversation_context}\n\nשאלה נוכחית: {user_input}"
-                
-                # בדיקה אם מדובר באובייקט Handoff
-                if hasattr(agent, 'agent'):
-                    # קריאה לסוכן דרך אובייקט Handoff
-                    response = agent.agent.run(enhanced_input)
-                else:
-                    # קריאה ישירה לסוכן
-                    response = agent.run(enhanced_input)
+                response = yield from self._call_specialist(target_agent_type, user_input, stream, source,
+                                                            prefetched=prefetched)
                     
                 # הוסף את התגובה להיסטוריה ושמור את סוג הסוכן שטיפל בבקשה
                 self.context.add_to_history(user_input, response, target_agent_type)
@@ -424,34 +878,226 @@ class MainAgent(BaseAgent):
         # אם לא זוהה סוכן ספציפי או שהבקשה היא כללית, הסוכן הראשי מטפל בה
         processed_input, was_processed = self._process_user_intent(user_input)
         
-        # אם הקלט עבר עיבוד, נסה שוב לזהות סוכן מתאים
-        if was_processed and self.router:
-            target_agent_type = self.router.identify_agent(processed_input, self.context)
+        # אם הקלט עבר עיבוד, הוא זוהה כבקשת מוצר (יצירת מוצר או עדכון מלאי) -
+        # ההחלטה הזו משמשת לניתוב ישיר, בלי קריאה נוספת למנתב
+        if was_processed and "product" in self.specialized_agents:
+            response = yield from self._call_specialist("product", processed_input, stream, "intent")
             
-            if target_agent_type != "primary" and target_agent_type in self.specialized_agents:
-                agent = self.specialized_agents[target_agent_type]
-                
-                # הכנת הקשר השיחה להעברה לסוכן
-                conversation_context = self.context.get_context_for_model()
-                
-                # בניית קלט עם הקשר אם יש היסטוריה
-                enhanced_input = processed_input
-                if conversation_context:
-                    enhanced_input = f"{conversation_context}\n\nשאלה נוכחית: {processed_input}"
-                
-                if hasattr(agent, 'agent'):
-                    response = agent.agent.run(enhanced_input)
-                else:
-                    response = agent.run(enhanced_input)
-                    
-                self.context.add_to_history(user_input, response, target_agent_type)
-                return response
+            self.context.add_to_history(user_input, response, "product")
+            return response
         
         # טיפול בבקשה על ידי הסוכן הראשי
         # מענה לשאלות כלליות, הכוונה או עזרה
-        primary_response = self._get_primary_agent_response(user_input)
+        primary_response = yield from self._emit(self._get_primary_agent_response(user_input), stream)
         self.context.add_to_history(user_input, primary_response, "primary")
         return primary_response
+    
+    def _call_specialist(self, agent_type, agent_input, stream=False, source=None, prefetched=None):
+        """
+        מעביר בקשה לסוכן מתמחה יחד עם הקשר השיחה
+        
+        ההחלטה על התחום כבר התקבלה, ולכן הבקשה עוברת ישירות לקריאת בחירת
+        הכלים של הסוכן המתמחה: עטיפות Handoff נפתחות, וסוכן שיש לו העברה
+        לאותו תחום לא מבזבז קריאה למודל כדי להחליט עליה שוב.
+        
+        Args:
+            agent_type: סוג הסוכן המתמחה
+            agent_input: הקלט להעברה
+            stream: האם להזרים את אירועי הסוכן
+            source: מקור החלטת הניתוב (לנתוני התור)
+            prefetched: (מחולל הסוכן, אירועים, תוצאה) - סוכן שהקריאה הראשונה
+                שלו כבר בוצעה במקביל לניתוב (_identify_agent)
+            
+        Returns:
+            str: תשובת הסוכן המתמחה (כערך ההחזרה של המחולל)
+        """
+        stats = self._turn_stats.get()
+        if stats is not None:
+            stats["route"] = agent_type
+            stats["route_source"] = source or "direct"
+        
+        if stream:
+            yield {"type": "route", "agent": agent_type}
+        
+        if prefetched is not None:
+            return (yield ResumeAgent(*prefetched))
+        
+        agent = resolve_agent(self.specialized_agents[agent_type], agent_type)
+        return (yield RunAgent(agent, self._specialist_input(agent_type, agent_input), stream))
+    
+    def _specialist_input(self, agent_type, agent_input):
+        """
+        בונה את הקלט לסוכן המתמחה: הבקשה יחד עם הקשר השיחה, אם יש היסטוריה
+        """
+        conversation_context = self.context.get_context_for_model()
+        if not conversation_context:
+            return agent_input
+        logger.debug(f"הקשר לסוכן {agent_type}: {self.context.last_context_report}")
+        return f"{conversation_context}\n\nשאלה נוכחית: {agent_input}"
+
+    def _fast_path_action(self, matched):
+        """
+        מחזיר את הפעולה לביצוע ישיר אם ההודעה היא פקודה מלאה והכלי שלה קיים
+        אצל הסוכן המתמחה, אחרת None (והבקשה עוברת בניתוב הרגיל)
+
+        Args:
+            matched: תוצאת הסריקה של ההודעה
+
+        Returns:
+            dict: type, agent, tool, args, details (לתבנית האישור), confirm - או None
+        """
+        for intent, (action_type, agent_type, tool_name, arg_slots) in self.FAST_PATH_ACTIONS.items():
+            if not matched.has(intent):
+                continue
+            if self._find_tool(agent_type, tool_name) is None:
+                return None
+            try:
+                args = {arg: convert(matched.slot(slot).strip()) for arg, (slot, convert) in arg_slots.items()}
+            except (AttributeError, ValueError):
+                return None
+            # שמות הפרטים בהודעת האישור (_generate_confirmation_message)
+            details = {{"quantity": "new_stock", "regular_price": "new_price"}.get(arg, arg): value
+                       for arg, value in args.items()}
+            return {"type": action_type, "agent": agent_type, "tool": tool_name, "args": args,
+                    "details": details, "confirm": self.confirm_writes or intent in self.CONFIRM_FIRST}
+        return None
+
+    def _find_tool(self, agent_type, tool_name):
+        """
+        מחזיר את הכלי tool_name של הסוכן המתמחה agent_type, או None
+        """
+        if agent_type not in self.specialized_agents:
+            return None
+        agent = resolve_agent(self.specialized_agents[agent_type], agent_type)
+        for tool in getattr(agent, "tools", []):
+            if isinstance(tool, Tool) and tool.name == tool_name:
+                return tool
+        return None
+
+    def _run_fast_path(self, action, stream=False):
+        """
+        מבצע פעולה ישירות בכלי של הסוכן המתמחה ומחזיר את תשובת הכלי - הכלים
+        של החנות כבר מחזירים תשובה מנוסחת, כך שאין צורך בקריאת סיכום למודל
+
+        Args:
+            action: הפעולה (_fast_path_action)
+            stream: האם לשלוח אירועי route, tool_call, tool_result ו-token
+
+        Returns:
+            str: התשובה (כערך ההחזרה של המחולל)
+        """
+        stats = self._turn_stats.get()
+        if stats is not None:
+            stats["route"] = action["agent"]
+            stats["route_source"] = "fast_path"
+
+        tool = self._find_tool(action["agent"], action["tool"])
+        if tool is None:
+            return (yield from self._emit("לא ניתן לבצע את הפעולה כרגע.", stream))
+
+        if stream:
+            yield {"type": "route", "agent": action["agent"]}
+            yield {"type": "tool_call", "name": tool.name,
+                   "arguments": json.dumps(action["args"], ensure_ascii=False)}
+        logger.info(f"ביצוע ישיר: {tool.name} {action['args']}")
+        result = yield BlockingCall(tool, dict(action["args"]))
+        if stream:
+            yield {"type": "tool_result", "name": tool.name}
+
+        response = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+        return (yield from self._emit(response, stream))
+
+    def _identify_agent(self, user_input, stream=False):
+        """
+        מזהה את הסוכן המתאים. החלטות מקומיות של המנתב (כללים או המסווג
+        המקומי) מתקבלות בלי קריאה למודל; אחרת נשלחת בקשת ניתוב (במנוע
+        האסינכרוני - aidentify_agent). במצב ספקולטיבי הקריאה הראשונה של
+        הסוכנים הסבירים רצה במקביל לבקשת הניתוב (agents/speculation.py).
+        
+        Returns:
+            (סוג הסוכן, מקור ההחלטה, prefetched) כערך ההחזרה של המחולל -
+            prefetched הוא הסוכן שנבחר אם כבר הופעל מראש (ל-_call_specialist), או None
+        """
+        quick_decision = getattr(self.router, "quick_decision", None)
+        if quick_decision is None:
+            route_call = BlockingCall(
+                self.router.identify_agent, user_input, self.context,
+                async_func=getattr(self.router, "aidentify_agent", None)
+            )
+        else:
+            decision, source = quick_decision(user_input)
+            if decision:
+                return decision, source, None
+            # ההחלטה המהירה כבר נבדקה - בקשת הניתוב פונה ישר למודל, כדי שהמטמון
+            # והמסווג לא ייבדקו (וייספרו) פעמיים
+            route_call = BlockingCall(
+                self.router.llm_identify_agent, user_input,
+                async_func=getattr(self.router, "allm_identify_agent", None)
+            )
+        started = self._start_speculation(user_input, stream)
+        if not started:
+            decision = yield route_call
+            return decision, "llm", None
+        
+        try:
+            decision, winner, outcome = yield Speculate(
+                route_call,
+                {agent_type: first_call for agent_type, (_, first_call) in started.items()},
+                select=lambda agent_type: agent_type if agent_type in started else None
+            )
+        except Exception:
+            for logic, _ in started.values():
+                logic.close()
+            raise
+        
+        hit = winner is not None and outcome is not None
+        self.speculation.record(len(started), hit)
+        for agent_type, (logic, _) in started.items():
+            if not (hit and agent_type == winner):
+                logic.close()
+        logger.info(f"ניתוב ספקולטיבי: {list(started)} -> {decision} ({'פגיעה' if hit else 'החטאה'})")
+        
+        prefetched = (started[winner][0],) + tuple(outcome) if hit else None
+        return decision, "llm", prefetched
+    
+    def _start_speculation(self, user_input, stream):
+        """
+        מפעיל את הסוכנים הסבירים ביותר עד הקריאה הראשונה שלהם למודל, בלי
+        לבצע אותה. סוכן שהצעד הראשון שלו אינו קריאה למודל, או שהפרומפט שלו
+        חורג מהתקרה, לא מופעל מראש.
+        
+        Returns:
+            dict: סוג הסוכן -> (מחולל הלוגיקה שלו, הקריאה הראשונה)
+        """
+        if self.speculation is None or not hasattr(self.router, "likely_agents"):
+            return {}
+        
+        started = {}
+        for agent_type in self.router.likely_agents(user_input, self.speculation.width,
+                                                    self.speculation.min_probability):
+            if agent_type not in self.specialized_agents:
+                continue
+            agent = resolve_agent(self.specialized_agents[agent_type], agent_type)
+            if not hasattr(agent, "_logic"):
+                continue
+            logic = agent._logic(self._specialist_input(agent_type, user_input), stream)
+            first_call = next(logic, None)
+            prompt_tokens = (prompt_token_report(first_call.kwargs.get("messages", []), first_call.kwargs.get("tools"))
+                             ["total"] if isinstance(first_call, Completion) else None)
+            if prompt_tokens is None or prompt_tokens > self.speculation.max_prompt_tokens:
+                logic.close()
+                continue
+            started[agent_type] = (logic, first_call)
+        return started
+    
+    @staticmethod
+    def _emit(text, stream):
+        """
+        מחזיר תשובה קבועה, ובמצב הזרמה שולח אותה גם כאירוע token
+        """
+        if stream:
+            yield {"type": "token", "content": text}
+        return text
 
     def _get_primary_agent_response(self, user_input):
         """
@@ -463,12 +1109,14 @@ class MainAgent(BaseAgent):
         Returns:
             str: תשובת הסוכן הראשי
         """
+        matched = match_intents(user_input)
+        
         # בדיקה אם זו שאלה על הסוכן עצמו
-        if "איזה סוכן אתה" in user_input or "מי אתה" in user_input:
+        if matched.has("identity"):
             return "אני הסוכן הראשי (Primary Agent) של מערכת ניהול החנות. אני מסייע בניתוב שאלות לסוכנים מתמחים ומטפל בבקשות כלליות."
             
         # בדיקה אם זו בקשה לעזרה
-        if "עזרה" in user_input or "מה אתה יכול לעשות" in user_input:
+        if matched.has("help_request"):
             return """אני הסוכן הראשי ואני יכול לעזור לך בניהול חנות ה-WooCommerce שלך. למשל:
             - ניהול מוצרים (הוספה, עדכון, מחיקה)
             - ניהול הזמנות (צפייה, עדכון סטטוס)
@@ -481,7 +1129,7 @@ class MainAgent(BaseAgent):
             פשוט ציין מה אתה רוצה לעשות ואנתב אותך לסוכן המתאים."""
         
         # בדיקה אם זו בקשה ראשונית
-        if "שלום" in user_input or "היי" in user_input or "ברוך הבא" in user_input or "צריך עזרה" in user_input:
+        if matched.has("greeting"):
             return "שלום! אני הסוכן הראשי ואני כאן כדי לעזור לך בניהול חנות ה-WooCommerce שלך. במה אוכל לסייע לך היום?"
             
         # ברירת מחדל - מציע עזרה כללית
@@ -498,82 +1146,27 @@ class MainAgent(BaseAgent):
 
     def _create_specialized_agents(self):
         """
-        יוצר סוכנים מיוחדים עבור תחומים שונים בחנות ומוסיף אותם למערכת
-        """
-        # הוספת סוכנים מתמחים
-        self.add_specialized_agent("product", create_product_agent(self.client, self.model, self.woocommerce))
-        self.add_specialized_agent("order", create_order_agent(self.client, self.model, self.woocommerce))
-        self.add_specialized_agent("coupon", create_coupon_agent(self.client, self.model, self.woocommerce))
-        self.add_specialized_agent("category", create_category_agent(self.client, self.model, self.woocommerce))
-        self.add_specialized_agent("customer", create_customer_agent(self.client, self.model, self.woocommerce))
-        self.add_specialized_agent("report", create_report_agent(self.client, self.model, self.woocommerce))
-        self.add_specialized_agent("settings", create_settings_agent(self.client, self.model, self.woocommerce))
-
-        # הוספת handoff agents עבור זיהוי מתי להעביר לסוכן מתמחה
-        # סוכן מוצרים: טיפול בבקשות הקשורות למוצרים, מלאי, מחירים וכו
-        handoff = Handoff(
-            name="product_handoff",
-            agent=self.specialized_agents["product"],
-            description="לטיפול בבקשות הקשורות למוצרים, רשימת מוצרים, יצירת מוצרים, עדכון מוצרים, מלאי, מחירים וכו'"
-        )
-        self.add_specialized_agent(handoff.name, handoff)
-        
-        # עדכון רשימת העברות
-        self.handoffs = []
-        
-        # הוספת handoff לכל סוכן מתמחה
-        product_handoff = Handoff(
-            name="product",
-            agent=self.specialized_agents["product"],
-            description="העבר לסוכן מוצרים כשהמשתמש מבקש לנהל מוצרים, לחפש מוצרים, ליצור או לעדכן מוצרים, או לעבוד עם מלאי."
-        )
-        
-        order_handoff = Handoff(
-            name="order",
-            agent=self.specialized_agents["order"],
-            description="העבר לסוכן הזמנות כשהמשתמש מבקש לנהל הזמנות, לחפש הזמנות, לעדכן סטטוס הזמנות או לבצע פעולות הקשורות להזמנות."
-        )
-        
-        coupon_handoff = Handoff(
-            name="coupon",
-            agent=self.specialized_agents["coupon"],
-            description="העבר לסוכן קופונים כשהמשתמש מבקש ליצור קופונים, לנהל קופונים, או לעדכן מבצעים והנחות."
-        )
-        
-        category_handoff = Handoff(
-            name="category",
-            agent=self.specialized_agents["category"],
-            description="העבר לסוכן קטגוריות כשהמשתמש מבקש לנהל קטגוריות מוצרים, תגיות, או מבנה המוצרים בחנות."
-        )
-        
-        customer_handoff = Handoff(
-            name="customer",
-            agent=self.specialized_agents["customer"],
-            description="העבר לסוכן לקוחות כשהמשתמש מבקש לנהל לקוחות, לחפש לקוחות, או לעדכן פרטי לקוחות."
-        )
-        
-        report_handoff = Handoff(
-            name="report",
-            agent=self.specialized_agents["report"],
-            description="העבר לסוכן דו״חות כשהמשתמש מבקש לקבל דו״חות מכירות, נתונים סטטיסטיים, או ניתוח ביצועים של החנות."
-        )
-        
-        settings_handoff = Handoff(
-            name="settings_handoff",
-            agent=self.specialized_agents["settings"],
-            description="העבר לסוכן הגדרות כשהמשתמש מבקש לעדכן הגדרות חנות, להגדיר שיטות משלוח, שיטות תשלום או הגדרות כלליות."
-        )
-        
-        # הוספת כל ה-handoffs לסוכן הראשי
-        self.handoffs.extend([
-            product_handoff, order_handoff, coupon_handoff, 
-            category_handoff, customer_handoff, report_handoff, 
-            settings_handoff
-        ])
+        רושם את הסוכנים המתמחים לכל תחום בחנות. כל סוכן נבנה רק בפעם הראשונה
+        שבקשה מנותבת אליו, ונשמר לשאר הבקשות (ולכל השיחות).
+        """
+        for agent_type, create_agent in self.AGENT_MAPPING.items():
+            self.specialized_agents.register(
+                agent_type,
+                lambda create_agent=create_agent: create_agent(self.client, self.model, self.woocommerce)
+            )
         
-        # הוספת ה-handoffs לרשימת הכלים
-        for handoff in self.handoffs:
-            self.add_specialized_agent(handoff.name, handoff)
+        # שמות ה-handoff הישנים מפנים לאותם סוכנים
+        for alias, agent_type in self.HANDOFF_ALIASES.items():
+            self.specialized_agents.register(alias, lambda agent_type=agent_type: self.specialized_agents[agent_type])
+
+    @property
+    def handoffs(self):
+        """
+        העברות לכל הסוכנים המתמחים (נבנות לפי דרישה - הגישה יוצרת את הסוכנים)
+        """
+        return [Handoff(name=name, agent=self.specialized_agents[agent_type], description=description)
+                for name, (agent_type, description) in self.HANDOFF_DESCRIPTIONS.items()
+                if agent_type in self.specialized_agents]
 
     def add_specialized_agent(self, name, agent):
         """
@@ -587,7 +1180,6 @@ class MainAgent(BaseAgent):
             self: להמשך שרשור קריאות
         """
         self.specialized_agents[name] = agent
-        self.agents[name] = agent  # שמירה גם במילון הישן לתמיכה לאחורה
         
         return self
 
@@ -597,13 +1189,13 @@ class MainAgent(BaseAgent):
         מחזיר את הקלט המעובד ודגל שמציין אם הקלט השתנה
         """
         original_input = user_input
+        matched = match_intents(user_input)
         
         # בדיקה אם מדובר בבקשה ליצירת מוצר אך במינוח "תמצא מוצר"
-        find_product_match = re.match(r'^(תמצא מוצר|מצא מוצר)\s+(.+?)(?:\s+כמות\s+(\d+))?(?:\s+מחיר\s+(\d+(?:\.\d+)?))?$', user_input, re.DOTALL)
-        if find_product_match:
-            product_name = find_product_match.group(2).strip()
-            quantity = find_product_match.group(3) if find_product_match.group(3) else None
-            price = find_product_match.group(4) if find_product_match.group(4) else None
+        if matched.has("find_product"):
+            product_name = matched.slot("find_name").strip()
+            quantity = matched.slot("find_quantity")
+            price = matched.slot("find_price")
             
             # אם יש גם מחיר וגם כמות, כנראה שהמשתמש התכוון ליצור מוצר
             if price and quantity:
@@ -614,10 +1206,9 @@ class MainAgent(BaseAgent):
                 return processed_input, True
                 
         # בדיקה אם מדובר בבקשה לעדכון מלאי בצורה עמומה
-        update_product_match = re.match(r'^עדכן את המוצר\s+(\d+)\s+ל-(\d+)$', user_input)
-        if update_product_match:
-            product_id = update_product_match.group(1)
-            value = update_product_match.group(2)
+        if matched.has("product_shorthand"):
+            product_id = matched.slot("shorthand_product_id")
+            value = matched.slot("shorthand_value")
             
             # ההנחה היא שהמשתמש מתכוון לעדכן מלאי
             processed_input = f"עדכן מלאי למוצר {product_id} לכמות {value}"
@@ -632,69 +1223,43 @@ class MainAgent(BaseAgent):
         זיהוי פעולות מורכבות שדורשות אימות
         מחזיר סוג הפעולה ופרטים רלוונטיים, או None אם לא זוהתה פעולה מורכבת
         """
+        matched = match_intents(user_input)
+        
         # זיהוי יצירת מוצר
-        product_match = re.search(r'צור מוצר|יצירת מוצר|מוצר חדש|תמצא מוצר.*מחיר', user_input, re.IGNORECASE)
-        if product_match:
+        if matched.has("create_product"):
             # חילוץ פרטים רלוונטיים
-            name_match = re.search(r'(?:בשם|שם:?|ששמו)\s+[\'"]?([^\'",]+)[\'"]?', user_input)
-            price_match = re.search(r'(?:מחיר:?|במחיר)\s+(\d+(?:\.\d+)?)', user_input)
-            quantity_match = re.search(r'(?:כמות:?|במלאי)\s+(\d+)', user_input)
-            
-            details = {}
-            if name_match:
-                details["name"] = name_match.group(1).strip()
-            if price_match:
-                details["price"] = price_match.group(1)
-            if quantity_match:
-                details["quantity"] = quantity_match.group(1)
-                
-            return "create_product", details
+            return "create_product", self._collect_slots(matched, name="name", price="price", quantity="quantity")
             
         # זיהוי עדכון מחיר
-        price_update_match = re.search(r'עדכן מחיר|שנה מחיר|לשנות מחיר', user_input, re.IGNORECASE)
-        if price_update_match:
+        if matched.has("update_price"):
             # חילוץ מזהה מוצר ומחיר חדש
-            product_id_match = re.search(r'מוצר\s+(\d+)', user_input)
-            new_price_match = re.search(r'(?:מחיר חדש|למחיר|מחיר:?)\s+(\d+(?:\.\d+)?)', user_input)
-            
-            details = {}
-            if product_id_match:
-                details["product_id"] = product_id_match.group(1)
-            if new_price_match:
-                details["new_price"] = new_price_match.group(1)
-                
-            return "update_price", details
+            return "update_price", self._collect_slots(matched, product_id="product_id", new_price="new_price")
             
         # זיהוי עדכון מלאי
-        stock_update_match = re.search(r'עדכן מלאי|עדכן כמות|שנה מלאי|לשנות מלאי', user_input, re.IGNORECASE)
-        if stock_update_match:
+        if matched.has("update_stock"):
             # חילוץ מזהה מוצר וכמות חדשה
-            product_id_match = re.search(r'מוצר\s+(\d+)', user_input)
-            new_stock_match = re.search(r'(?:כמות חדשה|לכמות|כמות:?|ל-)\s+(\d+)', user_input)
-            
-            details = {}
-            if product_id_match:
-                details["product_id"] = product_id_match.group(1)
-            if new_stock_match:
-                details["new_stock"] = new_stock_match.group(1)
-                
-            return "update_stock", details
+            return "update_stock", self._collect_slots(matched, product_id="product_id", new_stock="new_stock")
             
         # זיהוי יצירת קטגוריה
-        category_match = re.search(r'צור קטגוריה|יצירת קטגוריה|קטגוריה חדשה', user_input, re.IGNORECASE)
-        if category_match:
+        if matched.has("create_category"):
             # חילוץ שם הקטגוריה
-            name_match = re.search(r'(?:בשם|שם:?|ששמה)\s+[\'"]?([^\'",]+)[\'"]?', user_input)
-            
-            details = {}
-            if name_match:
-                details["name"] = name_match.group(1).strip()
-                
-            return "create_category", details
+            return "create_category", self._collect_slots(matched, name="name")
             
         # לא זוהתה פעולה מורכבת
         return None, None
         
+    @staticmethod
+    def _collect_slots(matched, **slot_names):
+        """
+        מחזיר מילון פרטים מהפרמטרים שחולצו בסריקה (מפתח -> שם הפרמטר), בלי ערכים חסרים
+        """
+        details = {}
+        for key, slot_name in slot_names.items():
+            value = matched.slot(slot_name)
+            if value:
+                details[key] = value.strip()
+        return details
+        
     def _generate_confirmation_message(self, action_type, action_details):
         """
         יצירת הודעת אימות מותאמת לסוג הפעולה והפרטים שלה
@@ -739,21 +1304,15 @@ class MainAgent(BaseAgent):
         """
         בדיקה האם הקלט של המשתמש הוא תגובה לבקשת אימות
         """
-        # בדיקת ביטויים שונים של אישור או ביטול בעברית
-        confirmation_pattern = r'^(?:כן|אישור|מאשר|נכון|אכן|בהחלט|בבקשה|אוקיי|אוקי|ok|yes|y)$'
-        rejection_pattern = r'^(?:לא|ביטול|מבטל|לבטל|שגוי|לא מאשר|no|n)$'
-        
-        return (re.search(confirmation_pattern, user_input.strip(), re.IGNORECASE) is not None or
-                re.search(rejection_pattern, user_input.strip(), re.IGNORECASE) is not None)
+        # ביטויים שונים של אישור או ביטול בעברית (agents/intent_matcher.py)
+        return match_intents(user_input).has("confirm", "reject")
     
     def _is_positive_confirmation(self, user_input):
         """
         בדיקה האם התגובה היא אישור חיובי
         """
-        # בדיקת ביטויים שונים של אישור בעברית
-        confirmation_pattern = r'^(?:כן|אישור|מאשר|נכון|אכן|בהחלט|בבקשה|אוקיי|אוקי|ok|yes|y)$'
-        
-        return re.search(confirmation_pattern, user_input.strip(), re.IGNORECASE) is not None
+        # ביטויים שונים של אישור בעברית (agents/intent_matcher.py)
+        return match_intents(user_input).has("confirm")
 
 def create_agent(client=None, model_name="gpt-4o", woo_client=None):
     """
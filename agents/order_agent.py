@@ -14,10 +14,11 @@ Agent הזמנות למערכת AI Agents לניהול חנות WooCommerce
 """
 
 from .base import Agent, Tool, function_tool
+from .records import OrderDetail, OrderSummary, RecordList
 
 # Dummy tool functions for demonstration
 def get_order(woo_client, order_id=None, search_term=None):
-    """מקבל פרטי הזמנה לפי מזהה או לפי ערך חיפוש"""
+    """מקבל פרטי הזמנה לפי מזהה (OrderDetail) או לפי ערך חיפוש"""
     if woo_client is None:
         return "אין חיבור לחנות WooCommerce"
     
@@ -40,16 +41,7 @@ def get_order(woo_client, order_id=None, search_term=None):
             ]
         }
         
-        order_details = f"הזמנה {result['number']} ({result['status']}):\n"
-        order_details += f"תאריך: {result['date_created']}\n"
-        order_details += f"סכום כולל: ₪{result['total']}\n"
-        order_details += f"לקוח: {result['billing']['first_name']} {result['billing']['last_name']} ({result['billing']['email']})\n\n"
-        
-        order_details += "פריטים בהזמנה:\n"
-        for item in result['line_items']:
-            order_details += f"- {item['name']}, כמות: {item['quantity']}, סכום: ₪{item['subtotal']}\n"
-        
-        return order_details
+        return OrderDetail.from_woo(result)
     elif search_term:
         # מדמה חיפוש הזמנה
         return f"נמצאה הזמנה שתואמת לחיפוש '{search_term}': הזמנה #123, סטטוס: processing, סכום: ₪299.99"
@@ -57,7 +49,7 @@ def get_order(woo_client, order_id=None, search_term=None):
         return "נדרש מזהה הזמנה או ערך חיפוש"
 
 def list_orders(woo_client, status=None, customer_id=None, limit=10):
-    """מחזיר רשימת הזמנות עם אפשרות לסינון"""
+    """מחזיר רשימת הזמנות עם אפשרות לסינון (RecordList של OrderSummary)"""
     if woo_client is None:
         return "אין חיבור לחנות WooCommerce"
     
@@ -75,16 +67,7 @@ def list_orders(woo_client, status=None, customer_id=None, limit=10):
             "customer_id": customer
         })
     
-    # בניית מחרוזת התשובה
-    status_filter = f" בסטטוס {status}" if status else ""
-    customer_filter = f" ללקוח {customer_id}" if customer_id else ""
-    result = f"רשימת {len(orders)} הזמנות אחרונות{status_filter}{customer_filter}:\n\n"
-    
-    for order in orders:
-        result += f"הזמנה {order['number']} ({order['status']})\n"
-        result += f"תאריך: {order['date_created']}, סכום: ₪{order['total']}, לקוח: {order['customer_id']}\n\n"
-    
-    return result
+    return RecordList(OrderSummary.from_woo(order) for order in orders)
 
 def create_order(woo_client, customer_id, products, billing=None, shipping=None, payment_method="cod"):
     """יוצר הזמנה חדשה"""
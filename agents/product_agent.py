@@ -16,13 +16,17 @@ Agent מוצרים למערכת AI Agents לניהול חנות WooCommerce
 """
 
 from .base import Agent, Tool, function_tool
+from .records import ProductDetail, ProductSummary, RecordList, render_product_list
 import datetime
 import re
 import logging
 
 # פונקציות לאינטראקציה עם WooCommerce API
 def get_product(woo_client, product_id=None, search_term=None):
-    """מחזיר מידע על מוצר לפי מזהה או חיפוש"""
+    """
+    מחזיר מידע על מוצר לפי מזהה (ProductDetail) או רשימת מוצרים לפי חיפוש
+    (RecordList של ProductSummary). הודעות שגיאה מוחזרות כטקסט.
+    """
     if woo_client is None:
         return "אין חיבור לחנות WooCommerce"
         
@@ -33,25 +37,7 @@ def get_product(woo_client, product_id=None, search_term=None):
         if not result or "id" not in result:
             return f"לא נמצא מוצר עם המזהה {product_id}"
         
-        product_info = f"מוצר: {result.get('name', '')} (מק\"ט: {result.get('sku', 'ללא מק\"ט')})\n"
-        product_info += f"מזהה: {result.get('id', '')}\n"
-        product_info += f"מחיר: ₪{result.get('price', '')}"
-        
-        if result.get('regular_price') and result.get('regular_price') != result.get('price'):
-            product_info += f" (מחיר רגיל: ₪{result.get('regular_price')})"
-        
-        product_info += f"\nכמות במלאי: {result.get('stock_quantity', 'לא צוין')}\n"
-        product_info += f"סטטוס: {result.get('status', '')}\n"
-        product_info += f"קישור: {result.get('permalink', '')}\n\n"
-        
-        product_info += f"תיאור קצר: {result.get('short_description', '')}\n\n"
-        product_info += f"תיאור מלא: {result.get('description', '')}\n\n"
-        
-        if result.get('categories'):
-            cats = ", ".join([c.get('name', '') for c in result.get('categories', [])])
-            product_info += f"קטגוריות: {cats}\n"
-        
-        return product_info
+        return ProductDetail.from_woo(result)
     elif search_term:
         # חיפוש מוצרים אמיתיים
         products = woo_client.search_products(search_term, per_page=5)
@@ -59,18 +45,15 @@ def get_product(woo_client, product_id=None, search_term=None):
         if not products:
             return f"לא נמצאו מוצרים שתואמים לחיפוש '{search_term}'"
         
-        result = f"נמצאו {len(products)} מוצרים שתואמים לחיפוש '{search_term}':\n\n"
-        
-        for product in products:
-            result += f"- {product.get('name', '')} (מק\"ט: {product.get('sku', 'ללא מק\"ט')}), "
-            result += f"מזהה: {product.get('id', '')}, מחיר: ₪{product.get('price', '')}\n"
-        
-        return result
+        return RecordList(ProductSummary.from_woo(product) for product in products)
     
     return "חסר מזהה מוצר או מונח חיפוש"
 
-def list_products(woo_client, category=None, tag=None, status=None, limit=10):
-    """מחזיר רשימת מוצרים עם אפשרויות סינון"""
+def list_products(woo_client, category=None, tag=None, status=None, limit=10, search=None):
+    """
+    מחזיר רשימת מוצרים עם אפשרויות סינון (RecordList של ProductSummary),
+    או הודעה כטקסט אם לא נמצאו מוצרים
+    """
     if woo_client is None:
         return "אין חיבור לחנות WooCommerce"
     
@@ -83,6 +66,8 @@ def list_products(woo_client, category=None, tag=None, status=None, limit=10):
         params["tag"] = tag
     if status:
         params["status"] = status
+    if search:
+        params["search"] = search
     
     # קבלת מוצרים אמיתיים מהשרת
     products = woo_client.get_products(**params)
@@ -95,22 +80,12 @@ def list_products(woo_client, category=None, tag=None, status=None, limit=10):
             filter_msg += f" עם תגית {tag}"
         if status:
             filter_msg += f" בסטטוס {status}"
+        if search:
+            filter_msg += f" שתואמים לחיפוש '{search}'"
         
         return f"לא נמצאו מוצרים{filter_msg}"
     
-    # בניית מחרוזת התשובה
-    category_filter = f" בקטגוריה {category}" if category else ""
-    tag_filter = f" עם תגית {tag}" if tag else ""
-    status_filter = f" בסטטוס {status}" if status else ""
-    
-    result = f"רשימת {len(products)} מוצרים{category_filter}{tag_filter}{status_filter}:\n\n"
-    
-    for product in products:
-        result += f"{product.get('name', '')} (מק\"ט: {product.get('sku', 'ללא מק\"ט')})\n"
-        result += f"מזהה: {product.get('id', '')}, מחיר: ₪{product.get('price', '')}, "
-        result += f"כמות במלאי: {product.get('stock_quantity', 'לא צוין')}\n\n"
-    
-    return result
+    return RecordList(ProductSummary.from_woo(product) for product in products)
 
 def create_product(woo_client, name, description="", regular_price="", short_description="", 
                    categories=None, tags=None, stock_quantity=0, images=None, attributes=None):
@@ -375,7 +350,7 @@ def create_product_agent(client, model="gpt-4o", woo_client=None):
                 product_id: מזהה המוצר
             
             Returns:
-                פרטי המוצר או הודעת שגיאה
+                פרטי המוצר כ-JSON דחוס או הודעת שגיאה
             """
             return get_product(woo_client, product_id)
         
@@ -390,9 +365,9 @@ def create_product_agent(client, model="gpt-4o", woo_client=None):
                 category: קטגוריה לסינון (אופציונלי)
             
             Returns:
-                רשימת מוצרים או הודעת שגיאה
+                רשימת מוצרים כ-TSV (id, name, sku, price, stock) או הודעת שגיאה
             """
-            return list_products(woo_client, category, None, None, limit)
+            return list_products(woo_client, category, None, None, limit, search)
         
         @function_tool(name="create_product", description="יוצר מוצר חדש")
         def create_product_tool(name: str, regular_price: str, description: str = "", 
@@ -560,6 +535,8 @@ class ProductAgent:
         # כאן הלוגיקה לטיפול בבקשות מוצרים
         if "רשימת מוצרים" in user_input or "הצג מוצרים" in user_input:
             products = list_products(self.woo_client)
+            if isinstance(products, RecordList):
+                products = render_product_list(products)
             return f"הנה רשימת המוצרים: {products}"
         
         # בדיקה אם יש בקשה ליצירת מוצר
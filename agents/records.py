@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+רשומות מובנות לתוצאות כלים
+--------------------------
+
+כלי קריאה (מוצרים, הזמנות) מחזירים רשומות עם השדות הנחוצים בלבד במקום
+טקסט עברי מעוצב עם תוויות חוזרות. המודל מקבל אותן בפורמט דחוס:
+- רשומה בודדת כ-JSON מינימלי (ללא שדות ריקים)
+- רשימת רשומות כ-TSV: שורת כותרת אחת ושורה לכל רשומה
+
+העיבוד לטקסט קריא נעשה פעם אחת בקצה (render_*), רק כשהתשובה מוצגת
+למשתמש ישירות ולא דרך המודל.
+"""
+
+import re
+import json
+import html
+from dataclasses import dataclass, field, fields, asdict
+from typing import List, Optional
+
+# אורך מרבי לתיאור מוצר שנשלח למודל
+DESCRIPTION_CHARS = 300
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def strip_html(text, max_chars=DESCRIPTION_CHARS):
+    """
+    מסיר תגיות HTML ורווחים מיותרים מתיאור, ומקצר אותו
+
+    Args:
+        text: התיאור (HTML מ-WooCommerce)
+        max_chars: מספר התווים המרבי
+
+    Returns:
+        str: טקסט נקי
+    """
+    if not text:
+        return ""
+    text = " ".join(html.unescape(_TAG_RE.sub(" ", text)).split())
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip() + "…"
+    return text
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "|".join(_format_value(item) for item in value)
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+class CompactRecord:
+    """בסיס לרשומות - str מחזיר JSON מינימלי ללא שדות ריקים"""
+
+    def to_dict(self):
+        return {key: value for key, value in asdict(self).items() if value not in (None, "", [], {})}
+
+    def __str__(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+
+class RecordList(list):
+    """
+    רשימת רשומות מאותו סוג. str מחזיר TSV עם שורת כותרת אחת.
+    """
+
+    def serialize(self, records=None):
+        """
+        מחזיר את הרשומות (או חלק מהן) כ-TSV
+
+        Args:
+            records: הרשומות לסידור (ברירת מחדל: כל הרשימה)
+        """
+        records = self if records is None else records
+        if not records and not self:
+            return ""
+        names = [f.name for f in fields(records[0] if records else self[0])]
+        lines = ["\t".join(names)]
+        for record in records:
+            lines.append("\t".join(_format_value(getattr(record, name)) for name in names))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.serialize()
+
+
+@dataclass
+class ProductSummary(CompactRecord):
+    """מוצר ברשימה או בתוצאות חיפוש"""
+    id: int
+    name: str
+    sku: str = ""
+    price: str = ""
+    stock: Optional[int] = None
+
+    @classmethod
+    def from_woo(cls, data):
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", ""),
+            sku=data.get("sku") or "",
+            price=data.get("price") or "",
+            stock=data.get("stock_quantity")
+        )
+
+
+@dataclass
+class ProductDetail(ProductSummary):
+    """פרטי מוצר מלאים"""
+    regular_price: str = ""
+    status: str = ""
+    categories: List[str] = field(default_factory=list)
+    short_description: str = ""
+    description: str = ""
+    permalink: str = ""
+
+    @classmethod
+    def from_woo(cls, data):
+        regular_price = data.get("regular_price") or ""
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", ""),
+            sku=data.get("sku") or "",
+            price=data.get("price") or "",
+            stock=data.get("stock_quantity"),
+            # המחיר הרגיל נשלח רק כשהוא שונה מהמחיר הנוכחי (מבצע)
+            regular_price=regular_price if regular_price != data.get("price") else "",
+            status=data.get("status", ""),
+            categories=[c.get("name", "") for c in data.get("categories") or []],
+            short_description=strip_html(data.get("short_description")),
+            description=strip_html(data.get("description")),
+            permalink=data.get("permalink", "")
+        )
+
+
+@dataclass
+class OrderSummary(CompactRecord):
+    """הזמנה ברשימה"""
+    id: int
+    number: str
+    status: str
+    date: str
+    total: str
+    customer_id: Optional[int] = None
+
+    @classmethod
+    def from_woo(cls, data):
+        return cls(
+            id=data.get("id"),
+            number=str(data.get("number", data.get("id"))),
+            status=data.get("status", ""),
+            date=(data.get("date_created") or "")[:10],
+            total=data.get("total", ""),
+            customer_id=data.get("customer_id")
+        )
+
+
+@dataclass
+class OrderDetail(OrderSummary):
+    """פרטי הזמנה מלאים"""
+    customer: str = ""
+    email: str = ""
+    items: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_woo(cls, data):
+        billing = data.get("billing") or {}
+        return cls(
+            id=data.get("id"),
+            number=str(data.get("number", data.get("id"))),
+            status=data.get("status", ""),
+            date=data.get("date_created") or "",
+            total=data.get("total", ""),
+            customer_id=data.get("customer_id"),
+            customer=f"{billing.get('first_name', '')} {billing.get('last_name', '')}".strip(),
+            email=billing.get("email", ""),
+            # כל פריט כ"שם x כמות = סכום"
+            items=[
+                f"{item.get('name', '')} x{item.get('quantity', 1)} = {item.get('subtotal', '')}"
+                for item in data.get("line_items") or []
+            ]
+        )
+
+
+def render_product(product):
+    """
+    מציג פרטי מוצר כטקסט קריא למשתמש
+    """
+    lines = [f"מוצר: {product.name} (מק\"ט: {product.sku or 'ללא מק״ט'})", f"מזהה: {product.id}"]
+    price_line = f"מחיר: ₪{product.price}"
+    if getattr(product, "regular_price", ""):
+        price_line += f" (מחיר רגיל: ₪{product.regular_price})"
+    lines.append(price_line)
+    lines.append(f"כמות במלאי: {product.stock if product.stock is not None else 'לא צוין'}")
+    if getattr(product, "status", ""):
+        lines.append(f"סטטוס: {product.status}")
+    if getattr(product, "categories", None):
+        lines.append(f"קטגוריות: {', '.join(product.categories)}")
+    if getattr(product, "short_description", ""):
+        lines.append(f"תיאור קצר: {product.short_description}")
+    return "\n".join(lines)
+
+
+def render_product_list(products, title=None):
+    """
+    מציג רשימת מוצרים כטקסט קריא למשתמש
+    """
+    title = title or f"רשימת {len(products)} מוצרים:"
+    rows = [
+        f"- {p.name} (מק\"ט: {p.sku or 'ללא מק״ט'}), מזהה: {p.id}, מחיר: ₪{p.price}, "
+        f"כמות במלאי: {p.stock if p.stock is not None else 'לא צוין'}"
+        for p in products
+    ]
+    return "\n".join([title] + rows)
+
+
+def render_order(order):
+    """
+    מציג פרטי הזמנה כטקסט קריא למשתמש
+    """
+    lines = [
+        f"הזמנה {order.number} ({order.status}):",
+        f"תאריך: {order.date}",
+        f"סכום כולל: ₪{order.total}",
+        f"לקוח: {order.customer} ({order.email})",
+        "פריטים בהזמנה:"
+    ]
+    lines.extend(f"- {item}" for item in order.items)
+    return "\n".join(lines)
+
+
+def render_order_list(orders, title=None):
+    """
+    מציג רשימת הזמנות כטקסט קריא למשתמש
+    """
+    title = title or f"רשימת {len(orders)} הזמנות:"
+    rows = [
+        f"- הזמנה {o.number} ({o.status}), תאריך: {o.date}, סכום: ₪{o.total}, לקוח: {o.customer_id}"
+        for o in orders
+    ]
+    return "\n".join([title] + rows)
+
+
+def render_result(result):
+    """
+    מציג תוצאת כלי כטקסט קריא למשתמש. תוצאות שאינן רשומות מוחזרות כמו שהן.
+    """
+    if isinstance(result, ProductSummary):
+        return render_product(result)
+    if isinstance(result, OrderDetail):
+        return render_order(result)
+    if isinstance(result, RecordList) and result:
+        if isinstance(result[0], ProductSummary):
+            return render_product_list(result)
+        if isinstance(result[0], OrderSummary):
+            return render_order_list(result)
+    return str(result)
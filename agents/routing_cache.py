@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מטמון החלטות ניתוב
+------------------
+
+משתמשים שולחים שוב ושוב פקודות באותו מבנה שנבדלות רק במזהים ובמספרים
+("עדכן מלאי למוצר 123 לכמות 5"). המנתב מנרמל כל בקשה לתבנית - מספרים,
+מק"טים, כתובות מייל, תאריכים ושמות במירכאות מוחלפים בסמלים - ושומר את
+התחום שנבחר לכל תבנית. בקשה בתבנית מוכרת מנותבת בלי המסווג ובלי המודל.
+
+הרשומות נשמרות ב-LRU בזיכרון עם שכבת SQLite שמשקפת אותו, כך שהמטמון נטען
+מחדש בהפעלה הבאה. stored_at בטבלה הוא זמן השימוש האחרון (שמירה או פגיעה),
+ולכן גם אחרי הפעלה מחדש התבניות שלא נעשה בהן שימוש זמן רב מפונות ראשונות.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# סדר ההחלפה חשוב: מייל ותאריך לפני מק"ט, ומק"ט לפני מספר
+_MASKS = (
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"\b\d{1,4}[./-]\d{1,2}[./-]\d{1,4}\b"), "<date>"),
+    # מילה עם אותיות לטיניות וספרות (TS-0042, SUMMER20) או אותיות גדולות עם מקף
+    (re.compile(r"\b(?=[A-Za-z0-9_-]*\d)(?=[A-Za-z0-9_-]*[A-Za-z])[A-Za-z0-9_-]+\b|\b[A-Z]+-[A-Z]+\b"), "<sku>"),
+    # טקסט במירכאות, כשהמירכאות הפותחות אינן בתוך מילה (כמו מק"ט)
+    (re.compile(r"(?:(?<=\s)|^)[\"“”״']([^\"“”״'\n]{1,80})[\"“”״'](?=[\s.,!?:;]|$)"), "<name>"),
+    (re.compile(r"\d+(?:[.,]\d+)*"), "<num>"),
+)
+
+
+def normalize_utterance(text):
+    """
+    מחזיר את תבנית הבקשה: מזהים, מספרים ושמות במירכאות מוחלפים בסמלים,
+    רווחים מצומצמים, אותיות לטיניות קטנות וסימני פיסוק בסוף מוסרים.
+
+    Args:
+        text: קלט המשתמש
+
+    Returns:
+        str: התבנית, למשל "עדכן מלאי למוצר <num> לכמות <num>"
+    """
+    text = " ".join((text or "").split())
+    for pattern, placeholder in _MASKS:
+        text = pattern.sub(placeholder, text)
+    return text.lower().rstrip(" .!?")
+
+
+class RoutingCache:
+    """
+    מטמון תבנית -> תחום: LRU בזיכרון ושכבת SQLite אופציונלית
+    """
+
+    def __init__(self, max_entries=2048, db_path=None):
+        """
+        Args:
+            max_entries: מספר התבניות המרבי
+            db_path: נתיב לקובץ SQLite לשמירה בין הפעלות (None - זיכרון בלבד)
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            # פגיעה במטמון כותבת את זמן השימוש - WAL בלי fsync לכל כתיבה
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS routes "
+                "(template TEXT PRIMARY KEY, agent TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+
+    @classmethod
+    def from_env(cls):
+        """
+        יוצר מטמון לפי משתני הסביבה, או None אם המטמון כבוי (ROUTING_CACHE_ENABLED=false)
+        """
+        if os.environ.get("ROUTING_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            max_entries=int(os.environ.get("ROUTING_CACHE_SIZE", "2048")),
+            db_path=os.environ.get("ROUTING_CACHE_PATH", os.path.join("cache", "routing_cache.sqlite")) or None
+        )
+
+    def _load(self):
+        """
+        טוען מה-SQLite את התבניות שנעשה בהן שימוש לאחרונה (מהישנה לחדשה) ומוחק את השאר
+        """
+        rows = self._db.execute(
+            "SELECT template, agent FROM routes ORDER BY stored_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for template, agent in reversed(rows):
+            self._entries[template] = agent
+        self._db.execute(
+            "DELETE FROM routes WHERE template NOT IN "
+            "(SELECT template FROM routes ORDER BY stored_at DESC LIMIT ?)", (self.max_entries,)
+        )
+        self._db.commit()
+
+    def get(self, template):
+        """
+        מחזיר את התחום השמור לתבנית, או None
+        """
+        with self._lock:
+            agent = self._entries.get(template)
+            if agent is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(template)
+            self._stats["hits"] += 1
+            if self._db is not None:
+                self._db.execute("UPDATE routes SET stored_at = ? WHERE template = ?", (time.time(), template))
+                self._db.commit()
+            return agent
+
+    def set(self, template, agent):
+        """
+        שומר את התחום לתבנית. התבנית שהשימוש בה הכי ישן מפונה כשהמטמון מלא.
+        """
+        with self._lock:
+            self._entries[template] = agent
+            self._entries.move_to_end(template)
+            self._stats["stores"] += 1
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+            self._stats["evictions"] += len(evicted)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO routes (template, agent, stored_at) VALUES (?, ?, ?)",
+                    (template, agent, time.time())
+                )
+                self._db.executemany("DELETE FROM routes WHERE template = ?", [(t,) for t in evicted])
+                self._db.commit()
+
+    def clear(self):
+        """
+        מרוקן את המטמון (למשל אחרי אימון מחדש של המסווג)
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM routes")
+                self._db.commit()
+
+    def stats(self):
+        """
+        מחזיר מדדי שימוש
+
+        Returns:
+            dict: hits, misses, stores, evictions, entries, hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
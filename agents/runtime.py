@@ -0,0 +1,554 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+סביבת ההרצה של הסוכנים - סינכרונית ואסינכרונית
+------------------------------------------------
+
+הלוגיקה של הסוכנים (לולאת הכלים, הניתוב) כתובה פעם אחת כמחולל שמחזיר
+"בקשות קלט/פלט" (Effect): קריאה למודל, הפעלת כלים, הפעלת סוכן אחר וכו'.
+המחולל לא מבצע קלט/פלט בעצמו - מנוע ההרצה מבצע כל בקשה ומחזיר לו את התוצאה:
+- run_effects: מנוע סינכרוני (run / run_stream)
+- arun_effects: מנוע אסינכרוני מבוסס asyncio (arun / arun_stream)
+
+כל מה שאינו בקשה (מילון אירוע כמו token או route) מועבר כמו שהוא למי שמריץ.
+"""
+
+import sys
+import asyncio
+import weakref
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# לקוחות אסינכרוניים שנוצרו עבור לקוחות סינכרוניים, כדי לשתף חיבורים
+_async_clients = weakref.WeakKeyDictionary()
+
+# מונה הקריאות למודל בתור הנוכחי של השיחה. המונה הוא מילון משותף, כך שגם
+# קריאות שרצות בתהליכון נפרד (asyncio.to_thread מעתיק את ההקשר) נספרות בו
+_llm_calls = contextvars.ContextVar("llm_calls", default=None)
+
+
+def start_llm_call_count():
+    """
+    מתחיל ספירה חדשה של קריאות למודל בהקשר הנוכחי ומחזיר את המונה
+    """
+    counter = {"count": 0}
+    _llm_calls.set(counter)
+    return counter
+
+
+def record_llm_call():
+    """
+    רושם קריאה אחת למודל במונה הפעיל, אם יש כזה
+    """
+    counter = _llm_calls.get()
+    if counter is not None:
+        counter["count"] += 1
+
+
+def async_client_for(client):
+    """
+    מחזיר לקוח AsyncOpenAI שמתאים ללקוח OpenAI סינכרוני, או None אם אין כזה
+
+    Args:
+        client: לקוח OpenAI (או לקוח עם תכונה async_client)
+
+    Returns:
+        לקוח אסינכרוני, או None
+    """
+    if client is None:
+        return None
+    if getattr(client, "async_client", None) is not None:
+        return client.async_client
+    # הספרייה openai נטענת רק כשנוצר לקוח אמיתי; אם היא לא נטענה, הלקוח אינו לקוח OpenAI
+    openai = sys.modules.get("openai")
+    if openai is None or not isinstance(client, openai.OpenAI):
+        return None
+
+    async_client = _async_clients.get(client)
+    if async_client is None:
+        async_client = openai.AsyncOpenAI(
+            api_key=client.api_key,
+            organization=client.organization,
+            base_url=client.base_url,
+            timeout=client.timeout,
+            max_retries=client.max_retries
+        )
+        _async_clients[client] = async_client
+    return async_client
+
+
+class LazyClient:
+    """
+    לקוח שנוצר רק בגישה הראשונה אליו. טעינת הספרייה openai ויצירת הלקוח
+    יקרות, ולכן השרת יכול להתחיל לקבל בקשות לפני שהן מסתיימות (ראה warm_up ב-app.py).
+    """
+
+    def __init__(self, factory):
+        """
+        Args:
+            factory: פונקציה ללא פרמטרים שיוצרת את הלקוח
+        """
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        מחזיר את הלקוח, ויוצר אותו בקריאה הראשונה
+        """
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    @property
+    def async_client(self):
+        return async_client_for(self.get())
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+
+async def acreate_completion(client, **kwargs):
+    """
+    קריאה אסינכרונית ל-chat.completions.create. אם אין לקוח אסינכרוני,
+    הקריאה הסינכרונית מורצת בתהליכון נפרד כדי לא לחסום את לולאת האירועים.
+    """
+    async_client = async_client_for(client)
+    if async_client is not None:
+        return await async_client.chat.completions.create(**kwargs)
+    return await asyncio.to_thread(client.chat.completions.create, **kwargs)
+
+
+class StreamAccumulator:
+    """
+    מרכיב תשובת מודל מלאה מקטעי הזרמה (chunks), כולל קריאות כלים
+    שהארגומנטים שלהן מפוצלים על פני כמה קטעים
+    """
+
+    def __init__(self):
+        self.content_parts = []
+        self.tool_calls = {}
+        self.usage = None
+
+    def add(self, chunk):
+        """
+        מוסיף קטע ומחזיר את הטקסט החדש שבו (או None)
+        """
+        self.usage = getattr(chunk, "usage", None) or self.usage
+        if not chunk.choices:
+            return None
+
+        delta = chunk.choices[0].delta
+        for tool_call_delta in getattr(delta, "tool_calls", None) or []:
+            entry = self.tool_calls.setdefault(tool_call_delta.index, {"id": None, "name": "", "arguments": ""})
+            if tool_call_delta.id:
+                entry["id"] = tool_call_delta.id
+            function = getattr(tool_call_delta, "function", None)
+            if function:
+                entry["name"] += function.name or ""
+                entry["arguments"] += function.arguments or ""
+
+        text = getattr(delta, "content", None)
+        if text:
+            self.content_parts.append(text)
+        return text
+
+    def response(self):
+        """
+        מחזיר תשובה באותו מבנה כמו קריאה רגילה (ללא הזרמה)
+        """
+        message = SimpleNamespace(
+            role="assistant",
+            content="".join(self.content_parts) or None,
+            tool_calls=[
+                SimpleNamespace(
+                    id=entry["id"],
+                    type="function",
+                    function=SimpleNamespace(name=entry["name"], arguments=entry["arguments"])
+                )
+                for _, entry in sorted(self.tool_calls.items())
+            ] or None
+        )
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self.usage)
+
+
+class EffectResult:
+    """עוטף את ערך ההחזרה של בקשה במנוע האסינכרוני"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Effect:
+    """
+    בקשת קלט/פלט שמחולל הלוגיקה מחזיר למנוע ההרצה.
+
+    run() הוא מחולל סינכרוני שמחזיר אירועים ובסופו את התוצאה;
+    arun() הוא מחולל אסינכרוני שמחזיר אירועים ובסופו EffectResult.
+    """
+
+    def run(self):
+        raise NotImplementedError
+
+    async def arun(self):
+        raise NotImplementedError
+        yield
+
+
+class Completion(Effect):
+    """קריאה למודל השפה, עם או בלי הזרמה"""
+
+    def __init__(self, client, stream=False, **kwargs):
+        self.client = client
+        self.stream = stream
+        self.kwargs = kwargs
+
+    def run(self):
+        record_llm_call()
+        if not self.stream:
+            return self.client.chat.completions.create(**self.kwargs)
+
+        accumulator = StreamAccumulator()
+        chunks = self.client.chat.completions.create(
+            stream=True,
+            stream_options={"include_usage": True},
+            **self.kwargs
+        )
+        for chunk in chunks:
+            text = accumulator.add(chunk)
+            if text:
+                yield {"type": "token", "content": text}
+        return accumulator.response()
+
+    async def arun(self):
+        record_llm_call()
+        if not self.stream:
+            yield EffectResult(await acreate_completion(self.client, **self.kwargs))
+            return
+
+        accumulator = StreamAccumulator()
+        chunks = await acreate_completion(
+            self.client,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self.kwargs
+        )
+        if hasattr(chunks, "__aiter__"):
+            async for chunk in chunks:
+                text = accumulator.add(chunk)
+                if text:
+                    yield {"type": "token", "content": text}
+        else:
+            # הזרמה מלקוח סינכרוני - כל קטע נקרא בתהליכון נפרד
+            chunks = iter(chunks)
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                text = accumulator.add(chunk)
+                if text:
+                    yield {"type": "token", "content": text}
+        yield EffectResult(accumulator.response())
+
+
+class ToolCalls(Effect):
+    """הפעלת קבוצת קריאות כלים של סוכן, במקביל"""
+
+    def __init__(self, agent, tool_calls):
+        self.agent = agent
+        self.tool_calls = tool_calls
+
+    def run(self):
+        return self.agent._execute_tool_calls(self.tool_calls)
+        yield
+
+    async def arun(self):
+        # הכלים עצמם סינכרוניים (WooCommerce), לכן כל אחד רץ בתהליכון נפרד
+        # והמקביליות מוגבלת כמו במנוע הסינכרוני
+        semaphore = asyncio.Semaphore(max(1, self.agent.max_parallel_tools))
+
+        async def execute(tool_call):
+            async with semaphore:
+                return await asyncio.to_thread(self.agent._execute_tool_call, tool_call)
+
+        results = await asyncio.gather(*(execute(tool_call) for tool_call in self.tool_calls))
+        yield EffectResult(list(zip(self.tool_calls, results)))
+
+
+class RunAgent(Effect):
+    """הפעלת סוכן אחר (העברה או סוכן מתמחה) והעברת האירועים שלו"""
+
+    def __init__(self, agent, user_input, stream=False):
+        self.agent = agent
+        self.user_input = user_input
+        self.stream = stream
+
+    def run(self):
+        return (yield from agent_events(self.agent, self.user_input, self.stream))
+
+    async def arun(self):
+        async for event in agent_aevents(self.agent, self.user_input, self.stream):
+            if event.get("type") == "done":
+                yield EffectResult(event["content"])
+                return
+            yield event
+
+
+class BlockingCall(Effect):
+    """
+    קריאה לפונקציה חוסמת. במנוע האסינכרוני משתמשים בגרסה האסינכרונית
+    אם סופקה, ואחרת מריצים את הפונקציה בתהליכון נפרד.
+    """
+
+    def __init__(self, func, *args, async_func=None, **kwargs):
+        self.func = func
+        self.async_func = async_func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        return self.func(*self.args, **self.kwargs)
+        yield
+
+    async def arun(self):
+        if self.async_func is not None:
+            yield EffectResult(await self.async_func(*self.args, **self.kwargs))
+        else:
+            yield EffectResult(await asyncio.to_thread(self.func, *self.args, **self.kwargs))
+
+class ResumeAgent(Effect):
+    """
+    המשך ריצה של סוכן שמחולל הלוגיקה שלו כבר הופעל ועצר בבקשה הראשונה,
+    אחרי שהבקשה בוצעה בנפרד (Speculate): האירועים שלה נשלחים, והתוצאה
+    מוחזרת למחולל
+    """
+
+    def __init__(self, logic, events, value):
+        self.logic = logic
+        self.events = events
+        self.value = value
+
+    def run(self):
+        for event in self.events:
+            yield event
+        return (yield from run_effects(self.logic, self.value))
+
+    async def arun(self):
+        for event in self.events:
+            yield event
+        async for event in arun_effects(self.logic, self.value):
+            if event.get("type") == "done":
+                yield EffectResult(event["content"])
+                return
+            yield event
+
+
+def _collect(effect):
+    """
+    מבצע בקשה במנוע הסינכרוני ומחזיר (האירועים שלה, התוצאה)
+    """
+    events = []
+    steps = effect.run()
+    while True:
+        try:
+            events.append(next(steps))
+        except StopIteration as stop:
+            return events, stop.value
+
+
+async def _acollect(effect):
+    """
+    מבצע בקשה במנוע האסינכרוני ומחזיר (האירועים שלה, התוצאה)
+    """
+    events, value = [], None
+    async for event in effect.arun():
+        if isinstance(event, EffectResult):
+            value = event.value
+        else:
+            events.append(event)
+    return events, value
+
+
+class Speculate(Effect):
+    """
+    בקשה עיקרית (למשל החלטת הניתוב) שרצה במקביל לבקשות ספקולטיביות.
+    כשהבקשה העיקרית מסתיימת, select בוחר לפי התוצאה שלה את הבקשה
+    הספקולטיבית שנשמרת; האחרות מבוטלות במנוע האסינכרוני, ובמנוע הסינכרוני
+    התוצאה שלהן נזרקת (קריאה שכבר נשלחה לא ניתנת לעצירה).
+
+    התוצאה: (תוצאת הבקשה העיקרית, המפתח שנבחר, (אירועים, תוצאה) של הבקשה
+    שנבחרה - או None אם לא נבחרה בקשה או שהיא נכשלה)
+    """
+
+    def __init__(self, main, speculative, select):
+        self.main = main
+        self.speculative = speculative
+        self.select = select
+
+    def run(self):
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.speculative)))
+        # כל בקשה רצה בעותק של ההקשר, כדי שהקריאות למודל ייספרו בתור הנוכחי
+        futures = {
+            key: executor.submit(contextvars.copy_context().run, _collect, effect)
+            for key, effect in self.speculative.items()
+        }
+        try:
+            decision = yield from self.main.run()
+            key = self.select(decision)
+            for other, future in futures.items():
+                if other != key:
+                    future.cancel()
+            outcome = None
+            if key in futures:
+                try:
+                    outcome = futures[key].result()
+                except Exception:
+                    outcome = None
+            return decision, key, outcome
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def arun(self):
+        tasks = {key: asyncio.create_task(_acollect(effect)) for key, effect in self.speculative.items()}
+        try:
+            decision = None
+            async for event in self.main.arun():
+                if isinstance(event, EffectResult):
+                    decision = event.value
+                else:
+                    yield event
+            key = self.select(decision)
+            for other, task in tasks.items():
+                if other != key:
+                    task.cancel()
+            outcome = None
+            if key in tasks:
+                try:
+                    outcome = await tasks[key]
+                except Exception:
+                    outcome = None
+            yield EffectResult((decision, key, outcome))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+
+def run_effects(logic, send_value=None):
+    """
+    מנוע סינכרוני: מבצע את הבקשות שמחולל הלוגיקה מחזיר ומעביר הלאה את האירועים.
+
+    Args:
+        logic: מחולל לוגיקה
+        send_value: תוצאת הבקשה שהמחולל ממתין לה, אם הוא כבר הופעל (ResumeAgent)
+
+    Returns:
+        ערך ההחזרה של מחולל הלוגיקה (כערך ההחזרה של המחולל הזה)
+    """
+    error = None
+    while True:
+        try:
+            item = logic.throw(error) if error is not None else logic.send(send_value)
+        except StopIteration as stop:
+            return stop.value
+
+        send_value, error = None, None
+        if isinstance(item, Effect):
+            try:
+                send_value = yield from item.run()
+            except Exception as e:
+                # השגיאה מוחזרת למחולל הלוגיקה כדי שיטפל בה כמו בקריאה ישירה
+                error = e
+        else:
+            yield item
+
+
+async def arun_effects(logic, send_value=None):
+    """
+    מנוע אסינכרוני: מבצע את הבקשות שמחולל הלוגיקה מחזיר ומעביר הלאה את האירועים.
+    מחולל אסינכרוני אינו יכול להחזיר ערך, ולכן התשובה הסופית נשלחת כאירוע done.
+
+    Args:
+        logic: מחולל לוגיקה
+        send_value: תוצאת הבקשה שהמחולל ממתין לה, אם הוא כבר הופעל (ResumeAgent)
+    """
+    error = None
+    while True:
+        try:
+            item = logic.throw(error) if error is not None else logic.send(send_value)
+        except StopIteration as stop:
+            yield {"type": "done", "content": stop.value}
+            return
+
+        send_value, error = None, None
+        if isinstance(item, Effect):
+            try:
+                async for event in item.arun():
+                    if isinstance(event, EffectResult):
+                        send_value = event.value
+                    else:
+                        yield event
+            except Exception as e:
+                error = e
+        else:
+            yield item
+
+
+def agent_events(agent, user_input, stream=False):
+    """
+    מפעיל סוכן כמחולל אירועים ומחזיר את התשובה הסופית כערך ההחזרה.
+    סוכנים שאינם תומכים בהזרמה מופעלים כרגיל והתשובה נשלחת כאירוע אחד.
+    """
+    if hasattr(agent, "_logic"):
+        return (yield from run_effects(agent._logic(user_input, stream)))
+
+    content = agent.run(user_input)
+    if stream:
+        yield {"type": "token", "content": content}
+    return content
+
+
+async def agent_aevents(agent, user_input, stream=False):
+    """
+    הגרסה האסינכרונית של agent_events - מסתיימת תמיד באירוע done
+    """
+    if hasattr(agent, "_logic"):
+        async for event in arun_effects(agent._logic(user_input, stream)):
+            yield event
+        return
+
+    if hasattr(agent, "arun"):
+        content = await agent.arun(user_input)
+    else:
+        content = await asyncio.to_thread(agent.run, user_input)
+    if stream:
+        yield {"type": "token", "content": content}
+    yield {"type": "done", "content": content}
+
+
+def drain_events(events):
+    """
+    מריץ מחולל אירועים עד סופו ומחזיר את ערך ההחזרה שלו
+    """
+    while True:
+        try:
+            next(events)
+        except StopIteration as stop:
+            return stop.value
+
+
+async def adrain_events(events):
+    """
+    מריץ מחולל אירועים אסינכרוני עד סופו ומחזיר את התוכן של אירוע done
+    """
+    content = None
+    async for event in events:
+        if event.get("type") == "done":
+            content = event["content"]
+    return content
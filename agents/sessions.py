@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+שיחות נפרדות לכל משתמש
+----------------------
+
+שרת ה-Flask מחזיק סוכן ראשי אחד, וה-AgentContext שלו (היסטוריה, פעולה
+שממתינה לאישור) היה משותף לכל המשתמשים. מנהל השיחות מחזיק לכל מזהה שיחה
+(מה-cookie) עותק קל של הסוכן הראשי (MainAgent.for_session): הקשר שיחה
+משלו, מעל המנתב והסוכנים המתמחים המשותפים, שאין בהם מצב של שיחה.
+
+בקשות של אותה שיחה מטופלות אחת אחרי השנייה (נעילה לכל שיחה); שיחות
+שונות רצות במקביל. שיחות מפונות לפי LRU כשעוברים את מספר השיחות המרבי
+או את תקרת הזיכרון (הערכה לפי גודל ההיסטוריה), ושיחות שלא היו פעילות
+זמן רב מפונות בכל מקרה. שיחה שבקשה שלה עדיין רצה לא מפונה - אחרת בקשה
+נוספת לאותה שיחה הייתה יוצרת סוכן שני שרץ במקביל לראשון.
+"""
+
+import os
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Session:
+    """
+    שיחה אחת: הסוכן שלה, נעילה, זמן הפעילות האחרון, הערכת הגודל שלה ומספר
+    הבקשות שמשתמשות בה כרגע
+    """
+
+    def __init__(self, session_id, agent):
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.size = 0
+        self.in_use = 0
+
+
+def estimate_session_size(agent):
+    """
+    מעריך את גודל הזיכרון של שיחה בבתים לפי הטקסט שנשמר בהקשר שלה
+
+    Args:
+        agent: הסוכן של השיחה
+
+    Returns:
+        int: מספר הבתים המשוער
+    """
+    context = getattr(agent, "context", None)
+    if context is None:
+        return 0
+    size = 0
+    for item in context.conversation_history:
+        size += len((item.get("user_input") or "").encode("utf-8"))
+        size += len((item.get("response") or "").encode("utf-8"))
+    size += sum(len(line.encode("utf-8")) for line in context.summary_lines)
+    return size
+
+
+class SessionManager:
+    """
+    מזהה שיחה -> Session, עם פינוי LRU, פינוי שיחות לא פעילות ותקרת זיכרון
+    """
+
+    def __init__(self, factory, max_sessions=1000, idle_ttl=1800, max_memory_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            factory: פונקציה שמקבלת מזהה שיחה ויוצרת לה סוכן (למשל agent.for_session)
+            max_sessions: מספר השיחות המרבי בזיכרון
+            idle_ttl: שניות ללא פעילות שאחריהן שיחה מפונה (None - ללא הגבלה)
+            max_memory_bytes: תקרת הזיכרון המשוער של כל השיחות יחד
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_bytes = 0
+        self._stats = {"created": 0, "evicted_lru": 0, "evicted_idle": 0, "evicted_memory": 0}
+
+    @classmethod
+    def from_env(cls, factory):
+        """
+        יוצר מנהל שיחות לפי משתני הסביבה (SESSION_MAX, SESSION_IDLE_TTL, SESSION_MAX_MEMORY_MB)
+        """
+        idle_ttl = float(os.environ.get("SESSION_IDLE_TTL", "1800"))
+        return cls(
+            factory,
+            max_sessions=int(os.environ.get("SESSION_MAX", "1000")),
+            idle_ttl=idle_ttl if idle_ttl > 0 else None,
+            max_memory_bytes=int(float(os.environ.get("SESSION_MAX_MEMORY_MB", "64")) * 1024 * 1024)
+        )
+
+    @staticmethod
+    def new_session_id():
+        """
+        מחזיר מזהה שיחה אקראי חדש
+        """
+        return secrets.token_urlsafe(16)
+
+    def get(self, session_id):
+        """
+        מחזיר את השיחה למזהה, ויוצר אותה אם אינה קיימת (או שפונתה)
+
+        Args:
+            session_id: מזהה השיחה
+
+        Returns:
+            Session
+        """
+        with self._lock:
+            return self._get(session_id)
+
+    def _get(self, session_id):
+        now = time.monotonic()
+        self._evict_idle(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(session_id, self.factory(session_id))
+            self._sessions[session_id] = session
+            self._stats["created"] += 1
+            self._evict_over_capacity(keep=session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = now
+        return session
+
+    @contextmanager
+    def session(self, session_id):
+        """
+        נותן גישה בלעדית לסוכן של השיחה למשך הבקשה, ומעדכן את גודל השיחה בסיומה
+
+        Yields:
+            הסוכן של השיחה
+        """
+        # השיחה מסומנת בשימוש כבר כשהיא נשלפת, כדי שלא תפונה לפני שהבקשה מקבלת את הנעילה
+        with self._lock:
+            session = self._get(session_id)
+            session.in_use += 1
+        try:
+            with session.lock:
+                # שיחה שנשמרת במאגר משותף מתעדכנת בתורות שנכתבו בתהליכים אחרים
+                sync = getattr(session.agent, "sync_session", None)
+                if sync is not None:
+                    sync()
+                try:
+                    yield session.agent
+                finally:
+                    self._update_size(session)
+        finally:
+            with self._lock:
+                session.in_use -= 1
+
+    def discard(self, session_id):
+        """
+        מוחק שיחה (למשל כשהמשתמש מתחיל שיחה חדשה)
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._memory_bytes -= session.size
+
+    def _update_size(self, session):
+        """
+        מעדכן את גודל השיחה אחרי בקשה ומפנה שיחות אם עברנו את תקרת הזיכרון
+        """
+        size = estimate_session_size(session.agent)
+        with self._lock:
+            session.last_used = time.monotonic()
+            if self._sessions.get(session.session_id) is not session:
+                return
+            # הסדר נשמר לפי זמן הפעילות האחרון, גם לבקשות ארוכות
+            self._sessions.move_to_end(session.session_id)
+            self._memory_bytes += size - session.size
+            session.size = size
+            self._evict_over_capacity(keep=session.session_id)
+
+    def _evict_idle(self, now):
+        """
+        מפנה שיחות שלא היו פעילות יותר מ-idle_ttl (הישנות נמצאות בתחילת הסדר)
+        """
+        if self.idle_ttl is None:
+            return
+        idle = []
+        for session_id, session in self._sessions.items():
+            if now - session.last_used <= self.idle_ttl:
+                break
+            if not session.in_use:
+                idle.append(session_id)
+        for session_id in idle:
+            self._remove(session_id, "evicted_idle")
+
+    def _evict_over_capacity(self, keep):
+        """
+        מפנה את השיחות שהשימוש בהן הכי ישן עד שמספר השיחות והזיכרון בתוך התקרה.
+        השיחה keep (הבקשה הנוכחית) ושיחות שבקשה שלהן רצה לא מפונות.
+        """
+        count, memory_bytes = len(self._sessions), self._memory_bytes
+        evicted = []
+        for session_id, session in self._sessions.items():
+            over_count = count > self.max_sessions
+            if not over_count and (memory_bytes <= self.max_memory_bytes or count <= 1):
+                break
+            if session_id == keep or session.in_use:
+                continue
+            evicted.append((session_id, "evicted_lru" if over_count else "evicted_memory"))
+            count -= 1
+            memory_bytes -= session.size
+        for session_id, reason in evicted:
+            self._remove(session_id, reason)
+
+    def _remove(self, session_id, reason):
+        session = self._sessions.pop(session_id)
+        self._memory_bytes -= session.size
+        self._stats[reason] += 1
+
+    def stats(self):
+        """
+        מחזיר מדדי שימוש
+
+        Returns:
+            dict: sessions, memory_bytes, created, evicted_lru, evicted_idle, evicted_memory
+        """
+        with self._lock:
+            return dict(self._stats, sessions=len(self._sessions), memory_bytes=self._memory_bytes)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+יצירה עצלה של הסוכנים המתמחים
+------------------------------
+
+הסוכן הראשי בנה בהפעלה את כל שבעת הסוכנים המתמחים (עם עשרות כלים לכל
+אחד) ועטף כל אחד מהם ב-Handoff, גם אם בשיחה נשאלו רק שאלות על הזמנות.
+המאגר מחזיק לכל תחום פונקציה שיוצרת את הסוכן, ובונה אותו בפעם הראשונה
+שהוא נדרש. הסוכן נשמר ומשותף לכל השיחות שנוצרות מאותו סוכן ראשי.
+"""
+
+import threading
+from collections.abc import MutableMapping
+
+
+class LazyAgentRegistry(MutableMapping):
+    """
+    מילון שם -> סוכן, שבו סוכן יכול להירשם כפונקציה שיוצרת אותו.
+    "name in registry" לא יוצר את הסוכן; registry[name] יוצר אותו פעם אחת.
+    """
+
+    def __init__(self):
+        self._agents = {}
+        self._factories = {}
+        # נעילה חוזרת - פונקציית יצירה יכולה לבקש סוכן אחר מהמאגר (כינוי)
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        """
+        רושם פונקציה שיוצרת את הסוכן name בגישה הראשונה אליו
+
+        Args:
+            name: שם הסוכן
+            factory: פונקציה ללא פרמטרים שמחזירה את הסוכן
+        """
+        with self._lock:
+            self._agents.pop(name, None)
+            self._factories[name] = factory
+
+    def is_created(self, name):
+        """
+        האם הסוכן name כבר נוצר
+        """
+        return name in self._agents
+
+    def __getitem__(self, name):
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        with self._lock:
+            if name not in self._agents:
+                factory = self._factories[name]
+                self._agents[name] = factory()
+                del self._factories[name]
+            return self._agents[name]
+
+    def __setitem__(self, name, agent):
+        with self._lock:
+            self._factories.pop(name, None)
+            self._agents[name] = agent
+
+    def __delitem__(self, name):
+        with self._lock:
+            if name in self._agents:
+                del self._agents[name]
+            else:
+                del self._factories[name]
+
+    def __contains__(self, name):
+        return name in self._agents or name in self._factories
+
+    def __iter__(self):
+        return iter(list(self._agents) + [name for name in self._factories if name not in self._agents])
+
+    def __len__(self):
+        return len(self._agents) + len(self._factories)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ניתוב ספקולטיבי
+---------------
+
+כשהניתוב דורש קריאה למודל, התור משלם על שתי קריאות בטור: החלטת הניתוב
+ואחריה הקריאה הראשונה של הסוכן המתמחה. במצב ספקולטיבי הקריאה הראשונה של
+הסוכנים הסבירים ביותר לפי המסווג המקומי (עד width סוכנים) נשלחת במקביל
+לקריאת הניתוב. אם המנתב בוחר באחד מהם, הסוכן ממשיך מהתשובה שכבר התקבלה;
+השאר מבוטלים.
+
+רק הקריאה הראשונה למודל רצה מראש - כלים (ובפרט כתיבה לחנות) מופעלים רק
+אחרי שהניתוב הוכרע. מחיר הספקולציה הוא קריאות למודל שנזרקות, ולכן הוא
+מוגבל: מספר המועמדים, הסתברות מינימלית לכל מועמד, ואורך הפרומפט המרבי.
+"""
+
+import os
+import threading
+
+
+class SpeculativeRouting:
+    """
+    מדיניות הספקולציה ומדדי הפגיעה שלה
+    """
+
+    def __init__(self, width=2, min_probability=0.2, max_prompt_tokens=4000):
+        """
+        Args:
+            width: מספר הסוכנים המרבי שמופעלים מראש בכל תור
+            min_probability: ההסתברות המינימלית (לפי המסווג) של סוכן שמופעל מראש
+            max_prompt_tokens: סוכן שהפרומפט הראשון שלו ארוך יותר לא מופעל מראש
+        """
+        self.width = width
+        self.min_probability = min_probability
+        self.max_prompt_tokens = max_prompt_tokens
+        self._lock = threading.Lock()
+        self._stats = {"turns": 0, "speculative_calls": 0, "hits": 0, "misses": 0, "wasted_calls": 0}
+
+    @classmethod
+    def from_env(cls):
+        """
+        יוצר מדיניות לפי משתני הסביבה, או None אם הספקולציה כבויה
+        (ברירת המחדל; SPECULATIVE_ROUTING_ENABLED=true מפעיל אותה)
+        """
+        if os.environ.get("SPECULATIVE_ROUTING_ENABLED", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            width=int(os.environ.get("SPECULATIVE_ROUTING_WIDTH", "2")),
+            min_probability=float(os.environ.get("SPECULATIVE_ROUTING_MIN_PROBABILITY", "0.2")),
+            max_prompt_tokens=int(os.environ.get("SPECULATIVE_ROUTING_MAX_PROMPT_TOKENS", "4000"))
+        )
+
+    def record(self, started, hit):
+        """
+        רושם תור שבו הופעלו סוכנים מראש
+
+        Args:
+            started: מספר הסוכנים שהופעלו מראש
+            hit: האם הסוכן שנבחר היה אחד מהם (והקריאה שלו הצליחה)
+        """
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["speculative_calls"] += started
+            self._stats["hits" if hit else "misses"] += 1
+            self._stats["wasted_calls"] += started - (1 if hit else 0)
+
+    def stats(self):
+        """
+        מחזיר מדדי שימוש
+
+        Returns:
+            dict: turns, speculative_calls, hits, misses, wasted_calls (חסם עליון -
+            קריאה שבוטלה לפני שנשלחה נספרת גם היא), hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hit_rate"] = stats["hits"] / stats["turns"] if stats["turns"] else 0.0
+        return stats
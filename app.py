@@ -5,13 +5,21 @@
 שרת פשוט למימוש ממשק משתמש לצ'אט בוט של Agent WooCommerce
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, session
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
+import threading
 from agents.main_agent import MainAgent
+from agents.runtime import LazyClient
 from api.woocommerce_client import WooCommerceClient
 from config import get_openai_config, get_woocommerce_config
+from agents.routing_cache import RoutingCache
+from agents.speculation import SpeculativeRouting
+from agents.sessions import SessionManager
+from memory.conversation_store import conversation_store_from_env
+from utils.llm_cache import CompletionCache, with_completion_cache
+import json
+import time
 import logging
 
 # טעינת משתני הסביבה
@@ -25,44 +33,74 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'secret-key-for-dev')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# יצירת לקוח OpenAI
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY")
-)
+# מטמון התשובות נוצר כאן ולא יחד עם הלקוח, כדי שמדדי המטמון לא יטענו את openai
+llm_cache = CompletionCache.from_env()
 
-# יצירת לקוח WooCommerce
+def _create_openai_client():
+    """יוצר את לקוח OpenAI, עטוף במטמון תשובות (טעינת הספרייה openai איטית)"""
+    from openai import OpenAI
+    return with_completion_cache(OpenAI(api_key=os.environ.get("OPENAI_API_KEY")), llm_cache)
+
+# לקוח OpenAI - נוצר בחימום השרת או בבקשה הראשונה שצריכה אותו
+client = LazyClient(_create_openai_client)
+
+# יצירת לקוח WooCommerce (בדיקת החיבור לחנות מתבצעת בחימום, לא בטעינת המודול)
 try:
     woo_config = get_woocommerce_config()
-    logger.info(f"מנסה להתחבר לחנות WooCommerce בכתובת: {woo_config['url']}")
-    logger.info(f"משתמש במפתח צרכן: {woo_config['consumer_key'][:4]}...{woo_config['consumer_key'][-4:] if len(woo_config['consumer_key']) > 8 else ''}")
-    
     woo_client = WooCommerceClient(
         url=woo_config["url"],
         consumer_key=woo_config["consumer_key"],
         consumer_secret=woo_config["consumer_secret"]
     )
-    
-    # בדיקת חיבור באמצעות בקשת נתונים בסיסיים
-    logger.info("בודק חיבור לחנות WooCommerce...")
-    connection_test = woo_client.wcapi.get("").json()
-    logger.info(f"תוצאת בדיקת חיבור: {connection_test}")
-    
-    # בדיקה אם יש מוצרים בחנות
-    logger.info("בודק גישה למוצרים...")
-    products_test = woo_client.get_products(per_page=1)
-    logger.info(f"נמצאו מוצרים בחנות: {products_test is not None and len(products_test) > 0}")
-    
-    logger.info(f"התחברות לחנות WooCommerce הצליחה: {woo_config['url']}")
 except Exception as e:
-    logger.error(f"שגיאה מפורטת בהתחברות לחנות WooCommerce: {str(e)}")
-    logger.error(f"סוג השגיאה: {type(e).__name__}")
-    import traceback
-    logger.error(f"מידע נוסף על השגיאה: {traceback.format_exc()}")
+    logger.error(f"שגיאה ביצירת לקוח WooCommerce: {str(e)}")
     logger.info("ממשיך ללא חיבור לחנות...")
     woo_client = None
 
-# יצירת ה-MainAgent
-agent = MainAgent(client, woo_client=woo_client)
+# יצירת ה-MainAgent, עם מטמון החלטות ניתוב לפי תבנית הבקשה, ניתוב ספקולטיבי (אם הופעל)
+# ומאגר שיחות שבו נשמר הקשר השיחה של כל משתמש (משותף לכל תהליכי השרת)
+routing_cache = RoutingCache.from_env()
+speculation = SpeculativeRouting.from_env()
+conversation_store = conversation_store_from_env()
+agent = MainAgent(client, woo_client=woo_client, routing_cache=routing_cache, speculation=speculation,
+                  conversation_store=conversation_store,
+                  history_depth=int(os.environ.get("CONVERSATION_HISTORY_DEPTH", "50")),
+                  confirm_writes=os.environ.get("FAST_PATH_CONFIRM", "true").lower() == "true")
+
+# לכל משתמש שיחה משלו (לפי מזהה ב-cookie), מעל הסוכנים המתמחים המשותפים
+sessions = SessionManager.from_env(agent.for_session)
+
+def warm_up():
+    """
+    מחמם את השרת ברקע: טוען את ספריית openai ואת מסווג הכוונות, ובודק את
+    החיבור לחנות. השרת מקבל בקשות כבר לפני שהחימום מסתיים.
+    """
+    start = time.perf_counter()
+    client.get()
+    if agent.router is not None:
+        agent.router.classifier
+    
+    if woo_client is not None:
+        try:
+            logger.info(f"בודק חיבור לחנות WooCommerce בכתובת: {woo_config['url']}")
+            connection_test = woo_client.wcapi.get("").json()
+            logger.info(f"תוצאת בדיקת חיבור: {connection_test}")
+            products_test = woo_client.get_products(per_page=1)
+            logger.info(f"נמצאו מוצרים בחנות: {products_test is not None and len(products_test) > 0}")
+        except Exception as e:
+            logger.error(f"שגיאה בבדיקת החיבור לחנות WooCommerce: {type(e).__name__}: {str(e)}")
+    
+    logger.info(f"חימום השרת הסתיים ({time.perf_counter() - start:.2f} שניות)")
+
+# החימום רץ בתהליכון רקע, כך שטעינת המודול (ו-worker של WSGI) לא מחכה לו
+if os.environ.get("APP_WARMUP", "true").lower() == "true":
+    threading.Thread(target=warm_up, name="app-warm-up", daemon=True).start()
+
+def _session_id():
+    """מחזיר את מזהה השיחה של המשתמש, ויוצר מזהה חדש בבקשה הראשונה"""
+    if 'session_id' not in session:
+        session['session_id'] = SessionManager.new_session_id()
+    return session['session_id']
 
 @app.route('/')
 def index():
@@ -82,8 +120,9 @@ def chat():
         
         logger.info(f"התקבלה הודעה: {user_message}")
         
-        # שליחת ההודעה ל-Agent
-        response = agent.run(user_message)
+        # שליחת ההודעה ל-Agent של השיחה
+        with sessions.session(_session_id()) as session_agent:
+            response = session_agent.run(user_message)
         
         return jsonify({
             'response': response
@@ -93,6 +132,69 @@ def chat():
         logger.error(f"שגיאה בעת עיבוד הבקשה: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """מטפל בבקשות צ'אט ומזרים את התשובה כ-Server-Sent Events"""
+    data = request.json or {}
+    user_message = data.get('message', '')
+    
+    if not user_message:
+        return jsonify({'error': 'חסרה הודעה'}), 400
+    
+    logger.info(f"התקבלה הודעה להזרמה: {user_message}")
+    session_id = _session_id()
+    
+    def generate():
+        try:
+            with sessions.session(session_id) as session_agent:
+                for event in session_agent.run_stream(user_message):
+                    yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"שגיאה בעת הזרמת התשובה: {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)}, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/stats/llm-cache', methods=['GET'])
+def llm_cache_stats():
+    """מחזיר את מדדי מטמון התשובות של מודל השפה"""
+    if llm_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(llm_cache.stats(), enabled=True))
+
+@app.route('/api/stats/routing-cache', methods=['GET'])
+def routing_cache_stats():
+    """מחזיר את מדדי מטמון החלטות הניתוב"""
+    if routing_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(routing_cache.stats(), enabled=True))
+
+@app.route('/api/session/reset', methods=['POST'])
+def reset_session():
+    """מתחיל שיחה חדשה למשתמש הנוכחי"""
+    if 'session_id' in session:
+        session_id = session.pop('session_id')
+        sessions.discard(session_id)
+        if conversation_store is not None:
+            conversation_store.delete_session(session_id)
+    return jsonify({'status': 'ok'})
+
+@app.route('/api/stats/sessions', methods=['GET'])
+def session_stats():
+    """מחזיר את מדדי מנהל השיחות"""
+    return jsonify(sessions.stats())
+
+@app.route('/api/stats/speculation', methods=['GET'])
+def speculation_stats():
+    """מחזיר את מדדי הניתוב הספקולטיבי (שיעור הפגיעה וקריאות שנזרקו)"""
+    if speculation is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(speculation.stats(), enabled=True))
+
 if __name__ == '__main__':
     # יצירת תיקיית התבניות אם לא קיימת
     templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
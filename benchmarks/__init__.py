@@ -0,0 +1,3 @@
+"""
+מדידות ביצועים למערכת ה-Agents (מורצות ידנית, לא חלק מחבילת הבדיקות)
+"""
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+recall מול זמן חיפוש: אינדקס ANN לעומת חיפוש מדויק
+--------------------------------------------------
+
+בונה מטריצת embeddings סינתטית עם מבנה של אשכולות (כמו embeddings של
+טקסטים אמיתיים - וקטורים גאוסיים אקראיים לגמרי הם המקרה הגרוע לכל ANN),
+מאמן אינדקס IVF, ומודד לכל nprobe את recall@10 ביחס לחיפוש המדויק ואת
+זמן החיפוש. כש-hnswlib מותקנת נמדד גם HNSW לכל ef.
+
+הרצה:
+    python -m benchmarks.bench_ann_recall [מספר מסמכים] [מימד]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from memory.ann_index import HNSWLIB_AVAILABLE, HNSWIndex, IVFFlatIndex
+from memory.vector_index import EmbeddingMatrix
+
+K = 10
+N_QUERIES = 50
+
+
+def build_matrix(n_documents, dimensions, n_topics=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dimensions), dtype=np.float32)
+    matrix = EmbeddingMatrix(capacity=n_documents)
+    for i, topic in enumerate(rng.integers(n_topics, size=n_documents)):
+        matrix.add(i, topics[topic] + 0.6 * rng.standard_normal(dimensions, dtype=np.float32))
+    queries = matrix.vectors[rng.integers(n_documents, size=N_QUERIES)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(dimensions)
+    return matrix, queries
+
+
+def measure(search, queries, exact):
+    """
+    Returns:
+        (recall@K ממוצע, זמן חיפוש ממוצע ב-ms)
+    """
+    hits = 0
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+    for found, expected in zip(results, exact):
+        hits += len(set(found) & expected)
+    return hits / (K * len(queries)), elapsed
+
+
+def run(n_documents=100_000, dimensions=256):
+    matrix, queries = build_matrix(n_documents, dimensions)
+    exact = [{doc_id for doc_id, _ in matrix.top_k(query, K)} for query in queries]
+    _, exact_ms = measure(lambda q: [doc_id for doc_id, _ in matrix.top_k(q, K)], queries, exact)
+    print(f"{n_documents} מסמכים, מימד {dimensions}")
+    print(f"{'index':<24}{'recall@10':>12}{'ms/query':>12}")
+    print(f"{'exact (numpy)':<24}{1.0:>12.3f}{exact_ms:>12.2f}")
+
+    ivf = IVFFlatIndex(matrix)
+    start = time.perf_counter()
+    ivf.train()
+    print(f"IVF: nlist={len(ivf.centroids)}, אימון {time.perf_counter() - start:.1f} שניות")
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        ivf.nprobe = nprobe
+        recall, ms = measure(lambda q: [row for row, _ in ivf.search(q, K)], queries, exact)
+        print(f"{f'ivf nprobe={nprobe}':<24}{recall:>12.3f}{ms:>12.2f}")
+
+    if HNSWLIB_AVAILABLE:
+        hnsw = HNSWIndex(matrix)
+        start = time.perf_counter()
+        hnsw.train()
+        print(f"HNSW: בנייה {time.perf_counter() - start:.1f} שניות")
+        for ef in (16, 32, 64, 128, 256):
+            hnsw.ef = ef
+            recall, ms = measure(lambda q: [row for row, _ in hnsw.search(q, K)], queries, exact)
+            print(f"{f'hnsw ef={ef}':<24}{recall:>12.3f}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
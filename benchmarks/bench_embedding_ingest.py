@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מדידת קליטה של תיאורי מוצרים למאגר הזיכרון
+-------------------------------------------
+
+לקוח embeddings מדומה עם השהיה קבועה לכל בקשה ותוספת קטנה לכל טקסט
+(בערך כמו ה-API), ומדידה של:
+- add_document לכל מסמך (קריאה אחת לכל מסמך) - נמדד על מדגם ומוכפל
+- add_documents (מנות מקבילות, עם איחוד כפילויות)
+- add_documents אחרי הפעלה מחדש, כשהווקטורים כבר במטמון
+
+הרצה:
+    python -m benchmarks.bench_embedding_ingest [מספר מסמכים]
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from memory.embedding_cache import EmbeddingCache
+from memory.embedding_queue import EmbeddingPipeline
+from memory.vector_store import AdvancedVectorStore
+from tests.fakes import FakeEmbeddings
+
+REQUEST_LATENCY = 0.25
+PER_INPUT_LATENCY = 0.0002
+
+
+class SlowEmbeddings(FakeEmbeddings):
+    """embeddings מדומה עם השהיה של בקשת רשת"""
+
+    def create(self, model, input, dimensions=None, **kwargs):
+        count = 1 if isinstance(input, str) else len(input)
+        time.sleep(REQUEST_LATENCY + PER_INPUT_LATENCY * count)
+        return super().create(model, input, dimensions, **kwargs)
+
+
+def descriptions(n_documents):
+    # כעשירית מהתיאורים חוזרים (וריאציות של אותו מוצר)
+    return [f"חולצת כותנה דגם {i % (n_documents * 9 // 10)} במגוון מידות וצבעים" for i in range(n_documents)]
+
+
+def make_store(concurrency=4, cache=None):
+    client = SimpleNamespace(embeddings=SlowEmbeddings(dimensions=256))
+    pipeline = EmbeddingPipeline(client, "text-embedding-3-small", {"dimensions": 256},
+                                 max_concurrency=concurrency, cache=cache)
+    return AdvancedVectorStore(client, importance_threshold=0.0, embedding_dimensions=256,
+                               embedding_pipeline=pipeline, embedding_cache=cache)
+
+
+def run(n_documents=10_000):
+    # המדידה בלי מטמון ה-embeddings שהמאגר יוצר כברירת מחדל
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    texts = descriptions(n_documents)
+
+    sample = 20
+    store = make_store()
+    start = time.perf_counter()
+    for text in texts[:sample]:
+        store.add_document(text)
+    per_document = (time.perf_counter() - start) / sample
+    print(f"add_document: {per_document * 1000:.0f} ms למסמך -> {n_documents} מסמכים: "
+          f"~{per_document * n_documents / 60:.0f} דקות (הערכה)")
+
+    cache = EmbeddingCache()
+    for label in ("add_documents", "add_documents (מטמון חם)"):
+        store = make_store(cache=cache)
+        start = time.perf_counter()
+        store.add_documents(texts)
+        elapsed = time.perf_counter() - start
+        stats = store.embedding_pipeline.stats
+        print(f"{label}: {elapsed:.1f} שניות, {stats['requests']} בקשות, "
+              f"{stats['duplicates']} כפילויות לא נשלחו")
+        store.close()
+    print(f"מטמון: {cache.stats()['hit_rate']:.0%} פגיעות, {cache.stats()['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מדידת זמן הטעינה של השרת: פירוט python -X importtime וזמן עד הבקשה הראשונה
+------------------------------------------------------------------------------
+
+מריץ את טעינת app.py בתהליך נפרד (כך שהמודולים לא טעונים כבר), מסכם את
+הפלט של python -X importtime לפי חבילה עליונה, ומודד את הזמן מתחילת
+התהליך ועד שהבקשה הראשונה (שלא צריכה את המודל) הוחזרה. החימום ברקע
+(APP_WARMUP) כבוי במדידה, כדי שלא יתחרה על הטעינה.
+
+הרצה:
+    python -m benchmarks.bench_import_time
+"""
+
+import os
+import re
+import sys
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# היעד: פחות מ-300 ms מתחילת התהליך ועד הבקשה הראשונה
+TARGET_MS = 300
+
+_FIRST_REQUEST = (
+    "import time; start = time.perf_counter(); import app; "
+    "app.app.test_client().get('/api/stats/sessions'); "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def _run(args):
+    env = dict(os.environ, APP_WARMUP="false", PYTHONDONTWRITEBYTECODE="0")
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def import_report(module="app", top=15):
+    """
+    מסכם את הפלט של python -X importtime: הזמן העצמי של כל מודול נצבר לחבילה העליונה שלו
+
+    Returns:
+        (זמן הטעינה הכולל ב-ms, רשימת (חבילה, ms) מהיקרה ביותר)
+    """
+    result = _run(["-X", "importtime", "-c", f"import {module}"])
+    packages = defaultdict(int)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total_us / 1000, [(name, us / 1000) for name, us in ranked]
+
+
+def first_request_ms(repeat=3):
+    """
+    הזמן מטעינת app.py ועד שהבקשה הראשונה הוחזרה (הטוב מכמה הרצות)
+    """
+    timings = []
+    for _ in range(repeat):
+        result = _run(["-c", _FIRST_REQUEST])
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def run():
+    total_ms, ranked = import_report()
+    print(f"import app: {total_ms:.0f} ms\n")
+    print(f"{'package':<28}{'self ms':>10}")
+    for name, ms in ranked:
+        print(f"{name:<28}{ms:>10.1f}")
+
+    first_ms = first_request_ms()
+    status = "OK" if first_ms < TARGET_MS else "מעל היעד"
+    print(f"\nעד הבקשה הראשונה: {first_ms:.0f} ms (יעד: {TARGET_MS} ms) - {status}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מדידת עלות זיהוי הכוונות לכל הודעה: בדיקות נפרדות מול סריקה אחת
+-----------------------------------------------------------------
+
+משווה בין הבדיקות הקודמות של MainAgent ו-BaseAgent (רשימות מחרוזות
+וקריאות re.search נפרדות, כל אחת סורקת את ההודעה מחדש) לבין IntentMatcher,
+שמזהה את כל הכוונות והפרמטרים במעבר אחד. הסריקה נמדדת בלי המטמון של
+match_intents.
+
+הרצה:
+    python -m benchmarks.bench_intent_matcher
+"""
+
+import re
+import time
+
+from agents.intent_matcher import IntentMatcher
+
+MESSAGES = [
+    "עדכן מלאי למוצר 123 לכמות 5",
+    "עדכן את המוצר 12 ל-5",
+    "תמצא מוצר חולצה כחולה כמות 10 מחיר 120",
+    "צור קטגוריה חדשה בשם נעליים",
+    "הצג לי את המכירות של החודש האחרון ואת המוצרים הנמכרים ביותר",
+    "מה הסטטוס של ההזמנה האחרונה של הלקוח דני כהן?",
+    "כן",
+    "שלום, אני צריך עזרה עם החנות",
+]
+
+_FIND_PRODUCT_ROUTE = r'^(תמצא מוצר|מצא מוצר)\s+.+\s+כמות\s+\d+\s+מחיר\s+\d+'
+_FIND_PRODUCT = r'^(תמצא מוצר|מצא מוצר)\s+(.+?)(?:\s+כמות\s+(\d+))?(?:\s+מחיר\s+(\d+(?:\.\d+)?))?$'
+_CONFIRM = r'^(?:כן|אישור|מאשר|נכון|אכן|בהחלט|בבקשה|אוקיי|אוקי|ok|yes|y)$'
+_REJECT = r'^(?:לא|ביטול|מבטל|לבטל|שגוי|לא מאשר|no|n)$'
+
+
+# הבדיקות הקודמות, לצורך השוואה - כל הבדיקות שהודעה אחת עוברת בתור
+def legacy_checks(user_input):
+    lowered = user_input.lower()
+    result = [
+        "חזור לסוכן הראשי" in user_input or "חזור לסוכן הכללי" in user_input
+        or "איזה סוכן אתה" in user_input or "מי אתה" in user_input,
+        any(word in lowered for word in ["מוצר", "הזמנ", "קטגור", "קופון", "לקוח", "דוח", "הגדר"]),
+        any(word in lowered for word in ["כמה", "איזה", "מה", "למה", "כמות", "פרטים", "עוד", "אחר", "נוסף"]),
+        re.search(_FIND_PRODUCT_ROUTE, user_input, re.IGNORECASE),
+        any(phrase in lowered for phrase in [
+            "קטגוריה חדשה", "צור קטגוריה", "יצירת קטגוריה", "הוסף קטגוריה", "עדכן קטגוריה",
+            "שנה קטגוריה", "מחק קטגוריה", "רשימת קטגוריות", "חפש קטגוריה", "פרטי קטגוריה"
+        ]),
+        re.match(_FIND_PRODUCT, user_input, re.DOTALL),
+        re.match(r'^עדכן את המוצר\s+(\d+)\s+ל-(\d+)$', user_input),
+        re.search(r'צור מוצר|יצירת מוצר|מוצר חדש|תמצא מוצר.*מחיר', user_input, re.IGNORECASE),
+        re.search(r'(?:בשם|שם:?|ששמו)\s+[\'"]?([^\'",]+)[\'"]?', user_input),
+        re.search(r'(?:מחיר:?|במחיר)\s+(\d+(?:\.\d+)?)', user_input),
+        re.search(r'(?:כמות:?|במלאי)\s+(\d+)', user_input),
+        re.search(r'עדכן מחיר|שנה מחיר|לשנות מחיר', user_input, re.IGNORECASE),
+        re.search(r'מוצר\s+(\d+)', user_input),
+        re.search(r'(?:מחיר חדש|למחיר|מחיר:?)\s+(\d+(?:\.\d+)?)', user_input),
+        re.search(r'עדכן מלאי|עדכן כמות|שנה מלאי|לשנות מלאי', user_input, re.IGNORECASE),
+        re.search(r'(?:כמות חדשה|לכמות|כמות:?|ל-)\s+(\d+)', user_input),
+        re.search(r'צור קטגוריה|יצירת קטגוריה|קטגוריה חדשה', user_input, re.IGNORECASE),
+        re.search(r'(?:בשם|שם:?|ששמה)\s+[\'"]?([^\'",]+)[\'"]?', user_input),
+        re.search(_CONFIRM, user_input.strip(), re.IGNORECASE),
+        re.search(_REJECT, user_input.strip(), re.IGNORECASE),
+        "עדכן את המלאי" in user_input or "עדכן מלאי" in user_input,
+        re.search(r'מוצר עם מזהה (\d+)|מוצר (\d+)|מזהה (\d+)', user_input),
+        re.search(r'לכמות (\d+)', user_input),
+        "עזרה" in user_input or "מה אתה יכול לעשות" in user_input,
+        "שלום" in user_input or "היי" in user_input or "ברוך הבא" in user_input or "צריך עזרה" in user_input,
+    ]
+    return result
+
+
+def _timed(func, repeat=2000):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            func(message)
+    return (time.perf_counter() - start) / (repeat * len(MESSAGES)) * 1e6
+
+
+def run():
+    start = time.perf_counter()
+    matcher = IntentMatcher()
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    legacy_us = _timed(legacy_checks)
+    scan_us = _timed(matcher.scan)
+
+    print(f"חלופות בביטוי המשולב: {len(matcher.alternatives)}, זמן בנייה: {build_ms:.1f} ms\n")
+    print(f"{'':<28}{'us/message':>12}")
+    print(f"{'legacy (separate checks)':<28}{legacy_us:>12.1f}")
+    print(f"{'IntentMatcher.scan':<28}{scan_us:>12.1f}")
+    print(f"\nהאצה: x{legacy_us / scan_us:.1f}")
+
+
+if __name__ == "__main__":
+    run()
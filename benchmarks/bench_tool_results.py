@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מדידת גודל תוצאות הכלים בטוקנים: טקסט עברי מעוצב מול רשומות דחוסות
+---------------------------------------------------------------------
+
+משווה, על נתוני מוצרים והזמנות מדומים בפורמט של WooCommerce, בין הפורמט
+הישן של הכלים (טקסט עם תוויות חוזרות) לבין הרשומות הדחוסות (JSON / TSV).
+
+הרצה:
+    python -m benchmarks.bench_tool_results
+"""
+
+import time
+
+from agents.order_agent import get_order, list_orders
+from agents.product_agent import get_product, list_products
+from utils.tokens import TIKTOKEN_AVAILABLE, _get_encoding, count_tokens
+
+DESCRIPTION_HTML = (
+    "<p><strong>חולצת כותנה איכותית</strong> בגזרה מחמיאה, מתאימה ליום-יום ולאירועים.</p>"
+    "<ul><li>100% כותנה סרוקה</li><li>כביסה ב-30 מעלות</li><li>מיוצרת בישראל</li></ul>"
+    "<p>זמינה במגוון צבעים ומידות. &nbsp;משלוח חינם בקנייה מעל 200 ש&quot;ח.</p>"
+) * 2
+
+
+def _fake_product(product_id):
+    return {
+        "id": product_id,
+        "name": f"חולצת כותנה דגם {product_id}",
+        "sku": f"TS-{product_id:04d}",
+        "price": f"{79 + product_id % 40}.90",
+        "regular_price": f"{99 + product_id % 40}.90",
+        "stock_quantity": product_id % 25,
+        "status": "publish",
+        "permalink": f"https://shop.example.com/product/tshirt-{product_id}/",
+        "short_description": "<p>חולצת כותנה נוחה לכל עונה</p>",
+        "description": DESCRIPTION_HTML,
+        "categories": [{"id": 3, "name": "ביגוד"}, {"id": 7, "name": "חולצות"}],
+    }
+
+
+class FakeWooClient:
+    """לקוח WooCommerce מדומה שמחזיר מוצרים קבועים"""
+
+    def get_product(self, product_id):
+        return _fake_product(product_id)
+
+    def get_products(self, per_page=10, **params):
+        return [_fake_product(i) for i in range(1, per_page + 1)]
+
+    def search_products(self, search_term, per_page=10, **params):
+        return self.get_products(per_page=per_page)
+
+
+# הפורמט הקודם של הכלים, לצורך השוואה
+def legacy_product(result):
+    product_info = f"מוצר: {result.get('name', '')} (מק\"ט: {result.get('sku', 'ללא מק״ט')})\n"
+    product_info += f"מזהה: {result.get('id', '')}\n"
+    product_info += f"מחיר: ₪{result.get('price', '')}"
+    if result.get('regular_price') and result.get('regular_price') != result.get('price'):
+        product_info += f" (מחיר רגיל: ₪{result.get('regular_price')})"
+    product_info += f"\nכמות במלאי: {result.get('stock_quantity', 'לא צוין')}\n"
+    product_info += f"סטטוס: {result.get('status', '')}\n"
+    product_info += f"קישור: {result.get('permalink', '')}\n\n"
+    product_info += f"תיאור קצר: {result.get('short_description', '')}\n\n"
+    product_info += f"תיאור מלא: {result.get('description', '')}\n\n"
+    if result.get('categories'):
+        cats = ", ".join([c.get('name', '') for c in result.get('categories', [])])
+        product_info += f"קטגוריות: {cats}\n"
+    return product_info
+
+
+def legacy_product_list(products):
+    result = f"רשימת {len(products)} מוצרים:\n\n"
+    for product in products:
+        result += f"{product.get('name', '')} (מק\"ט: {product.get('sku', 'ללא מק״ט')})\n"
+        result += f"מזהה: {product.get('id', '')}, מחיר: ₪{product.get('price', '')}, "
+        result += f"כמות במלאי: {product.get('stock_quantity', 'לא צוין')}\n\n"
+    return result
+
+
+def legacy_order_list(limit):
+    result = f"רשימת {limit} הזמנות אחרונות:\n\n"
+    for i in range(1, limit + 1):
+        result += f"הזמנה #{i + 100} ({['processing', 'completed', 'on-hold'][i % 3]})\n"
+        result += f"תאריך: 2023-06-15, סכום: ₪{i * 100 + 99.99}, לקוח: {i % 5 + 1}\n\n"
+    return result
+
+
+def _timed(func, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = func()
+    return value, (time.perf_counter() - start) / repeat * 1e6
+
+
+def run():
+    woo = FakeWooClient()
+    cases = [
+        ("get_product", lambda: legacy_product(_fake_product(42)), lambda: str(get_product(woo, 42))),
+        ("list_products (10)", lambda: legacy_product_list(woo.get_products(per_page=10)),
+         lambda: str(list_products(woo, limit=10))),
+        ("list_products (50)", lambda: legacy_product_list(woo.get_products(per_page=50)),
+         lambda: str(list_products(woo, limit=50))),
+        ("list_orders (20)", lambda: legacy_order_list(20), lambda: str(list_orders(woo, limit=20))),
+        ("get_order", None, lambda: str(get_order(woo, 123))),
+    ]
+
+    tokenizer = "tiktoken" if TIKTOKEN_AVAILABLE and _get_encoding("gpt-4o") else "הערכה (ללא tiktoken)"
+    print(f"ספירת טוקנים: {tokenizer}\n")
+    print(f"{'tool':<22}{'legacy':>10}{'compact':>10}{'saved':>9}{'build us':>11}")
+    for name, legacy, compact in cases:
+        compact_text, compact_us = _timed(compact)
+        compact_tokens = count_tokens(compact_text)
+        if legacy is None:
+            print(f"{name:<22}{'-':>10}{compact_tokens:>10}{'-':>9}{compact_us:>11.1f}")
+            continue
+        legacy_tokens = count_tokens(legacy())
+        saved = 1 - compact_tokens / legacy_tokens
+        print(f"{name:<22}{legacy_tokens:>10}{compact_tokens:>10}{saved:>9.0%}{compact_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+זמן טעינה של מאגר הזיכרון השמור
+-------------------------------
+
+כותב אוסף סינתטי לדיסק (מטריצה + טבלת מסמכים, כמו save()) ומודד:
+- load() - פתיחת המטריצה כ-memmap, בלי לקרוא את הווקטורים
+- החיפוש הראשון אחרי הטעינה (כולל קריאת הדפים מהדיסק) והחיפוש השני
+- לשם השוואה: קריאה מלאה של המטריצה לזיכרון (np.load בלי mmap)
+
+הרצה:
+    python -m benchmarks.bench_vector_persistence [מספר מסמכים] [מימד]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+
+from memory.vector_index import EmbeddingMatrix
+from memory.vector_persistence import DOCUMENTS_FILE, DocumentTable, save_matrix
+from memory.vector_store import AdvancedVectorStore
+
+
+def write_collection(directory, n_documents, dimensions, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_documents, dimensions), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"doc-{i}" for i in range(n_documents)]
+    os.makedirs(directory, exist_ok=True)
+    save_matrix(directory, EmbeddingMatrix.from_arrays(vectors, ids))
+    table = DocumentTable(os.path.join(directory, DOCUMENTS_FILE))
+    table.update_many({doc_id: {"content": f"מסמך {doc_id}", "metadata": {"importance_score": 0.5}}
+                       for doc_id in ids})
+    table.close()
+    return vectors[rng.integers(n_documents, size=2)]
+
+
+def run(n_documents=200_000, dimensions=256):
+    with tempfile.TemporaryDirectory() as persist_directory:
+        store = AdvancedVectorStore(SimpleNamespace(), persist_directory=persist_directory,
+                                    embedding_dimensions=dimensions)
+        start = time.perf_counter()
+        queries = write_collection(store.storage_path, n_documents, dimensions)
+        print(f"{n_documents} מסמכים, מימד {dimensions}: כתיבה {time.perf_counter() - start:.1f} שניות")
+
+        start = time.perf_counter()
+        store.load(read_only=True)
+        print(f"load(): {(time.perf_counter() - start) * 1000:.1f} ms")
+        for label, query in zip(("חיפוש ראשון", "חיפוש שני"), queries):
+            start = time.perf_counter()
+            store.search_by_embedding(query.tolist(), min_relevance_score=0.0)
+            print(f"{label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        store.close()
+
+        vectors_path = next(os.path.join(store.storage_path, name)
+                            for name in os.listdir(store.storage_path) if name.startswith("vectors."))
+        start = time.perf_counter()
+        np.load(vectors_path)
+        print(f"קריאה מלאה של המטריצה (np.load): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מדידת זמן החיפוש הווקטורי במאגר הזיכרון
+----------------------------------------
+
+ממלא AdvancedVectorStore במסמכים עם וקטורים אקראיים (בלי קריאות ל-API)
+ומודד את זמן החיפוש - עם ובלי סינון לפי מטא-דאטה - מול חיפוש נאיבי
+שמחשב דמיון לכל מסמך בלולאת Python.
+
+הרצה:
+    python -m benchmarks.bench_vector_search [מספר מסמכים] [מימד]
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from memory.vector_store import AdvancedVectorStore
+
+
+class RandomEmbeddings:
+    """embeddings.create שמחזיר וקטור אקראי לכל טקסט"""
+
+    def __init__(self, dimensions, seed=0):
+        self.dimensions = dimensions
+        self.rng = np.random.default_rng(seed)
+
+    def create(self, model, input, **kwargs):
+        texts = [input] if isinstance(input, str) else input
+        vectors = self.rng.standard_normal((len(texts), self.dimensions), dtype=np.float32)
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=v) for i, v in enumerate(vectors)])
+
+
+def build_store(n_documents, dimensions):
+    client = SimpleNamespace(embeddings=RandomEmbeddings(dimensions))
+    store = AdvancedVectorStore(client, importance_threshold=0.0, embedding_dimensions=dimensions)
+    for i in range(n_documents):
+        store.add_document(f"memory {i}", metadata={"type": ("order", "product", "customer")[i % 3]})
+    return store
+
+
+def naive_search(store, embedding, n_results):
+    """חיפוש לפני המטריצה: דמיון קוסינוס לכל מסמך בנפרד"""
+    query = np.asarray(embedding, dtype=np.float32)
+    scores = []
+    for doc_id in store.documents:
+        row = store._matrix.rows[doc_id]
+        vector = store._matrix.vectors[row]
+        scores.append((float(np.dot(vector, query) / np.linalg.norm(query)), doc_id))
+    return sorted(scores, reverse=True)[:n_results]
+
+
+def best_of(func, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def run(n_documents=100_000, dimensions=1536):
+    # המדידה בלי מטמון ה-embeddings שהמאגר יוצר כברירת מחדל
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    start = time.perf_counter()
+    store = build_store(n_documents, dimensions)
+    print(f"{n_documents} מסמכים, מימד {dimensions}: נבנה ב-{time.perf_counter() - start:.1f} שניות")
+
+    query = np.random.default_rng(1).standard_normal(dimensions, dtype=np.float32)
+    top = best_of(lambda: store.search_by_embedding(query, 10, min_relevance_score=0.0))
+    filtered = best_of(lambda: store.search_by_embedding(query, 10, 0.0, filters={"type": "customer"}))
+    naive = best_of(lambda: naive_search(store, query, 10), repeat=1)
+
+    print(f"{'search':<28}{'ms':>10}")
+    print(f"{'top-10 (argpartition)':<28}{top:>10.2f}")
+    print(f"{'top-10 + filter':<28}{filtered:>10.2f}")
+    print(f"{'naive python loop':<28}{naive:>10.2f}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
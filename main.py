@@ -16,9 +16,13 @@ import datetime
 from pathlib import Path
 from openai import OpenAI
 from agents.main_agent import MainAgent
-from utils.tracing import setup_tracing_directory, analyze_trace, get_latest_trace
+from utils.tracing import Trace, setup_tracing_directory, save_trace, analyze_trace, get_latest_trace
 from config import get_openai_config, get_woocommerce_config
 from api.woocommerce_client import WooCommerceClient
+from agents.routing_cache import RoutingCache
+from agents.speculation import SpeculativeRouting
+from memory.conversation_store import conversation_store_from_env
+from utils.llm_cache import CompletionCache, with_completion_cache
 
 def main():
     """פונקציית הכניסה הראשית למערכת."""
@@ -27,8 +31,8 @@ def main():
     openai_config = get_openai_config()
     api_key = openai_config["api_key"]
     
-    # יצירת לקוח OpenAI
-    client = OpenAI(api_key=api_key)
+    # יצירת לקוח OpenAI, עטוף במטמון תשובות
+    client = with_completion_cache(OpenAI(api_key=api_key), CompletionCache.from_env())
     
     # יצירת לקוח WooCommerce
     try:
@@ -50,7 +54,19 @@ def main():
     print(f"Traces will be saved to: {trace_path}")
     
     # יצירת ה-agent הראשי
-    agent = MainAgent(client, woo_client=woo_client)
+    routing_cache = RoutingCache.from_env()
+    speculation = SpeculativeRouting.from_env()
+    agent = MainAgent(client, woo_client=woo_client, routing_cache=routing_cache, speculation=speculation,
+                      conversation_store=conversation_store_from_env(),
+                      history_depth=int(os.environ.get("CONVERSATION_HISTORY_DEPTH", "50")),
+                      confirm_writes=os.environ.get("FAST_PATH_CONFIRM", "true").lower() == "true")
+    # עם CLI_SESSION_ID השיחה נשמרת במאגר השיחות וממשיכה מהמקום שבו נעצרה
+    cli_session_id = os.environ.get("CLI_SESSION_ID")
+    if cli_session_id and agent.conversation_store is not None:
+        agent = agent.for_session(cli_session_id)
+    # החלטות הניתוב נשמרות ב-trace בסיום, לאימון מסווג הכוונות
+    # (python -m agents.intent_classifier train)
+    agent.trace = Trace()
     
     print("ברוכים הבאים ל-WooCommerce Agent!")
     print("הקלד 'exit' כדי לצאת")
@@ -61,6 +77,8 @@ def main():
         user_input = input("\nאתה: ")
         
         if user_input.lower() == "exit":
+            if agent.trace.steps:
+                save_trace(agent.trace, trace_dir)
             break
         
         if user_input.lower() == "debug":
@@ -77,6 +95,19 @@ def main():
                 print(f"קובץ מלא: {latest_trace}")
             else:
                 print("\nלא נמצאו קבצי trace.")
+            cache = getattr(client, "cache", None)
+            if cache is not None:
+                stats = cache.stats()
+                print(f"מטמון תשובות: {stats['hit_rate']:.0%} פגיעות "
+                      f"({stats['memory_hits'] + stats['disk_hits']} מתוך "
+                      f"{stats['memory_hits'] + stats['disk_hits'] + stats['misses']})")
+            if routing_cache is not None:
+                stats = routing_cache.stats()
+                print(f"מטמון ניתוב: {stats['hit_rate']:.0%} פגיעות, {stats['entries']} תבניות")
+            if speculation is not None:
+                stats = speculation.stats()
+                print(f"ניתוב ספקולטיבי: {stats['hit_rate']:.0%} פגיעות, "
+                      f"{stats['wasted_calls']} קריאות שנזרקו מתוך {stats['speculative_calls']}")
             continue
         
         try:
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+אינדקס שכנים קרובים משוער (ANN) למאגר הזיכרון
+---------------------------------------------
+
+גם עם מטריצת numpy, חיפוש מדויק סורק את כל הווקטורים, וזמן החיפוש גדל
+ליניארית עם מספר הזכרונות. האינדקסים כאן בודקים רק חלק מהמטריצה:
+
+- IVFFlatIndex (ללא תלויות נוספות): הווקטורים מחולקים ל-nlist אשכולות
+  (k-means על דגימה), וחיפוש בודק רק את nprobe האשכולות הקרובים לשאילתה.
+  nprobe גבוה יותר - recall גבוה יותר וחיפוש איטי יותר.
+- HNSWIndex (כשהחבילה hnswlib מותקנת): גרף HNSW; ef קובע את האיזון בין
+  recall לזמן.
+
+שני האינדקסים עובדים על מספרי השורות של EmbeddingMatrix: הוספה מכניסה
+שורה לאינדקס, ומחיקה מסתמכת על סימון השורה כמחוקה במטריצה (tombstone).
+אחרי דחיסת המטריצה המספור משתנה, והאינדקס נבנה מחדש (reset).
+"""
+
+import importlib.util
+import logging
+
+import numpy as np
+
+from .vector_index import normalize, ranked_rows
+
+logger = logging.getLogger(__name__)
+
+HNSWLIB_AVAILABLE = importlib.util.find_spec("hnswlib") is not None
+
+
+class IVFFlatIndex:
+    """
+    אינדקס IVF-flat: k-means לאשכולות, וחיפוש מדויק בתוך האשכולות הקרובים
+    """
+
+    def __init__(self, matrix, nlist=None, nprobe=8, train_iterations=10, seed=0):
+        """
+        Args:
+            matrix: ה-EmbeddingMatrix שהאינדקס מצביע עליו
+            nlist: מספר האשכולות (ברירת מחדל: שורש מספר הווקטורים באימון)
+            nprobe: מספר האשכולות שנבדקים בכל חיפוש
+            train_iterations: מספר סבבי k-means
+            seed: זרע לדגימת האימון
+        """
+        self.matrix = matrix
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        """
+        מוחק את האשכולות; האינדקס יאומן מחדש בחיפוש הבא
+        """
+        self.centroids = None
+        self._lists = []
+        self._arrays = []
+        self._assignment = {}
+        self._trained_size = 0
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def needs_training(self):
+        """
+        האם צריך לאמן (או לאמן מחדש, כשהמאגר גדל פי 4 מאז האימון)
+        """
+        return not self.is_trained or len(self.matrix) > 4 * self._trained_size
+
+    def train(self):
+        """
+        מחשב את מרכזי האשכולות (k-means כדורי על דגימה) ומשייך את כל השורות
+        """
+        alive_rows = np.flatnonzero(self.matrix.alive)
+        if not len(alive_rows):
+            self.reset()
+            return
+        vectors = self.matrix.vectors
+        nlist = min(self.nlist or max(1, int(np.sqrt(len(alive_rows)))), len(alive_rows))
+
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(alive_rows, min(len(alive_rows), 64 * nlist), replace=False)]
+        centroids = sample[:nlist].copy()
+        for _ in range(self.train_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # אשכול שנשאר ריק שומר על המרכז הקודם שלו
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+
+        self.centroids = np.ascontiguousarray(centroids)
+        self._lists = [[] for _ in range(nlist)]
+        self._assignment = {}
+        for start in range(0, len(alive_rows), 8192):
+            rows = alive_rows[start:start + 8192]
+            for row, cluster in zip(rows.tolist(), np.argmax(vectors[rows] @ self.centroids.T, axis=1).tolist()):
+                self._lists[cluster].append(row)
+                self._assignment[row] = cluster
+        self._arrays = [None] * nlist
+        self._trained_size = len(alive_rows)
+
+    def add(self, row):
+        """
+        משייך שורה חדשה (או שורה שהווקטור שלה הוחלף) לאשכול הקרוב אליה
+        """
+        if not self.is_trained:
+            return
+        previous = self._assignment.get(row)
+        if previous is not None:
+            self._lists[previous].remove(row)
+            self._arrays[previous] = None
+        cluster = int(np.argmax(self.centroids @ self.matrix.vectors[row]))
+        self._lists[cluster].append(row)
+        self._arrays[cluster] = None
+        self._assignment[row] = cluster
+
+    def remove(self, row):
+        """
+        השורה כבר מסומנת כמחוקה במטריצה ומדולגת בחיפוש; היא יוצאת מהאשכול באימון הבא
+        """
+
+    def _rows(self, cluster):
+        if self._arrays[cluster] is None:
+            self._arrays[cluster] = np.array(self._lists[cluster], dtype=np.int64)
+        return self._arrays[cluster]
+
+    def search(self, query_vector, k, min_score=-1.0, accept=None):
+        """
+        מחפש את k השורות הקרובות בתוך nprobe האשכולות הקרובים לשאילתה
+
+        Returns:
+            list: זוגות (שורה, דמיון) מהגבוה לנמוך
+        """
+        if self.needs_training():
+            self.train()
+        query = normalize(query_vector)
+        if query is None or not self.is_trained or query.size != self.matrix.dimensions:
+            return []
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._rows(cluster) for cluster in probe])
+        if not len(rows):
+            return []
+        scores = self.matrix.vectors[rows] @ query
+        scores[~self.matrix.alive[rows]] = -np.inf
+
+        row_filter = None if accept is None else (lambda i: accept(int(rows[i])))
+        return [(int(rows[i]), score) for i, score in ranked_rows(scores, k, min_score, row_filter)]
+
+
+class HNSWIndex:
+    """
+    עטיפה ל-hnswlib: גרף HNSW על מכפלה פנימית (= דמיון קוסינוס לווקטורים מנורמלים)
+    """
+
+    def __init__(self, matrix, ef=64, M=16, ef_construction=200):
+        """
+        Args:
+            matrix: ה-EmbeddingMatrix שהאינדקס מצביע עליו
+            ef: רוחב החיפוש (גבוה יותר - recall גבוה יותר וחיפוש איטי יותר)
+            M: מספר השכנים לכל צומת בגרף
+            ef_construction: רוחב החיפוש בבניית הגרף
+        """
+        import hnswlib
+
+        self._hnswlib = hnswlib
+        self.matrix = matrix
+        self.ef = ef
+        self.M = M
+        self.ef_construction = ef_construction
+        self.reset()
+
+    def reset(self):
+        """
+        מוחק את הגרף; הוא ייבנה מחדש בחיפוש הבא
+        """
+        self._index = None
+
+    def needs_training(self):
+        return self._index is None
+
+    def train(self):
+        """
+        בונה את הגרף מכל השורות שאינן מחוקות
+        """
+        alive_rows = np.flatnonzero(self.matrix.alive)
+        self._index = self._hnswlib.Index(space="ip", dim=self.matrix.dimensions)
+        self._index.init_index(max_elements=max(1024, 2 * len(alive_rows)),
+                               ef_construction=self.ef_construction, M=self.M)
+        if len(alive_rows):
+            self._index.add_items(self.matrix.vectors[alive_rows], alive_rows)
+
+    def add(self, row):
+        """
+        מוסיף שורה לגרף (הוספה של תווית קיימת מעדכנת את הווקטור שלה)
+        """
+        if self._index is None:
+            return
+        if self._index.get_current_count() >= self._index.get_max_elements():
+            self._index.resize_index(2 * self._index.get_max_elements())
+        self._index.add_items(self.matrix.vectors[row][None, :], [row])
+
+    def remove(self, row):
+        """
+        מסמן את השורה כמחוקה בגרף
+        """
+        if self._index is None:
+            return
+        try:
+            self._index.mark_deleted(row)
+        except RuntimeError:
+            pass
+
+    def search(self, query_vector, k, min_score=-1.0, accept=None):
+        """
+        מחפש את k השורות הקרובות בגרף
+
+        Returns:
+            list: זוגות (שורה, דמיון) מהגבוה לנמוך
+        """
+        if self.needs_training():
+            self.train()
+        query = normalize(query_vector)
+        if query is None or not len(self.matrix) or query.size != self.matrix.dimensions:
+            return []
+        # knn_query נכשל כשמבקשים יותר תוצאות ממספר השורות שלא נמחקו
+        k_query = min(k, len(self.matrix))
+        self._index.set_ef(max(self.ef, k_query))
+        labels, distances = self._index.knn_query(query, k=k_query)
+
+        ranked = []
+        for row, distance in zip(labels[0].tolist(), distances[0].tolist()):
+            score = 1.0 - distance
+            if score >= min_score and self.matrix.alive[row] and (accept is None or accept(row)):
+                ranked.append((row, score))
+        return ranked
+
+
+def create_ann_index(kind, matrix, **options):
+    """
+    יוצר אינדקס ANN לפי סוג
+
+    Args:
+        kind: "ivf", "hnsw", או "auto" (hnsw אם hnswlib מותקנת, אחרת ivf)
+        matrix: ה-EmbeddingMatrix
+        **options: פרמטרים לאינדקס (nlist/nprobe ל-ivf, ef/M ל-hnsw)
+
+    Returns:
+        האינדקס
+    """
+    if kind == "auto":
+        kind = "hnsw" if HNSWLIB_AVAILABLE else "ivf"
+    if kind == "hnsw":
+        if HNSWLIB_AVAILABLE:
+            return HNSWIndex(matrix, **options)
+        logger.warning("החבילה hnswlib לא מותקנת - משתמש באינדקס IVF")
+        kind, options = "ivf", {}
+    if kind == "ivf":
+        return IVFFlatIndex(matrix, **options)
+    raise ValueError(f"סוג אינדקס לא מוכר: {kind}")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+שמירת מצב השיחה מחוץ לתהליך
+---------------------------
+
+היסטוריית השיחה של AgentContext (שיחות, סוכנים, מידע משותף) וההיסטוריה
+של BaseAgent נשמרו רק בזיכרון התהליך: הן אבדו בהפעלה מחדש ולא היו זמינות
+לתהליכי worker אחרים. המודול מגדיר מאגר שיחות עם שני מימושים:
+- SQLiteConversationStore - ברירת המחדל, קובץ מקומי (WAL, כמה תהליכים)
+- KeyValueConversationStore - מעל לקוח בסגנון Redis (rpush/lrange/get/set);
+  ללא שרת Redis משתמשים ב-LocalKeyValue, מימוש מקומי של אותן פקודות
+
+המאגר שומר שני סוגי נתונים לכל שיחה:
+- רצפים (stream) שנכתבים רק בהוספה - רשומה אחת לכל תור, בלי לכתוב מחדש
+  את כל ההיסטוריה
+- מצב (state) - מילונים קטנים שנשמרים במלואם (למשל shared_data)
+
+הרשומות נשמרות כ-JSON מצומצם, ורשומות ארוכות נדחסות ב-zlib.
+"""
+
+import os
+import json
+import zlib
+import sqlite3
+import logging
+import threading
+import importlib.util
+from collections import defaultdict
+
+# לקוח Redis אופציונלי - נבדק בלי לייבא אותו, ונטען רק כשבוחרים CONVERSATION_STORE=redis
+REDIS_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+logger = logging.getLogger(__name__)
+
+# רשומות ארוכות מזה נדחסות
+COMPRESS_THRESHOLD = 512
+
+
+def encode_record(value):
+    """
+    מקודד רשומה לבתים: JSON מצומצם (קידומת j), או JSON דחוס (קידומת z)
+
+    Args:
+        value: ערך שניתן לייצג ב-JSON
+
+    Returns:
+        bytes: הרשומה המקודדת
+    """
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(data) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(data)
+    return b"j" + data
+
+
+def decode_record(data):
+    """
+    מפענח רשומה שקודדה ב-encode_record
+    """
+    data = bytes(data)
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]).decode("utf-8"))
+    return json.loads(data[1:].decode("utf-8"))
+
+
+class ConversationStore:
+    """
+    הממשק של מאגר השיחות. כל פעולה מקבלת את מזהה השיחה.
+    """
+
+    def append(self, session_id, stream, record):
+        """מוסיף רשומה לסוף הרצף stream"""
+        raise NotImplementedError
+
+    def read(self, session_id, stream, start=0):
+        """מחזיר את רשומות הרצף החל מהמיקום start"""
+        raise NotImplementedError
+
+    def replace(self, session_id, stream, records):
+        """מחליף את כל רשומות הרצף (לדחיסת רצף שהתקצר בזיכרון)"""
+        raise NotImplementedError
+
+    def set_state(self, session_id, name, value):
+        """שומר ערך מצב בשם name"""
+        raise NotImplementedError
+
+    def get_state(self, session_id, name, default=None):
+        """מחזיר ערך מצב, או default"""
+        raise NotImplementedError
+
+    def delete_session(self, session_id):
+        """מוחק את כל הנתונים של השיחה"""
+        raise NotImplementedError
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    מאגר שיחות בקובץ SQLite. מצב WAL מאפשר לכמה תהליכים לקרוא ולכתוב לאותו קובץ.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: נתיב לקובץ ה-SQLite (":memory:" - בזיכרון בלבד)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+            " stream TEXT NOT NULL, data BLOB NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS records_by_stream ON records (session_id, stream, seq);"
+            "CREATE TABLE IF NOT EXISTS state ("
+            " session_id TEXT NOT NULL, name TEXT NOT NULL, data BLOB NOT NULL,"
+            " PRIMARY KEY (session_id, name));"
+        )
+        self._db.commit()
+
+    def append(self, session_id, stream, record):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO records (session_id, stream, data) VALUES (?, ?, ?)",
+                (session_id, stream, encode_record(record))
+            )
+            self._db.commit()
+
+    def read(self, session_id, stream, start=0):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM records WHERE session_id = ? AND stream = ? ORDER BY seq LIMIT -1 OFFSET ?",
+                (session_id, stream, start)
+            ).fetchall()
+        return [decode_record(data) for (data,) in rows]
+
+    def replace(self, session_id, stream, records):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM records WHERE session_id = ? AND stream = ?", (session_id, stream))
+                self._db.executemany(
+                    "INSERT INTO records (session_id, stream, data) VALUES (?, ?, ?)",
+                    [(session_id, stream, encode_record(record)) for record in records]
+                )
+
+    def set_state(self, session_id, name, value):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO state (session_id, name, data) VALUES (?, ?, ?)",
+                (session_id, name, encode_record(value))
+            )
+            self._db.commit()
+
+    def get_state(self, session_id, name, default=None):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM state WHERE session_id = ? AND name = ?", (session_id, name)
+            ).fetchone()
+        return decode_record(row[0]) if row else default
+
+    def delete_session(self, session_id):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM records WHERE session_id = ?", (session_id,))
+                self._db.execute("DELETE FROM state WHERE session_id = ?", (session_id,))
+
+
+class LocalKeyValue:
+    """
+    מימוש מקומי בזיכרון של פקודות Redis שהמאגר משתמש בהן, לפיתוח ולבדיקות
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lists = defaultdict(list)
+        self._sets = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def rpush(self, key, *values):
+        with self._lock:
+            self._lists[key].extend(values)
+            return len(self._lists[key])
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            items = self._lists.get(key, [])
+            return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key)
+
+    def sadd(self, key, *members):
+        with self._lock:
+            self._sets[key].update(members)
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._sets.get(key, ()))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+                self._lists.pop(key, None)
+                self._sets.pop(key, None)
+
+
+class KeyValueConversationStore(ConversationStore):
+    """
+    מאגר שיחות מעל לקוח בסגנון Redis. כל רצף הוא רשימה (rpush/lrange), כל
+    ערך מצב הוא מפתח, והמפתחות של כל שיחה נרשמים בקבוצה למחיקה. הרישום
+    (SADD) נשלח עם כל כתיבה: הפקודה אידמפוטנטית, ומטמון מקומי של מפתחות
+    רשומים היה גדל בלי הגבלה ומתיישן כשתהליך אחר מוחק את השיחה.
+    """
+
+    def __init__(self, client=None, prefix="conversation"):
+        """
+        Args:
+            client: לקוח redis.Redis, או None ל-LocalKeyValue
+            prefix: קידומת המפתחות
+        """
+        self.client = client if client is not None else LocalKeyValue()
+        self.prefix = prefix
+
+    def _key(self, session_id, kind, name):
+        return f"{self.prefix}:{session_id}:{kind}:{name}"
+
+    def _write_key(self, session_id, kind, name):
+        """
+        מחזיר את המפתח לכתיבה, אחרי שנרשם בקבוצת המפתחות של השיחה
+        """
+        key = self._key(session_id, kind, name)
+        self.client.sadd(f"{self.prefix}:{session_id}:keys", key)
+        return key
+
+    def append(self, session_id, stream, record):
+        self.client.rpush(self._write_key(session_id, "stream", stream), encode_record(record))
+
+    def read(self, session_id, stream, start=0):
+        return [decode_record(data) for data in self.client.lrange(self._key(session_id, "stream", stream), start, -1)]
+
+    def replace(self, session_id, stream, records):
+        key = self._write_key(session_id, "stream", stream)
+        self.client.delete(key)
+        if records:
+            self.client.rpush(key, *[encode_record(record) for record in records])
+
+    def set_state(self, session_id, name, value):
+        self.client.set(self._write_key(session_id, "state", name), encode_record(value))
+
+    def get_state(self, session_id, name, default=None):
+        data = self.client.get(self._key(session_id, "state", name))
+        return decode_record(data) if data is not None else default
+
+    def delete_session(self, session_id):
+        keys_key = f"{self.prefix}:{session_id}:keys"
+        keys = list(self.client.smembers(keys_key))
+        self.client.delete(keys_key, *keys)
+
+
+def conversation_store_from_env():
+    """
+    יוצר מאגר שיחות לפי משתני הסביבה:
+    CONVERSATION_STORE - sqlite (ברירת מחדל), redis, local או none
+    CONVERSATION_STORE_PATH - קובץ ה-SQLite, REDIS_URL - כתובת שרת Redis
+
+    Returns:
+        ConversationStore, או None אם השמירה כבויה
+    """
+    kind = os.environ.get("CONVERSATION_STORE", "sqlite").lower()
+    if kind in ("", "none", "false", "0"):
+        return None
+    if kind == "local":
+        return KeyValueConversationStore()
+    if kind == "redis":
+        if REDIS_AVAILABLE:
+            import redis
+            return KeyValueConversationStore(redis.Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0")))
+        logger.warning("החבילה redis לא מותקנת - השיחות נשמרות במאגר מקומי בזיכרון")
+        return KeyValueConversationStore()
+    return SQLiteConversationStore(os.environ.get("CONVERSATION_STORE_PATH", os.path.join("cache", "conversations.sqlite")))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מטמון embeddings לפי תוכן
+-------------------------
+
+אותם טקסטים (תיאורי מוצרים, שאלות חוזרות) הוטמעו מחדש אחרי כל הפעלה ובכל
+הוספה כפולה. המטמון שומר כל וקטור בטבלת SQLite כ-BLOB של float32, לפי
+המפתח (מודל, מימד, sha256 של הטקסט) - טקסט זהה לא נשלח שוב ל-API.
+
+כשהגודל הכולל של הווקטורים עובר את max_bytes, הרשומות שלא נקראו הכי הרבה
+זמן נמחקות (LRU) עד שהמטמון יורד ל-90% מהמגבלה.
+"""
+
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+
+# פינוי מוריד את המטמון לחלק הזה מהמגבלה, כדי לא לפנות שוב בכל כתיבה
+_EVICT_TO = 0.9
+
+
+def text_digest(text):
+    """
+    מחזיר את ה-sha256 של הטקסט (hex)
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _encode(vector):
+    return array.array("f", vector).tobytes()
+
+
+def _decode(blob):
+    vector = array.array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    מטמון embeddings ב-SQLite: (מודל, מימד, sha256) -> וקטור float32
+    """
+
+    def __init__(self, db_path=None, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            db_path: נתיב לקובץ SQLite (None - בזיכרון בלבד)
+            max_bytes: הגודל המרבי של הווקטורים השמורים בבתים
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, dimensions INTEGER NOT NULL, digest TEXT NOT NULL, "
+            "vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, dimensions, digest))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @classmethod
+    def from_env(cls):
+        """
+        יוצר מטמון לפי משתני הסביבה, או None אם המטמון כבוי (EMBEDDING_CACHE_ENABLED=false)
+        """
+        if os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            db_path=os.environ.get("EMBEDDING_CACHE_PATH", os.path.join("cache", "embedding_cache.sqlite")) or None,
+            max_bytes=int(float(os.environ.get("EMBEDDING_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        )
+
+    def get_many(self, model, dimensions, texts):
+        """
+        מחזיר את הווקטורים השמורים של הטקסטים
+
+        Args:
+            model: מודל ההטמעה
+            dimensions: מימד הווקטורים (None למודל ללא פרמטר dimensions)
+            texts: רשימת טקסטים
+
+        Returns:
+            dict: טקסט -> וקטור, לטקסטים שנמצאו במטמון בלבד
+        """
+        digests = {text_digest(text): text for text in dict.fromkeys(texts)}
+        found = {}
+        with self._lock:
+            items = list(digests)
+            # SQLite מגביל את מספר הפרמטרים בשאילתה
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND dimensions = ? "
+                    f"AND digest IN ({','.join('?' * len(chunk))})",
+                    (model, dimensions or 0, *chunk)
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digests[digest]] = _decode(blob)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND digest = ?",
+                    [(now, model, dimensions or 0, text_digest(text)) for text in found]
+                )
+                self._db.commit()
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(digests) - len(found)
+        return found
+
+    def get(self, model, dimensions, text):
+        """
+        מחזיר את הווקטור השמור של טקסט, או None
+        """
+        return self.get_many(model, dimensions, [text]).get(text)
+
+    def set_many(self, model, dimensions, vectors):
+        """
+        שומר וקטורים במטמון (וקטורים ריקים לא נשמרים)
+
+        Args:
+            model: מודל ההטמעה
+            dimensions: מימד הווקטורים
+            vectors: dict של טקסט -> וקטור
+        """
+        now = time.time()
+        rows = [(model, dimensions or 0, text_digest(text), _encode(vector), now)
+                for text, vector in vectors.items() if len(vector)]
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                previous = self._db.execute(
+                    "SELECT LENGTH(vector) FROM embeddings WHERE model = ? AND dimensions = ? AND digest = ?",
+                    row[:3]
+                ).fetchone()
+                self._bytes += len(row[3]) - (previous[0] if previous else 0)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, digest, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._stats["stores"] += len(rows)
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def set(self, model, dimensions, text, vector):
+        """
+        שומר וקטור של טקסט אחד
+        """
+        self.set_many(model, dimensions, {text: vector})
+
+    def _evict(self):
+        target = self.max_bytes * _EVICT_TO
+        cursor = self._db.execute(
+            "SELECT model, dimensions, digest, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        evicted = []
+        for model, dimensions, digest, size in cursor:
+            if self._bytes <= target:
+                break
+            evicted.append((model, dimensions, digest))
+            self._bytes -= size
+        cursor.close()
+        self._db.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND dimensions = ? AND digest = ?", evicted
+        )
+        self._stats["evictions"] += len(evicted)
+
+    def clear(self):
+        """
+        מרוקן את המטמון
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM embeddings")
+            self._db.commit()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        מחזיר מדדי שימוש
+
+        Returns:
+            dict: hits, misses, stores, evictions, entries, bytes, hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+הטמעה (embedding) במנות ותור הטמעה ברקע
+----------------------------------------
+
+AdvancedVectorStore.add_document קרא ל-client.embeddings.create פעם אחת לכל
+מסמך, בתוך הבקשה. הטעינה של אלפי תיאורי מוצרים הייתה אלפי קריאות רצופות.
+
+- EmbeddingPipeline: מאחד טקסטים זהים, מחלק את השאר למנות עד מגבלת
+  ה-API (מספר קלטים וטוקנים לבקשה), ושולח כמה מנות במקביל תחת מגבלת קצב.
+  מנה שנכשלה נשלחת שוב עם המתנה הולכת וגדלה.
+- RateLimiter: דלי אסימונים לבקשות ולטוקנים בדקה.
+- EmbeddingQueue: תהליכון רקע שאוסף מסמכים לתור, מטמיע אותם במנות
+  ומחזיר כל וקטור ל-callback - המסמך נכנס לחיפוש כשהווקטור שלו מוכן.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tokens import count_tokens, truncate_text
+
+logger = logging.getLogger(__name__)
+
+# המגבלות של embeddings.create ב-OpenAI
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 300_000
+MAX_INPUT_TOKENS = 8191
+
+
+class RateLimiter:
+    """
+    דלי אסימונים לבקשות בדקה ולטוקנים בדקה (None - ללא הגבלה)
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            requests_per_minute: מספר הבקשות המרבי בדקה
+            tokens_per_minute: מספר הטוקנים המרבי בדקה
+            clock: פונקציית זמן (לבדיקות)
+            sleep: פונקציית המתנה (לבדיקות)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens=0):
+        """
+        ממתין עד שיש מקום לבקשה אחת עם tokens טוקנים, ותופס אותו
+        """
+        if self.tokens_per_minute:
+            # בקשה גדולה מהמגבלה לדקה לעולם לא תיכנס - מגבילים אותה לדלי המלא
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                waits = []
+                if self.requests_per_minute and self._requests < 1:
+                    waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens < tokens:
+                    waits.append((tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if not waits:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            self._sleep(max(waits))
+
+
+def make_batches(token_counts, max_inputs=MAX_BATCH_INPUTS, max_tokens=MAX_BATCH_TOKENS):
+    """
+    מחלק טקסטים למנות לפי הסדר, כך שכל מנה בתוך מגבלות הבקשה
+
+    Args:
+        token_counts: מספר הטוקנים של כל טקסט
+        max_inputs: מספר הטקסטים המרבי במנה
+        max_tokens: מספר הטוקנים המרבי במנה
+
+    Returns:
+        list: רשימות של אינדקסים, מנה לכל רשימה
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for index, tokens in enumerate(token_counts):
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingPipeline:
+    """
+    הטמעה של רשימות טקסטים במנות מקבילות, עם איחוד כפילויות ומגבלת קצב
+    """
+
+    def __init__(self, client, model, options=None, batch_size=MAX_BATCH_INPUTS,
+                 max_batch_tokens=MAX_BATCH_TOKENS, max_concurrency=4, rate_limiter=None, cache=None,
+                 max_retries=3, retry_backoff=1.0, sleep=time.sleep):
+        """
+        Args:
+            client: לקוח OpenAI
+            model: מודל ההטמעה
+            options: פרמטרים נוספים ל-embeddings.create (למשל dimensions)
+            batch_size: מספר הטקסטים המרבי בבקשה
+            max_batch_tokens: מספר הטוקנים המרבי בבקשה
+            max_concurrency: מספר הבקשות שרצות במקביל
+            rate_limiter: RateLimiter משותף (אופציונלי)
+            cache: EmbeddingCache - טקסטים שכבר הוטמעו לא נשלחים שוב (אופציונלי)
+            max_retries: מספר הניסיונות החוזרים למנה שנכשלה
+            retry_backoff: ההמתנה לפני הניסיון החוזר הראשון בשניות (מוכפלת בכל ניסיון)
+            sleep: פונקציית המתנה (לבדיקות)
+        """
+        self.client = client
+        self.model = model
+        self.options = dict(options or {})
+        self.batch_size = min(batch_size, MAX_BATCH_INPUTS)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._sleep = sleep
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "texts": 0, "duplicates": 0, "retries": 0, "failed_batches": 0}
+
+    @classmethod
+    def from_env(cls, client, model, options=None, cache=None):
+        """
+        יוצר צינור הטמעה לפי משתני הסביבה (EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY,
+        EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE, EMBEDDING_MAX_RETRIES)
+        """
+        requests_per_minute = int(os.environ.get("EMBEDDING_REQUESTS_PER_MINUTE", "0"))
+        tokens_per_minute = int(os.environ.get("EMBEDDING_TOKENS_PER_MINUTE", "0"))
+        rate_limiter = None
+        if requests_per_minute or tokens_per_minute:
+            rate_limiter = RateLimiter(requests_per_minute or None, tokens_per_minute or None)
+        return cls(
+            client, model, options,
+            batch_size=int(os.environ.get("EMBEDDING_BATCH_SIZE", str(MAX_BATCH_INPUTS))),
+            max_concurrency=int(os.environ.get("EMBEDDING_CONCURRENCY", "4")),
+            rate_limiter=rate_limiter,
+            cache=cache,
+            max_retries=int(os.environ.get("EMBEDDING_MAX_RETRIES", "3"))
+        )
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix="embedding")
+            return self._executor
+
+    def embed(self, texts):
+        """
+        מטמיע רשימת טקסטים
+
+        Args:
+            texts: רשימת טקסטים
+
+        Returns:
+            list: וקטור לכל טקסט, לפי הסדר (רשימה ריקה לטקסט שההטמעה שלו נכשלה
+                גם אחרי הניסיונות החוזרים)
+        """
+        unique = list(dict.fromkeys(texts))
+        self._count("duplicates", len(texts) - len(unique))
+        dimensions = self.options.get("dimensions")
+        vectors = self.cache.get_many(self.model, dimensions, unique) if self.cache is not None else {}
+        missing = [text for text in unique if text not in vectors]
+        if missing:
+            embedded = self._embed_missing(missing)
+            if self.cache is not None:
+                self.cache.set_many(self.model, dimensions, embedded)
+            vectors.update(embedded)
+        return [vectors[text] for text in texts]
+
+    def _embed_missing(self, unique):
+        """
+        מטמיע טקסטים ייחודיים במנות מקבילות
+
+        Returns:
+            dict: טקסט -> וקטור
+        """
+        inputs, token_counts = [], []
+        for text in unique:
+            tokens = count_tokens(text, self.model)
+            if tokens > MAX_INPUT_TOKENS:
+                text, tokens = truncate_text(text, MAX_INPUT_TOKENS, self.model, keep="head"), MAX_INPUT_TOKENS
+            inputs.append(text or " ")
+            token_counts.append(max(tokens, 1))
+
+        batches = make_batches(token_counts, self.batch_size, self.max_batch_tokens)
+        jobs = [([inputs[i] for i in batch], sum(token_counts[i] for i in batch)) for batch in batches]
+        if len(jobs) == 1:
+            results = [self._embed_batch(*jobs[0])]
+        else:
+            results = list(self._pool().map(lambda job: self._embed_batch(*job), jobs))
+
+        vectors = {}
+        for batch, batch_vectors in zip(batches, results):
+            for index, vector in zip(batch, batch_vectors):
+                vectors[unique[index]] = vector
+        return vectors
+
+    def _embed_batch(self, inputs, tokens):
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(tokens)
+            try:
+                response = self.client.embeddings.create(model=self.model, input=inputs, **self.options)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.warning("הטמעה של מנה עם %d טקסטים נכשלה: %s", len(inputs), e)
+                    self._count("failed_batches")
+                    return [[] for _ in inputs]
+                self._count("retries")
+                self._sleep(self.retry_backoff * 2 ** attempt)
+        self._count("requests")
+        self._count("texts", len(inputs))
+        data = sorted(response.data, key=lambda item: getattr(item, "index", 0))
+        return [item.embedding for item in data]
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class EmbeddingQueue:
+    """
+    תור הטמעה ברקע: מקבל זוגות (מפתח, טקסט) ומחזיר כל וקטור ל-callback
+    """
+
+    def __init__(self, pipeline, on_embedded, max_wait=0.05):
+        """
+        Args:
+            pipeline: EmbeddingPipeline שמבצע את ההטמעה
+            on_embedded: פונקציה (מפתח, וקטור) שנקראת לכל טקסט שהוטמע
+            max_wait: כמה שניות לחכות לפריטים נוספים לפני שליחת מנה חלקית
+        """
+        self.pipeline = pipeline
+        self.on_embedded = on_embedded
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, items):
+        """
+        מוסיף זוגות (מפתח, טקסט) לתור ומפעיל את תהליכון הרקע אם צריך
+        """
+        items = list(items)
+        if not items:
+            return
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("תור ההטמעה נסגר")
+            self._pending += len(items)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-queue", daemon=True)
+                self._thread.start()
+        for item in items:
+            self._queue.put(item)
+
+    @property
+    def pending(self):
+        """
+        מספר הטקסטים שעוד לא הוטמעו
+        """
+        return self._pending
+
+    def _collect(self):
+        # בכל סבב נאספים עד מנה אחת לכל בקשה מקבילה
+        limit = self.pipeline.batch_size * self.pipeline.max_concurrency
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < limit and items[-1] is not None:
+            timeout = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            stop = items[-1] is None
+            items = [item for item in items if item is not None]
+            if items:
+                try:
+                    vectors = self.pipeline.embed([text for _, text in items])
+                    for (key, _), vector in zip(items, vectors):
+                        self.on_embedded(key, vector)
+                except Exception:
+                    logger.exception("שגיאה בתור ההטמעה")
+                finally:
+                    with self._condition:
+                        self._pending -= len(items)
+                        self._condition.notify_all()
+            if stop:
+                return
+
+    def flush(self, timeout=None):
+        """
+        ממתין עד שכל הטקסטים שבתור הוטמעו
+
+        Returns:
+            bool: האם התור התרוקן לפני שעבר הזמן
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=None):
+        """
+        מטמיע את מה שנשאר בתור ועוצר את תהליכון הרקע
+        """
+        with self._condition:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+        self.pipeline.close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+אינדקס תפוגה למסמכי הזיכרון
+---------------------------
+
+forget_old_documents עבר על כל המסמכים והשווה מחרוזות ISO של תאריך התפוגה.
+האינדקס שומר ערימת מינימום של (זמן תפוגה, מזהה), כך שמציאת המסמכים שפג
+תוקפם עולה O(פגי תוקף · log n) - המסמכים שעוד בתוקף לא נסרקים בכלל.
+
+עדכון זמן תפוגה (update_document_importance) לא מחפש את הרשומה הישנה בערימה:
+נוספת רשומה חדשה, והישנה מזוהה כלא-בתוקף כשהיא יוצאת מהערימה (invalidation
+עצל). כשהרשומות הישנות מצטברות, הערימה נבנית מחדש.
+"""
+
+import heapq
+import threading
+from datetime import datetime
+
+# בנייה מחדש כשיש בערימה יותר מפי שניים רשומות מהמסמכים באינדקס
+_REBUILD_FACTOR = 2
+_REBUILD_MIN_ENTRIES = 64
+
+
+def expiry_timestamp(expiry_date):
+    """
+    ממיר תאריך תפוגה (ISO או datetime) לזמן unix, או None אם אין תאריך תקין
+    """
+    if isinstance(expiry_date, datetime):
+        return expiry_date.timestamp()
+    if not expiry_date:
+        return None
+    try:
+        return datetime.fromisoformat(expiry_date).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class ExpiryIndex:
+    """
+    ערימת מינימום של זמני תפוגה עם invalidation עצל
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expires)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._expires
+
+    def set(self, doc_id, expires_at):
+        """
+        קובע (או מעדכן) את זמן התפוגה של מסמך
+
+        Args:
+            doc_id: מזהה המסמך
+            expires_at: זמן unix, או None למסמך שלא פג
+        """
+        with self._lock:
+            if expires_at is None:
+                self._expires.pop(doc_id, None)
+                return
+            self._expires[doc_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, doc_id))
+            self._maybe_rebuild()
+
+    def discard(self, doc_id):
+        """
+        מוציא מסמך מהאינדקס (הרשומה בערימה נזרקת כשהיא מגיעה לראש)
+        """
+        with self._lock:
+            self._expires.pop(doc_id, None)
+            self._maybe_rebuild()
+
+    def pop_expired(self, now):
+        """
+        מוציא מהאינדקס את המסמכים שזמן התפוגה שלהם עבר
+
+        Args:
+            now: זמן unix נוכחי
+
+        Returns:
+            רשימת מזהים, מהמסמך שפג ראשון
+        """
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] < now:
+                expires_at, doc_id = heapq.heappop(self._heap)
+                if self._expires.get(doc_id) == expires_at:
+                    del self._expires[doc_id]
+                    expired.append(doc_id)
+        return expired
+
+    def next_expiry(self):
+        """
+        זמן התפוגה הקרוב ביותר, או None אם האינדקס ריק
+        """
+        with self._lock:
+            while self._heap and self._expires.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+            self._expires = {}
+
+    def _maybe_rebuild(self):
+        if len(self._heap) > max(_REBUILD_MIN_ENTRIES, _REBUILD_FACTOR * len(self._expires)):
+            self._heap = [(expires_at, doc_id) for doc_id, expires_at in self._expires.items()]
+            heapq.heapify(self._heap)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+אינדקס הפוך להיסטוריית השיחה
+----------------------------
+
+get_relevant_history חישב מחדש בכל קריאה ציון חפיפת מילים מול כל הודעה
+בהיסטוריה (בדיקת תת-מחרוזת לכל מילה בשאילתה). האינדקס מתעדכן בכל הודעה
+שנוספת או נזרקת, ומחזיר ציוני BM25 רק להודעות שמכילות מילה מהשאילתה,
+כך שעלות החיפוש תלויה במספר ההתאמות ולא באורך ההיסטוריה.
+
+אופציונלית, ניתן לשלב דמיון embeddings: ה-embedding של כל הודעה מחושב
+פעם אחת ונשמר באינדקס.
+"""
+
+import re
+import math
+from collections import defaultdict
+
+# אותיות שימוש נפוצות בתחילת מילה בעברית (ה, ו, ב, ל, מ, ש, כ)
+HEBREW_PREFIXES = "הובלמשכ"
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    מפרק טקסט למונחים. למילה עברית שמתחילה באות שימוש נוסף גם המונח בלעדיה,
+    כדי ש"המוצרים" ו"מוצרים" יתאימו זה לזה.
+
+    Args:
+        text: הטקסט
+
+    Returns:
+        list: המונחים
+    """
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        terms.append(word)
+        if len(word) > 3 and word[0] in HEBREW_PREFIXES and "\u0590" <= word[1] <= "\u05ff":
+            terms.append(word[1:])
+    return terms
+
+
+def cosine_similarity(a, b):
+    """
+    דמיון קוסינוס בין שני וקטורים
+    """
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class HistoryIndex:
+    """
+    אינדקס BM25 הפוך מעל הודעות. כל הודעה מזוהה לפי האובייקט שלה, ומקבלת
+    מספר סידורי לפי סדר ההוספה (לחישוב עדיפות להודעות אחרונות).
+    """
+
+    def __init__(self, k1=1.5, b=0.75, max_document_ratio=0.5, embed=None):
+        """
+        Args:
+            k1: רוויית תדירות המונח ב-BM25
+            b: נרמול לפי אורך ההודעה ב-BM25
+            max_document_ratio: מונחים שמופיעים ביותר מחלק זה של ההודעות לא
+                נספרים - משקל ה-IDF שלהם כמעט אפס, והם היו הופכים כל הודעה למועמדת
+            embed: פונקציה שמחזירה embedding לטקסט (אופציונלי)
+        """
+        self.k1 = k1
+        self.b = b
+        self.max_document_ratio = max_document_ratio
+        self.embed = embed
+        self._postings = defaultdict(dict)  # מונח -> {מזהה הודעה: תדירות}
+        self._terms = {}  # מזהה הודעה -> המונחים שלה
+        self._lengths = {}
+        self._items = {}
+        self._sequence = {}
+        self._embeddings = {}
+        self._total_length = 0
+        self._next_sequence = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item, text):
+        """
+        מוסיף הודעה לאינדקס
+
+        Args:
+            item: ההודעה (האובייקט נשמר ומזהה אותה)
+            text: הטקסט לאינדוקס
+        """
+        key = id(item)
+        if key in self._items:
+            return
+        terms = tokenize(text or "")
+        counts = defaultdict(int)
+        for term in terms:
+            counts[term] += 1
+        for term, count in counts.items():
+            self._postings[term][key] = count
+        self._terms[key] = list(counts)
+        self._lengths[key] = len(terms)
+        self._items[key] = item
+        self._sequence[key] = self._next_sequence
+        self._next_sequence += 1
+        self._total_length += len(terms)
+
+    def remove(self, item):
+        """
+        מסיר הודעה מהאינדקס (למשל כשהיא נזרקת מההיסטוריה)
+        """
+        key = id(item)
+        if key not in self._items:
+            return
+        for term in self._terms.pop(key):
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(key)
+        del self._items[key]
+        del self._sequence[key]
+        self._embeddings.pop(key, None)
+
+    def sequence(self, item):
+        """
+        מחזיר את המספר הסידורי של ההודעה באינדקס, או None
+        """
+        return self._sequence.get(id(item))
+
+    def search(self, query):
+        """
+        מחשב ציוני BM25 להודעות שמכילות לפחות מונח אחד מהשאילתה
+
+        Args:
+            query: השאילתה
+
+        Returns:
+            dict: מזהה הודעה -> (ההודעה, ציון)
+        """
+        if not self._items:
+            return {}
+        count = len(self._items)
+        average_length = self._total_length / count or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings or (count > 2 and len(postings) > count * self.max_document_ratio):
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average_length)
+                scores[key] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return {key: (self._items[key], score) for key, score in scores.items()}
+
+    def embedding_similarity(self, item, text, query_vector):
+        """
+        מחזיר את דמיון ה-embedding בין ההודעה לשאילתה. ה-embedding של
+        ההודעה מחושב בפעם הראשונה בלבד.
+        """
+        key = id(item)
+        vector = self._embeddings.get(key)
+        if vector is None:
+            vector = self.embed(text)
+            if key in self._items:
+                self._embeddings[key] = vector
+        return cosine_similarity(vector, query_vector)
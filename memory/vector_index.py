@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מטריצת embeddings לחיפוש וקטורי
+-------------------------------
+
+AdvancedVectorStore שמר את ה-embedding של כל מסמך כרשימת float של Python,
+והחיפוש החזיר את המסמכים הראשונים בלי להשוות אותם לשאילתה. המטריצה שומרת
+את כל הווקטורים ברצף אחד של float32, מנורמלים לאורך 1, כך שדמיון קוסינוס
+לכל המסמכים הוא מכפלת מטריצה בווקטור אחת, והבחירה של k הטובים ביותר
+נעשית ב-argpartition בלי למיין את כל הציונים.
+
+מחיקה מסמנת את השורה כמחוקה (tombstone); השורות נדחסות כשיותר ממחציתן מחוקות.
+מטריצה שנטענה מהדיסק (from_arrays) עוטפת memmap לקריאה בלבד בלי להעתיק אותו,
+ומועתקת לזיכרון רק בשינוי הראשון.
+"""
+
+import numpy as np
+
+
+def normalize(vector):
+    """
+    מחזיר את הווקטור כ-float32 מנורמל לאורך 1 (או None לווקטור ריק/אפס)
+    """
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    if not vector.size or norm == 0:
+        return None
+    return vector / norm
+
+
+class EmbeddingMatrix:
+    """
+    מזהה מסמך -> שורה במטריצת float32 רציפה עם וקטורים מנורמלים
+    """
+
+    def __init__(self, dimensions=None, capacity=1024):
+        """
+        Args:
+            dimensions: מימד הווקטורים (ברירת מחדל: לפי הווקטור הראשון)
+            capacity: מספר השורות שמוקצות מראש (המטריצה מוכפלת כשהיא מתמלאת)
+        """
+        self.dimensions = dimensions
+        self._capacity = capacity
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self.ids = []  # שורה -> מזהה מסמך (None לשורה מחוקה)
+        self._rows = {}  # מזהה מסמך -> שורה
+        self._count = 0
+
+    @classmethod
+    def from_arrays(cls, vectors, ids):
+        """
+        עוטף וקטורים מנורמלים שמורים (למשל memmap לקריאה בלבד) בלי להעתיק אותם
+
+        Args:
+            vectors: מערך float32 בגודל (שורות, מימד)
+            ids: מערך מזהי המסמכים לפי השורות
+
+        Returns:
+            EmbeddingMatrix
+        """
+        matrix = cls(dimensions=vectors.shape[1] if len(ids) else None)
+        if len(ids):
+            matrix._vectors = vectors
+        matrix._alive = np.ones(len(ids), dtype=bool)
+        matrix.ids = ids
+        # מפת המזהים נבנית רק כשצריך אותה - לא בטעינה
+        matrix._rows = None
+        matrix._count = len(ids)
+        return matrix
+
+    @property
+    def rows(self):
+        """
+        מזהה מסמך -> שורה
+        """
+        if self._rows is None:
+            ids = self.ids.tolist() if isinstance(self.ids, np.ndarray) else self.ids
+            self._rows = {doc_id: row for row, doc_id in enumerate(ids) if doc_id is not None}
+        return self._rows
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, doc_id):
+        return doc_id in self.rows
+
+    def _make_writable(self):
+        """
+        מעתיק לזיכרון מטריצה שנטענה לקריאה בלבד, לפני השינוי הראשון
+        """
+        if isinstance(self.ids, np.ndarray):
+            self.ids = self.ids.tolist()
+        if self._vectors is not None and not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors)
+
+    @property
+    def vectors(self):
+        """
+        השורות שבשימוש (כולל מחוקות - ראה alive)
+        """
+        if self._vectors is None:
+            return np.zeros((0, self.dimensions or 0), dtype=np.float32)
+        return self._vectors[:len(self.ids)]
+
+    @property
+    def alive(self):
+        """
+        מסכה בוליאנית של השורות שאינן מחוקות
+        """
+        return self._alive[:len(self.ids)]
+
+    def add(self, doc_id, vector):
+        """
+        מוסיף (או מחליף) את הווקטור של מסמך
+
+        Returns:
+            int: השורה של המסמך, או None אם הווקטור ריק
+        """
+        vector = normalize(vector)
+        if vector is None:
+            return None
+        if self.dimensions is None:
+            self.dimensions = vector.size
+        elif vector.size != self.dimensions:
+            raise ValueError(f"מימד הווקטור {vector.size} שונה ממימד המאגר {self.dimensions}")
+
+        row = self.rows.get(doc_id)
+        if row is not None:
+            self._make_writable()
+            self._vectors[row] = vector
+            return row
+
+        row = len(self.ids)
+        self._reserve(row + 1)
+        self._make_writable()
+        self._vectors[row] = vector
+        self._alive[row] = True
+        self.ids.append(doc_id)
+        self.rows[doc_id] = row
+        self._count += 1
+        return row
+
+    def _reserve(self, size):
+        if self._vectors is not None and size <= self._vectors.shape[0]:
+            return
+        capacity = max(self._capacity, size, 2 * (0 if self._vectors is None else self._vectors.shape[0]))
+        vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        if self._vectors is not None:
+            vectors[:len(self.ids)] = self._vectors[:len(self.ids)]
+            alive[:len(self.ids)] = self._alive[:len(self.ids)]
+        self._vectors, self._alive = vectors, alive
+
+    def remove(self, doc_id):
+        """
+        מסמן את השורה של המסמך כמחוקה
+
+        Returns:
+            bool: האם המסמך היה במטריצה
+        """
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return False
+        self._make_writable()
+        self._alive[row] = False
+        self.ids[row] = None
+        self._count -= 1
+        return True
+
+    def needs_compaction(self):
+        """
+        האם יותר ממחצית השורות מחוקות
+        """
+        return len(self.ids) > 64 and self._count < len(self.ids) / 2
+
+    def compact(self):
+        """
+        מוחק פיזית את השורות המסומנות כמחוקות (המספור של השורות משתנה)
+        """
+        keep = np.flatnonzero(self.alive)
+        self._vectors = np.ascontiguousarray(self.vectors[keep])
+        self._alive = np.ones(len(keep), dtype=bool)
+        self.ids = [self.ids[row] for row in keep.tolist()]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def scores(self, query_vector):
+        """
+        מחזיר את דמיון הקוסינוס של השאילתה לכל השורות (שורה מחוקה: -inf)
+        """
+        query = normalize(query_vector)
+        if query is None or not len(self.ids) or query.size != self.dimensions:
+            return np.full(len(self.ids), -np.inf, dtype=np.float32)
+        scores = self.vectors @ query
+        scores[~self.alive] = -np.inf
+        return scores
+
+    def top_k(self, query_vector, k, min_score=-1.0, accept=None):
+        """
+        מחזיר את k השורות הדומות ביותר לשאילתה, מהדומה ביותר
+
+        Args:
+            query_vector: וקטור השאילתה
+            k: מספר התוצאות
+            min_score: דמיון מינימלי
+            accept: פונקציה אופציונלית (מזהה מסמך) -> bool לסינון התוצאות
+
+        Returns:
+            list: זוגות (מזהה מסמך, דמיון)
+        """
+        scores = self.scores(query_vector)
+        row_filter = None if accept is None else (lambda row: accept(self.ids[row]))
+        return [(self.ids[row], score) for row, score in ranked_rows(scores, k, min_score, row_filter)]
+
+
+def ranked_rows(scores, k, min_score=-1.0, accept=None):
+    """
+    בוחר את k הציונים הגבוהים (מעל min_score) בלי למיין את כל המערך
+
+    Args:
+        scores: מערך הציונים
+        k: מספר התוצאות
+        min_score: ציון מינימלי
+        accept: פונקציה אופציונלית (שורה) -> bool; השורות נבדקות מהציון הגבוה
+            לנמוך עד שנמצאו k שורות מתאימות
+
+    Returns:
+        list: זוגות (שורה, ציון) מהגבוה לנמוך
+    """
+    if k <= 0 or not len(scores):
+        return []
+    # עם סינון, מתחילים מחלון של 8k המועמדים הטובים ומגדילים אותו רק אם לא
+    # נמצאו מספיק שורות מתאימות (פי 4 בכל פעם) - בלי למיין את כל המערך
+    window = k if accept is None else 8 * k
+    checked = set()
+    ranked = []
+    while True:
+        if window < len(scores):
+            candidates = np.argpartition(-scores, window - 1)[:window]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[scores[candidates] >= min_score]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        for row in candidates.tolist():
+            if row in checked:
+                continue
+            checked.add(row)
+            if accept is None or accept(row):
+                ranked.append((row, float(scores[row])))
+                if len(ranked) == k:
+                    return ranked
+        if window >= len(scores) or len(candidates) < window:
+            return sorted(ranked, key=lambda item: -item[1])
+        window *= 4
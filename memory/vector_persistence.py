@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+שמירה וטעינה של מאגר הזיכרון הווקטורי
+-------------------------------------
+
+save() לא עשה כלום, וכל הזיכרונות אבדו ביציאה. המאגר נשמר בתיקייה
+<persist_directory>/<collection_name>:
+
+- vectors.<n>.npy: מטריצת float32 של הווקטורים המנורמלים (נטענת כ-memmap
+  לקריאה בלבד - בלי העתקה, ותהליכים שונים חולקים את אותם דפי זיכרון)
+- ids.<n>.npy: מזהה המסמך של כל שורה במטריצה
+- snapshot.json: מספר הגרסה (n) של המטריצה הנוכחית. הקובץ מוחלף אטומית
+  אחרי שהמטריצה החדשה נכתבה, כך שקריסה באמצע שמירה משאירה את הגרסה הקודמת
+- documents.sqlite: התוכן והמטא-דאטה של המסמכים. כל שינוי נכתב מיד
+  (SQLite במצב WAL), כך שאין צורך לקרוא את כל המסמכים בטעינה. זמן התפוגה
+  נשמר גם בעמודה מאונדקסת, כך שהשכחה שולפת רק את המסמכים שפג תוקפם
+- vectors.journal: יומן של וקטורים שנוספו ונמחקו מאז השמירה האחרונה.
+  הטעינה משחזרת את היומן מעל המטריצה, ו-save() כותב מטריצה חדשה ומרוקן אותו.
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .expiry_index import expiry_timestamp
+from .vector_index import EmbeddingMatrix
+
+SNAPSHOT_FILE = "snapshot.json"
+DOCUMENTS_FILE = "documents.sqlite"
+JOURNAL_FILE = "vectors.journal"
+
+
+class DocumentTable(MutableMapping):
+    """
+    מזהה מסמך -> {"content", "metadata"}, שמור בטבלת SQLite
+    """
+
+    def __init__(self, path, read_only=False):
+        """
+        Args:
+            path: נתיב לקובץ SQLite
+            read_only: פתיחה לקריאה בלבד (תהליכים שרק מחפשים)
+        """
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents "
+            "(id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL, expires_at REAL)"
+        )
+        self._add_expiry_column()
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_expires_at ON documents (expires_at)")
+        self._db.commit()
+
+    def _add_expiry_column(self):
+        # קבצים שנשמרו לפני שנוספה עמודת התפוגה - מילוי חד-פעמי מהמטא-דאטה
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(documents)")]
+        if "expires_at" in columns:
+            return
+        self._db.execute("ALTER TABLE documents ADD COLUMN expires_at REAL")
+        rows = self._db.execute("SELECT id, json_extract(metadata, '$.expiry_date') FROM documents").fetchall()
+        self._db.executemany("UPDATE documents SET expires_at = ? WHERE id = ?",
+                             [(expiry_timestamp(expiry_date), doc_id) for doc_id, expiry_date in rows])
+
+    @staticmethod
+    def _decode(content, metadata):
+        return {"content": content, "metadata": json.loads(metadata)}
+
+    def __getitem__(self, doc_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content, metadata FROM documents WHERE id = ?", (str(doc_id),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(doc_id)
+        return self._decode(*row)
+
+    def __setitem__(self, doc_id, document):
+        self.update_many({doc_id: document})
+
+    def update_many(self, documents):
+        """
+        כותב מסמכים רבים בטרנזקציה אחת
+
+        Args:
+            documents: dict של מזהה -> {"content", "metadata"}
+        """
+        rows = [(str(doc_id), document["content"], json.dumps(document["metadata"], ensure_ascii=False, default=str),
+                 expiry_timestamp(document["metadata"].get("expiry_date")))
+                for doc_id, document in documents.items()]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (id, content, metadata, expires_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    def __delitem__(self, doc_id):
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM documents WHERE id = ?", (str(doc_id),))
+            self._db.commit()
+        if cursor.rowcount == 0:
+            raise KeyError(doc_id)
+
+    def __contains__(self, doc_id):
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM documents WHERE id = ?", (str(doc_id),)
+            ).fetchone() is not None
+
+    def __iter__(self):
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT id FROM documents")]
+        return iter(ids)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def items(self):
+        # שאילתה אחת במקום שאילתה לכל מסמך
+        with self._lock:
+            rows = self._db.execute("SELECT id, content, metadata FROM documents").fetchall()
+        return [(doc_id, self._decode(content, metadata)) for doc_id, content, metadata in rows]
+
+    def expired(self, now):
+        """
+        המסמכים שזמן התפוגה שלהם עבר (דרך האינדקס - בלי לסרוק את הטבלה)
+
+        Args:
+            now: זמן unix נוכחי
+
+        Returns:
+            רשימת מזהים, מהמסמך שפג ראשון
+        """
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT id FROM documents WHERE expires_at < ? ORDER BY expires_at", (now,)
+            )]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM documents")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class VectorJournal:
+    """
+    יומן הוספות ומחיקות של וקטורים (שורת JSON לכל פעולה)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def add(self, doc_id, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        self._write({"op": "add", "id": doc_id, "vector": base64.b64encode(vector.tobytes()).decode("ascii")})
+
+    def remove(self, doc_id):
+        self._write({"op": "delete", "id": doc_id})
+
+    def clear(self):
+        self._write({"op": "clear"})
+
+    def truncate(self):
+        """
+        מרוקן את היומן (אחרי שמירת מטריצה חדשה)
+        """
+        with self._lock:
+            self._file.truncate(0)
+            self._file.seek(0)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_journal(path):
+    """
+    קורא את רשומות היומן; שורה אחרונה חלקית (קריסה באמצע כתיבה) מדולגת
+
+    Yields:
+        (פעולה, מזהה, וקטור או None)
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            vector = None
+            if record["op"] == "add":
+                vector = np.frombuffer(base64.b64decode(record["vector"]), dtype=np.float32)
+            yield record["op"], record.get("id"), vector
+
+
+def _read_snapshot(directory):
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as snapshot:
+        return json.load(snapshot)
+
+
+def _matrix_paths(directory, generation):
+    return (os.path.join(directory, f"vectors.{generation}.npy"),
+            os.path.join(directory, f"ids.{generation}.npy"))
+
+
+def save_matrix(directory, matrix):
+    """
+    כותב את השורות שאינן מחוקות כגרסה חדשה של המטריצה, ומוחק את הגרסה הקודמת
+    (תהליך שכבר פתח אותה ממשיך לקרוא ממנה עד שהוא טוען מחדש)
+    """
+    snapshot = _read_snapshot(directory)
+    previous = None if snapshot is None else snapshot["generation"]
+    generation = 0 if previous is None else previous + 1
+    keep = np.flatnonzero(matrix.alive)
+    vectors = np.ascontiguousarray(matrix.vectors[keep], dtype=np.float32)
+    ids = np.array([str(matrix.ids[row]) for row in keep.tolist()], dtype=str)
+    vectors_path, ids_path = _matrix_paths(directory, generation)
+    np.save(vectors_path, vectors)
+    np.save(ids_path, ids)
+
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    with open(snapshot_path + ".tmp", "w", encoding="utf-8") as snapshot:
+        json.dump({"generation": generation, "rows": len(ids)}, snapshot)
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+
+    if previous is not None:
+        for path in _matrix_paths(directory, previous):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def load_matrix(directory):
+    """
+    פותח את המטריצה השמורה כ-memmap לקריאה בלבד (בלי העתקה)
+
+    Returns:
+        EmbeddingMatrix, או מטריצה ריקה אם לא נשמרה מטריצה
+    """
+    snapshot = _read_snapshot(directory)
+    # מערך ריק לא ניתן למיפוי לזיכרון
+    if snapshot is None or not snapshot["rows"]:
+        return EmbeddingMatrix()
+    vectors_path, ids_path = _matrix_paths(directory, snapshot["generation"])
+    return EmbeddingMatrix.from_arrays(np.load(vectors_path, mmap_mode="r"), np.load(ids_path, mmap_mode="r"))
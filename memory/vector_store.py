@@ -16,19 +16,24 @@ import os
 import json
 import uuid
 import time
+import logging
+import threading
+import importlib.util
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple, Union
-from openai import OpenAI
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 
-# מנסה לייבא חבילות אופציונליות
-try:
-    import chromadb
-    from chromadb.config import Settings
-    import numpy as np
-    from sklearn.cluster import KMeans
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
+from .expiry_index import ExpiryIndex
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+# בודק אם החבילות האופציונליות מותקנות בלי לייבא אותן - הייבוא שלהן איטי,
+# והן נטענות רק כשמשתמשים בהן
+CHROMADB_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("chromadb", "numpy", "sklearn")
+)
 
 # מחלקת ImportanceScorer מדומה אם chromadb לא זמין
 class ImportanceScorer:
@@ -36,7 +41,7 @@ class ImportanceScorer:
     מחלקה לזיהוי וניקוד חשיבות של מידע.
     """
     
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: "OpenAI"):
         """
         אתחול מנגנון ניקוד חשיבות.
         
@@ -65,8 +70,11 @@ class AdvancedVectorStore:
     מחלקה לשמירת מידע בצורה וקטורית עם יכולות מתקדמות.
     """
     
-    def __init__(self, client: OpenAI, collection_name: str = "woo_agent_memory", persist_directory: str = "memory_db", 
-                 importance_threshold: float = 0.6, ttl_days: int = 30, use_advanced_embeddings: bool = True):
+    def __init__(self, client: "OpenAI", collection_name: str = "woo_agent_memory", persist_directory: str = "memory_db", 
+                 importance_threshold: float = 0.6, ttl_days: int = 30, use_advanced_embeddings: bool = True,
+                 embedding_dimensions: int = 1536, ann_index: Optional[str] = None,
+                 ann_options: Optional[Dict[str, Any]] = None, ann_min_documents: int = 10000,
+                 embedding_pipeline: Optional[Any] = None, embedding_cache: Optional[Any] = None):
         """
         אתחול מערכת הזיכרון המתקדמת.
         
@@ -77,6 +85,13 @@ class AdvancedVectorStore:
             importance_threshold: סף חשיבות לשמירת מידע (ברירת מחדל: 0.6)
             ttl_days: מספר ימים לשמירת מידע לפני שכחה (ברירת מחדל: 30)
             use_advanced_embeddings: האם להשתמש במודל הטמעה מתקדם (ברירת מחדל: True)
+            embedding_dimensions: מימד הווקטורים במודלי text-embedding-3 (ברירת מחדל: 1536)
+            ann_index: אינדקס חיפוש משוער - "ivf", "hnsw" או "auto" (ברירת מחדל: None - חיפוש מדויק)
+            ann_options: פרמטרים לאינדקס, למשל {"nprobe": 16} או {"ef": 128} (אופציונלי)
+            ann_min_documents: מספר המסמכים שממנו החיפוש עובר לאינדקס המשוער (ברירת מחדל: 10000)
+            embedding_pipeline: EmbeddingPipeline להטמעה במנות (ברירת מחדל: לפי משתני הסביבה)
+            embedding_cache: EmbeddingCache לווקטורים שכבר חושבו (ברירת מחדל: לפי משתני הסביבה -
+                EmbeddingCache.from_env(), שמחזיר None כש-EMBEDDING_CACHE_ENABLED=false)
         """
         self.client = client
         self.persist_directory = persist_directory
@@ -91,6 +106,70 @@ class AdvancedVectorStore:
         
         # מודל הטמעה מתקדם
         self.embedding_model = "text-embedding-3-large" if use_advanced_embeddings else "text-embedding-ada-002"
+        self.embedding_dimensions = embedding_dimensions
+        
+        # ה-embeddings נשמרים במטריצת float32 אחת לחיפוש מהיר, ומעליה אינדקס
+        # משוער אופציונלי למאגרים גדולים
+        self.ann_min_documents = ann_min_documents
+        self._embedding_pipeline = embedding_pipeline
+        if embedding_cache is None:
+            from .embedding_cache import EmbeddingCache
+            embedding_cache = EmbeddingCache.from_env()
+        self.embedding_cache = embedding_cache
+        self._embedding_queue = None
+        # מסמכים שההטמעה שלהם נכשלה (אין להם וקטור, ולכן הם לא נמצאים בחיפוש)
+        self._unembedded = set()
+        self._ann_kind = ann_index
+        self._ann_options = dict(ann_options or {})
+        self._lock = threading.RLock()
+        
+        # שמירה לדיסק: יומן הווקטורים נפתח אחרי save() או load()
+        self._journal = None
+        self.read_only = False
+        self._reset_matrix()
+        
+        # זמני התפוגה של המסמכים, ותהליכון הרקע שמוחק מסמכים שפג תוקפם
+        self._expiry = ExpiryIndex()
+        self._sweeper = None
+        self._sweeper_stop = threading.Event()
+    
+    def _reset_matrix(self, matrix: Optional[Any] = None) -> None:
+        """
+        מחליף את מטריצת ה-embeddings (ברירת מחדל: מטריצה ריקה) ויוצר אינדקס משוער חדש
+        מעליה (numpy נטען רק כאן).
+        """
+        if matrix is None:
+            from .vector_index import EmbeddingMatrix
+            matrix = EmbeddingMatrix()
+        self._matrix = matrix
+        self.ann_index = None
+        if self._ann_kind:
+            from .ann_index import create_ann_index
+            self.ann_index = create_ann_index(self._ann_kind, self._matrix, **self._ann_options)
+    
+    def build_index(self) -> None:
+        """
+        מאמן את האינדקס המשוער מראש, כדי שהחיפוש הראשון לא יחכה לאימון.
+        """
+        with self._lock:
+            if self.ann_index is not None and self.ann_index.needs_training():
+                self.ann_index.train()
+    
+    def _add_vector(self, doc_id: str, embedding: List[float]) -> None:
+        """
+        מוסיף את הווקטור של מסמך למטריצה ולאינדקס המשוער. מסמך בלי וקטור
+        (ההטמעה נכשלה) נרשם ב-unembedded_documents.
+        """
+        row = self._matrix.add(doc_id, embedding)
+        if row is None:
+            logger.warning("אין וקטור למסמך %s - הוא לא ייכלל בחיפוש עד retry_embeddings()", doc_id)
+            self._unembedded.add(doc_id)
+            return
+        self._unembedded.discard(doc_id)
+        if self.ann_index is not None:
+            self.ann_index.add(row)
+        if self._journal is not None:
+            self._journal.add(doc_id, self._matrix.vectors[row])
     
     def _get_embedding(self, text: str) -> List[float]:
         """
@@ -102,17 +181,45 @@ class AdvancedVectorStore:
         Returns:
             וקטור משובץ
         """
+        options = self._embedding_options()
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(self.embedding_model, options.get("dimensions"), text)
+            if cached is not None:
+                return cached
         try:
             response = self.client.embeddings.create(
                 model=self.embedding_model,
                 input=text,
-                dimensions=1536
+                **options
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
+            if self.embedding_cache is not None:
+                self.embedding_cache.set(self.embedding_model, options.get("dimensions"), text, embedding)
+            return embedding
         except:
             # אם יש בעיה בקבלת embedding, מחזיר רשימה ריקה
             return []
     
+    def _embedding_options(self) -> Dict[str, Any]:
+        """
+        פרמטרים נוספים ל-embeddings.create - רק מודלי text-embedding-3 מקבלים את dimensions.
+        """
+        if self.embedding_model.startswith("text-embedding-3"):
+            return {"dimensions": self.embedding_dimensions}
+        return {}
+    
+    @property
+    def embedding_pipeline(self):
+        """
+        צינור ההטמעה במנות (נוצר בשימוש הראשון).
+        """
+        if self._embedding_pipeline is None:
+            from .embedding_queue import EmbeddingPipeline
+            self._embedding_pipeline = EmbeddingPipeline.from_env(
+                self.client, self.embedding_model, self._embedding_options(), cache=self.embedding_cache
+            )
+        return self._embedding_pipeline
+    
     def add_document(self, content: str, metadata: Optional[Dict[str, Any]] = None, 
                      context: Optional[str] = None, force_add: bool = False) -> Optional[str]:
         """
@@ -127,6 +234,150 @@ class AdvancedVectorStore:
         Returns:
             מזהה המסמך אם נוסף, אחרת None
         """
+        doc_id = self._new_document(content, metadata, context, force_add)
+        if doc_id is None:
+            return None
+        
+        embedding = self._get_embedding(content)
+        with self._lock:
+            if doc_id in self.documents:
+                self._add_vector(doc_id, embedding)
+        
+        return doc_id
+    
+    def add_documents(self, contents: List[str], metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+                      context: Optional[str] = None, force_add: bool = False,
+                      wait: bool = True) -> List[Optional[str]]:
+        """
+        מוסיף מסמכים רבים, עם הטמעה במנות במקום קריאה ל-API לכל מסמך.
+        
+        Args:
+            contents: תכני המסמכים
+            metadatas: מטא-דאטה לכל מסמך (אופציונלי)
+            context: הקשר לחישוב חשיבות (אופציונלי)
+            force_add: האם לכפות הוספה ללא בדיקת חשיבות (ברירת מחדל: False)
+            wait: האם לחכות להטמעה (ברירת מחדל: True). אם False, ההטמעה נעשית
+                בתור ברקע, והמסמכים נכנסים לחיפוש כשהווקטורים שלהם מוכנים
+        
+        Returns:
+            מזהה לכל מסמך (None למסמך שלא נוסף), לפי הסדר. מסמכים שההטמעה שלהם
+            נכשלה מופיעים ב-unembedded_documents() וניתן להטמיע אותם שוב ב-retry_embeddings()
+        """
+        metadatas = metadatas or [None] * len(contents)
+        doc_ids = [self._new_document(content, metadata, context, force_add)
+                   for content, metadata in zip(contents, metadatas)]
+        added = [(doc_id, content) for doc_id, content in zip(doc_ids, contents) if doc_id is not None]
+        
+        if not wait:
+            self._get_embedding_queue().submit(added)
+            return doc_ids
+        
+        vectors = self.embedding_pipeline.embed([content for _, content in added])
+        with self._lock:
+            for (doc_id, _), vector in zip(added, vectors):
+                if doc_id in self.documents:
+                    self._add_vector(doc_id, vector)
+        return doc_ids
+    
+    def unembedded_documents(self) -> List[str]:
+        """
+        מחזיר את המסמכים שההטמעה שלהם נכשלה (גם אחרי הניסיונות החוזרים של
+        צינור ההטמעה) ולכן אינם נמצאים בחיפוש.
+        """
+        with self._lock:
+            return sorted(self._unembedded)
+    
+    def retry_embeddings(self, wait: bool = True) -> List[str]:
+        """
+        מטמיע מחדש את המסמכים שההטמעה שלהם נכשלה.
+        
+        Args:
+            wait: האם לחכות להטמעה (ברירת מחדל: True), או לשלוח לתור ההטמעה ברקע
+        
+        Returns:
+            המסמכים שעדיין אין להם וקטור (עם wait=False - המסמכים שנשלחו לתור)
+        """
+        self._check_writable()
+        with self._lock:
+            pending = [(doc_id, self.documents[doc_id]["content"])
+                       for doc_id in sorted(self._unembedded) if doc_id in self.documents]
+            self._unembedded = {doc_id for doc_id, _ in pending}
+        if not pending:
+            return []
+        if not wait:
+            self._get_embedding_queue().submit(pending)
+            return [doc_id for doc_id, _ in pending]
+        
+        vectors = self.embedding_pipeline.embed([content for _, content in pending])
+        with self._lock:
+            for (doc_id, _), vector in zip(pending, vectors):
+                if doc_id in self.documents:
+                    self._add_vector(doc_id, vector)
+        return self.unembedded_documents()
+    
+    def _get_embedding_queue(self):
+        """
+        מחזיר את תור ההטמעה ברקע (נוצר בשימוש הראשון).
+        """
+        with self._lock:
+            if self._embedding_queue is None:
+                from .embedding_queue import EmbeddingQueue
+                self._embedding_queue = EmbeddingQueue(self.embedding_pipeline, self._on_embedded)
+            return self._embedding_queue
+    
+    def _on_embedded(self, doc_id: str, embedding: List[float]) -> None:
+        """
+        כותב וקטור שהוטמע ברקע, אם המסמך לא נמחק בינתיים.
+        """
+        with self._lock:
+            if doc_id in self.documents:
+                self._add_vector(doc_id, embedding)
+    
+    def flush_embeddings(self, timeout: Optional[float] = None) -> bool:
+        """
+        ממתין עד שכל המסמכים בתור ההטמעה נכנסו לחיפוש.
+        
+        Args:
+            timeout: זמן המתנה מרבי בשניות (None - ללא הגבלה)
+        
+        Returns:
+            האם התור התרוקן
+        """
+        if self._embedding_queue is None:
+            return True
+        return self._embedding_queue.flush(timeout)
+    
+    def close(self) -> None:
+        """
+        מסיים את ההטמעה ברקע ומשחרר את התהליכונים.
+        """
+        self.stop_expiry_sweeper()
+        if self._embedding_queue is not None:
+            self._embedding_queue.close()
+            self._embedding_queue = None
+        elif self._embedding_pipeline is not None:
+            self._embedding_pipeline.close()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+    
+    def _check_writable(self) -> None:
+        """
+        מונע שינויים במאגר שנטען לקריאה בלבד.
+        """
+        if self.read_only:
+            raise RuntimeError("מאגר הזיכרון נטען לקריאה בלבד")
+    
+    def _new_document(self, content: str, metadata: Optional[Dict[str, Any]], context: Optional[str],
+                      force_add: bool) -> Optional[str]:
+        """
+        רושם מסמך חדש (ללא וקטור) אם הוא מספיק חשוב.
+        
+        Returns:
+            מזהה המסמך, או None אם הוא לא מספיק חשוב
+        """
+        self._check_writable()
+        
         # חישוב ציון חשיבות
         importance_score = 1.0 if force_add else self.importance_scorer.score_importance(content, context)
         
@@ -142,20 +393,23 @@ class AdvancedVectorStore:
             metadata = {}
         
         # הוספת מידע נוסף למטא-דאטה
+        expiry_date = datetime.now() + timedelta(days=self.ttl_days)
         metadata["timestamp"] = datetime.now().isoformat()
         metadata["importance_score"] = importance_score
-        metadata["expiry_date"] = (datetime.now() + timedelta(days=self.ttl_days)).isoformat()
+        metadata["expiry_date"] = expiry_date.isoformat()
         
-        # שמירת המסמך במאגר הפשוט
-        self.documents[doc_id] = {
-            "content": content,
-            "metadata": metadata,
-            "embedding": self._get_embedding(content)
-        }
+        # שמירת המסמך במאגר הפשוט; הווקטור נכנס למטריצה אחרי ההטמעה
+        with self._lock:
+            self.documents[doc_id] = {
+                "content": content,
+                "metadata": metadata
+            }
+            self._track_expiry(doc_id, expiry_date.timestamp())
         
         return doc_id
     
-    def search(self, query: str, n_results: int = 5, min_relevance_score: float = 0.7) -> List[Dict[str, Any]]:
+    def search(self, query: str, n_results: int = 5, min_relevance_score: float = 0.7,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         מחפש מסמכים דומים לשאילתה.
         
@@ -163,25 +417,54 @@ class AdvancedVectorStore:
             query: שאילתת החיפוש
             n_results: מספר התוצאות המקסימלי (ברירת מחדל: 5)
             min_relevance_score: ציון רלוונטיות מינימלי (ברירת מחדל: 0.7)
+            filters: סינון לפי מטא-דאטה - מפתח -> ערך, או רשימת ערכים מותרים (אופציונלי)
         
         Returns:
-            רשימה של מסמכים דומים
+            רשימה של מסמכים דומים, מהרלוונטי ביותר
         """
-        # במימוש פשוט, מחזיר את כל המסמכים
-        documents = []
-        for doc_id, doc in self.documents.items():
-            documents.append({
-                "id": doc_id,
-                "content": doc["content"],
-                "metadata": doc["metadata"],
-                "relevance_score": 0.9  # ציון רלוונטיות קבוע
-            })
-            
-            # הגבלת מספר התוצאות
-            if len(documents) >= n_results:
-                break
+        return self.search_by_embedding(self._get_embedding(query), n_results, min_relevance_score, filters)
+    
+    def search_by_embedding(self, embedding: List[float], n_results: int = 5, min_relevance_score: float = 0.7,
+                            filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        מחפש את המסמכים הדומים ביותר לווקטור (דמיון קוסינוס).
         
-        return documents
+        Args:
+            embedding: וקטור השאילתה
+            n_results: מספר התוצאות המקסימלי
+            min_relevance_score: ציון רלוונטיות מינימלי
+            filters: סינון לפי מטא-דאטה (ראה search)
+        
+        Returns:
+            רשימה של מסמכים דומים, מהרלוונטי ביותר
+        """
+        with self._lock:
+            accept = None
+            if filters:
+                accept = lambda doc_id: _matches_filters(self.documents[doc_id]["metadata"], filters)
+            
+            ranked = None
+            if self.ann_index is not None and len(self._matrix) >= self.ann_min_documents:
+                row_filter = None if accept is None else (lambda row: accept(self._matrix.ids[row]))
+                rows = self.ann_index.search(embedding, n_results, min_relevance_score, row_filter)
+                ranked = [(self._matrix.ids[row], score) for row, score in rows]
+                # סינון שמתאים למעט מסמכים עלול לא להופיע באשכולות שנבדקו -
+                # במקרה כזה עוברים לחיפוש המדויק
+                if filters and len(ranked) < n_results:
+                    ranked = None
+            if ranked is None:
+                ranked = self._matrix.top_k(embedding, n_results, min_relevance_score, accept)
+            
+            results = []
+            for doc_id, score in ranked:
+                doc = self.documents[doc_id]
+                results.append({
+                    "id": doc_id,
+                    "content": doc["content"],
+                    "metadata": doc["metadata"],
+                    "relevance_score": score
+                })
+            return results
     
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -212,23 +495,112 @@ class AdvancedVectorStore:
         Returns:
             האם המחיקה הצליחה
         """
-        if doc_id in self.documents:
+        self._check_writable()
+        with self._lock:
+            if doc_id not in self.documents:
+                return False
             del self.documents[doc_id]
+            self._expiry.discard(doc_id)
+            self._unembedded.discard(doc_id)
+            row = self._matrix.rows.get(doc_id)
+            if self._matrix.remove(doc_id):
+                if self.ann_index is not None:
+                    self.ann_index.remove(row)
+                if self._journal is not None:
+                    self._journal.remove(doc_id)
+            if self._matrix.needs_compaction():
+                # הדחיסה משנה את מספרי השורות, ולכן האינדקס נבנה מחדש
+                self._matrix.compact()
+                if self.ann_index is not None:
+                    self.ann_index.reset()
             return True
-        return False
     
     def clear(self) -> None:
         """
         מוחק את כל המסמכים באוסף.
         """
-        self.documents.clear()
+        self._check_writable()
+        with self._lock:
+            self.documents.clear()
+            self._expiry.clear()
+            self._unembedded.clear()
+            self._reset_matrix()
+            if self._journal is not None:
+                self._journal.clear()
+    
+    @property
+    def storage_path(self) -> str:
+        """
+        התיקייה שבה האוסף נשמר.
+        """
+        return os.path.join(self.persist_directory, self.collection_name)
     
     def save(self) -> None:
         """
         שומר את מסד הנתונים לדיסק.
+        
+        המסמכים עוברים לטבלת SQLite שכל שינוי בה נכתב מיד, המטריצה נכתבת כקובץ
+        npy חדש, ויומן הווקטורים מתרוקן. מכאן והלאה כל הוספה ומחיקה של וקטור
+        נרשמת ביומן, כך שגם שינויים אחרי השמירה נשמרים.
+        """
+        self._check_writable()
+        from .vector_persistence import DOCUMENTS_FILE, JOURNAL_FILE, DocumentTable, VectorJournal, save_matrix
+        with self._lock:
+            os.makedirs(self.storage_path, exist_ok=True)
+            if not isinstance(self.documents, DocumentTable):
+                table = DocumentTable(os.path.join(self.storage_path, DOCUMENTS_FILE))
+                table.clear()
+                table.update_many(self.documents)
+                self.documents = table
+                # מכאן התפוגה נשמרת בעמודה המאונדקסת של הטבלה
+                self._expiry.clear()
+            save_matrix(self.storage_path, self._matrix)
+            if self._journal is None:
+                self._journal = VectorJournal(os.path.join(self.storage_path, JOURNAL_FILE))
+            self._journal.truncate()
+    
+    def load(self, read_only: bool = False) -> bool:
         """
-        # במימוש פשוט, לא עושה כלום
-        pass
+        טוען את האוסף השמור מהדיסק.
+        
+        המטריצה ממופה לזיכרון בלי העתקה (ומועתקת רק בשינוי הראשון), המסמכים
+        נקראים מ-SQLite לפי הצורך, והיומן משוחזר מעל המטריצה.
+        
+        Args:
+            read_only: טעינה לקריאה בלבד - למשל בתהליכי שרת שרק מחפשים. כל
+                התהליכים חולקים את אותם דפי זיכרון של המטריצה
+        
+        Returns:
+            האם נמצא אוסף שמור
+        """
+        from .vector_index import EmbeddingMatrix
+        from .vector_persistence import DOCUMENTS_FILE, JOURNAL_FILE, DocumentTable, VectorJournal, \
+            load_matrix, read_journal
+        documents_path = os.path.join(self.storage_path, DOCUMENTS_FILE)
+        if not os.path.exists(documents_path):
+            return False
+        
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self.documents = DocumentTable(documents_path, read_only=read_only)
+            matrix = load_matrix(self.storage_path)
+            for op, doc_id, vector in read_journal(os.path.join(self.storage_path, JOURNAL_FILE)):
+                if op == "add":
+                    matrix.add(doc_id, vector)
+                elif op == "delete":
+                    matrix.remove(doc_id)
+                else:
+                    # clear() אחרי השמירה האחרונה
+                    matrix = EmbeddingMatrix()
+            self._reset_matrix(matrix)
+            self.read_only = read_only
+            # זמני התפוגה נשלפים מהעמודה המאונדקסת בטבלה - אין צורך לקרוא אותם כאן
+            self._expiry.clear()
+            if not read_only:
+                self._journal = VectorJournal(os.path.join(self.storage_path, JOURNAL_FILE))
+        return True
     
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """
@@ -251,21 +623,58 @@ class AdvancedVectorStore:
         """
         מוחק מסמכים ישנים שעברו את תאריך התפוגה.
         
+        רק המסמכים שפג תוקפם נשלפים - מאינדקס התפוגה בזיכרון, או מהעמודה
+        המאונדקסת בטבלה אחרי שמירה/טעינה. שאר המסמכים לא נסרקים.
+        
         Returns:
             מספר המסמכים שנמחקו
         """
-        current_time = datetime.now().isoformat()
-        
-        # סינון מסמכים שעברו את תאריך התפוגה
-        expired_ids = []
-        for doc_id, doc in list(self.documents.items()):
-            expiry_date = doc["metadata"].get("expiry_date")
-            if expiry_date and expiry_date < current_time:
-                expired_ids.append(doc_id)
-                del self.documents[doc_id]
+        self._check_writable()
+        if isinstance(self.documents, dict):
+            expired_ids = self._expiry.pop_expired(time.time())
+        else:
+            expired_ids = self.documents.expired(time.time())
+        for doc_id in expired_ids:
+            self.delete_document(doc_id)
         
         return len(expired_ids)
     
+    def _track_expiry(self, doc_id: str, expires_at: float) -> None:
+        # בטבלת SQLite זמן התפוגה נכתב יחד עם המסמך
+        if isinstance(self.documents, dict):
+            self._expiry.set(doc_id, expires_at)
+    
+    def start_expiry_sweeper(self, interval: float = 3600.0) -> None:
+        """
+        מפעיל תהליכון רקע שמוחק מסמכים שפג תוקפם, כדי שהשכחה לא תרוץ בזמן בקשה.
+        
+        Args:
+            interval: מספר השניות בין סריקות (ברירת מחדל: שעה)
+        """
+        self._check_writable()
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._sweeper_stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_expired, args=(interval,),
+                                         name="memory-expiry", daemon=True)
+        self._sweeper.start()
+    
+    def stop_expiry_sweeper(self, timeout: Optional[float] = None) -> None:
+        """
+        עוצר את תהליכון השכחה ברקע.
+        """
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout)
+            self._sweeper = None
+    
+    def _sweep_expired(self, interval: float) -> None:
+        while not self._sweeper_stop.wait(interval):
+            try:
+                self.forget_old_documents()
+            except Exception:
+                logger.exception("שגיאה במחיקת מסמכים שפג תוקפם")
+    
     def update_document_importance(self, doc_id: str, new_importance: float) -> bool:
         """
         מעדכן את ציון החשיבות של מסמך.
@@ -277,16 +686,26 @@ class AdvancedVectorStore:
         Returns:
             האם העדכון הצליח
         """
-        if doc_id not in self.documents:
-            return False
-        
-        # עדכון ציון החשיבות
-        metadata = self.documents[doc_id]["metadata"]
-        metadata["importance_score"] = new_importance
-        
-        # עדכון תאריך התפוגה בהתאם לחשיבות
-        ttl_days = int(self.ttl_days * (1 + new_importance))
-        metadata["expiry_date"] = (datetime.now() + timedelta(days=ttl_days)).isoformat()
+        self._check_writable()
+        # הבדיקה, הקריאה והכתיבה בנעילה אחת - מחיקה באמצע (למשל של תהליכון
+        # השכחה) הייתה מחזירה את המסמך למאגר בלי וקטור
+        with self._lock:
+            if doc_id not in self.documents:
+                return False
+            
+            # עדכון ציון החשיבות
+            doc = self.documents[doc_id]
+            metadata = doc["metadata"]
+            metadata["importance_score"] = new_importance
+            
+            # עדכון תאריך התפוגה בהתאם לחשיבות
+            ttl_days = int(self.ttl_days * (1 + new_importance))
+            expiry_date = datetime.now() + timedelta(days=ttl_days)
+            metadata["expiry_date"] = expiry_date.isoformat()
+            
+            # במאגר שנשמר לדיסק המסמך הוא עותק, ולכן נכתב בחזרה
+            self.documents[doc_id] = doc
+            self._track_expiry(doc_id, expiry_date.timestamp())
         
         return True
     
@@ -358,13 +777,34 @@ class AdvancedVectorStore:
         return response.choices[0].message.content.strip()
 
 
+def _matches_filters(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """
+    בודק אם המטא-דאטה של מסמך מתאים לכל תנאי הסינון.
+    
+    Args:
+        metadata: המטא-דאטה של המסמך
+        filters: מפתח -> ערך נדרש, או רשימה/קבוצה של ערכים מותרים
+    
+    Returns:
+        האם המסמך עומד בכל התנאים
+    """
+    for key, expected in filters.items():
+        value = metadata.get(key)
+        if isinstance(expected, (list, tuple, set, frozenset)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
 # שמירת תאימות לאחור עם הגרסה הקודמת
 class VectorStore(AdvancedVectorStore):
     """
     מחלקה לשמירת מידע בצורה וקטורית (תאימות לאחור).
     """
     
-    def __init__(self, client: OpenAI, collection_name: str = "woo_agent_memory", persist_directory: str = "memory_db"):
+    def __init__(self, client: "OpenAI", collection_name: str = "woo_agent_memory", persist_directory: str = "memory_db"):
         """
         אתחול מערכת הזיכרון.
         
@@ -144,10 +144,10 @@ function removeTypingIndicator() {
     isWaitingForResponse = false;
 }
 
-// פונקציה לשליחת הודעה לשרת
+// פונקציה לשליחת הודעה לשרת - מנסה קודם הזרמה ונופלת לבקשה רגילה
 async function sendMessageToServer(message) {
     try {
-        const response = await fetch('/api/chat', {
+        const response = await fetch('/api/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -155,18 +155,12 @@ async function sendMessageToServer(message) {
             body: JSON.stringify({ message: message }),
         });
         
-        const data = await response.json();
-        
-        // הסרת אינדיקטור טעינה
-        removeTypingIndicator();
-        
-        if (data.error) {
-            // הצגת שגיאה
-            addMessage(`שגיאה: ${data.error}`, 'bot');
-        } else {
-            // הצגת תשובת הבוט
-            addFormattedResponse(data.response);
+        if (!response.ok || !response.body) {
+            await sendMessageWithoutStreaming(message);
+            return;
         }
+        
+        await readEventStream(response.body);
     } catch (error) {
         // הסרת אינדיקטור טעינה
         removeTypingIndicator();
@@ -177,6 +171,123 @@ async function sendMessageToServer(message) {
     }
 }
 
+// פונקציה לשליחת הודעה לשרת ללא הזרמה
+async function sendMessageWithoutStreaming(message) {
+    const response = await fetch('/api/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ message: message }),
+    });
+    
+    const data = await response.json();
+    
+    // הסרת אינדיקטור טעינה
+    removeTypingIndicator();
+    
+    if (data.error) {
+        // הצגת שגיאה
+        addMessage(`שגיאה: ${data.error}`, 'bot');
+    } else {
+        // הצגת תשובת הבוט
+        addFormattedResponse(data.response);
+    }
+}
+
+// פונקציה לקריאת אירועי Server-Sent Events מגוף התשובה
+async function readEventStream(body) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    const streamingMessage = { element: null, content: null, status: null, text: '' };
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        // כל אירוע מסתיים בשורה ריקה
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        events.forEach(rawEvent => {
+            const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+            if (dataLine) {
+                handleStreamEvent(JSON.parse(dataLine.slice(6)), streamingMessage);
+            }
+        });
+    }
+    
+    // אם הזרם נסגר לפני אירוע הסיום
+    removeTypingIndicator();
+}
+
+// פונקציה לטיפול באירוע בודד מהזרם
+function handleStreamEvent(event, streamingMessage) {
+    if (event.type === 'token') {
+        ensureStreamingMessage(streamingMessage);
+        streamingMessage.text += event.content;
+        streamingMessage.content.innerHTML = streamingMessage.text.replace(/\n/g, '<br>');
+    } else if (event.type === 'route' || event.type === 'handoff') {
+        ensureStreamingMessage(streamingMessage);
+        setStreamStatus(streamingMessage, `מעביר לסוכן ${event.agent}...`);
+    } else if (event.type === 'tool_call') {
+        ensureStreamingMessage(streamingMessage);
+        setStreamStatus(streamingMessage, `מפעיל את הכלי ${event.name}...`);
+    } else if (event.type === 'tool_result') {
+        ensureStreamingMessage(streamingMessage);
+        setStreamStatus(streamingMessage, `הכלי ${event.name} הסתיים, מכין תשובה...`);
+    } else if (event.type === 'done') {
+        ensureStreamingMessage(streamingMessage);
+        setStreamStatus(streamingMessage, null);
+        streamingMessage.text = event.content || streamingMessage.text;
+        streamingMessage.content.innerHTML = streamingMessage.text.replace(/\n/g, '<br>');
+        removeTypingIndicator();
+    } else if (event.type === 'error') {
+        removeTypingIndicator();
+        addMessage(`שגיאה: ${event.error}`, 'bot');
+    }
+    
+    // גלילה לתחתית הצ'אט
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+// פונקציה ליצירת הודעת הבוט שמתעדכנת במהלך ההזרמה
+function ensureStreamingMessage(streamingMessage) {
+    if (streamingMessage.element) return;
+    
+    // האינדיקטור מוחלף בהודעה עצמה, אך הבקשה עדיין בטיפול
+    const typingIndicator = document.getElementById('typing-indicator');
+    if (typingIndicator) {
+        typingIndicator.remove();
+    }
+    
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message bot';
+    
+    const messageContent = document.createElement('div');
+    messageContent.className = 'message-content';
+    
+    const status = document.createElement('div');
+    status.className = 'stream-status';
+    
+    messageDiv.appendChild(messageContent);
+    messageDiv.appendChild(status);
+    chatMessages.appendChild(messageDiv);
+    
+    streamingMessage.element = messageDiv;
+    streamingMessage.content = messageContent;
+    streamingMessage.status = status;
+}
+
+// פונקציה לעדכון שורת הסטטוס של הודעה בהזרמה
+function setStreamStatus(streamingMessage, text) {
+    streamingMessage.status.textContent = text || '';
+    streamingMessage.status.style.display = text ? 'block' : 'none';
+}
+
 // פונקציה להצגת תשובה מפורמטת
 function addFormattedResponse(response) {
     const messageDiv = document.createElement('div');
@@ -28,6 +28,9 @@ logger = logging.getLogger(__name__)
 # טעינת משתני הסביבה
 load_dotenv()
 
+# בדיקות שמייבאות את app.py לא מחממות את הסוכנים ברקע (החימום יוצר לקוח OpenAI)
+os.environ.setdefault("APP_WARMUP", "false")
+
 # פיקסטורה ללקוח OpenAI
 @pytest.fixture(scope="session")
 def openai_client():
@@ -49,8 +52,8 @@ def openai_client():
 
 # פיקסטורה ללקוח WooCommerce
 @pytest.fixture(scope="session")
-def woo_client():
-    """יצירת לקוח WooCommerce לבדיקות"""
+def woo_client(request):
+    """יצירת לקוח WooCommerce לבדיקות (נתוני הבדיקה שנוצרו נמחקים בסיום הריצה)"""
     try:
         woo_config = get_woocommerce_config()
         
@@ -66,6 +69,7 @@ def woo_client():
             consumer_key=consumer_key,
             consumer_secret=consumer_secret
         )
+        request.addfinalizer(lambda: cleanup_test_data(client))
         return client
     except Exception as e:
         logger.error(f"שגיאה ביצירת לקוח WooCommerce: {str(e)}")
@@ -163,41 +167,39 @@ def test_customer_data():
         "password": "password123"
     }
 
-# מחיקת נתוני בדיקה לאחר הטסטים
-@pytest.fixture(scope="session", autouse=True)
-def cleanup_test_data(request, woo_client):
+# מטמון ה-embeddings של מאגר הזיכרון נשמר בזיכרון בלבד, כדי שבדיקות לא יחלקו
+# קובץ מטמון (ומספר הקריאות ל-API לא יהיה תלוי בריצה קודמת)
+@pytest.fixture(autouse=True)
+def isolated_embedding_cache(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", "")
+
+# מחיקת נתוני בדיקה לאחר הטסטים - רק בריצות שהשתמשו בחנות (woo_client), כדי
+# שבדיקות היחידה ירוצו גם בלי הגדרות WooCommerce
+def cleanup_test_data(woo_client):
     """מוחק נתוני בדיקה שנוצרו במהלך הריצה"""
-    # מה שיקרה אחרי הטסטים
-    def cleanup():
-        if not woo_client:
-            return
-            
-        try:
-            # מחיקת מוצרי בדיקה
-            products = woo_client.get_products(search="מוצר בדיקה")
-            for product in products:
-                if "מוצר בדיקה" in product.get("name", ""):
-                    woo_client.delete_product(product["id"])
-            
-            # מחיקת קטגוריות בדיקה
-            categories = woo_client.get_categories(search="קטגוריית בדיקה")
-            for category in categories:
-                if "קטגוריית בדיקה" in category.get("name", ""):
-                    woo_client.delete_category(category["id"])
-                    
-            # מחיקת קופוני בדיקה
-            coupons = woo_client.get_coupons()
-            for coupon in coupons:
-                if coupon.get("code", "").startswith("TEST"):
-                    woo_client.delete_coupon(coupon["id"])
-                    
-            # מחיקת לקוחות בדיקה
-            customers = woo_client.get_customers(email="test@example.com")
-            for customer in customers:
-                woo_client.delete_customer(customer["id"])
+    try:
+        # מחיקת מוצרי בדיקה
+        products = woo_client.get_products(search="מוצר בדיקה")
+        for product in products:
+            if "מוצר בדיקה" in product.get("name", ""):
+                woo_client.delete_product(product["id"])
+        
+        # מחיקת קטגוריות בדיקה
+        categories = woo_client.get_categories(search="קטגוריית בדיקה")
+        for category in categories:
+            if "קטגוריית בדיקה" in category.get("name", ""):
+                woo_client.delete_category(category["id"])
+                
+        # מחיקת קופוני בדיקה
+        coupons = woo_client.get_coupons()
+        for coupon in coupons:
+            if coupon.get("code", "").startswith("TEST"):
+                woo_client.delete_coupon(coupon["id"])
                 
-        except Exception as e:
-            logger.error(f"שגיאה בניקוי נתוני בדיקה: {str(e)}")
-    
-    # רשום את פונקציית הניקוי להפעלה בסיום
-    request.addfinalizer(cleanup) 
\ No newline at end of file
+        # מחיקת לקוחות בדיקה
+        customers = woo_client.get_customers(email="test@example.com")
+        for customer in customers:
+            woo_client.delete_customer(customer["id"])
+            
+    except Exception as e:
+        logger.error(f"שגיאה בניקוי נתוני בדיקה: {str(e)}")
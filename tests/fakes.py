@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+לקוחות מדומים לבדיקות שאינן דורשות חיבור ל-OpenAI
+"""
+
+import hashlib
+import json
+import re
+import threading
+from types import SimpleNamespace
+
+
+def make_tool_call(call_id, name, arguments):
+    """יוצר אובייקט קריאת כלי בפורמט של OpenAI"""
+    if not isinstance(arguments, str):
+        arguments = json.dumps(arguments, ensure_ascii=False)
+    return SimpleNamespace(
+        id=call_id,
+        type="function",
+        function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+def make_response(content=None, tool_calls=None, prompt_tokens=10, completion_tokens=5):
+    """יוצר תשובת chat completion מדומה"""
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens
+    )
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def make_stream(content_parts=(), tool_calls=None, prompt_tokens=10, completion_tokens=5):
+    """יוצר רשימת קטעי הזרמה (chunks) בפורמט של OpenAI"""
+    chunks = []
+    for part in content_parts:
+        delta = SimpleNamespace(content=part, tool_calls=None)
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None))
+    for index, tool_call in enumerate(tool_calls or []):
+        # שם הכלי בקטע הראשון והארגומנטים מפוצלים לשני קטעים, כמו ב-API האמיתי
+        arguments = tool_call.function.arguments
+        middle = len(arguments) // 2
+        for position, fragment in enumerate((arguments[:middle], arguments[middle:])):
+            function = SimpleNamespace(name=tool_call.function.name if position == 0 else None, arguments=fragment)
+            delta_call = SimpleNamespace(index=index, id=tool_call.id if position == 0 else None, function=function)
+            delta = SimpleNamespace(content=None, tool_calls=[delta_call])
+            chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None))
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens
+    )
+    chunks.append(SimpleNamespace(choices=[], usage=usage))
+    return chunks
+
+
+class FakeCompletions:
+    """מחזיר תשובות מתוסרטות לפי הסדר ושומר את הבקשות שהתקבלו"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            if not self.responses:
+                return make_response(content="")
+            response = self.responses.pop(0)
+        response = response(kwargs) if callable(response) else response
+        # רשימת קטעים מוחזרת כאיטרטור, כמו תשובה בהזרמה
+        return iter(response) if isinstance(response, list) else response
+
+
+class FakeEmbeddings:
+    """
+    embeddings.create מדומה: כל מילה ממופה (לפי hash יציב) למימד ולסימן,
+    כך שלטקסטים עם מילים משותפות יש דמיון קוסינוס גבוה
+    """
+
+    def __init__(self, dimensions=64):
+        self.dimensions = dimensions
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def vector(self, text, dimensions=None):
+        vector = [0.0] * (dimensions or self.dimensions)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.sha256(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % len(vector)] += 1.0 if digest[4] % 2 else -1.0
+        return vector
+
+    def create(self, model, input, dimensions=None, **kwargs):
+        with self._lock:
+            self.calls.append(dict(kwargs, model=model, input=input, dimensions=dimensions))
+        texts = [input] if isinstance(input, str) else list(input)
+        data = [SimpleNamespace(index=i, embedding=self.vector(text, dimensions)) for i, text in enumerate(texts)]
+        return SimpleNamespace(data=data, model=model)
+
+
+class FakeOpenAIClient:
+    """לקוח OpenAI מדומה עם chat.completions ו-embeddings"""
+
+    def __init__(self, responses=None):
+        self.chat = SimpleNamespace(completions=FakeCompletions(responses or []))
+        self.embeddings = FakeEmbeddings()
+
+    @property
+    def calls(self):
+        return self.chat.completions.calls
+
+
+class FakeAsyncCompletions:
+    """הגרסה האסינכרונית של FakeCompletions, עם השהיה אופציונלית לכל קריאה"""
+
+    def __init__(self, responses, delay=0.0):
+        self.sync = FakeCompletions(responses)
+        self.delay = delay
+
+    @property
+    def calls(self):
+        return self.sync.calls
+
+    async def create(self, **kwargs):
+        import asyncio
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        response = self.sync.create(**kwargs)
+        if kwargs.get("stream"):
+            return _AsyncChunks(response)
+        return response
+
+
+class _AsyncChunks:
+    """איטרטור אסינכרוני על קטעי הזרמה"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeAsyncOpenAIClient:
+    """לקוח AsyncOpenAI מדומה"""
+
+    def __init__(self, responses=None, delay=0.0):
+        self.chat = SimpleNamespace(completions=FakeAsyncCompletions(responses or [], delay))
+
+    @property
+    def calls(self):
+        return self.chat.completions.calls
+
+
+class FakeWooClient:
+    """חנות WooCommerce מדומה בזיכרון, עם רישום של קריאות הכתיבה"""
+
+    def __init__(self, products=None):
+        self.products = {p["id"]: dict(p) for p in (products or [])}
+        self.categories = []
+        self.writes = []
+
+    def get_product(self, product_id):
+        return self.products.get(int(product_id), {})
+
+    def update_product(self, product_id, data):
+        self.writes.append(("update_product", int(product_id), data))
+        product = self.products.get(int(product_id))
+        if product is None:
+            return {}
+        product.update(data)
+        return product
+
+    def create_category(self, data):
+        self.writes.append(("create_category", data))
+        category = dict(data, id=len(self.categories) + 100, slug=data["name"], parent=0)
+        self.categories.append(category)
+        return category
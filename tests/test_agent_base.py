@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות יחידה למחלקת Agent הבסיסית (ללא חיבור ל-OpenAI)
+"""
+
+import threading
+import time
+
+from agents.base import Agent, Handoff, function_tool
+from tests.fakes import FakeOpenAIClient, make_response, make_tool_call
+
+
+def _create_stock_agent(client, max_parallel_tools=4):
+    """יוצר סוכן עם כלי עדכון מלאי שמתעד את הקריאות"""
+    agent = Agent(client=client, max_parallel_tools=max_parallel_tools)
+    agent.updates = []
+    agent.threads = set()
+
+    @function_tool(name="update_stock", description="מעדכן מלאי")
+    def update_stock_tool(product_id: int, quantity: int):
+        time.sleep(0.05)
+        agent.updates.append((product_id, quantity))
+        agent.threads.add(threading.get_ident())
+        return f"מלאי מוצר {product_id} עודכן ל-{quantity}"
+
+    agent.add_tool(update_stock_tool)
+    return agent
+
+
+class TestParallelToolCalls:
+    """בדיקות לביצוע כל קריאות הכלים שהמודל החזיר"""
+
+    def test_all_tool_calls_are_executed(self):
+        """כל קריאות הכלים מבוצעות ומוחזרות להודעת המשך אחת"""
+        tool_calls = [
+            make_tool_call("call_12", "update_stock", {"product_id": 12, "quantity": 5}),
+            make_tool_call("call_15", "update_stock", {"product_id": 15, "quantity": 5}),
+            make_tool_call("call_19", "update_stock", {"product_id": 19, "quantity": 5}),
+        ]
+        client = FakeOpenAIClient([
+            make_response(tool_calls=tool_calls),
+            make_response(content="המלאי עודכן לשלושת המוצרים"),
+        ])
+        agent = _create_stock_agent(client)
+
+        response = agent.run("עדכן מלאי למוצרים 12, 15 ו-19 לכמות 5")
+
+        assert response == "המלאי עודכן לשלושת המוצרים"
+        assert sorted(agent.updates) == [(12, 5), (15, 5), (19, 5)]
+        assert len(client.calls) == 2
+
+        follow_up = client.calls[1]["messages"]
+        assert [c["id"] for c in follow_up[-4]["tool_calls"]] == ["call_12", "call_15", "call_19"]
+        tool_messages = [m for m in follow_up if m["role"] == "tool"]
+        assert [m["tool_call_id"] for m in tool_messages] == ["call_12", "call_15", "call_19"]
+        assert "19" in tool_messages[2]["content"]
+
+    def test_tool_calls_run_concurrently(self):
+        """קריאות עצמאיות רצות על יותר מתהליכון אחד"""
+        tool_calls = [
+            make_tool_call(f"call_{i}", "update_stock", {"product_id": i, "quantity": 1})
+            for i in range(4)
+        ]
+        client = FakeOpenAIClient([make_response(tool_calls=tool_calls), make_response(content="בוצע")])
+        agent = _create_stock_agent(client)
+
+        agent.run("עדכן מלאי")
+
+        assert len(agent.threads) > 1
+
+    def test_parallelism_can_be_disabled(self):
+        """max_parallel_tools=1 מריץ את הכלים ברצף"""
+        tool_calls = [
+            make_tool_call(f"call_{i}", "update_stock", {"product_id": i, "quantity": 1})
+            for i in range(3)
+        ]
+        client = FakeOpenAIClient([make_response(tool_calls=tool_calls), make_response(content="בוצע")])
+        agent = _create_stock_agent(client, max_parallel_tools=1)
+
+        agent.run("עדכן מלאי")
+
+        assert agent.updates == [(0, 1), (1, 1), (2, 1)]
+        assert agent.threads == {threading.get_ident()}
+
+    def test_handoff_takes_priority(self):
+        """קריאת העברה מפעילה את הסוכן המקבל"""
+        specialist = Agent(client=FakeOpenAIClient([make_response(content="תשובת מומחה")]))
+        client = FakeOpenAIClient([
+            make_response(tool_calls=[
+                make_tool_call("call_1", "handoff_to_product", {"query": "הצג מוצרים"})
+            ])
+        ])
+        agent = Agent(client=client)
+        agent.add_tool(Handoff(name="product", agent=specialist, description="מוצרים"))
+
+        assert agent.run("הצג מוצרים") == "תשובת מומחה"
+        assert specialist.client.calls[0]["messages"][-1]["content"] == "הצג מוצרים"
+
+
+class TestToolLoop:
+    """בדיקות ללולאת הכלים הרב-שלבית ולמגבלות התקציב"""
+
+    def _create_catalog_agent(self, client, **kwargs):
+        agent = Agent(client=client, **kwargs)
+        agent.calls = []
+
+        @function_tool(name="find_category", description="מחפש קטגוריה")
+        def find_category_tool(name: str):
+            agent.calls.append(("find_category", name))
+            return '{"id": 7}'
+
+        @function_tool(name="list_products", description="מחזיר מוצרים בקטגוריה")
+        def list_products_tool(category: int):
+            agent.calls.append(("list_products", category))
+            return "חולצה, מכנסיים"
+
+        agent.add_tool(find_category_tool)
+        agent.add_tool(list_products_tool)
+        return agent
+
+    def test_multi_step_task(self):
+        """המודל יכול לשרשר כמה צעדי כלים לפני התשובה הסופית"""
+        client = FakeOpenAIClient([
+            make_response(tool_calls=[make_tool_call("c1", "find_category", {"name": "ביגוד"})]),
+            make_response(tool_calls=[make_tool_call("c2", "list_products", {"category": 7})]),
+            make_response(content="בקטגוריה ביגוד: חולצה, מכנסיים"),
+        ])
+        agent = self._create_catalog_agent(client)
+
+        response = agent.run("מצא את קטגוריית ביגוד והצג את המוצרים שלה")
+
+        assert response == "בקטגוריה ביגוד: חולצה, מכנסיים"
+        assert agent.calls == [("find_category", "ביגוד"), ("list_products", 7)]
+        stats = agent.last_run_stats
+        assert stats["stop_reason"] == "completed"
+        assert [s["tool_calls"] for s in stats["steps"]] == [["find_category"], ["list_products"], []]
+        assert stats["total_tokens"] == 45
+        assert all(s["duration"] >= 0 for s in stats["steps"])
+
+    def test_max_steps_requests_final_answer(self):
+        """בהגעה למספר הצעדים המקסימלי מתבקשת תשובה סופית ללא כלים"""
+        client = FakeOpenAIClient([
+            make_response(tool_calls=[make_tool_call("c1", "find_category", {"name": "ביגוד"})]),
+            make_response(content="סיכום חלקי"),
+        ])
+        agent = self._create_catalog_agent(client, max_steps=1)
+
+        assert agent.run("מצא קטגוריה") == "סיכום חלקי"
+        assert agent.last_run_stats["stop_reason"] == "max_steps"
+        assert "tools" not in client.calls[-1]
+
+    def test_duplicate_calls_are_not_repeated(self):
+        """קריאה חוזרת עם אותם ארגומנטים לא מופעלת שוב ועוצרת את הלולאה"""
+        client = FakeOpenAIClient([
+            make_response(tool_calls=[make_tool_call("c1", "find_category", {"name": "ביגוד"})]),
+            make_response(tool_calls=[make_tool_call("c2", "find_category", {"name": "ביגוד"})]),
+            make_response(content="קטגוריה 7"),
+        ])
+        agent = self._create_catalog_agent(client)
+
+        assert agent.run("מצא קטגוריה") == "קטגוריה 7"
+        assert agent.calls == [("find_category", "ביגוד")]
+        stats = agent.last_run_stats
+        assert stats["stop_reason"] == "duplicate_calls"
+        assert stats["steps"][1]["duplicate_calls"] == 1
+
+    def test_token_budget_stops_without_extra_call(self):
+        """חריגה מתקציב הטוקנים מחזירה את התוצאות הגולמיות"""
+        client = FakeOpenAIClient([
+            make_response(tool_calls=[make_tool_call("c1", "find_category", {"name": "ביגוד"})],
+                          prompt_tokens=900, completion_tokens=200),
+        ])
+        agent = self._create_catalog_agent(client, token_budget=1000)
+
+        response = agent.run("מצא קטגוריה")
+
+        assert '{"id": 7}' in response
+        assert agent.last_run_stats["stop_reason"] == "token_budget"
+        assert len(client.calls) == 1
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למסלול ההרצה האסינכרוני (arun / arun_stream)
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from agents.base import Agent, Guardrail, function_tool
+from agents.main_agent import AgentRouter, MainAgent
+from tests.fakes import (
+    FakeAsyncOpenAIClient, FakeOpenAIClient, make_response, make_stream, make_tool_call
+)
+
+
+def _client_with_async(responses, delay=0.0):
+    """לקוח סינכרוני מדומה שמצביע על לקוח אסינכרוני מדומה"""
+    client = FakeOpenAIClient()
+    client.async_client = FakeAsyncOpenAIClient(responses, delay)
+    return client
+
+
+class TestAgentArun:
+    """בדיקות ל-Agent.arun"""
+
+    def test_arun_uses_async_client_and_runs_tools_off_loop(self):
+        """הכלים רצים בתהליכון נפרד והתשובה זהה למסלול הסינכרוני"""
+        client = _client_with_async([
+            make_response(tool_calls=[
+                make_tool_call("c1", "update_stock", {"product_id": 12, "quantity": 5}),
+                make_tool_call("c2", "update_stock", {"product_id": 15, "quantity": 5}),
+            ]),
+            make_response(content="עודכן"),
+        ])
+        agent = Agent(client=client)
+        tool_threads = []
+
+        @function_tool(name="update_stock", description="מעדכן מלאי")
+        def update_stock_tool(product_id: int, quantity: int):
+            tool_threads.append(threading.get_ident())
+            return f"{product_id}={quantity}"
+
+        agent.add_tool(update_stock_tool)
+
+        assert asyncio.run(agent.arun("עדכן מלאי")) == "עודכן"
+        assert len(client.async_client.calls) == 2
+        assert client.calls == []
+        assert threading.get_ident() not in tool_threads
+        assert [m["tool_call_id"] for m in client.async_client.calls[1]["messages"] if m["role"] == "tool"] == ["c1", "c2"]
+
+    def test_arun_falls_back_to_sync_client(self):
+        """לקוח ללא גרסה אסינכרונית מופעל בתהליכון נפרד"""
+        agent = Agent(client=FakeOpenAIClient([make_response(content="שלום")]))
+        assert asyncio.run(agent.arun("היי")) == "שלום"
+
+    def test_arun_stream_yields_tokens(self):
+        """arun_stream מחזיר את אותם אירועים כמו run_stream"""
+        agent = Agent(client=_client_with_async([make_stream(["א", "ב"])]))
+
+        async def collect():
+            return [event async for event in agent.arun_stream("שאלה")]
+
+        events = asyncio.run(collect())
+        assert [e["type"] for e in events] == ["token", "token", "done"]
+        assert events[-1]["content"] == "אב"
+
+    def test_concurrent_conversations_do_not_block_each_other(self):
+        """שיחות רבות במקביל בתהליכון אחד מסתיימות בזמן של שיחה אחת בערך"""
+        agents = [
+            Agent(client=_client_with_async([make_response(content=str(i))], delay=0.05))
+            for i in range(50)
+        ]
+
+        async def run_all():
+            return await asyncio.gather(*(agent.arun("שאלה") for agent in agents))
+
+        start = time.monotonic()
+        answers = asyncio.run(run_all())
+
+        assert answers == [str(i) for i in range(50)]
+        assert time.monotonic() - start < 1.0
+
+    def test_last_run_stats_are_per_task(self):
+        """נתוני הריצה נשמרים בנפרד לכל משימה"""
+        agent = Agent(client=_client_with_async([
+            make_response(content="א", prompt_tokens=1, completion_tokens=1),
+            make_response(content="ב", prompt_tokens=100, completion_tokens=100),
+        ]))
+
+        async def run_and_report():
+            await agent.arun("שאלה")
+            return agent.last_run_stats["total_tokens"]
+
+        async def run_all():
+            return await asyncio.gather(run_and_report(), run_and_report())
+
+        assert sorted(asyncio.run(run_all())) == [2, 200]
+
+
+class TestAsyncRouting:
+    """בדיקות לניתוב אסינכרוני"""
+
+    def test_router_aidentify_agent(self):
+        router = AgentRouter(_client_with_async([make_response(content="הזמנות")]), classifier=None)
+        assert asyncio.run(router.aidentify_agent("מה הסטטוס של ההזמנה האחרונה")) == "order"
+
+    def test_router_local_decision_skips_model(self):
+        client = _client_with_async([])
+        router = AgentRouter(client, classifier=None)
+        assert asyncio.run(router.aidentify_agent("צור קטגוריה חדשה בשם נעליים")) == "category"
+        assert client.async_client.calls == []
+
+    def test_guardrail_acheck(self):
+        guardrail = Guardrail(_client_with_async([make_response(content="true")]), "gpt-4o", "בדוק")
+        assert asyncio.run(guardrail.acheck("קלט")) is True
+
+    def test_main_agent_arun_routes_to_specialist(self):
+        main_agent = MainAgent(None)
+        main_agent.router = AgentRouter(_client_with_async([make_response(content="דוחות")]), classifier=None)
+        specialist = Agent(client=_client_with_async([make_response(content="המכירות החודש: 1200")]))
+        main_agent.add_specialized_agent("report", specialist)
+
+        response = asyncio.run(main_agent.arun("הצג לי את המכירות של החודש האחרון"))
+
+        assert response == "המכירות החודש: 1200"
+        assert list(main_agent.context.agent_history) == ["report"]
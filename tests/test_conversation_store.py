@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למאגר השיחות: השיחה שורדת הפעלה מחדש וזמינה לכמה תהליכים
+"""
+
+import pytest
+
+from agents.main_agent import MainAgent
+from agents.sessions import SessionManager
+from memory.conversation_store import (
+    COMPRESS_THRESHOLD, KeyValueConversationStore, LocalKeyValue, SQLiteConversationStore, decode_record,
+    encode_record,
+)
+
+
+@pytest.fixture(params=["sqlite", "local"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteConversationStore(str(tmp_path / "conversations.sqlite"))
+    return KeyValueConversationStore()
+
+
+class TestEncoding:
+    """JSON מצומצם, ורשומות ארוכות נדחסות"""
+
+    def test_round_trip(self):
+        short = {"u": "כמה הזמנות היו היום?", "a": "order"}
+        long = {"r": "הזמנה " * COMPRESS_THRESHOLD}
+
+        assert encode_record(short).startswith(b"j")
+        assert encode_record(long).startswith(b"z")
+        assert len(encode_record(long)) < len(str(long).encode("utf-8"))
+        assert decode_record(encode_record(short)) == short
+        assert decode_record(encode_record(long)) == long
+
+
+class TestConversationStore:
+    """רצפים בהוספה בלבד, מצב ומחיקת שיחה"""
+
+    def test_streams_and_state(self, store):
+        for n in range(3):
+            store.append("s1", "turns", {"n": n})
+        store.append("s2", "turns", {"n": 9})
+        store.set_state("s1", "shared_data", {"pending_action": None})
+
+        assert store.read("s1", "turns") == [{"n": 0}, {"n": 1}, {"n": 2}]
+        assert store.read("s1", "turns", start=2) == [{"n": 2}]
+        assert store.read("s1", "chat") == []
+        assert store.get_state("s1", "shared_data") == {"pending_action": None}
+        assert store.get_state("s2", "shared_data", {}) == {}
+
+        store.replace("s1", "turns", [{"n": 2}])
+        assert store.read("s1", "turns") == [{"n": 2}]
+
+        store.delete_session("s1")
+        assert store.read("s1", "turns") == [] and store.get_state("s1", "shared_data") is None
+        assert store.read("s2", "turns") == [{"n": 9}]
+
+    def test_session_deleted_by_another_process_leaves_no_keys(self):
+        shared = LocalKeyValue()
+        first, second = KeyValueConversationStore(shared), KeyValueConversationStore(shared)
+        first.append("s1", "turns", {"n": 0})
+        second.delete_session("s1")
+
+        first.append("s1", "turns", {"n": 1})
+        first.set_state("s1", "shared_data", {})
+        first.delete_session("s1")
+
+        assert not shared._lists and not shared._values and not shared._sets
+
+
+class TestPersistentSessions:
+    """הקשר השיחה נטען מהמאגר בעצלות ונכתב בו בכל תור"""
+
+    def test_conversation_survives_restart(self, store):
+        first = MainAgent(None, conversation_store=store).for_session("alice")
+        first.context.add_to_history("כמה מוצרים יש?", "יש 12 מוצרים", "product")
+        first.context.set_shared_data("pending_action", {"type": "update_stock", "agent": "product"})
+        first.add_to_chat_history("user", "כמה מוצרים יש?")
+
+        restarted = MainAgent(None, conversation_store=store).for_session("alice")
+
+        assert restarted.context._loaded is False
+        assert restarted.context.conversation_history[0]["response"] == "יש 12 מוצרים"
+        assert list(restarted.context.agent_history) == ["product"]
+        assert restarted.context.get_shared_data("pending_action")["type"] == "update_stock"
+        assert restarted.chat_history == [{"role": "user", "content": "כמה מוצרים יש?"}]
+        assert len(MainAgent(None, conversation_store=store).for_session("bob").context.conversation_history) == 0
+
+    def test_bounded_history_loads_only_the_window(self, store):
+        agent = MainAgent(None, conversation_store=store, history_depth=4).for_session("alice")
+        for i in range(30):
+            agent.context.add_to_history(f"שאלה {i}", f"תשובה {i}", "order")
+
+        reads = []
+        read = store.read
+        store.read = lambda *args, **kwargs: reads.append(read(*args, **kwargs)) or reads[-1]
+        restarted = MainAgent(None, conversation_store=store, history_depth=4).for_session("alice")
+
+        assert list(restarted.context.conversation_history) == list(agent.context.conversation_history)
+        assert restarted.context.summary_lines == agent.context.summary_lines
+        assert restarted.context.turn_count == 30 and len(reads[0]) <= 8
+
+    def test_turns_stream_is_compacted(self, store):
+        agent = MainAgent(None, conversation_store=store, history_depth=4).for_session("alice")
+        other_process = MainAgent(None, conversation_store=store, history_depth=4).for_session("alice")
+        assert len(other_process.context.conversation_history) == 0
+        for i in range(30):
+            agent.context.add_to_history(f"שאלה {i}", f"תשובה {i}", "order")
+
+        restarted = MainAgent(None, conversation_store=store, history_depth=4).for_session("alice")
+        assert len(store.read("alice", "turns")) <= 8
+        assert list(restarted.context.conversation_history) == list(agent.context.conversation_history)
+        assert restarted.context.summary_lines == agent.context.summary_lines
+
+        other_process.context.sync()
+        assert list(other_process.context.conversation_history) == list(agent.context.conversation_history)
+        other_process.context.add_to_history("שאלה 30", "תשובה 30", "order")
+        agent.context.sync()
+        assert agent.context.turn_count == 31
+        assert agent.context.conversation_history[-1]["user_input"] == "שאלה 30"
+
+    def test_other_process_turns_are_synced(self, store):
+        manager = SessionManager(MainAgent(None, conversation_store=store).for_session)
+        with manager.session("alice") as agent:
+            agent.context.add_to_history("שאלה ראשונה", "תשובה", "primary")
+
+        other_process = MainAgent(None, conversation_store=store).for_session("alice")
+        other_process.context.add_to_history("שאלה שנייה", "תשובה", "order")
+
+        with manager.session("alice") as agent:
+            assert [t["user_input"] for t in agent.context.conversation_history] == ["שאלה ראשונה", "שאלה שנייה"]
+
+    def test_chat_history_is_truncated_and_compacted(self, store):
+        agent = MainAgent(None, conversation_store=store).for_session("alice")
+        agent.chat_memory_limit = 2
+        agent.history_archive_limit = 6
+        agent.add_to_chat_history("system", "הוראות")
+        for n in range(12):
+            agent.add_to_chat_history("user", f"הודעה {n}")
+
+        restarted = MainAgent(None, conversation_store=store).for_session("alice")
+        restarted.chat_memory_limit = 2
+        restarted.history_archive_limit = 6
+
+        assert restarted.chat_history == agent.chat_history
+        assert restarted.get_relevant_history("הודעה 7", max_messages=2) == \
+            agent.get_relevant_history("הודעה 7", max_messages=2)
+        assert len(store.read("alice", "chat")) < 13
+
+        restarted.clear_chat_history()
+        assert store.read("alice", "chat") == [{"role": "system", "content": "הוראות"}]
+
+    def test_sessions_without_store_stay_in_memory(self):
+        agent = MainAgent(None).for_session("alice")
+        agent.context.add_to_history("שאלה", "תשובה", "primary")
+
+        assert agent.context.store is None and agent.chat_store is None
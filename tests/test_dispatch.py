@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לניתוב הישיר לסוכנים המתמחים ולמדד הקריאות למודל בכל תור
+"""
+
+import asyncio
+
+from agents.base import Agent, Handoff, resolve_agent
+from agents.main_agent import AgentRouter, MainAgent
+from tests.fakes import FakeAsyncOpenAIClient, FakeOpenAIClient, make_response, make_tool_call
+
+
+def _main_agent(router_answers, specialists):
+    main_agent = MainAgent(None)
+    main_agent.router = AgentRouter(FakeOpenAIClient([make_response(content=a) for a in router_answers]),
+                                     classifier=None)
+    for name, agent in specialists.items():
+        main_agent.add_specialized_agent(name, agent)
+    return main_agent
+
+
+class TestLlmCallsPerTurn:
+    """מספר הקריאות למודל בכל תור נמדד ונשמר ב-last_turn_stats"""
+
+    def test_llm_routing_costs_one_call_plus_specialist(self):
+        specialist = Agent(client=FakeOpenAIClient([make_response(content="המכירות: 1200")]))
+        main_agent = _main_agent(["דוחות"], {"report": specialist})
+
+        assert main_agent.run("הצג לי את המכירות של החודש האחרון") == "המכירות: 1200"
+        assert main_agent.last_turn_stats["route"] == "report"
+        assert main_agent.last_turn_stats["route_source"] == "llm"
+        assert main_agent.last_turn_stats["llm_calls"] == 2
+
+    def test_local_decision_skips_router_call(self):
+        specialist = Agent(client=FakeOpenAIClient([make_response(content="נוצרה")]))
+        main_agent = _main_agent([], {"category": specialist})
+
+        main_agent.run("צור קטגוריה חדשה בשם נעליים")
+
+        assert main_agent.router.client.calls == []
+        assert main_agent.last_turn_stats["route_source"] == "local"
+        assert main_agent.last_turn_stats["llm_calls"] == 1
+
+    def test_processed_intent_is_not_classified_twice(self):
+        """בקשת מוצר עמומה שעברה עיבוד מועברת לסוכן המוצרים בלי סיווג נוסף"""
+        product_client = FakeOpenAIClient([make_response(content="המלאי עודכן")])
+        main_agent = _main_agent(["כללי"], {"product": Agent(client=product_client)})
+
+        main_agent.run("עדכן את המוצר 12 ל-5")
+
+        assert len(main_agent.router.client.calls) == 1
+        assert product_client.calls[0]["messages"][-1]["content"] == "עדכן מלאי למוצר 12 לכמות 5"
+        assert main_agent.last_turn_stats["route_source"] == "intent"
+        assert main_agent.last_turn_stats["llm_calls"] == 2
+
+    def test_fixed_answers_cost_nothing(self):
+        main_agent = _main_agent([], {})
+        main_agent.run("איזה סוכן אתה?")
+        assert main_agent.last_turn_stats == dict(main_agent.last_turn_stats, route="primary",
+                                                  route_source="fixed", llm_calls=0)
+
+    def test_async_turns_are_counted(self):
+        specialist_client = FakeOpenAIClient()
+        specialist_client.async_client = FakeAsyncOpenAIClient([make_response(content="1200")])
+        router_client = FakeOpenAIClient()
+        router_client.async_client = FakeAsyncOpenAIClient([make_response(content="דוחות")])
+        main_agent = MainAgent(None)
+        main_agent.router = AgentRouter(router_client, classifier=None)
+        main_agent.add_specialized_agent("report", Agent(client=specialist_client))
+
+        async def run_and_report():
+            await main_agent.arun("הצג לי את המכירות של החודש האחרון")
+            return main_agent.last_turn_stats["llm_calls"]
+
+        assert asyncio.run(run_and_report()) == 2
+
+
+class TestDirectDispatch:
+    """החלטת ניתוב עוברת ישירות לסוכן שבוחר את הכלים"""
+
+    def test_triage_agent_is_skipped_when_route_is_known(self):
+        """סוכן עם העברה לתחום שכבר נבחר לא קורא למודל כדי לבחור בה שוב"""
+        triage_client = FakeOpenAIClient([
+            make_response(tool_calls=[make_tool_call("c1", "handoff_to_report", {"query": "מכירות"})])
+        ])
+        report_client = FakeOpenAIClient([make_response(content="המכירות: 1200")])
+        triage = Agent(client=triage_client)
+        triage.add_tool(Handoff("report", Agent(client=report_client), "דוחות"))
+        main_agent = _main_agent(["דוחות"], {"report": Handoff("report", triage, "דוחות")})
+
+        assert main_agent.run("הצג לי את המכירות של החודש האחרון") == "המכירות: 1200"
+        assert triage_client.calls == []
+        assert main_agent.last_turn_stats["llm_calls"] == 2
+
+    def test_resolve_agent_unwraps_handoff_chains(self):
+        specialist = Agent(client=FakeOpenAIClient())
+        triage = Agent(client=FakeOpenAIClient())
+        triage.add_tool(Handoff("order_handoff", specialist, "הזמנות"))
+
+        assert resolve_agent(Handoff("outer", Handoff("inner", specialist, ""), "")) is specialist
+        assert resolve_agent(triage, "order") is specialist
+        assert resolve_agent(triage, "coupon") is triage
+        assert resolve_agent(triage) is triage
+
+    def test_agent_run_stats_count_llm_calls(self):
+        agent = Agent(client=FakeOpenAIClient([make_response(content="שלום")]))
+        agent.run("היי")
+        assert agent.last_run_stats["llm_calls"] == 1
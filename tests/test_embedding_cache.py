@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למטמון ה-embeddings
+"""
+
+import itertools
+from types import SimpleNamespace
+
+import memory.embedding_cache as embedding_cache
+from memory.embedding_cache import EmbeddingCache
+from memory.vector_store import AdvancedVectorStore
+from tests.fakes import FakeOpenAIClient
+
+
+class TestEmbeddingCache:
+    """וקטורים נשמרים לפי (מודל, מימד, תוכן)"""
+
+    def test_vectors_survive_a_restart(self, tmp_path):
+        path = str(tmp_path / "embeddings.sqlite")
+        EmbeddingCache(path).set("text-embedding-3-small", 4, "חולצה", [0.5, -1.0, 0.25, 2.0])
+
+        cache = EmbeddingCache(path)
+        assert cache.get("text-embedding-3-small", 4, "חולצה") == [0.5, -1.0, 0.25, 2.0]
+        assert cache.get("text-embedding-3-small", 8, "חולצה") is None
+        assert cache.get("text-embedding-3-large", 4, "חולצה") is None
+        assert cache.stats()["bytes"] == 16
+
+    def test_least_recently_used_vectors_are_evicted_by_size(self, monkeypatch):
+        clock = itertools.count()
+        monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+        cache = EmbeddingCache(max_bytes=48)
+        for text in ("א", "ב", "ג"):
+            cache.set("m", 4, text, [1.0] * 4)
+        cache.get("m", 4, "א")
+
+        cache.set("m", 4, "ד", [1.0] * 4)
+
+        # הפינוי יורד ל-90% מהמגבלה: "ב" ו-"ג" נמחקים, "א" נקרא לאחרונה ונשאר
+        assert sorted(cache.get_many("m", 4, ["א", "ב", "ג", "ד"])) == ["א", "ד"]
+        stats = cache.stats()
+        assert stats["evictions"] == 2 and stats["entries"] == 2 and stats["bytes"] == 32
+
+    def test_stats_report_the_hit_rate(self):
+        cache = EmbeddingCache()
+        cache.set_many("m", None, {"א": [1.0], "ב": [2.0], "ריק": []})
+
+        assert cache.get_many("m", None, ["א", "ב", "ג", "ריק"]) == {"א": [1.0], "ב": [2.0]}
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["stores"]) == (2, 2, 2)
+        assert stats["hit_rate"] == 0.5
+
+
+class TestStoreUsesTheCache:
+    """המאגר וצינור ההטמעה בודקים את המטמון לפני קריאה ל-API"""
+
+    def test_cached_texts_are_not_embedded_again(self):
+        client = FakeOpenAIClient()
+        cache = EmbeddingCache()
+        store = AdvancedVectorStore(client, importance_threshold=0.0, embedding_dimensions=32,
+                                    embedding_cache=cache)
+
+        store.add_document("חולצה כחולה")
+        store.search("חולצה כחולה")
+        assert len(client.embeddings.calls) == 1
+
+        store.add_documents(["חולצה כחולה", "מכנסי ג'ינס"])
+        assert client.embeddings.calls[-1]["input"] == ["מכנסי ג'ינס"]
+        assert client.embeddings.calls[-1]["dimensions"] == 32
+        assert cache.stats()["hits"] == 2
+
+    def test_store_uses_the_environment_cache_by_default(self, monkeypatch):
+        client = FakeOpenAIClient()
+        store = AdvancedVectorStore(client, importance_threshold=0.0, embedding_dimensions=32)
+        assert isinstance(store.embedding_cache, EmbeddingCache)
+        assert store.embedding_pipeline.cache is store.embedding_cache
+
+        store.add_document("חולצה כחולה")
+        store.search("חולצה כחולה")
+        assert len(client.embeddings.calls) == 1
+
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        assert AdvancedVectorStore(client).embedding_cache is None
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות להטמעה במנות ולתור ההטמעה ברקע
+"""
+
+import threading
+
+from memory.embedding_queue import EmbeddingPipeline, EmbeddingQueue, RateLimiter, make_batches
+from memory.vector_store import AdvancedVectorStore
+from tests.fakes import FakeOpenAIClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestEmbeddingPipeline:
+    """טקסטים זהים מוטמעים פעם אחת, במנות עד מגבלת הבקשה"""
+
+    def test_duplicates_are_embedded_once_in_batches(self):
+        client = FakeOpenAIClient()
+        pipeline = EmbeddingPipeline(client, "text-embedding-3-large", {"dimensions": 16}, batch_size=2)
+
+        vectors = pipeline.embed(["חולצה", "מכנסיים", "חולצה", "כובע", "גרביים"])
+
+        assert [len(call["input"]) for call in client.embeddings.calls] == [2, 2]
+        assert vectors[0] == vectors[2] == client.embeddings.vector("חולצה", 16)
+        assert vectors[4] == client.embeddings.vector("גרביים", 16)
+        assert pipeline.stats["duplicates"] == 1 and pipeline.stats["requests"] == 2
+
+    def test_batches_respect_the_token_limit(self):
+        assert make_batches([5, 5, 5, 20, 1], max_inputs=10, max_tokens=12) == [[0, 1], [2], [3], [4]]
+        assert make_batches([1] * 5, max_inputs=2) == [[0, 1], [2, 3], [4]]
+
+    def test_failed_batch_returns_empty_vectors(self):
+        client = FakeOpenAIClient()
+        client.embeddings.create = lambda **kwargs: (_ for _ in ()).throw(RuntimeError("429"))
+        sleeps = []
+        pipeline = EmbeddingPipeline(client, "text-embedding-3-large", sleep=sleeps.append)
+
+        assert pipeline.embed(["א", "ב"]) == [[], []]
+        assert sleeps == [1.0, 2.0, 4.0]
+        assert pipeline.stats["failed_batches"] == 1 and pipeline.stats["retries"] == 3
+
+    def test_transient_failure_is_retried(self):
+        client = FakeOpenAIClient()
+        failures = iter([RuntimeError("429")])
+        create = client.embeddings.create
+
+        def flaky(**kwargs):
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            return create(**kwargs)
+
+        client.embeddings.create = flaky
+        pipeline = EmbeddingPipeline(client, "text-embedding-3-small", {"dimensions": 8}, sleep=lambda seconds: None)
+
+        assert pipeline.embed(["א"]) == [client.embeddings.vector("א", 8)]
+        assert pipeline.stats["retries"] == 1 and pipeline.stats["failed_batches"] == 0
+
+
+class TestRateLimiter:
+    """הבקשות מחכות כשהדלי ריק"""
+
+    def test_requests_wait_for_the_bucket_to_refill(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire(100)
+        limiter.acquire(100)
+        assert clock.sleeps == []
+        limiter.acquire(100)
+        assert clock.now == 30.0
+
+        limiter.acquire(900)
+        assert clock.now > 30.0 and len(clock.sleeps) >= 2
+
+
+class TestEmbeddingQueue:
+    """התור מטמיע ברקע ומחזיר כל וקטור ל-callback"""
+
+    def test_items_are_embedded_in_the_background(self):
+        client = FakeOpenAIClient()
+        results = {}
+        pipeline = EmbeddingPipeline(client, "text-embedding-3-small")
+        embedding_queue = EmbeddingQueue(pipeline, results.__setitem__, max_wait=0.01)
+
+        embedding_queue.submit([(1, "הזמנה"), (2, "מוצר"), (3, "הזמנה")])
+        assert embedding_queue.flush(timeout=5)
+        assert sorted(results) == [1, 2, 3] and results[1] == results[3]
+        assert embedding_queue.pending == 0
+        embedding_queue.close(timeout=5)
+
+
+class TestAddDocuments:
+    """הוספת מסמכים רבים בקריאה אחת"""
+
+    def make_store(self, client):
+        return AdvancedVectorStore(client, importance_threshold=0.0, embedding_dimensions=32)
+
+    def test_bulk_add_uses_one_request_and_is_searchable(self):
+        client = FakeOpenAIClient()
+        store = self.make_store(client)
+
+        doc_ids = store.add_documents(["חולצה כחולה", "מכנסי ג'ינס", "חולצה כחולה"],
+                                      metadatas=[{"sku": 1}, {"sku": 2}, {"sku": 3}])
+
+        assert len(client.embeddings.calls) == 1 and client.embeddings.calls[0]["dimensions"] == 32
+        results = store.search("חולצה כחולה", n_results=2, min_relevance_score=0.9)
+        assert {result["id"] for result in results} == {doc_ids[0], doc_ids[2]}
+
+    def test_background_add_becomes_searchable_after_flush(self):
+        client = FakeOpenAIClient()
+        store = self.make_store(client)
+        release = threading.Event()
+        create = client.embeddings.create
+        # רק הקריאה במנה (של add_documents) מחכה; ההטמעה של השאילתה עוברת מיד
+        client.embeddings.create = lambda **kwargs: (isinstance(kwargs["input"], str) or release.wait(5)) and create(**kwargs)
+
+        doc_ids = store.add_documents(["קופון הנחה", "משלוח חינם"], wait=False)
+        assert store.get_document(doc_ids[0]) is not None
+        assert store.search("קופון הנחה", min_relevance_score=0.0) == []
+
+        store.delete_document(doc_ids[1])
+        release.set()
+        assert store.flush_embeddings(timeout=5)
+        assert [result["id"] for result in store.search("קופון הנחה", min_relevance_score=0.0)] == [doc_ids[0]]
+        store.close()
+
+    def test_documents_without_a_vector_can_be_retried(self):
+        client = FakeOpenAIClient()
+        store = self.make_store(client)
+        store._embedding_pipeline = EmbeddingPipeline(client, "text-embedding-3-large", {"dimensions": 32},
+                                                      max_retries=0)
+        create = client.embeddings.create
+        client.embeddings.create = lambda **kwargs: (_ for _ in ()).throw(RuntimeError("500"))
+
+        doc_ids = store.add_documents(["קופון הנחה", "משלוח חינם"])
+        assert store.unembedded_documents() == sorted(doc_ids)
+
+        store.delete_document(doc_ids[1])
+        client.embeddings.create = create
+        assert store.retry_embeddings() == []
+        assert [result["id"] for result in store.search("קופון הנחה")] == [doc_ids[0]]
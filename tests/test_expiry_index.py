@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לאינדקס התפוגה ולשכחה של מסמכים ישנים
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import memory.vector_store as vector_store
+from memory.expiry_index import ExpiryIndex, expiry_timestamp
+from memory.vector_persistence import DOCUMENTS_FILE, DocumentTable
+from memory.vector_store import AdvancedVectorStore
+from tests.fakes import FakeOpenAIClient
+
+
+def make_store(ttl_days=1, **kwargs):
+    return AdvancedVectorStore(FakeOpenAIClient(), importance_threshold=0.0, embedding_dimensions=32,
+                               ttl_days=ttl_days, **kwargs)
+
+
+def days_from_now(days):
+    return (datetime.now() + timedelta(days=days)).timestamp()
+
+
+class TestExpiryIndex:
+    """ערימת מינימום עם invalidation עצל"""
+
+    def test_pops_only_expired_documents_in_order(self):
+        index = ExpiryIndex()
+        for doc_id, expires_at in (("ג", 30), ("א", 10), ("ב", 20), ("ד", 40)):
+            index.set(doc_id, expires_at)
+
+        assert index.pop_expired(25) == ["א", "ב"]
+        assert len(index) == 2 and index.next_expiry() == 30
+
+    def test_updated_and_discarded_entries_are_skipped(self):
+        index = ExpiryIndex()
+        index.set("א", 10)
+        index.set("ב", 20)
+        index.set("א", 50)
+        index.discard("ב")
+
+        assert index.pop_expired(30) == []
+        assert index.pop_expired(60) == ["א"]
+        assert len(index) == 0 and index.next_expiry() is None
+
+    def test_stale_entries_are_compacted(self):
+        index = ExpiryIndex()
+        for expires_at in range(1000):
+            index.set("א", expires_at)
+
+        assert len(index._heap) <= 64
+        assert index.pop_expired(1000) == ["א"]
+
+    def test_parses_iso_dates(self):
+        expiry = datetime(2030, 1, 1, 12, 0)
+        assert expiry_timestamp(expiry.isoformat()) == expiry.timestamp()
+        assert expiry_timestamp(None) is None and expiry_timestamp("לא תאריך") is None
+
+
+class TestForgetOldDocuments:
+    """המאגר מוחק רק מסמכים שפג תוקפם"""
+
+    def test_forgets_expired_documents(self, monkeypatch):
+        store = make_store()
+        doc_id = store.add_document("מבצע סוף שבוע")
+        kept = store.add_document("מדיניות החזרות")
+        store.update_document_importance(kept, 1.0)
+
+        assert store.forget_old_documents() == 0
+        monkeypatch.setattr(vector_store, "time", SimpleNamespace(time=lambda: days_from_now(1.5)))
+        assert store.forget_old_documents() == 1
+        assert doc_id not in store.documents and kept in store.documents
+        assert [result["id"] for result in store.search("מדיניות החזרות")] == [kept]
+
+    def test_deleted_documents_are_not_forgotten_twice(self, monkeypatch):
+        store = make_store()
+        doc_id = store.add_document("הודעה זמנית")
+        store.delete_document(doc_id)
+
+        monkeypatch.setattr(vector_store, "time", SimpleNamespace(time=lambda: days_from_now(2)))
+        assert store.forget_old_documents() == 0
+
+    def test_expiry_survives_save_and_load(self, tmp_path, monkeypatch):
+        store = make_store(persist_directory=str(tmp_path))
+        old = store.add_document("קופון שפג")
+        new = store.add_document("קופון חדש")
+        store.save()
+        store.update_document_importance(new, 1.0)
+
+        loaded = make_store(persist_directory=str(tmp_path))
+        loaded.load()
+        # הטעינה לא קוראת את זמני התפוגה - הם נשלפים מהעמודה המאונדקסת
+        assert len(loaded._expiry) == 0
+        monkeypatch.setattr(vector_store, "time", SimpleNamespace(time=lambda: days_from_now(1.5)))
+        assert loaded.forget_old_documents() == 1
+        assert old not in loaded.documents and new in loaded.documents
+
+    def test_documents_added_after_save_expire_from_the_table(self, tmp_path, monkeypatch):
+        store = make_store(persist_directory=str(tmp_path))
+        store.save()
+        doc_id = store.add_document("מבצע אחרי השמירה")
+
+        assert len(store._expiry) == 0
+        monkeypatch.setattr(vector_store, "time", SimpleNamespace(time=lambda: days_from_now(1.5)))
+        assert store.forget_old_documents() == 1 and doc_id not in store.documents
+
+    def test_tables_saved_without_an_expiry_column_are_migrated(self, tmp_path):
+        path = str(tmp_path / DOCUMENTS_FILE)
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        expiry = datetime(2030, 1, 1)
+        db.executemany("INSERT INTO documents VALUES (?, ?, ?)", [
+            ("ישן", "א", json.dumps({"expiry_date": expiry.isoformat()})),
+            ("בלי תאריך", "ב", json.dumps({})),
+        ])
+        db.commit()
+        db.close()
+
+        table = DocumentTable(path)
+        assert table.expired(expiry.timestamp() + 1) == ["ישן"]
+        assert table.expired(expiry.timestamp()) == []
+        table.close()
+
+    def test_importance_update_does_not_restore_a_document_deleted_meanwhile(self):
+        store = make_store()
+        doc_id = store.add_document("מבצע חג")
+        deleter = threading.Thread(target=store.delete_document, args=(doc_id,))
+
+        class DeletedOnRead(dict):
+            # מחיקה מתהליכון אחר בין הבדיקה לבין הכתיבה של העדכון
+            def __getitem__(self, key):
+                if not deleter.is_alive() and deleter.ident is None:
+                    deleter.start()
+                    deleter.join(0.1)
+                return super().__getitem__(key)
+
+        store.documents = DeletedOnRead(store.documents)
+        store.update_document_importance(doc_id, 0.9)
+        deleter.join(5)
+
+        assert doc_id not in store.documents and doc_id not in store._expiry
+
+    def test_sweeper_forgets_in_the_background(self):
+        store = make_store(ttl_days=0)
+        store.add_document("מסמך שפג מיד")
+
+        store.start_expiry_sweeper(interval=0.01)
+        deadline = time.monotonic() + 5
+        while len(store.documents) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        store.close()
+
+        assert len(store.documents) == 0 and store._sweeper is None
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לביצוע הישיר של פקודות מלאות בכלי של הסוכן המתמחה
+"""
+
+import asyncio
+
+from agents.base import Agent
+from agents.category_agent import create_category_agent
+from agents.main_agent import AgentRouter, MainAgent
+from agents.product_agent import create_product_agent
+from tests.fakes import FakeOpenAIClient, FakeWooClient, make_response
+
+
+def _main_agent(woo, router_answers=(), confirm_writes=False):
+    main_agent = MainAgent(None, confirm_writes=confirm_writes)
+    main_agent.router = AgentRouter(FakeOpenAIClient([make_response(content=a) for a in router_answers]),
+                                     classifier=None)
+    main_agent.add_specialized_agent("product", create_product_agent(FakeOpenAIClient(), woo_client=woo))
+    main_agent.add_specialized_agent("category", create_category_agent(FakeOpenAIClient(), woo_client=woo))
+    return main_agent
+
+
+def _llm_calls(main_agent):
+    specialists = [main_agent.specialized_agents[name].client for name in ("product", "category")]
+    return len(main_agent.router.client.calls) + sum(len(client.calls) for client in specialists)
+
+
+class TestFastPath:
+    """פקודה מלאה מתבצעת בלי ניתוב ובלי קריאות למודל"""
+
+    def test_stock_command_runs_tool_directly(self):
+        woo = FakeWooClient([{"id": 12, "name": "כובע", "stock_quantity": 3}])
+        main_agent = _main_agent(woo)
+
+        response = main_agent.run("עדכן את המלאי של מוצר עם מזהה 12 לכמות 5")
+
+        assert "עודכן בהצלחה" in response
+        assert woo.products[12]["stock_quantity"] == 5
+        assert _llm_calls(main_agent) == 0
+        assert main_agent.last_turn_stats == dict(main_agent.last_turn_stats, route="product",
+                                                  route_source="fast_path", llm_calls=0)
+        assert list(main_agent.context.agent_history) == ["product"]
+
+    def test_price_and_category_commands(self):
+        woo = FakeWooClient([{"id": 45, "name": "חולצה"}])
+        main_agent = _main_agent(woo)
+
+        main_agent.run("עדכן מחיר למוצר 45 למחיר 149.90")
+        main_agent.run("צור קטגוריה חדשה בשם 'נעלי ספורט'")
+
+        assert woo.writes == [("update_product", 45, {"regular_price": "149.90"}),
+                              ("create_category", {"name": "נעלי ספורט"})]
+        assert _llm_calls(main_agent) == 0
+
+    def test_shorthand_waits_for_confirmation(self):
+        woo = FakeWooClient([{"id": 12, "name": "כובע", "stock_quantity": 3}])
+        main_agent = _main_agent(woo)
+
+        prompt = main_agent.run("עדכן את המוצר 12 ל-5")
+        assert "לעדכן את כמות המלאי של המוצר עם מזהה 12 לכמות 5" in prompt
+        assert woo.writes == []
+
+        assert "עודכן בהצלחה" in main_agent.run("כן")
+        assert woo.products[12]["stock_quantity"] == 5
+        assert main_agent.last_turn_stats["route_source"] == "fast_path"
+        assert _llm_calls(main_agent) == 0
+
+    def test_write_commands_wait_for_confirmation_by_default(self):
+        woo = FakeWooClient([{"id": 45, "name": "חולצה"}])
+        main_agent = _main_agent(woo, confirm_writes=True)
+
+        prompt = main_agent.run("עדכן מחיר למוצר 45 למחיר 149.90")
+        assert "לעדכן את מחיר המוצר עם מזהה 45 למחיר 149.90" in prompt
+        assert woo.writes == []
+
+        main_agent.run("כן")
+        assert woo.writes == [("update_product", 45, {"regular_price": "149.90"})]
+        assert _llm_calls(main_agent) == 0
+
+    def test_rejection_cancels_pending_action(self):
+        woo = FakeWooClient([{"id": 12, "name": "כובע", "stock_quantity": 3}])
+        main_agent = _main_agent(woo)
+
+        main_agent.run("עדכן את המוצר 12 ל-5")
+        assert main_agent.run("לא") == "הפעולה בוטלה."
+        assert main_agent.run("כן") != "הפעולה בוטלה."
+        assert woo.writes == []
+
+    def test_commands_with_extra_details_use_the_specialist(self):
+        woo = FakeWooClient()
+        main_agent = _main_agent(woo)
+        category_client = main_agent.specialized_agents["category"].client
+        category_client.chat.completions.responses.append(make_response(content="נוצרה"))
+
+        assert main_agent.run("צור קטגוריה חדשה בשם 'נעליים' עם תיאור 'הכל לרגליים'") == "נוצרה"
+        assert main_agent.last_turn_stats["route_source"] != "fast_path"
+        assert woo.writes == []
+
+    def test_specialist_without_the_tool_falls_back(self):
+        specialist = Agent(client=FakeOpenAIClient([make_response(content="המלאי עודכן")]))
+        main_agent = MainAgent(None)
+        main_agent.router = AgentRouter(FakeOpenAIClient([make_response(content="מוצרים")]), classifier=None)
+        main_agent.add_specialized_agent("product", specialist)
+
+        assert main_agent.run("עדכן מלאי למוצר 12 לכמות 5") == "המלאי עודכן"
+        assert main_agent.last_turn_stats["route_source"] == "llm"
+
+    def test_async_and_stream(self):
+        woo = FakeWooClient([{"id": 7, "name": "כובע", "stock_quantity": 1}])
+        main_agent = _main_agent(woo)
+
+        assert "עודכן בהצלחה" in asyncio.run(main_agent.arun("שנה מלאי למוצר 7 ל-9"))
+        events = list(main_agent.run_stream("עדכן מלאי למוצר 7 לכמות 2"))
+
+        assert [e["type"] for e in events] == ["route", "tool_call", "tool_result", "token", "done"]
+        assert woo.products[7]["stock_quantity"] == 2
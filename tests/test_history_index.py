@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לאינדקס ההפוך של היסטוריית השיחה ולבחירת ההיסטוריה הרלוונטית
+"""
+
+from agents.base_agent import BaseAgent
+from memory.history_index import HistoryIndex, tokenize
+
+
+def _agent_with_history(count, chat_memory_limit=10_000, **kwargs):
+    agent = BaseAgent(chat_memory_limit=chat_memory_limit, **kwargs)
+    agent.add_to_chat_history("system", "אתה עוזר לניהול חנות")
+    for n in range(count):
+        agent.add_to_chat_history("user", f"כמה הזמנות היו ביום {n}?")
+        agent.add_to_chat_history("assistant", f"ביום {n} היו {n % 7} הזמנות")
+    return agent
+
+
+class TestHistoryIndex:
+    """BM25 מעל המונחים של כל הודעה"""
+
+    def test_hebrew_prefixes_match_the_bare_word(self):
+        assert "מוצרים" in tokenize("המוצרים החדשים")
+        assert tokenize("Stock 12") == ["stock", "12"]
+
+    def test_rare_terms_rank_higher_and_removed_messages_disappear(self):
+        index = HistoryIndex()
+        messages = [{"content": text} for text in ("מלאי מוצר 12", "מלאי מוצר 14", "קופון חדש למוצר 12")]
+        for message in messages:
+            index.add(message, message["content"])
+
+        scores = {message["content"]: score for message, score in index.search("קופון 12").values()}
+        assert max(scores, key=scores.get) == "קופון חדש למוצר 12"
+        assert "מלאי מוצר 14" not in scores
+
+        index.remove(messages[2])
+        assert len(index) == 2 and index.search("קופון") == {}
+
+
+class TestRelevantHistory:
+    """הבחירה משתמשת באינדקס מעל כל הארכיון, גם הודעות שיצאו מההיסטוריה שנשלחת למודל"""
+
+    def test_relevant_message_is_selected_from_a_long_history(self):
+        agent = _agent_with_history(2000)
+        agent.add_to_chat_history("user", "עדכנתי את הקופון SUMMER20")
+        for n in range(50):
+            agent.add_to_chat_history("user", f"כמה הזמנות היו ביום {n}?")
+
+        result = agent.get_relevant_history("מה קרה עם הקופון?", max_messages=5)
+
+        assert len(result) == 10 and result[0]["role"] == "system"
+        assert {"role": "user", "content": "עדכנתי את הקופון SUMMER20"} in result
+
+    def test_messages_truncated_from_the_prompt_stay_searchable(self):
+        agent = _agent_with_history(0, chat_memory_limit=10)
+        agent.add_to_chat_history("user", "בדוק את הקופון SUMMER20")
+        for n in range(40):
+            agent.add_to_chat_history("user", f"כמה הזמנות היו ביום {n}?")
+        coupon = {"role": "user", "content": "בדוק את הקופון SUMMER20"}
+
+        assert coupon not in agent.chat_history and len(agent.chat_history) == 20
+        result = agent.get_chat_context("קופון")
+        assert coupon in result and len(result) == 20
+        assert agent.get_chat_context(None) == agent.chat_history
+
+    def test_index_follows_the_archive_limit(self):
+        agent = _agent_with_history(40, chat_memory_limit=4, history_archive_limit=30)
+        agent.add_to_chat_history("user", "בדוק את הקופון SUMMER20")
+        for n in range(5):
+            agent.add_to_chat_history("user", f"כמה הזמנות היו ביום {n}?")
+        incremental = agent.get_relevant_history("קופון", max_messages=4)
+
+        assert len(agent._history_index) == len(agent._history_archive) == 30
+        agent._history_index = None
+        assert agent.get_relevant_history("קופון", max_messages=4) == incremental
+
+    def test_embeddings_are_blended_and_cached(self):
+        calls = []
+
+        def embed(text):
+            calls.append(text)
+            return [1.0, 0.0] if "משלוח" in text else [0.0, 1.0]
+
+        agent = _agent_with_history(20, history_embed=embed)
+        agent.add_to_chat_history("user", "החבילה עוד לא הגיעה, איפה המשלוח")
+        agent.get_relevant_history("מעקב משלוח", max_messages=3)
+        first_calls = len(calls)
+        agent.get_relevant_history("מעקב משלוח", max_messages=3)
+
+        assert len(calls) == first_calls + 1  # רק השאילתה מחושבת שוב
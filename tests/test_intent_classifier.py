@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למסווג הכוונות המקומי ולשילוב שלו במנתב
+"""
+
+import json
+import time
+
+from agents.intent_classifier import (
+    IntentClassifier, load_corpus, load_default_classifier, load_trace_examples, retrain
+)
+from agents.main_agent import AgentRouter, MainAgent
+from agents.base import Agent
+from utils.tracing import Trace, save_trace
+from tests.fakes import FakeOpenAIClient, make_response
+
+HELD_OUT = [
+    ("תעדכן את המחיר של המוצר 15 ל-80", "product"),
+    ("מה הסטטוס של הזמנה 4521", "order"),
+    ("צור קופון של 15 אחוז לחורף", "coupon"),
+    ("כמה הכנסות היו החודש", "report"),
+    ("הוסף קטגוריה בשם תיקים", "category"),
+    ("מה כתובת המייל של הלקוח 33", "customer"),
+]
+
+
+class TestIntentClassifier:
+    """בדיקות למודל המאומן שנשמר ב-agents/data"""
+
+    def test_default_model_routes_held_out_requests(self):
+        classifier = load_default_classifier()
+        for text, label in HELD_OUT:
+            assert classifier.predict(text)[0] == label, text
+
+    def test_prediction_is_under_a_millisecond(self):
+        classifier = load_default_classifier()
+        classifier.predict("הצג לי את המכירות של החודש האחרון")
+        start = time.perf_counter()
+        for _ in range(200):
+            classifier.predict("הצג לי את המכירות של החודש האחרון")
+        assert (time.perf_counter() - start) / 200 < 0.001
+
+    def test_unknown_text_has_no_confidence(self):
+        assert load_default_classifier().predict("xyz qwerty") == (None, 0.0)
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        examples = load_corpus()
+        classifier = IntentClassifier.train([t for t, _ in examples], [l for _, l in examples])
+        loaded = IntentClassifier.load(classifier.save(tmp_path / "model.json"))
+
+        label, confidence = classifier.predict("צור קופון הנחה חדש")
+        loaded_label, loaded_confidence = loaded.predict("צור קופון הנחה חדש")
+        assert loaded_label == label == "coupon"
+        assert abs(loaded_confidence - confidence) < 0.01
+
+
+class TestRetraining:
+    """אימון מחדש מהקורפוס ומצעדי הניתוב ב-trace"""
+
+    def test_trace_route_steps_become_examples(self, tmp_path):
+        trace = Trace()
+        trace.add_step("route", {"user_input": "תוציא חשבונית", "agent": "order", "source": "llm"})
+        trace.add_step("route", {"user_input": "בדיקה", "agent": "order", "source": "classifier"})
+        trace.add_step("tool_call", {"name": "get_order"})
+        save_trace(trace, tmp_path)
+
+        assert load_trace_examples(tmp_path) == [("תוציא חשבונית", "order")]
+
+    def test_retrain_writes_model(self, tmp_path):
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text("\n".join(
+            json.dumps({"text": text, "label": label}, ensure_ascii=False)
+            for text, label in load_corpus()
+        ), encoding="utf-8")
+
+        report = retrain(corpus, trace_dir=None, output_path=tmp_path / "model.json", folds=0)
+
+        assert report["examples"] == len(load_corpus())
+        assert IntentClassifier.load(report["path"]).predict("רשימת קופונים")[0] == "coupon"
+
+
+class TestRouterFallback:
+    """המנתב משתמש במסווג מעל סף הביטחון, ומתחתיו קורא למודל"""
+
+    def test_confident_prediction_skips_llm(self):
+        client = FakeOpenAIClient([make_response(content="הזמנות")])
+        router = AgentRouter(client)
+
+        assert router.identify_agent("כמה הכנסות היו החודש") == "report"
+        assert client.calls == []
+
+    def test_low_confidence_falls_back_to_llm(self):
+        client = FakeOpenAIClient([make_response(content="הזמנות")])
+        router = AgentRouter(client, confidence_threshold=1.01)
+
+        assert router.identify_agent("כמה הכנסות היו החודש") == "order"
+        assert len(client.calls) == 1
+
+    def test_llm_routed_turn_runs_the_local_router_once(self, monkeypatch):
+        router = AgentRouter(FakeOpenAIClient([make_response(content="דוחות")]), confidence_threshold=1.01)
+        calls = []
+        for name in ("local_decision", "quick_decision"):
+            method = getattr(router, name)
+            monkeypatch.setattr(router, name, lambda text, method=method, name=name: calls.append(name) or method(text))
+        main_agent = MainAgent(None)
+        main_agent.router = router
+        main_agent.add_specialized_agent(
+            "report", Agent(client=FakeOpenAIClient([make_response(content="הכנסות: 1200")])))
+
+        assert main_agent.run("כמה הכנסות היו החודש") == "הכנסות: 1200"
+        assert calls == ["quick_decision", "local_decision"]
+        assert main_agent.last_turn_stats["route_source"] == "llm"
+
+    def test_routing_decisions_are_traced(self):
+        specialist = Agent(client=FakeOpenAIClient([make_response(content="הכנסות: 1200")]))
+        main_agent = MainAgent(None)
+        main_agent.router = AgentRouter(FakeOpenAIClient())
+        main_agent.add_specialized_agent("report", specialist)
+        main_agent.trace = Trace()
+
+        main_agent.run("כמה הכנסות היו החודש")
+
+        assert main_agent.last_turn_stats["route_source"] == "classifier"
+        assert main_agent.last_turn_stats["llm_calls"] == 1
+        step = main_agent.trace.steps[-1]
+        assert step["type"] == "route"
+        assert step["data"] == dict(step["data"], user_input="כמה הכנסות היו החודש",
+                                    agent="report", source="classifier")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לזיהוי הכוונות והפרמטרים במעבר אחד (agents/intent_matcher.py)
+"""
+
+import re
+
+import pytest
+
+from agents.base_agent import BaseAgent
+from agents.intent_matcher import IntentMatcher, match_intents, rule
+from agents.main_agent import MainAgent
+
+
+class TestIntentMatcher:
+    """בדיקות למנגנון הסריקה"""
+
+    def test_overlapping_phrases_are_all_found(self):
+        matcher = IntentMatcher([rule("why", "למה"), rule("what", "מה"), rule("word", "מוצר"),
+                                 rule("new", "מוצר חדש"), rule(None, "מוצר", r"\s+(\d+)", slots=("id",))])
+        result = matcher.scan("למה מוצר חדש ולא מוצר 12")
+
+        assert result.intents == {"why", "what", "word", "new"}
+        assert result.slots == {"id": "12"}
+        assert result.positions["word"] == 4
+
+    def test_anchored_rules_match_whole_message_only(self):
+        matcher = IntentMatcher([rule("yes", ["כן", "y"], "$", anchored=True), rule("word", "כן")])
+
+        assert matcher.scan("  Y ").intents == {"yes"}
+        assert matcher.scan("כן").intents == {"yes", "word"}
+        assert matcher.scan("לא כן").intents == {"word"}
+
+    def test_first_occurrence_of_slot_wins(self):
+        result = match_intents("עדכן מחיר מוצר 5 למחיר 20 ומוצר 6 למחיר 30")
+        assert (result.slot("product_id"), result.slot("new_price")) == ("5", "20")
+
+    def test_cached_results_cannot_be_modified(self):
+        result = match_intents("עדכן מחיר מוצר 5 למחיר 20")
+        with pytest.raises(TypeError):
+            result.slots["product_id"] = "6"
+        with pytest.raises(TypeError):
+            result.positions["update_price"] = 3
+        assert match_intents("עדכן מחיר מוצר 5 למחיר 20").slot("product_id") == "5"
+
+    def test_find_product_name_may_span_lines(self):
+        result = match_intents("תמצא מוצר חולצה כחולה\nמידה L כמות 3 מחיר 50")
+        assert result.has("find_product")
+        assert (result.slot("find_name"), result.slot("find_quantity"), result.slot("find_price")) == \
+            ("חולצה כחולה\nמידה L", "3", "50")
+
+    def test_matches_legacy_search_semantics(self):
+        patterns = {
+            "update_stock": r"עדכן מלאי|עדכן כמות|שנה מלאי|לשנות מלאי",
+            "create_product": r"צור מוצר|יצירת מוצר|מוצר חדש|תמצא מוצר.*מחיר",
+        }
+        slots = {"new_stock": r"(?:כמות חדשה|לכמות|כמות:?|ל-)\s+(\d+)", "price": r"(?:מחיר:?|במחיר)\s+(\d+(?:\.\d+)?)"}
+        for text in ["עדכן מלאי למוצר 123 לכמות 5", "תמצא מוצר כובע כמות 3 מחיר 49.9",
+                     "שנה מלאי מוצר 4 כמות חדשה 8", "צור מוצר בשם חולצה במחיר 99"]:
+            result = match_intents(text)
+            for intent, pattern in patterns.items():
+                assert result.has(intent) == bool(re.search(pattern, text)), (intent, text)
+            for name, pattern in slots.items():
+                legacy = re.search(pattern, text)
+                assert result.slot(name) == (legacy.group(1) if legacy else None), (name, text)
+
+
+class TestAgentsUseMatcher:
+    """הכללים של הסוכנים עובדים על תוצאת הסריקה"""
+
+    def test_process_user_intent(self):
+        agent = MainAgent(None)
+        assert agent._process_user_intent("עדכן את המוצר 12 ל-5") == ("עדכן מלאי למוצר 12 לכמות 5", True)
+        assert agent._process_user_intent("תמצא מוצר חולצה כחולה כמות 10 מחיר 120") == (
+            "צור מוצר חולצה כחולה כמות 10 מחיר 120", True)
+        assert agent._process_user_intent("תמצא מוצר חולצה") == ("תמצא מוצר חולצה", False)
+
+    def test_detect_complex_action(self):
+        agent = MainAgent(None)
+        assert agent._detect_complex_action("עדכן מחיר למוצר 45 למחיר 150") == (
+            "update_price", {"product_id": "45", "new_price": "150"})
+        assert agent._detect_complex_action("צור קטגוריה חדשה בשם נעליים") == (
+            "create_category", {"name": "נעליים"})
+        assert agent._detect_complex_action("הצג הזמנות") == (None, None)
+
+    def test_confirmations(self):
+        agent = MainAgent(None)
+        assert agent._is_confirmation_response(" לא מאשר ")
+        assert agent._is_positive_confirmation("OK")
+        assert not agent._is_positive_confirmation("כן, אבל")
+
+    def test_base_agent_stock_update(self):
+        assert BaseAgent().run("עדכן את המלאי של מוצר עם מזהה 7 לכמות 9") == (
+            "המלאי עודכן בהצלחה! כמות המלאי של מוצר 7 עודכנה לכמות 9")
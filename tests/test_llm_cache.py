@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למטמון תשובות מודל השפה (utils/llm_cache.py)
+"""
+
+import asyncio
+
+from agents.base import Agent, function_tool
+from agents.main_agent import AgentRouter
+from utils.llm_cache import CompletionCache, CachedOpenAIClient, make_cache_key, normalize_text
+from tests.fakes import (
+    FakeAsyncOpenAIClient, FakeOpenAIClient, make_response, make_stream, make_tool_call
+)
+
+
+def _cached(responses, cache=None):
+    inner = FakeOpenAIClient(responses)
+    return inner, CachedOpenAIClient(inner, cache or CompletionCache())
+
+
+def _ask(client, text):
+    return client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": text}])
+
+
+class TestNormalization:
+    """בדיקות לנרמול הטקסט ולחישוב המפתח"""
+
+    def test_whitespace_and_numbers_are_normalized(self):
+        assert normalize_text("  מה   המכירות\nהחודש ") == "מה המכירות החודש"
+        assert normalize_text("מחיר 5.00 וכמות 1,200") == "מחיר 5 וכמות 1200"
+        assert normalize_text("מוצרים 12,15") == "מוצרים 12,15"
+
+    def test_key_ignores_formatting_but_not_values(self):
+        key = make_cache_key(model="gpt-4o", messages=[{"role": "user", "content": "מחיר 99.90"}])
+        assert key == make_cache_key(model="gpt-4o", messages=[{"role": "user", "content": " מחיר  99.9 "}])
+        assert key != make_cache_key(model="gpt-4o", messages=[{"role": "user", "content": "מחיר 99.8"}])
+        assert key != make_cache_key(model="gpt-4o-mini", messages=[{"role": "user", "content": "מחיר 99.9"}])
+
+    def test_key_ignores_random_tool_call_ids(self):
+        def messages(call_id):
+            return [
+                {"role": "user", "content": "מכירות"},
+                {"role": "assistant", "content": None, "tool_calls": [
+                    {"id": call_id, "type": "function", "function": {"name": "get_sales", "arguments": "{}"}}
+                ]},
+                {"role": "tool", "tool_call_id": call_id, "content": "1200"},
+            ]
+
+        assert make_cache_key(model="m", messages=messages("call_a")) == make_cache_key(model="m", messages=messages("call_b"))
+
+
+class TestCompletionCache:
+    """בדיקות לשכבות המטמון"""
+
+    def test_repeated_question_is_served_from_memory(self):
+        inner, client = _cached([make_response(content="1200 ש\"ח")])
+
+        assert _ask(client, "מה המכירות החודש").choices[0].message.content == "1200 ש\"ח"
+        cached = _ask(client, "מה  המכירות החודש")
+
+        assert cached.choices[0].message.content == "1200 ש\"ח"
+        assert cached.usage is None
+        assert len(inner.calls) == 1
+        stats = client.cache.stats()
+        assert stats["memory_hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+    def test_sqlite_tier_survives_restart(self, tmp_path):
+        db_path = str(tmp_path / "llm_cache.sqlite")
+        _, client = _cached([make_response(content="עזרה")], CompletionCache(db_path=db_path))
+        _ask(client, "מה אתה יודע לעשות")
+
+        inner, client = _cached([], CompletionCache(db_path=db_path))
+        assert _ask(client, "מה אתה יודע לעשות").choices[0].message.content == "עזרה"
+        assert inner.calls == []
+        assert client.cache.stats()["disk_hits"] == 1
+
+    def test_expired_entries_are_refetched(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("utils.llm_cache.time.time", lambda: now[0])
+        inner, client = _cached([make_response(content="ישן"), make_response(content="חדש")],
+                                CompletionCache(ttl_seconds=60))
+
+        _ask(client, "שאלה")
+        now[0] += 61
+        assert _ask(client, "שאלה").choices[0].message.content == "חדש"
+        assert len(inner.calls) == 2
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = CompletionCache(max_entries=2)
+        cache.set("a", {"v": 1})
+        cache.set("b", {"v": 2})
+        cache.get("a")
+        cache.set("c", {"v": 3})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == {"v": 1}
+
+
+class TestWriteBypass:
+    """תשובות שמשנות את החנות לא נשמרות במטמון"""
+
+    def test_write_tool_calls_are_not_cached(self):
+        responses = [
+            make_response(tool_calls=[make_tool_call("c1", "update_stock", {"product_id": 12, "quantity": 5})]),
+            make_response(content="עודכן"),
+            make_response(tool_calls=[make_tool_call("c2", "update_stock", {"product_id": 12, "quantity": 5})]),
+            make_response(content="עודכן שוב"),
+        ]
+        inner, client = _cached(responses)
+        agent = Agent(client=client)
+
+        @function_tool(name="update_stock", description="מעדכן מלאי")
+        def update_stock_tool(product_id: int, quantity: int):
+            return "ok"
+
+        agent.add_tool(update_stock_tool)
+
+        assert agent.run("עדכן מלאי של מוצר 12 ל-5") == "עודכן"
+        assert agent.run("עדכן מלאי של מוצר 12 ל-5") == "עודכן שוב"
+        assert len(inner.calls) == 4
+        assert client.cache.stats()["stores"] == 0
+        assert client.cache.stats()["bypassed"] == 2
+
+    def test_read_tool_loop_is_cached(self):
+        responses = [
+            make_response(tool_calls=[make_tool_call("c1", "get_sales", {"period": "month"})]),
+            make_response(content="1200"),
+        ]
+        inner, client = _cached(responses)
+        agent = Agent(client=client)
+
+        @function_tool(name="get_sales", description="מחזיר מכירות")
+        def get_sales_tool(period: str):
+            return "1200"
+
+        agent.add_tool(get_sales_tool)
+
+        assert agent.run("מה המכירות החודש") == "1200"
+        assert agent.run("מה המכירות החודש") == "1200"
+        assert len(inner.calls) == 2
+
+
+class TestStreamingAndAsync:
+    """המטמון עובד גם בהזרמה ובמסלול האסינכרוני"""
+
+    def test_stream_is_stored_and_replayed(self):
+        inner, client = _cached([make_stream(["המכירות ", "גבוהות"])])
+        agent = Agent(client=client)
+
+        first = list(agent.run_stream("מה המכירות"))
+        second = list(agent.run_stream("מה המכירות"))
+
+        assert first[-1]["content"] == second[-1]["content"] == "המכירות גבוהות"
+        assert [e["type"] for e in second] == ["token", "done"]
+        assert len(inner.calls) == 1
+
+    def test_arun_shares_the_cache(self):
+        inner = FakeOpenAIClient()
+        inner.async_client = FakeAsyncOpenAIClient([make_response(content="שלום")])
+        client = CachedOpenAIClient(inner, CompletionCache())
+        agent = Agent(client=client)
+
+        assert asyncio.run(agent.arun("היי")) == "שלום"
+        assert agent.run("היי") == "שלום"
+        assert len(inner.async_client.calls) == 1
+        assert inner.calls == []
+
+    def test_router_classification_is_cached(self):
+        inner, client = _cached([make_response(content="הזמנות")])
+        router = AgentRouter(client, classifier=None)
+
+        assert router.identify_agent("מה הסטטוס של ההזמנה האחרונה") == "order"
+        assert router.identify_agent("מה הסטטוס של ההזמנה האחרונה") == "order"
+        assert len(inner.calls) == 1
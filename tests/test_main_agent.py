@@ -18,6 +18,9 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# בדיקות מול חנות אמיתית - מדולגות כשאין הגדרות WooCommerce
+pytestmark = pytest.mark.usefixtures("woo_client", "openai_client")
+
 class TestMainAgent:
     """מחלקת בדיקות לסוכן הראשי ומעברים בין סוכנים"""
     
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לרשומות המובנות שהכלים מחזירים (agents/records.py)
+"""
+
+import json
+
+from agents.order_agent import list_orders
+from agents.product_agent import get_product, list_products
+from agents.records import ProductDetail, RecordList, render_result, strip_html
+from utils.tokens import compact_tool_output, count_tokens
+
+
+def _woo_product(product_id, price="79.90", regular_price="99.90"):
+    return {
+        "id": product_id,
+        "name": f"חולצה {product_id}",
+        "sku": f"TS-{product_id}",
+        "price": price,
+        "regular_price": regular_price,
+        "stock_quantity": 5,
+        "status": "publish",
+        "description": "<p>חולצת <strong>כותנה</strong>&nbsp;נוחה</p>",
+        "categories": [{"id": 3, "name": "ביגוד"}],
+    }
+
+
+class FakeWoo:
+    def __init__(self, products):
+        self.products = products
+        self.params = None
+
+    def get_product(self, product_id):
+        return next((p for p in self.products if p["id"] == product_id), {})
+
+    def get_products(self, **params):
+        self.params = params
+        return self.products[:params.get("per_page", 10)]
+
+
+class TestRecords:
+    """בדיקות לבניית הרשומות ולפורמט הדחוס"""
+
+    def test_product_detail_is_minimal_json(self):
+        record = get_product(FakeWoo([_woo_product(7)]), 7)
+        data = json.loads(str(record))
+
+        assert isinstance(record, ProductDetail)
+        assert data["description"] == "חולצת כותנה נוחה"
+        assert data["categories"] == ["ביגוד"]
+        assert "permalink" not in data
+
+    def test_regular_price_is_dropped_when_not_on_sale(self):
+        record = ProductDetail.from_woo(_woo_product(7, price="99.90", regular_price="99.90"))
+        assert "regular_price" not in record.to_dict()
+
+    def test_product_list_is_tsv_with_single_header(self):
+        woo = FakeWoo([_woo_product(i) for i in range(1, 4)])
+        lines = str(list_products(woo, limit=3, search="חולצה")).split("\n")
+
+        assert lines[0] == "id\tname\tsku\tprice\tstock"
+        assert lines[1] == "1\tחולצה 1\tTS-1\t79.90\t5"
+        assert len(lines) == 4
+        assert woo.params["search"] == "חולצה"
+
+    def test_empty_results_stay_messages(self):
+        assert list_products(FakeWoo([]), category=3) == "לא נמצאו מוצרים בקטגוריה 3"
+        assert get_product(FakeWoo([]), 9) == "לא נמצא מוצר עם המזהה 9"
+
+    def test_strip_html_truncates(self):
+        assert strip_html("<p>" + "א" * 50 + "</p>", max_chars=10) == "א" * 10 + "…"
+
+
+class TestCompactionAndRendering:
+    """רשומות נשארות דחוסות בקיצור, ומוצגות כטקסט רק בקצה"""
+
+    def test_compaction_keeps_tsv_header(self):
+        orders = list_orders(object(), limit=200)
+        text = compact_tool_output(orders, 150)
+
+        assert count_tokens(text) <= 150
+        assert text.startswith("id\tnumber\tstatus\tdate\ttotal\tcustomer_id\n101\t")
+        assert "מתוך 200" in text
+
+    def test_render_result_for_users(self):
+        products = RecordList([ProductDetail.from_woo(_woo_product(1))])
+        assert "מחיר: ₪79.90" in render_result(products)
+        assert "מחיר רגיל: ₪99.90" in render_result(products[0])
+        assert render_result("טקסט") == "טקסט"
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למטמון החלטות הניתוב לפי תבנית הבקשה
+"""
+
+import asyncio
+
+from agents.base import Agent
+from agents.main_agent import AgentRouter, MainAgent
+from agents.speculation import SpeculativeRouting
+from agents.routing_cache import RoutingCache, normalize_utterance
+from tests.fakes import FakeAsyncOpenAIClient, FakeOpenAIClient, make_response
+
+
+class CountingClassifier:
+    """מסווג מדומה שסופר קריאות"""
+
+    def __init__(self, label, confidence=0.9):
+        self.result = (label, confidence)
+        self.calls = 0
+
+    def predict(self, text):
+        self.calls += 1
+        return self.result
+
+    def predict_proba(self, text):
+        return {self.result[0]: self.result[1]}
+
+
+class TestNormalizeUtterance:
+    """תבניות הבקשה"""
+
+    def test_ids_and_numbers_are_masked(self):
+        assert normalize_utterance("עדכן מלאי למוצר 123 לכמות 5") == "עדכן מלאי למוצר <num> לכמות <num>"
+        assert normalize_utterance("עדכן מלאי  למוצר 7 לכמות 12.") == "עדכן מלאי למוצר <num> לכמות <num>"
+        assert normalize_utterance("מוצר TS-0042 מחיר 1,200.50") == "מוצר <sku> מחיר <num>"
+
+    def test_emails_dates_and_quoted_names_are_masked(self):
+        assert normalize_utterance("חפש לקוח dana@example.com") == "חפש לקוח <email>"
+        assert normalize_utterance("הזמנות מ-15/06/2024") == "הזמנות מ-<date>"
+        assert normalize_utterance('צור קטגוריה בשם "נעלי ספורט"') == "צור קטגוריה בשם <name>"
+
+    def test_gershayim_inside_words_are_kept(self):
+        assert normalize_utterance('מה המק"ט של המוצר 14') == 'מה המק"ט של המוצר <num>'
+
+
+class TestRoutingCache:
+    """LRU ושמירה ב-SQLite"""
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = RoutingCache(max_entries=2)
+        cache.set("a", "product")
+        cache.set("b", "order")
+        cache.get("a")
+        cache.set("c", "coupon")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "product"
+        assert cache.stats()["evictions"] == 1
+
+    def test_sqlite_survives_restart_with_same_bound(self, tmp_path):
+        path = str(tmp_path / "routes.sqlite")
+        cache = RoutingCache(max_entries=2, db_path=path)
+        for template, agent in [("a", "product"), ("b", "order"), ("c", "coupon")]:
+            cache.set(template, agent)
+
+        restored = RoutingCache(max_entries=2, db_path=path)
+        assert restored.get("a") is None
+        assert restored.get("c") == "coupon"
+        assert restored.stats()["entries"] == 2
+
+
+    def test_sqlite_keeps_lru_order_across_restart(self, tmp_path):
+        path = str(tmp_path / "routes.sqlite")
+        cache = RoutingCache(max_entries=2, db_path=path)
+        cache.set("a", "product")
+        cache.set("b", "order")
+        cache.get("a")
+
+        restored = RoutingCache(max_entries=2, db_path=path)
+        restored.set("c", "coupon")
+        assert restored.get("b") is None
+        assert restored.get("a") == "product"
+
+
+class TestRouterUsesCache:
+    """בקשה בתבנית מוכרת מדלגת על המסווג ועל המודל"""
+
+    def test_repeated_shape_skips_classifier(self):
+        classifier = CountingClassifier("product")
+        router = AgentRouter(FakeOpenAIClient(), classifier=classifier, routing_cache=RoutingCache())
+
+        assert router.quick_decision("עדכן מלאי למוצר 123 לכמות 5") == ("product", "classifier")
+        assert router.quick_decision("עדכן מלאי למוצר 9 לכמות 40") == ("product", "cache")
+        assert classifier.calls == 1
+
+    def test_llm_decisions_are_cached(self):
+        client = FakeOpenAIClient([make_response(content="הזמנות")])
+        router = AgentRouter(client, classifier=None, routing_cache=RoutingCache())
+
+        assert router.identify_agent("מה קורה עם ההזמנה 1001") == "order"
+        assert router.identify_agent("מה קורה עם ההזמנה 2002") == "order"
+        assert len(client.calls) == 1
+
+    def test_async_llm_decisions_are_cached(self):
+        client = FakeOpenAIClient()
+        client.async_client = FakeAsyncOpenAIClient([make_response(content="קופונים")])
+        router = AgentRouter(client, classifier=None, routing_cache=RoutingCache())
+
+        async def route_twice():
+            return [await router.aidentify_agent(f"מה מצב הקופון SALE{n}") for n in (10, 20)]
+
+        assert asyncio.run(route_twice()) == ["coupon", "coupon"]
+        assert len(client.async_client.calls) == 1
+
+    def test_primary_fallback_is_not_cached(self):
+        client = FakeOpenAIClient([make_response(content="לא ברור")])
+        cache = RoutingCache()
+        router = AgentRouter(client, classifier=None, routing_cache=cache)
+
+        assert router.identify_agent("בקשה לא ברורה 5") == "primary"
+        assert cache.stats()["entries"] == 0
+
+    def test_llm_routed_turn_checks_the_cache_once(self):
+        for speculation in (None, SpeculativeRouting()):
+            classifier = CountingClassifier("report", confidence=0.4)
+            cache = RoutingCache()
+            main_agent = MainAgent(None, speculation=speculation)
+            main_agent.router = AgentRouter(FakeOpenAIClient([make_response(content="דוחות")]),
+                                            classifier=classifier, routing_cache=cache)
+            main_agent.add_specialized_agent(
+                "report", Agent(client=FakeOpenAIClient([make_response(content="המכירות: 1200")])))
+
+            assert main_agent.run("תראה לי מה קרה בחנות בשבוע האחרון") == "המכירות: 1200"
+            assert classifier.calls == 1
+            assert cache.stats() == dict(cache.stats(), misses=1, stores=1)
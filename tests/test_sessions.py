@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למנהל השיחות: שיחה נפרדת לכל משתמש מעל סוכנים מתמחים משותפים
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from agents.base import Agent
+from agents.main_agent import MainAgent
+from agents.sessions import SessionManager, estimate_session_size
+from tests.fakes import FakeOpenAIClient, make_response
+
+
+def _history_agent(session_id=None):
+    return MainAgent(None)
+
+
+class TestSessionManager:
+    """פינוי ונעילה"""
+
+    def test_lru_eviction_by_count(self):
+        manager = SessionManager(_history_agent, max_sessions=2)
+        first = manager.get("a").agent
+        manager.get("b")
+        manager.get("a")
+        manager.get("c")
+
+        assert manager.get("a").agent is first
+        assert manager.stats() == dict(manager.stats(), sessions=2, created=3, evicted_lru=1)
+        assert manager.get("b").agent is not None and manager.stats()["created"] == 4
+
+    def test_idle_sessions_are_evicted(self):
+        manager = SessionManager(_history_agent, idle_ttl=0.05)
+        first = manager.get("a").agent
+        time.sleep(0.08)
+        manager.get("b")
+
+        assert manager.stats()["evicted_idle"] == 1
+        assert manager.get("a").agent is not first
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        manager = SessionManager(_history_agent, max_memory_bytes=300)
+        for session_id in ("a", "b"):
+            with manager.session(session_id) as agent:
+                agent.context.add_to_history("שאלה", "ת" * 100, "primary")
+
+        assert estimate_session_size(manager.get("b").agent) == len("שאלה".encode()) + 200
+        assert manager.stats() == dict(manager.stats(), sessions=1, evicted_memory=1)
+
+    def test_sessions_in_use_are_not_evicted(self):
+        manager = SessionManager(_history_agent, max_sessions=1)
+        entered, release = threading.Event(), threading.Event()
+
+        def hold():
+            with manager.session("a"):
+                entered.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        entered.wait(5)
+        first = manager.get("a").agent
+        manager.get("b")
+        manager.get("c")
+
+        assert manager.get("a").agent is first
+        assert manager.stats() == dict(manager.stats(), sessions=2, evicted_lru=1)
+        release.set()
+        holder.join(5)
+
+        manager.get("d")
+        assert manager.stats()["sessions"] == 1 and manager.get("a").agent is not first
+
+    def test_requests_of_one_session_are_serialized(self):
+        active, overlaps = [], []
+
+        def slow_run(message):
+            active.append(message)
+            overlaps.append(len(active))
+            time.sleep(0.02)
+            active.remove(message)
+
+        manager = SessionManager(lambda session_id: SimpleNamespace(run=slow_run))
+
+        def request(session_id, message):
+            with manager.session(session_id) as agent:
+                agent.run(message)
+
+        threads = [threading.Thread(target=request, args=("a", n)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(overlaps) == 1
+
+
+class TestSessionAgents:
+    """לכל שיחה הקשר משלה, והסוכנים המתמחים משותפים"""
+
+    def test_for_session_shares_specialists_not_context(self):
+        base = MainAgent(None)
+        base.add_specialized_agent("report", Agent(client=FakeOpenAIClient([make_response(content="דוח")])))
+        first, second = base.for_session(), base.for_session()
+
+        first.context.set_shared_data("pending_action", {"type": "update_stock"})
+
+        assert first.specialized_agents["report"] is second.specialized_agents["report"]
+        assert second.context.get_shared_data("pending_action") is None
+        assert base.context.get_shared_data("pending_action") is None
+
+    def test_web_users_get_separate_conversations(self, monkeypatch):
+        import app as web_app
+
+        monkeypatch.setattr(web_app, "sessions", SessionManager(MainAgent(None).for_session))
+        alice, bob = web_app.app.test_client(), web_app.app.test_client()
+
+        message = {"message": "אני רוצה לשאול משהו על החנות"}
+        alice.post("/api/chat", json=message)
+        alice.post("/api/chat", json=message)
+        bob.post("/api/chat", json=message)
+
+        histories = sorted(len(s.agent.context.conversation_history)
+                           for s in web_app.sessions._sessions.values())
+        assert histories == [1, 2]
+        assert alice.get("/api/stats/sessions").get_json()["created"] == 2
+
+        alice.post("/api/session/reset")
+        assert web_app.sessions.stats()["sessions"] == 1
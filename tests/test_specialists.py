@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות ליצירה העצלה של הסוכנים המתמחים ולסכמות הכלים המחושבות מראש
+"""
+
+from agents.base import Agent, Handoff, function_tool, resolve_agent
+from agents.main_agent import MainAgent
+from agents.order_agent import create_order_agent
+from agents.specialists import LazyAgentRegistry
+from tests.fakes import FakeOpenAIClient, FakeWooClient, make_response
+
+
+class TestLazyAgentRegistry:
+    """הסוכן נבנה בגישה הראשונה בלבד"""
+
+    def test_agents_are_built_once_on_first_access(self):
+        built = []
+        registry = LazyAgentRegistry()
+        registry.register("order", lambda: built.append("order") or "order agent")
+        registry.register("order_handoff", lambda: registry["order"])
+
+        assert "order" in registry and built == [] and not registry.is_created("order")
+        assert registry["order_handoff"] == registry["order"] == "order agent"
+        assert built == ["order"] and len(registry) == 2 and sorted(registry) == ["order", "order_handoff"]
+
+        registry["order"] = "replacement"
+        assert registry["order"] == "replacement" and "missing" not in registry
+
+
+class TestLazySpecialists:
+    """הסוכן הראשי בונה רק את הסוכן שהבקשה נותבה אליו"""
+
+    def test_only_the_routed_specialist_is_created(self):
+        client = FakeOpenAIClient([make_response(content="הזמנות"), make_response(content="יש 3 הזמנות")])
+        main_agent = MainAgent(client, woo_client=FakeWooClient())
+        main_agent.router.classifier = None
+
+        assert not any(main_agent.specialized_agents.is_created(name) for name in main_agent.AGENT_MAPPING)
+
+        assert main_agent.run("תראה לי מה קרה בחנות בשבוע האחרון") == "יש 3 הזמנות"
+        created = [name for name in main_agent.specialized_agents if main_agent.specialized_agents.is_created(name)]
+        assert created == ["order"]
+
+        session = main_agent.for_session()
+        assert session.specialized_agents["order"] is main_agent.specialized_agents["order"]
+
+    def test_handoff_names_resolve_to_the_same_agents(self):
+        main_agent = MainAgent(FakeOpenAIClient(), woo_client=FakeWooClient())
+
+        assert main_agent.specialized_agents["product_handoff"] is main_agent.specialized_agents["product"]
+        handoffs = {handoff.name: handoff for handoff in main_agent.handoffs}
+        assert isinstance(handoffs["settings_handoff"], Handoff)
+        assert resolve_agent(handoffs["settings_handoff"]) is main_agent.specialized_agents["settings"]
+
+
+class TestToolSchemas:
+    """סכמות הכלים מחושבות פעם אחת"""
+
+    def test_parameter_schemas_are_shared_between_agent_instances(self):
+        first = create_order_agent(FakeOpenAIClient(), woo_client=FakeWooClient())
+        second = create_order_agent(FakeOpenAIClient(), woo_client=FakeWooClient())
+
+        assert first.tools[0].parameters is second.tools[0].parameters
+        assert first.tools[0] is not second.tools[0]
+
+    def test_api_tool_list_is_cached_until_a_tool_is_added(self):
+        agent = Agent(client=FakeOpenAIClient())
+
+        @function_tool(name="sales")
+        def sales_tool(days: int = 7):
+            """מכירות"""
+            return "1200"
+
+        agent.add_tool(sales_tool)
+        tools = agent._get_tools_for_api()
+        assert agent._get_tools_for_api() is tools
+        assert tools[0]["function"]["parameters"]["properties"] == {"days": {"type": "integer", "default": 7}}
+
+        agent.add_tool(function_tool(name="orders")(lambda: "3"))
+        assert [tool["function"]["name"] for tool in agent._get_tools_for_api()] == ["sales", "orders"]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לניתוב הספקולטיבי: הקריאה הראשונה של הסוכנים הסבירים רצה במקביל לניתוב
+"""
+
+import asyncio
+import time
+
+from agents.base import Agent, function_tool
+from agents.main_agent import AgentRouter, MainAgent
+from agents.speculation import SpeculativeRouting
+from tests.fakes import FakeAsyncOpenAIClient, FakeOpenAIClient, make_response, make_stream, make_tool_call
+
+QUESTION = "תראה לי מה קרה בחנות בשבוע האחרון"
+
+
+class RankingClassifier:
+    """מסווג מדומה עם ביטחון מתחת לסף, כך שהניתוב עובר למודל"""
+
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+
+    def predict(self, text):
+        label = max(self.probabilities, key=self.probabilities.get)
+        return label, 0.4
+
+    def predict_proba(self, text):
+        return dict(self.probabilities)
+
+
+def _delayed(response, delay):
+    def create(kwargs):
+        time.sleep(delay)
+        return response
+    return create
+
+
+def _main_agent(router_client, specialists, speculation=None):
+    main_agent = MainAgent(None, speculation=speculation or SpeculativeRouting())
+    main_agent.router = AgentRouter(router_client, classifier=RankingClassifier(
+        {"report": 0.45, "order": 0.3, "coupon": 0.15, "primary": 0.1}))
+    for name, agent in specialists.items():
+        main_agent.add_specialized_agent(name, agent)
+    return main_agent
+
+
+class TestSpeculativeRouting:
+    """הסוכן שנבחר ממשיך מהקריאה שכבר בוצעה, והשאר נזרקים"""
+
+    def test_hit_reuses_the_prefetched_completion(self):
+        report = Agent(client=FakeOpenAIClient([make_response(content="המכירות: 1200")]))
+        order = Agent(client=FakeOpenAIClient([make_response(content="3 הזמנות")]))
+        main_agent = _main_agent(FakeOpenAIClient([_delayed(make_response(content="דוחות"), 0.05)]),
+                                 {"report": report, "order": order})
+
+        assert main_agent.run(QUESTION) == "המכירות: 1200"
+        assert len(report.client.calls) == 1 and len(order.client.calls) == 1
+        assert main_agent.last_turn_stats == dict(main_agent.last_turn_stats, route="report",
+                                                  route_source="llm", llm_calls=3)
+        assert main_agent.speculation.stats() == dict(main_agent.speculation.stats(), hits=1, misses=0,
+                                                      speculative_calls=2, wasted_calls=1, hit_rate=1.0)
+
+    def test_miss_runs_the_chosen_agent_normally(self):
+        report = Agent(client=FakeOpenAIClient([make_response(content="המכירות: 1200")]))
+        coupon = Agent(client=FakeOpenAIClient([make_response(content="2 קופונים פעילים")]))
+        main_agent = _main_agent(FakeOpenAIClient([make_response(content="קופונים")]),
+                                 {"report": report, "coupon": coupon},
+                                 SpeculativeRouting(width=1))
+
+        assert main_agent.run(QUESTION) == "2 קופונים פעילים"
+        assert main_agent.speculation.stats()["wasted_calls"] == 1
+        assert main_agent.speculation.stats()["misses"] == 1
+
+    def test_tools_run_only_for_the_chosen_agent(self):
+        executed = []
+
+        @function_tool(name="sales")
+        def sales_tool():
+            """מכירות"""
+            executed.append("sales")
+            return "1200"
+
+        def specialist(answer):
+            agent = Agent(client=FakeOpenAIClient([
+                make_response(tool_calls=[make_tool_call("c1", "sales", {})]),
+                make_response(content=answer),
+            ]))
+            agent.add_tool(sales_tool)
+            return agent
+
+        main_agent = _main_agent(FakeOpenAIClient([make_response(content="הזמנות")]),
+                                 {"report": specialist("דוח"), "order": specialist("הזמנות: 1200")})
+
+        assert main_agent.run(QUESTION) == "הזמנות: 1200"
+        assert executed == ["sales"]
+
+    def test_router_and_specialist_run_in_parallel(self):
+        report = Agent(client=FakeOpenAIClient([_delayed(make_response(content="דוח"), 0.1)]))
+        router_client = FakeOpenAIClient([_delayed(make_response(content="דוחות"), 0.1)])
+        main_agent = _main_agent(router_client, {"report": report}, SpeculativeRouting(width=1))
+
+        start = time.perf_counter()
+        assert main_agent.run(QUESTION) == "דוח"
+        assert time.perf_counter() - start < 0.18
+
+    def test_async_losers_are_cancelled(self):
+        def async_agent(answer, delay):
+            client = FakeOpenAIClient()
+            client.async_client = FakeAsyncOpenAIClient([make_response(content=answer)], delay=delay)
+            return Agent(client=client)
+
+        router_client = FakeOpenAIClient()
+        router_client.async_client = FakeAsyncOpenAIClient([make_response(content="דוחות")], delay=0.02)
+        report, order = async_agent("דוח", 0.1), async_agent("הזמנות", 0.1)
+        main_agent = _main_agent(router_client, {"report": report, "order": order})
+
+        assert asyncio.run(main_agent.arun(QUESTION)) == "דוח"
+        assert order.client.async_client.calls == []
+
+    def test_stream_events_follow_the_route_event(self):
+        report = Agent(client=FakeOpenAIClient([make_stream(["ד", "וח"])]))
+        main_agent = _main_agent(FakeOpenAIClient([make_response(content="דוחות")]), {"report": report},
+                                 SpeculativeRouting(width=1))
+
+        events = list(main_agent.run_stream(QUESTION))
+
+        assert [e["type"] for e in events] == ["route", "token", "token", "done"]
+        assert events[-1]["content"] == "דוח"
+
+    def test_cost_caps(self):
+        report = Agent(client=FakeOpenAIClient([make_response(content="דוח")]))
+        order = Agent(client=FakeOpenAIClient())
+        main_agent = _main_agent(FakeOpenAIClient([make_response(content="דוחות")]),
+                                 {"report": report, "order": order},
+                                 SpeculativeRouting(width=2, min_probability=0.4))
+
+        main_agent.run(QUESTION)
+        assert order.client.calls == []
+
+        main_agent.speculation = SpeculativeRouting(max_prompt_tokens=1)
+        report.client.chat.completions.responses.append(make_response(content="דוח"))
+        main_agent.router.client.chat.completions.responses.append(make_response(content="דוחות"))
+        main_agent.run(QUESTION)
+        assert main_agent.speculation.stats()["turns"] == 0
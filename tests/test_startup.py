@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לטעינה המהירה: ספריות כבדות נטענות רק כשצריך אותן
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from agents.runtime import LazyClient, async_client_for
+from tests.fakes import FakeAsyncOpenAIClient, FakeOpenAIClient, make_response
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestLazyImports:
+    """טעינת הסוכנים לא טוענת את openai, numpy או pkg_resources"""
+
+    def test_agent_modules_do_not_import_heavy_dependencies(self):
+        code = ("import sys, agents.main_agent, memory.vector_store, memory.conversation_store; "
+                "print(sorted(m for m in ('openai', 'numpy', 'pkg_resources', 'yaml', 'chromadb', 'redis') "
+                "if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+
+        assert result.stdout.strip() == "[]", result.stderr
+
+
+class TestLazyClient:
+    """הלקוח נוצר בגישה הראשונה בלבד"""
+
+    def test_client_is_created_on_first_use(self):
+        created = []
+        fake = FakeOpenAIClient([make_response(content="שלום")])
+        fake.async_client = FakeAsyncOpenAIClient([])
+        client = LazyClient(lambda: created.append(1) or fake)
+
+        assert created == []
+        assert client.chat.completions.create(model="gpt-4o", messages=[]).choices[0].message.content == "שלום"
+        assert async_client_for(client) is fake.async_client
+        assert created == [1]
+
+
+class TestStatsEndpoints:
+    """נקודות הקצה של המדדים לא יוצרות את לקוח OpenAI"""
+
+    def test_llm_cache_stats_do_not_create_the_client(self, monkeypatch):
+        import app as web_app
+
+        created = []
+        monkeypatch.setattr(web_app, "client", LazyClient(lambda: created.append(1)))
+        response = web_app.app.test_client().get("/api/stats/llm-cache")
+
+        assert response.status_code == 200 and created == []
+        assert response.get_json()["enabled"] == (web_app.llm_cache is not None)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות למצב ההזרמה של הסוכנים ולנקודת הקצה /api/chat/stream
+"""
+
+import json
+from types import SimpleNamespace
+
+from agents.base import Agent, function_tool
+from agents.main_agent import MainAgent
+from agents.sessions import SessionManager
+from tests.fakes import FakeOpenAIClient, make_response, make_stream, make_tool_call
+
+
+def _create_agent(client):
+    agent = Agent(client=client)
+
+    @function_tool(name="get_sales", description="מחזיר מכירות")
+    def get_sales_tool(period: str):
+        return f"מכירות {period}: 1200"
+
+    agent.add_tool(get_sales_tool)
+    return agent
+
+
+class TestAgentStreaming:
+    """בדיקות להזרמת אירועים מסוכן בודד"""
+
+    def test_tokens_are_streamed_in_order(self):
+        """כל קטע טקסט מהמודל נשלח כאירוע token ובסוף מגיע done"""
+        client = FakeOpenAIClient([make_stream(["המכירות ", "החודש ", "גבוהות"])])
+        events = list(_create_agent(client).run_stream("מה המכירות החודש"))
+
+        assert [e["content"] for e in events if e["type"] == "token"] == ["המכירות ", "החודש ", "גבוהות"]
+        assert events[-1] == {"type": "done", "content": "המכירות החודש גבוהות"}
+        assert client.calls[0]["stream"] is True
+
+    def test_tool_calls_are_assembled_from_chunks(self):
+        """קריאת כלי שמפוצלת על פני כמה קטעים מורכבת ומבוצעת"""
+        tool_call = make_tool_call("call_1", "get_sales", {"period": "החודש"})
+        client = FakeOpenAIClient([
+            make_stream(tool_calls=[tool_call]),
+            make_stream(["סה\"כ ", "1200"]),
+        ])
+        agent = _create_agent(client)
+
+        events = list(agent.run_stream("מה המכירות החודש"))
+        types = [e["type"] for e in events]
+
+        assert types.index("tool_call") < types.index("tool_result") < types.index("token")
+        assert events[-1]["content"] == "סה\"כ 1200"
+        tool_message = client.calls[1]["messages"][-1]
+        assert tool_message["tool_call_id"] == "call_1"
+        assert tool_message["content"] == "מכירות החודש: 1200"
+        assert agent.last_run_stats["total_tokens"] == 30
+
+    def test_run_and_stream_return_same_answer(self):
+        """run מחזיר את אותה תשובה שמגיעה באירוע done"""
+        client = FakeOpenAIClient([make_response(content="תשובה")])
+        assert _create_agent(client).run("שאלה") == "תשובה"
+
+
+class TestMainAgentStreaming:
+    """בדיקות להזרמה דרך הסוכן הראשי"""
+
+    def _create_main_agent(self, specialist_responses):
+        main_agent = MainAgent(None)
+        main_agent.router = SimpleNamespace(identify_agent=lambda user_input, context=None: "report")
+        main_agent.add_specialized_agent("report", Agent(client=FakeOpenAIClient(specialist_responses)))
+        return main_agent
+
+    def test_route_event_precedes_specialist_tokens(self):
+        """הסוכן הראשי מודיע לאיזה סוכן הועברה הבקשה ומזרים את תשובתו"""
+        main_agent = self._create_main_agent([make_stream(["דוח ", "מכירות"])])
+
+        events = list(main_agent.run_stream("הצג לי דוח מכירות של החודש האחרון"))
+
+        assert events[0] == {"type": "route", "agent": "report"}
+        assert events[-1] == {"type": "done", "content": "דוח מכירות"}
+        assert list(main_agent.context.agent_history) == ["report"]
+
+    def test_fixed_answers_are_streamed_as_single_token(self):
+        """תשובות קבועות של הסוכן הראשי נשלחות כאירוע אחד"""
+        events = list(self._create_main_agent([]).run_stream("מי אתה"))
+
+        assert [e["type"] for e in events] == ["token", "done"]
+        assert "הסוכן הראשי" in events[-1]["content"]
+
+
+class TestChatStreamEndpoint:
+    """בדיקות לנקודת הקצה של ה-SSE"""
+
+    def test_events_are_sent_as_sse(self, monkeypatch):
+        import app as web_app
+
+        fake_agent = SimpleNamespace(run_stream=lambda message: iter([
+            {"type": "token", "content": "שלום"},
+            {"type": "done", "content": "שלום"},
+        ]))
+        monkeypatch.setattr(web_app, "sessions", SessionManager(lambda session_id: fake_agent))
+
+        response = web_app.app.test_client().post("/api/chat/stream", json={"message": "היי"})
+        body = response.get_data(as_text=True)
+        events = [json.loads(line[len("data: "):]) for line in body.split("\n\n") if line]
+
+        assert response.mimetype == "text/event-stream"
+        assert events == [{"type": "token", "content": "שלום"}, {"type": "done", "content": "שלום"}]
+
+    def test_missing_message_is_rejected(self):
+        import app as web_app
+
+        response = web_app.app.test_client().post("/api/chat/stream", json={})
+        assert response.status_code == 400
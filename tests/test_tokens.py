@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לספירת טוקנים ולבניית הקשר בתקציב (utils/tokens.py)
+"""
+
+import json
+
+from agents.base import Agent, function_tool
+from agents.main_agent import AgentContext
+from utils.tokens import (
+    ContextBuilder, compact_tool_output, count_tokens, prompt_token_report, truncate_text
+)
+from tests.fakes import FakeOpenAIClient, make_response, make_tool_call
+
+
+LONG_LISTING = "\n".join(f"מוצר {i}: חולצת כותנה, מחיר: {i * 10} ש\"ח, מלאי: {i}" for i in range(200))
+
+
+class TestTruncation:
+    """בדיקות לקיצור טקסט ותוצאות כלים"""
+
+    def test_short_text_is_unchanged(self):
+        assert truncate_text("מה המכירות החודש", 50) == "מה המכירות החודש"
+        assert count_tokens("") == 0
+
+    def test_long_text_fits_budget_and_keeps_both_ends(self):
+        text = truncate_text(LONG_LISTING, 100)
+        assert count_tokens(text) <= 100
+        assert text.startswith("מוצר 0")
+        assert "מוצר 199" in text
+        assert "הושמטו" in text
+
+    def test_list_results_keep_whole_items(self):
+        products = [{"id": i, "name": f"מוצר {i}"} for i in range(100)]
+        text = compact_tool_output(products, 120)
+
+        assert count_tokens(text) <= 120
+        assert "{'id': 0, 'name': 'מוצר 0'}" in text
+        assert "מתוך 100" in text
+
+    def test_json_list_results_stay_valid_json(self):
+        products = json.dumps([{"id": i, "name": f"מוצר {i}"} for i in range(100)], ensure_ascii=False)
+        first_line = compact_tool_output(products, 120).split("\n")[0]
+        assert json.loads(first_line)[0] == {"id": 0, "name": "מוצר 0"}
+
+
+class TestContextBuilder:
+    """בדיקות לחלוקת התקציב בין חלקי ההקשר"""
+
+    def test_sections_are_capped_and_reported(self):
+        builder = ContextBuilder(max_tokens=200)
+        builder.add("question", "מה המכירות החודש", priority=0)
+        builder.add("history", LONG_LISTING, max_tokens=80, priority=1)
+        text = builder.build()
+
+        sections = builder.report["sections"]
+        assert sections["history"]["tokens"] <= 80 < sections["history"]["original_tokens"]
+        assert builder.report["total_tokens"] <= 200
+        assert text.startswith("מה המכירות החודש")
+
+    def test_low_priority_sections_get_leftover_budget(self):
+        builder = ContextBuilder(max_tokens=60)
+        builder.add("old", LONG_LISTING, priority=2)
+        builder.add("recent", LONG_LISTING, max_tokens=50, priority=1)
+        builder.build()
+
+        assert builder.report["sections"]["recent"]["tokens"] > builder.report["sections"]["old"]["tokens"]
+
+
+class TestAgentContext:
+    """בדיקות להקשר השיחה שמועבר לסוכנים המתמחים"""
+
+    def test_context_stays_within_budget(self):
+        context = AgentContext()
+        for i in range(10):
+            context.add_to_history(f"הצג את כל המוצרים {i}", LONG_LISTING, "product")
+
+        text = context.get_context_for_model()
+
+        assert count_tokens(text) <= AgentContext.CONTEXT_TOKENS
+        assert context.last_context_report["total_tokens"] <= AgentContext.CONTEXT_TOKENS
+        assert "הצג את כל המוצרים 9" in text
+
+    def test_older_turns_are_summarized_once(self):
+        context = AgentContext()
+        for i in range(5):
+            context.add_to_history(f"שאלה {i}", f"תשובה {i}", "order")
+            context.get_context_for_model()
+
+        assert len(context.summary_lines) == 2
+        assert context.summary_lines[0].startswith("- order: שאלה 0")
+
+    def test_history_is_bounded_and_evicted_turns_are_summarized(self):
+        context = AgentContext(history_depth=5)
+        for i in range(40):
+            context.add_to_history(f"שאלה {i}", f"תשובה {i}", "order")
+
+        assert len(context.conversation_history) == 5 and len(context.agent_history) == 5
+        assert context.turn_count == 40
+        assert context.conversation_history[0]["user_input"] == "שאלה 35"
+        assert context.summary_lines[-1].startswith("- order: שאלה 35")
+        assert count_tokens("\n".join(context.summary_lines)) <= AgentContext.SUMMARY_TOKENS
+
+        context.get_context_for_model()
+        assert context.summary_lines[-1].startswith("- order: שאלה 36")
+
+
+class TestAgentPromptReport:
+    """בדיקות לתוצאות כלים גדולות ולפירוט הטוקנים בכל צעד"""
+
+    def test_large_tool_results_are_compacted(self):
+        client = FakeOpenAIClient([
+            make_response(tool_calls=[make_tool_call("c1", "list_products", {})]),
+            make_response(content="יש 200 מוצרים"),
+        ])
+        agent = Agent(client=client, max_tool_result_tokens=100)
+
+        @function_tool(name="list_products", description="מחזיר מוצרים")
+        def list_products_tool():
+            return LONG_LISTING
+
+        agent.add_tool(list_products_tool)
+
+        assert agent.run("הצג מוצרים") == "יש 200 מוצרים"
+        tool_message = client.calls[1]["messages"][-1]
+        assert count_tokens(tool_message["content"]) <= 100
+
+        steps = agent.last_run_stats["steps"]
+        assert steps[0]["prompt_report"]["tool"] == 0
+        assert 0 < steps[1]["prompt_report"]["tool"] <= 110
+        assert steps[1]["prompt_report"]["tools_schema"] > 0
+
+    def test_prompt_report_totals(self):
+        messages = [{"role": "system", "content": "אתה עוזר"}, {"role": "user", "content": "שלום"}]
+        report = prompt_token_report(messages)
+        assert report["total"] == report["system"] + report["user"]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לשמירה ולטעינה של מאגר הזיכרון הווקטורי
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from memory.vector_persistence import JOURNAL_FILE
+from memory.vector_store import AdvancedVectorStore
+from tests.fakes import FakeOpenAIClient
+
+
+def make_store(directory, **kwargs):
+    return AdvancedVectorStore(FakeOpenAIClient(), persist_directory=str(directory), importance_threshold=0.0,
+                               embedding_dimensions=32, **kwargs)
+
+
+def ids_of(results):
+    return [result["id"] for result in results]
+
+
+class TestSaveAndLoad:
+    """האוסף נשמר ונטען בלי העתקה של המטריצה"""
+
+    def test_saved_store_loads_with_a_memory_mapped_matrix(self, tmp_path):
+        store = make_store(tmp_path)
+        shirt = store.add_document("חולצה כחולה", metadata={"type": "product"})
+        store.add_documents(["מדיניות משלוחים", "הזמנה 1001 נשלחה"])
+        store.save()
+
+        loaded = make_store(tmp_path)
+        assert loaded.load()
+        assert isinstance(loaded._matrix.vectors, np.memmap) and not loaded._matrix.vectors.flags.writeable
+        assert len(loaded.documents) == 3 and loaded.get_document(shirt)["metadata"]["type"] == "product"
+        assert ids_of(loaded.search("חולצה כחולה", n_results=1)) == [shirt]
+        assert ids_of(loaded.search("חולצה כחולה", filters={"type": "product"})) == [shirt]
+
+    def test_load_without_a_saved_collection_returns_false(self, tmp_path):
+        assert not make_store(tmp_path).load()
+
+    def test_changes_after_save_are_journaled(self, tmp_path):
+        store = make_store(tmp_path)
+        old = store.add_document("קופון הנחה ישן")
+        store.save()
+        new = store.add_document("קופון הנחה חדש")
+        store.delete_document(old)
+        store.update_document_importance(new, 0.5)
+
+        loaded = make_store(tmp_path)
+        loaded.load()
+        assert ids_of(loaded.search("קופון הנחה חדש", min_relevance_score=0.0)) == [new]
+        assert loaded.get_document(new)["metadata"]["importance_score"] == 0.5
+        assert old not in loaded.documents
+
+        loaded.save()
+        assert os.path.getsize(tmp_path / "woo_agent_memory" / JOURNAL_FILE) == 0
+        assert sorted(name for name in os.listdir(tmp_path / "woo_agent_memory") if name.endswith(".npy")) == \
+            ["ids.1.npy", "vectors.1.npy"]
+
+    def test_first_write_copies_the_mapped_matrix(self, tmp_path):
+        store = make_store(tmp_path)
+        store.add_document("מוצר ראשון")
+        store.save()
+        size = os.path.getsize(tmp_path / "woo_agent_memory" / "vectors.0.npy")
+
+        loaded = make_store(tmp_path)
+        loaded.load()
+        loaded.add_document("מוצר שני")
+
+        assert not isinstance(loaded._matrix.vectors, np.memmap) and len(loaded._matrix) == 2
+        assert os.path.getsize(tmp_path / "woo_agent_memory" / "vectors.0.npy") == size
+
+    def test_clear_is_journaled(self, tmp_path):
+        store = make_store(tmp_path)
+        store.add_document("זיכרון")
+        store.save()
+        store.clear()
+
+        loaded = make_store(tmp_path)
+        loaded.load()
+        assert len(loaded.documents) == 0 and len(loaded._matrix) == 0
+
+
+class TestReadOnly:
+    """תהליכים שרק מחפשים טוענים את האוסף לקריאה בלבד"""
+
+    def test_read_only_store_searches_but_rejects_writes(self, tmp_path):
+        store = make_store(tmp_path)
+        doc_id = store.add_document("שעות פעילות של החנות")
+        store.save()
+        # שורה חלקית בסוף היומן (קריסה באמצע כתיבה) מדולגת
+        with open(tmp_path / "woo_agent_memory" / JOURNAL_FILE, "a", encoding="utf-8") as journal:
+            journal.write('{"op": "add", "id": "x", "vec')
+
+        reader = make_store(tmp_path)
+        assert reader.load(read_only=True)
+        assert ids_of(reader.search("שעות פעילות", min_relevance_score=0.0)) == [doc_id]
+        with pytest.raises(RuntimeError):
+            reader.add_document("מסמך חדש")
+        with pytest.raises(RuntimeError):
+            reader.delete_document(doc_id)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+בדיקות לחיפוש הווקטורי במאגר הזיכרון
+"""
+
+import numpy as np
+import pytest
+
+from memory.ann_index import HNSWLIB_AVAILABLE, IVFFlatIndex, create_ann_index
+from memory.vector_index import EmbeddingMatrix, ranked_rows
+from memory.vector_store import AdvancedVectorStore, VectorStore
+from tests.fakes import FakeOpenAIClient
+
+
+def make_store(**kwargs):
+    return AdvancedVectorStore(FakeOpenAIClient(), importance_threshold=0.0, embedding_dimensions=64, **kwargs)
+
+
+class TestEmbeddingMatrix:
+    """מטריצה רציפה של וקטורים מנורמלים"""
+
+    def test_top_k_matches_a_full_sort(self):
+        rng = np.random.default_rng(7)
+        matrix = EmbeddingMatrix(capacity=4)
+        vectors = rng.normal(size=(300, 16))
+        for i, vector in enumerate(vectors):
+            matrix.add(f"doc-{i}", vector)
+        query = rng.normal(size=16)
+
+        expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        top = matrix.top_k(query, 10)
+
+        assert [doc_id for doc_id, _ in top] == [f"doc-{i}" for i in np.argsort(-expected)[:10]]
+        assert np.allclose([score for _, score in top], np.sort(expected)[::-1][:10], atol=1e-5)
+        assert matrix.vectors.dtype == np.float32 and matrix.vectors.flags["C_CONTIGUOUS"]
+
+    def test_removed_rows_are_skipped_and_compacted(self):
+        matrix = EmbeddingMatrix()
+        for i in range(100):
+            matrix.add(i, [1.0, i / 100])
+        for i in range(60):
+            matrix.remove(i)
+
+        assert matrix.needs_compaction()
+        matrix.compact()
+        assert len(matrix.ids) == len(matrix) == 40
+        assert [doc_id for doc_id, _ in matrix.top_k([1.0, 0.0], 3)] == [60, 61, 62]
+
+    def test_empty_vectors_are_not_added(self):
+        matrix = EmbeddingMatrix()
+
+        assert matrix.add("empty", []) is None and "empty" not in matrix
+        assert matrix.top_k([1.0, 0.0], 5) == []
+
+    def test_ranked_rows_applies_the_threshold_and_predicate(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.8, 0.95], dtype=np.float32)
+
+        assert [row for row, _ in ranked_rows(scores, 3, min_score=0.6)] == [4, 1, 3]
+        assert [row for row, _ in ranked_rows(scores, 2, accept=lambda row: row % 2 == 0)] == [4, 2]
+
+
+class TestVectorSearch:
+    """החיפוש מדרג לפי דמיון לשאילתה"""
+
+    def test_search_ranks_by_similarity_to_the_query(self):
+        store = make_store()
+        store.add_document("הזמנה 1001 נשלחה ללקוח בתל אביב")
+        store.add_document("המוצר חולצה כחולה אזל מהמלאי")
+        shirt = store.add_document("חולצה כחולה במבצע")
+
+        results = store.search("חולצה כחולה", n_results=2, min_relevance_score=0.0)
+
+        assert results[0]["id"] == shirt
+        assert results[0]["relevance_score"] >= results[1]["relevance_score"]
+        assert "חולצה" in results[1]["content"]
+
+    def test_min_relevance_score_and_metadata_filters_are_honored(self):
+        store = make_store()
+        store.add_document("מדיניות החזרות של החנות", metadata={"type": "policy"})
+        faq = store.add_document("מדיניות משלוחים של החנות", metadata={"type": "faq"})
+        store.add_document("דוח מכירות חודשי", metadata={"type": "report"})
+
+        assert store.search("מדיניות משלוחים", min_relevance_score=0.99) == []
+        filtered = store.search("מדיניות החזרות", min_relevance_score=0.0, filters={"type": ["faq", "report"]})
+        assert [result["id"] for result in filtered][0] == faq
+        assert all(result["metadata"]["type"] != "policy" for result in filtered)
+
+    def test_deleted_documents_are_not_returned(self):
+        store = make_store()
+        doc_id = store.add_document("קופון הנחה לחג")
+
+        assert store.delete_document(doc_id)
+        assert store.search("קופון הנחה", min_relevance_score=0.0) == []
+
+    def test_legacy_model_is_called_without_dimensions(self):
+        client = FakeOpenAIClient()
+        store = VectorStore(client)
+        store.add_document("שלום")
+
+        assert client.embeddings.calls[0]["model"] == "text-embedding-ada-002"
+        assert client.embeddings.calls[0]["dimensions"] is None
+        assert store.search("שלום")[0]["relevance_score"] > 0.99
+
+
+def clustered_matrix(n_clusters=20, per_cluster=50, dimensions=32, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dimensions))
+    matrix = EmbeddingMatrix()
+    for i in range(n_clusters * per_cluster):
+        matrix.add(i, centers[i % n_clusters] + 0.1 * rng.normal(size=dimensions))
+    return matrix, rng
+
+
+class TestIVFFlatIndex:
+    """חיפוש משוער באשכולות הקרובים"""
+
+    def test_probing_every_cluster_matches_the_exact_search(self):
+        matrix, rng = clustered_matrix()
+        index = IVFFlatIndex(matrix, nlist=10, nprobe=10)
+        query = rng.normal(size=32)
+
+        assert [row for row, _ in index.search(query, 10)] == [doc_id for doc_id, _ in matrix.top_k(query, 10)]
+
+    def test_recall_is_high_with_few_probes_on_clustered_data(self):
+        matrix, rng = clustered_matrix()
+        index = IVFFlatIndex(matrix, nlist=20, nprobe=3)
+        hits = 0
+        for _ in range(20):
+            query = matrix.vectors[rng.integers(len(matrix))] + 0.05 * rng.normal(size=32)
+            exact = {doc_id for doc_id, _ in matrix.top_k(query, 10)}
+            hits += len(exact & {row for row, _ in index.search(query, 10)})
+
+        assert hits / 200 >= 0.9
+
+    def test_inserts_after_training_and_tombstones_are_respected(self):
+        matrix, rng = clustered_matrix()
+        index = IVFFlatIndex(matrix, nlist=20, nprobe=2)
+        index.train()
+
+        vector = rng.normal(size=32)
+        index.add(matrix.add("new", vector))
+        assert index.search(vector, 1)[0][0] == matrix.rows["new"]
+
+        row = matrix.rows["new"]
+        matrix.remove("new")
+        index.remove(row)
+        assert row not in [found for found, _ in index.search(vector, 5)]
+
+    @pytest.mark.skipif(HNSWLIB_AVAILABLE, reason="hnswlib מותקנת")
+    def test_hnsw_falls_back_to_ivf_without_hnswlib(self):
+        assert isinstance(create_ann_index("hnsw", EmbeddingMatrix()), IVFFlatIndex)
+
+
+class TestAnnVectorStore:
+    """המאגר עובר לאינדקס המשוער מעל ann_min_documents"""
+
+    def test_store_searches_through_the_index(self):
+        store = make_store(ann_index="ivf", ann_options={"nlist": 2, "nprobe": 2}, ann_min_documents=0)
+        store.add_document("הזמנה 1001 נשלחה", metadata={"type": "order"})
+        refund = store.add_document("החזר כספי ללקוח", metadata={"type": "refund"})
+        store.build_index()
+        late = store.add_document("הזמנה 1002 בוטלה", metadata={"type": "order"})
+
+        assert store.search("הזמנה בוטלה", n_results=1, min_relevance_score=0.0)[0]["id"] == late
+        assert store.search("הזמנה", min_relevance_score=-1.0, filters={"type": "refund"})[0]["id"] == refund
+
+        store.delete_document(late)
+        assert late not in [result["id"] for result in store.search("הזמנה בוטלה", min_relevance_score=0.0)]
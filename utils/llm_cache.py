@@ -0,0 +1,460 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+מטמון לתשובות מודל השפה
+------------------------
+
+שאלות זהות או כמעט זהות ("מה המכירות החודש", שאלות עזרה, סיווג הבקשה בנתב)
+נשלחות ל-OpenAI שוב ושוב. המודול עוטף את client.chat.completions.create
+במטמון דו-שכבתי:
+- שכבה בזיכרון (LRU) עם זמן תפוגה
+- שכבה קבועה ב-SQLite שנשמרת בין הפעלות
+
+המפתח מחושב מהמודל, ההודעות והכלים אחרי נרמול רווחים ומספרים.
+תשובות שמפעילות כלי כתיבה (עדכון, יצירה, מחיקה) לא נשמרות, ושיחה שכבר
+הפעילה כלי כתיבה עוקפת את המטמון לגמרי.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
+
+# קידומות של כלים שמשנים את החנות
+WRITE_TOOL_PREFIXES = ("add_", "create_", "delete_", "update_", "manage_", "toggle_")
+
+# פרמטרים שלא משפיעים על תוכן התשובה
+_IGNORED_PARAMS = {"stream", "stream_options", "timeout", "extra_headers", "user"}
+
+# מספר עם מפריד אלפים (1,200) או מספר רגיל (5.00)
+_NUMBER_RE = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+\.\d+")
+
+
+def is_write_tool(name):
+    """
+    בודק אם כלי משנה את החנות לפי שמו
+    """
+    return bool(name) and name.startswith(WRITE_TOOL_PREFIXES)
+
+
+def _canonical_number(match):
+    text = match.group().replace(",", "")
+    if "." not in text:
+        return text
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return text
+    # 5.00 -> 5, 99.90 -> 99.9
+    return format(value.normalize(), "f")
+
+
+def normalize_text(text):
+    """
+    מנרמל טקסט לצורך חישוב מפתח: רווחים מרובים מצומצמים, מפרידי אלפים
+    ואפסים מיותרים אחרי הנקודה העשרונית מוסרים. המספרים עצמם נשמרים,
+    כך ששאלות על מוצרים שונים לא מקבלות אותה תשובה.
+    """
+    if not isinstance(text, str):
+        return text
+    text = " ".join(text.split())
+    return _NUMBER_RE.sub(_canonical_number, text)
+
+
+def _to_plain(obj):
+    """
+    ממיר תשובת מודל (אובייקט pydantic או SimpleNamespace) למבנה JSON
+    """
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, SimpleNamespace):
+        return {key: _to_plain(value) for key, value in vars(obj).items()}
+    if isinstance(obj, dict):
+        return {key: _to_plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_plain(value) for value in obj]
+    return obj
+
+
+def _to_namespace(data):
+    if isinstance(data, dict):
+        return SimpleNamespace(**{key: _to_namespace(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [_to_namespace(value) for value in data]
+    return data
+
+
+def _from_plain(data):
+    """
+    משחזר תשובה שנשמרה במטמון. השימוש בטוקנים מאופס - תשובה מהמטמון לא עלתה כלום.
+    """
+    data = dict(data, usage=None)
+    try:
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate(data)
+    except Exception:
+        return _to_namespace(data)
+
+
+def _message_to_plain(message):
+    if isinstance(message, dict):
+        return message
+    return _to_plain(message)
+
+
+def _tool_call_names(message):
+    names = []
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function") or {}
+        names.append(function.get("name"))
+    return names
+
+
+def make_cache_key(model=None, messages=None, tools=None, **params):
+    """
+    מחשב מפתח מטמון לקריאה ל-chat.completions.create
+
+    Args:
+        model: שם המודל
+        messages: ההודעות
+        tools: הגדרות הכלים
+        params: שאר הפרמטרים של הקריאה
+
+    Returns:
+        str: מפתח sha256
+    """
+    # מזהי קריאות הכלים אקראיים - מחליפים אותם במספור לפי סדר ההופעה
+    call_ids = {}
+
+    def call_id(value):
+        return call_ids.setdefault(value, f"call_{len(call_ids)}")
+
+    normalized_messages = []
+    for message in messages or []:
+        message = dict(_message_to_plain(message))
+        message["content"] = normalize_text(message.get("content"))
+        if message.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": call_id(tool_call.get("id")),
+                    "name": (tool_call.get("function") or {}).get("name"),
+                    "arguments": (tool_call.get("function") or {}).get("arguments")
+                }
+                for tool_call in message["tool_calls"]
+            ]
+        if message.get("tool_call_id"):
+            message["tool_call_id"] = call_id(message["tool_call_id"])
+        normalized_messages.append({key: value for key, value in message.items() if value is not None})
+
+    payload = {
+        "model": model,
+        "messages": normalized_messages,
+        "tools": tools,
+        "params": {key: value for key, value in params.items() if key not in _IGNORED_PARAMS}
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    מטמון תשובות: LRU בזיכרון עם זמן תפוגה ושכבת SQLite אופציונלית
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, db_path=None):
+        """
+        Args:
+            max_entries: מספר הרשומות המרבי בזיכרון
+            ttl_seconds: זמן התפוגה של רשומה בשניות (None - ללא תפוגה)
+            db_path: נתיב לקובץ SQLite לשכבה הקבועה (None - זיכרון בלבד)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """
+        יוצר מטמון לפי משתני הסביבה, או None אם המטמון כבוי (LLM_CACHE_ENABLED=false)
+        """
+        if os.environ.get("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        ttl = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+        return cls(
+            max_entries=int(os.environ.get("LLM_CACHE_SIZE", "1024")),
+            ttl_seconds=ttl if ttl > 0 else None,
+            db_path=os.environ.get("LLM_CACHE_PATH", os.path.join("cache", "llm_cache.sqlite")) or None
+        )
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """
+        מחזיר את התשובה השמורה (כמבנה JSON) או None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, data = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return data
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, created_at = row
+                    if not self._expired(created_at):
+                        data = json.loads(response)
+                        self._remember(key, created_at, data)
+                        self._stats["disk_hits"] += 1
+                        return data
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, data):
+        """
+        שומר תשובה (כמבנה JSON) בשתי השכבות
+        """
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, data)
+            self._stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(data, ensure_ascii=False, default=str), created_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key, created_at, data):
+        self._entries[key] = (created_at, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record_bypass(self):
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def clear(self):
+        """
+        מרוקן את שתי השכבות
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+    def stats(self):
+        """
+        מחזיר מדדי שימוש, כולל אחוז הפגיעות מתוך הקריאות שנבדקו במטמון
+
+        Returns:
+            dict: memory_hits, disk_hits, misses, stores, bypassed, entries, hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def _history_has_writes(messages):
+    return any(
+        is_write_tool(name)
+        for message in messages or []
+        for name in _tool_call_names(_message_to_plain(message))
+    )
+
+
+def _response_has_writes(data):
+    for choice in data.get("choices") or []:
+        if any(is_write_tool(name) for name in _tool_call_names(choice.get("message") or {})):
+            return True
+    return False
+
+
+def _replay_stream(data):
+    """
+    מחזיר תשובה שמורה כרצף קטעי הזרמה, באותו מבנה כמו הזרמה מ-OpenAI
+    """
+    message = (data.get("choices") or [{}])[0].get("message") or {}
+    if message.get("content"):
+        yield _to_namespace({"choices": [{"delta": {"content": message["content"], "tool_calls": None}}], "usage": None})
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        yield _to_namespace({
+            "choices": [{"delta": {"content": None, "tool_calls": [{
+                "index": index,
+                "id": tool_call.get("id"),
+                "function": tool_call.get("function")
+            }]}}],
+            "usage": None
+        })
+
+
+def _stream_and_store(cache, key, chunks):
+    """
+    מעביר קטעי הזרמה כמו שהם ושומר את התשובה המלאה בסופם
+    """
+    from agents.runtime import StreamAccumulator
+
+    accumulator = StreamAccumulator()
+    for chunk in chunks:
+        accumulator.add(chunk)
+        yield chunk
+    data = _to_plain(accumulator.response())
+    if not _response_has_writes(data):
+        cache.set(key, data)
+
+
+async def _areplay_stream(data):
+    for chunk in _replay_stream(data):
+        yield chunk
+
+
+async def _astream_and_store(cache, key, chunks):
+    from agents.runtime import StreamAccumulator
+
+    accumulator = StreamAccumulator()
+    async for chunk in chunks:
+        accumulator.add(chunk)
+        yield chunk
+    data = _to_plain(accumulator.response())
+    if not _response_has_writes(data):
+        cache.set(key, data)
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache, is_async=False):
+        self._completions = completions
+        self._cache = cache
+        self._is_async = is_async
+
+    def _lookup(self, kwargs):
+        """
+        מחזיר (מפתח, תשובה שמורה). מפתח None פירושו עקיפת המטמון.
+        """
+        if _history_has_writes(kwargs.get("messages")):
+            self._cache.record_bypass()
+            return None, None
+        key = make_cache_key(**kwargs)
+        return key, self._cache.get(key)
+
+    def _store(self, key, response):
+        data = _to_plain(response)
+        if not _response_has_writes(data):
+            self._cache.set(key, data)
+
+    def create(self, **kwargs):
+        if self._is_async:
+            return self._acreate(**kwargs)
+
+        key, data = self._lookup(kwargs)
+        stream = kwargs.get("stream", False)
+        if data is not None:
+            return _replay_stream(data) if stream else _from_plain(data)
+
+        response = self._completions.create(**kwargs)
+        if key is None:
+            return response
+        if stream:
+            return _stream_and_store(self._cache, key, response)
+        self._store(key, response)
+        return response
+
+    async def _acreate(self, **kwargs):
+        key, data = self._lookup(kwargs)
+        stream = kwargs.get("stream", False)
+        if data is not None:
+            return _areplay_stream(data) if stream else _from_plain(data)
+
+        response = await self._completions.create(**kwargs)
+        if key is None:
+            return response
+        if stream:
+            return _astream_and_store(self._cache, key, response)
+        self._store(key, response)
+        return response
+
+
+class CachedOpenAIClient:
+    """
+    עוטף לקוח OpenAI (סינכרוני או אסינכרוני) כך שקריאות ל-chat.completions.create
+    עוברות דרך המטמון. כל שאר התכונות (embeddings וכו') מועברות ללקוח המקורי.
+    """
+
+    def __init__(self, client, cache, is_async=False):
+        self._client = client
+        self.cache = cache
+        self._is_async = is_async
+        self.chat = SimpleNamespace(
+            completions=_CachedCompletions(client.chat.completions, cache, is_async)
+        )
+        self._async_wrapper = None
+
+    @property
+    def async_client(self):
+        """
+        לקוח אסינכרוני שחולק את אותו מטמון (עבור arun)
+        """
+        if self._is_async:
+            return None
+        if self._async_wrapper is None:
+            from agents.runtime import async_client_for
+
+            inner = async_client_for(self._client)
+            if inner is None:
+                return None
+            self._async_wrapper = CachedOpenAIClient(inner, self.cache, is_async=True)
+        return self._async_wrapper
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def with_completion_cache(client, cache):
+    """
+    עוטף לקוח במטמון, אם הוגדר מטמון
+
+    Args:
+        client: לקוח OpenAI
+        cache: CompletionCache או None
+
+    Returns:
+        הלקוח העטוף, או הלקוח המקורי אם אין מטמון
+    """
+    if client is None or cache is None or isinstance(client, CachedOpenAIClient):
+        return client
+    return CachedOpenAIClient(client, cache)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ספירת טוקנים וניהול תקציב ההקשר
+--------------------------------
+
+גודל ה-prompt קובע גם את זמן התגובה וגם את העלות. המודול מספק:
+- ספירת טוקנים מקומית (tiktoken אם מותקן, ואחרת הערכה קרובה)
+- קיצור טקסט ותוצאות כלים גדולות לתקציב נתון
+- בונה הקשר שמגביל כל חלק בנפרד ומדווח לאן הלכו הטוקנים
+"""
+
+import re
+import json
+import functools
+
+# מנסה לייבא את ה-tokenizer של OpenAI
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+DEFAULT_MODEL = "gpt-4o"
+
+# הערכה ללא tiktoken: כל מילה נחתכת לקטעים של עד 4 תווים, וכל סימן פיסוק הוא טוקן
+_APPROX_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+# תקורה של כל הודעה בפורמט ה-chat (role ומפרידים)
+_MESSAGE_OVERHEAD = 4
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model):
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # קובץ ה-BPE לא זמין (למשל ללא רשת) - עוברים להערכה
+        return None
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """
+    סופר את מספר הטוקנים בטקסט
+
+    Args:
+        text: הטקסט
+        model: שם המודל (קובע את ה-tokenizer)
+
+    Returns:
+        int: מספר הטוקנים
+    """
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = str(text)
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+def _split_at_tokens(text, head_tokens, tail_tokens, model):
+    """
+    מחזיר (התחלה, סוף) של הטקסט לפי מספר טוקנים
+    """
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        head = encoding.decode(tokens[:head_tokens])
+        tail = encoding.decode(tokens[len(tokens) - tail_tokens:]) if tail_tokens else ""
+        return head, tail
+
+    spans = [match.span() for match in _APPROX_TOKEN_RE.finditer(text)]
+    head = text[:spans[head_tokens - 1][1]] if head_tokens else ""
+    tail = text[spans[len(spans) - tail_tokens][0]:] if tail_tokens else ""
+    return head, tail
+
+
+def truncate_text(text, max_tokens, model=DEFAULT_MODEL, keep="both"):
+    """
+    מקצר טקסט לתקציב טוקנים, עם סימון של החלק שהושמט
+
+    Args:
+        text: הטקסט
+        max_tokens: מספר הטוקנים המרבי
+        model: שם המודל
+        keep: איזה חלק לשמור - head (התחלה), tail (סוף) או both (שניהם)
+
+    Returns:
+        str: הטקסט המקוצר (או המקורי אם הוא בתקציב)
+    """
+    if text is None:
+        return ""
+    text = str(text)
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return text
+
+    # התקציב כולל את סימון ההשמטה עצמו; גבולות בין החלקים עשויים להוסיף
+    # טוקן או שניים, ולכן מקצרים שוב במקרה של חריגה
+    marker_tokens = count_tokens(f"[... הושמטו כ-{total} טוקנים ...]", model) + 2
+    budget = max(max_tokens - marker_tokens, 1)
+    while True:
+        if keep == "head":
+            head_tokens, tail_tokens = budget, 0
+        elif keep == "tail":
+            head_tokens, tail_tokens = 0, budget
+        else:
+            head_tokens = (budget * 2 + 2) // 3
+            tail_tokens = budget - head_tokens
+
+        head, tail = _split_at_tokens(text, head_tokens, tail_tokens, model)
+        marker = f"[... הושמטו כ-{total - head_tokens - tail_tokens} טוקנים ...]"
+        result = "\n".join(part for part in (head.rstrip(), marker, tail.lstrip()) if part)
+        overflow = count_tokens(result, model) - max_tokens
+        if overflow <= 0 or budget <= 1:
+            return result
+        budget = max(budget - overflow, 1)
+
+
+def compact_tool_output(result, max_tokens, model=DEFAULT_MODEL):
+    """
+    מכין תוצאת כלי לשליחה למודל בתוך תקציב טוקנים. ברשימות נשמרים הפריטים
+    הראשונים בשלמותם עם ציון מספר הפריטים שהושמטו, ובשאר המקרים הטקסט מקוצר.
+
+    Args:
+        result: תוצאת הכלי (מחרוזת, רשימה, מילון)
+        max_tokens: מספר הטוקנים המרבי
+        model: שם המודל
+
+    Returns:
+        str: התוצאה כטקסט
+    """
+    text = result if isinstance(result, str) else str(result)
+    if max_tokens is None or count_tokens(text, model) <= max_tokens:
+        return text
+
+    items, render = None, str
+    if isinstance(result, (list, tuple)):
+        items = list(result)
+        # רשימת רשומות (RecordList) נשארת בפורמט הדחוס שלה
+        render = getattr(result, "serialize", str)
+    elif isinstance(result, str) and result.lstrip().startswith("["):
+        try:
+            items = json.loads(result)
+            render = functools.partial(json.dumps, ensure_ascii=False, separators=(",", ":"))
+        except ValueError:
+            items = None
+
+    if isinstance(items, list) and items:
+        note_tokens = 20
+        kept, used = [], count_tokens(render([]), model)
+        for item in items:
+            item_tokens = count_tokens(render([item]), model) - count_tokens(render([]), model) + 1
+            if used + item_tokens + note_tokens > max_tokens:
+                break
+            kept.append(item)
+            used += item_tokens
+        if kept:
+            return f"{render(kept)}\n[הושמטו {len(items) - len(kept)} פריטים מתוך {len(items)}]"
+
+    return truncate_text(text, max_tokens, model)
+
+
+def count_message_tokens(message, model=DEFAULT_MODEL):
+    """
+    סופר את הטוקנים של הודעת chat אחת, כולל קריאות כלים
+    """
+    tokens = _MESSAGE_OVERHEAD + count_tokens(message.get("content"), model)
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function") or {}
+        tokens += count_tokens(function.get("name"), model) + count_tokens(function.get("arguments"), model)
+    return tokens
+
+
+def prompt_token_report(messages, tools=None, model=DEFAULT_MODEL):
+    """
+    מפרק את גודל ה-prompt של קריאה אחת למודל לפי סוג התוכן
+
+    Args:
+        messages: ההודעות שנשלחות למודל
+        tools: הגדרות הכלים שנשלחות למודל
+        model: שם המודל
+
+    Returns:
+        dict: טוקנים לפי role (system, user, assistant, tool), tools_schema ו-total
+    """
+    report = {"system": 0, "user": 0, "assistant": 0, "tool": 0, "tools_schema": 0}
+    for message in messages:
+        role = message.get("role", "user")
+        report[role] = report.get(role, 0) + count_message_tokens(message, model)
+    if tools:
+        report["tools_schema"] = count_tokens(json.dumps(tools, ensure_ascii=False), model)
+    report["total"] = sum(report.values())
+    return report
+
+
+class ContextBuilder:
+    """
+    בונה טקסט הקשר מחלקים, כשלכל חלק תקרת טוקנים משלו ולכולם יחד תקרה כוללת.
+    התקציב מחולק לפי עדיפות (מספר נמוך קודם), והטקסט נבנה לפי סדר ההוספה.
+    """
+
+    def __init__(self, max_tokens, model=DEFAULT_MODEL):
+        """
+        Args:
+            max_tokens: תקרת הטוקנים הכוללת
+            model: שם המודל
+        """
+        self.max_tokens = max_tokens
+        self.model = model
+        self.sections = []
+        self.report = None
+
+    def add(self, name, text, max_tokens=None, priority=0, keep="both"):
+        """
+        מוסיף חלק להקשר
+
+        Args:
+            name: שם החלק (לדיווח)
+            text: תוכן החלק
+            max_tokens: תקרת הטוקנים של החלק (None - ללא תקרה נפרדת)
+            priority: עדיפות בחלוקת התקציב - מספר נמוך מקבל תקציב קודם
+            keep: איזה חלק לשמור בקיצור (ראה truncate_text)
+        """
+        if text:
+            self.sections.append({"name": name, "text": text, "max_tokens": max_tokens,
+                                  "priority": priority, "keep": keep})
+        return self
+
+    def build(self, separator="\n"):
+        """
+        מחזיר את ההקשר המקוצר ושומר ב-report את פירוט הטוקנים לכל חלק
+        """
+        remaining = self.max_tokens
+        report = {"sections": {}, "max_tokens": self.max_tokens}
+        texts = {}
+        for index, section in sorted(enumerate(self.sections), key=lambda item: (item[1]["priority"], item[0])):
+            original = count_tokens(section["text"], self.model)
+            cap = remaining if section["max_tokens"] is None else min(section["max_tokens"], remaining)
+            if cap <= 0:
+                text = ""
+            else:
+                text = truncate_text(section["text"], cap, self.model, section["keep"])
+            tokens = count_tokens(text, self.model)
+            remaining -= tokens
+            texts[index] = text
+            report["sections"][section["name"]] = {"tokens": tokens, "original_tokens": original}
+
+        report["total_tokens"] = sum(section["tokens"] for section in report["sections"].values())
+        self.report = report
+        return separator.join(texts[index] for index in range(len(self.sections)) if texts[index])